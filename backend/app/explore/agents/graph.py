@@ -57,7 +57,7 @@ async def run_graph_streaming(
          from the persisted answer). Once the buffer exceeds the holdback (or
          the stream ends tool-free) the prose flushes and streams live as
          ``delta`` events. If a chunk yields tool calls, emit
-         ``phase: searching`` once, execute each via ``execute_tool`` (
+         ``phase: searching`` once, execute them via ``execute_tools`` (
          ``search_documents`` results contribute citation sources), append the
          results, and loop again — the next iteration is ALSO streamed. A no-tool
          query therefore starts streaming on the FIRST model call (delayed only
@@ -80,7 +80,7 @@ async def run_graph_streaming(
         _format_sources_list,
     )
     from app.explore.agents.prompts import AGENT_SYSTEM_PROMPT
-    from app.explore.agents.tools import TOOLS, execute_tool
+    from app.explore.agents.tools import TOOLS, execute_tools
     from app.explore.core.config import settings
     from app.explore.db.supabase import user_client
     from app.explore.services.membership import get_project_context
@@ -261,6 +261,9 @@ async def run_graph_streaming(
         "completion_tokens": 0,
         "reasoning_tokens": 0,
         "total_tokens": 0,
+        # Tokens of retrieved document context packed into tool results
+        # (already part of prompt_tokens; reported to size the budgets).
+        "context_tokens": 0,
     }
 
     def record_usage(chunk: Any) -> None:
@@ -520,20 +523,17 @@ async def run_graph_streaming(
         # user_client() + scoped_project_ids() queries.
         _turn_context_db, _turn_context_pids = await _resolve_turn_ctx()
 
-        # Execute all tool calls concurrently; asyncio.gather preserves order.
-        tool_results = await asyncio.gather(
-            *(
-                execute_tool(
-                    name,
-                    args,
-                    client_id,
-                    access_token,
-                    project_id,
-                    db=_turn_context_db,
-                    resolved_project_ids=_turn_context_pids,
-                )
-                for name, tc_id, args in parsed_calls
-            )
+        # Execute all tool calls concurrently (several search_documents calls
+        # share one batched retrieval); results come back in call order.
+        tool_results = await execute_tools(
+            [(name, args) for name, tc_id, args in parsed_calls],
+            client_id,
+            access_token,
+            project_id,
+            db=_turn_context_db,
+            resolved_project_ids=_turn_context_pids,
+            model=model,
+            usage=usage_totals,
         )
 
         # Emit tool_result events and append history messages in the same stable order.
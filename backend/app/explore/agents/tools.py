@@ -16,6 +16,7 @@ Exposes these tools to the model:
 ``TOOLS`` is the OpenAI function-calling schema list passed to the chat
 completion. ``execute_tool`` dispatches a single tool call and returns the tool
 result text plus any citation sources (only ``search_documents`` yields sources).
+``execute_tools`` runs one iteration's calls, batching ``search_documents``.
 
 SECURITY — multi-tenant isolation
 ----------------------------------
@@ -260,7 +261,12 @@ TOOLS: List[Dict[str, Any]] = [
 
 
 async def _search_documents(
-    query: str, project_ids: List[int], client_id: str, strict: bool = False
+    query: str,
+    project_ids: List[int],
+    client_id: str,
+    strict: bool = False,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """Run RAG retrieval scoped to the caller's project(s); return
     (context_text, sources) for citations.
@@ -272,6 +278,10 @@ async def _search_documents(
     When ``strict`` is True (a specific project is active), retrieval is locked
     to the active project alone — the caller's legacy NULL-project uploads are
     excluded so another scope's documents can't leak into a project chat.
+
+    The context is packed within the chat ``model``'s token budget
+    (``settings.context_token_budget``); sources cover only the packed docs,
+    and the packed token count is added to ``usage["context_tokens"]``.
     """
     if not query or not query.strip():
         return "No search query was provided.", []
@@ -279,6 +289,16 @@ async def _search_documents(
     docs = await rag_service.retrieve_relevant(
         query=query, project_ids=project_ids, client_id=client_id, strict=strict
     )
+    return _format_search_results(docs, model, usage)
+
+
+def _format_search_results(
+    docs: List[Dict[str, Any]],
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Pack retrieved ``docs`` into ``(context_text, sources)`` for the model
+    (see ``_search_documents``)."""
     if not docs:
         return (
             "No matching passages were found in the project's documents "
@@ -286,7 +306,13 @@ async def _search_documents(
             [],
         )
 
-    context_text = rag_service.build_context_string(retrieved_docs=docs)
+    context_text, docs, context_tokens = rag_service.pack_context(
+        retrieved_docs=docs,
+        model=model or "",
+        token_budget=settings.context_token_budget(model),
+    )
+    if usage is not None:
+        usage["context_tokens"] = usage.get("context_tokens", 0) + context_tokens
 
     sources: List[Dict[str, Any]] = []
     seen: set[str] = set()
@@ -875,6 +901,84 @@ def _create_request_proposal(args: Dict[str, Any]) -> Tuple[str, List[Dict[str,
     return text, []
 
 
+async def execute_tools(
+    calls: List[Tuple[str, Dict[str, Any]]],
+    client_id: str,
+    access_token: str,
+    project_id: Optional[int] = None,
+    *,
+    db: Optional[Client] = None,
+    resolved_project_ids: Optional[List[int]] = None,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
+) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Run one tool iteration's ``(name, args)`` calls; results in call order.
+
+    Each result is exactly what ``execute_tool`` returns for that call, but
+    when the iteration holds two or more non-empty ``search_documents``
+    queries they are retrieved together (``rag_service.retrieve_relevant_batch``:
+    one embeddings request, one search round-trip, one rerank per query)
+    instead of each paying the full retrieval pipeline. Every other call goes
+    through ``execute_tool`` concurrently, as before.
+    """
+    search_slots = [
+        i
+        for i, (name, args) in enumerate(calls)
+        if name == "search_documents" and str((args or {}).get("query", "")).strip()
+    ]
+    batched = search_slots if len(search_slots) > 1 else []
+
+    async def _batched_searches() -> List[Tuple[str, List[Dict[str, Any]]]]:
+        if not batched:
+            return []
+        try:
+            if resolved_project_ids is not None:
+                project_ids = resolved_project_ids
+            else:
+                _db = db if db is not None else user_client(access_token)
+                project_ids = await _scoped_project_ids(_db, client_id, project_id)
+            doc_lists = await rag_service.retrieve_relevant_batch(
+                queries=[str(calls[i][1].get("query", "")) for i in batched],
+                project_ids=project_ids,
+                client_id=client_id,
+                strict=project_id is not None,
+            )
+        except Exception:
+            logger.exception("Batched 'search_documents' failed")
+            failure = (
+                "The tool 'search_documents' encountered an error and returned "
+                "no results."
+            )
+            return [(failure, []) for _ in batched]
+        return [_format_search_results(docs, model, usage) for docs in doc_lists]
+
+    others = [i for i in range(len(calls)) if i not in set(batched)]
+    batch_results, other_results = await asyncio.gather(
+        _batched_searches(),
+        asyncio.gather(
+            *(
+                execute_tool(
+                    calls[i][0],
+                    calls[i][1],
+                    client_id,
+                    access_token,
+                    project_id,
+                    db=db,
+                    resolved_project_ids=resolved_project_ids,
+                    model=model,
+                    usage=usage,
+                )
+                for i in others
+            )
+        ),
+    )
+    results: Dict[int, Tuple[str, List[Dict[str, Any]]]] = dict(
+        zip(batched, batch_results)
+    )
+    results.update(zip(others, other_results))
+    return [results[i] for i in range(len(calls))]
+
+
 async def execute_tool(
     name: str,
     args: Dict[str, Any],
@@ -884,6 +988,8 @@ async def execute_tool(
     *,
     db: Optional[Client] = None,
     resolved_project_ids: Optional[List[int]] = None,
+    model: Optional[str] = None,
+    usage: Optional[Dict[str, int]] = None,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """Dispatch a single tool call.
 
@@ -898,6 +1004,10 @@ async def execute_tool(
     ``asyncio.gather``.  When omitted the original per-call path is used so
     existing call sites and tests remain correct.
 
+    ``model`` is the turn's chat model: ``search_documents`` sizes its packed
+    context to that model's token budget and tokenizer, and adds the packed
+    token count to ``usage["context_tokens"]`` when ``usage`` is given.
+
     The five live-data tools build a single RLS-scoped PostgREST client from the
     caller's ``access_token`` (``user_client``) so their queries run under the
     caller's row-level-security context (defense-in-depth on top of the manual
@@ -924,7 +1034,12 @@ async def execute_tool(
             # from the actual project_id (not the list, which is single-element
             # for a no-project user with exactly one membership too).
             return await _search_documents(
-                query, project_ids, client_id, strict=project_id is not None
+                query,
+                project_ids,
+                client_id,
+                strict=project_id is not None,
+                model=model,
+                usage=usage,
             )
         if name == "search_sbi_knowledge":
             query = str(args.get("query", "")) if args else ""
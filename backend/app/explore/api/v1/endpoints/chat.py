@@ -4,16 +4,19 @@ import asyncio
 import json
 import logging
 from datetime import datetime
+from typing import Optional
 
 from app.explore.schemas.chat import ChatRequest
 from app.explore.agents.explore import run_explore_agent_streaming
 from app.explore.api.deps import AuthContext, get_auth_context, get_current_user_id
 from app.explore.core.limiter import limiter
 from app.explore.core.uploads import (
+    SpooledUpload,
     parse_content_length as _parse_content_length,
-    read_capped as _read_capped,
+    spool_capped as _spool_capped,
 )
-from app.explore.services.pdf_parser import PDFParser
+from app.explore.services import extraction
+from app.explore.services.pdf_parser import PDFParser, extract_text
 
 logger = logging.getLogger(__name__)
 
@@ -113,8 +116,9 @@ async def extract_file_text(
     # then bound the actual read so an oversize body is never fully buffered.
     _parse_content_length(request)
 
+    upload: Optional[SpooledUpload] = None
     try:
-        file_bytes = await _read_capped(file)
+        upload = await _spool_capped(file)
 
         filename = file.filename or "attachment"
         file_lower = filename.lower()
@@ -134,6 +138,7 @@ async def extract_file_text(
             # it as an image_url part on the user turn. No server-side transcription.
             import base64
 
+            file_bytes = upload.read_bytes()
             if not file_bytes:
                 raise HTTPException(
                     status_code=400,
@@ -150,31 +155,37 @@ async def extract_file_text(
         elif file_lower.endswith(".pdf"):
             # Use PDF parser for PDF files
             pdf_parser = PDFParser()
-            pages = pdf_parser.extract_text_with_metadata(file_bytes, filename)
+            pages = await extraction.run(
+                pdf_parser.extract_text_with_metadata, upload.source, filename
+            )
             content = "\n\n".join([p["content"] for p in pages])
             file_type = "pdf"
 
         elif file_lower.endswith((".doc", ".docx")):
-            # Use python-docx for DOCX files
-            import docx
-            import io
-
-            doc = docx.Document(io.BytesIO(file_bytes))
-            content = "\n\n".join(
-                [para.text for para in doc.paragraphs if para.text.strip()]
+            # python-docx (behind the zip-bomb guard); .doc goes the same way
+            content = await extraction.run(
+                extract_text, upload.source, "attachment.docx"
             )
             file_type = "docx"
 
         else:
             # Plain text files
-            content = file_bytes.decode("utf-8", errors="ignore")
+            content = upload.read_bytes().decode("utf-8", errors="ignore")
             file_type = "txt"
 
         return {"filename": filename, "content": content, "file_type": file_type}
 
+    except extraction.ExtractionError as e:
+        logger.warning("Could not extract %s: %s", file.filename, e)
+        raise HTTPException(
+            status_code=422, detail="The document is too large or complex to process"
+        )
     except HTTPException:
         raise
     except Exception:
         # Log the full exception server-side; return a generic client message.
         logger.error("Failed to extract text from file", exc_info=True)
         raise HTTPException(status_code=400, detail="Failed to extract text from file")
+    finally:
+        if upload is not None:
+            upload.close()
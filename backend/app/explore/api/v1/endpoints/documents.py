@@ -1,28 +1,43 @@
 import hashlib
 import logging
 import posixpath
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Request
+from typing import Optional
+from uuid import UUID
+from fastapi import (
+    APIRouter,
+    UploadFile,
+    File,
+    Form,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+)
 from pydantic import BaseModel, Field
 from datetime import datetime
 import asyncio
 
 from app.explore.schemas.document import DocumentUploadResponse
-from app.explore.services.pdf_parser import PDFParser, extract_text, is_extractable
+from app.explore.services import corpus, extraction, ingestion, jobs
+from app.explore.services.pdf_parser import PDFParser, is_extractable
 from app.explore.services.rag_service import RAGService
 from app.explore.services.membership import is_project_member
 from app.explore.api.deps import AuthContext, get_auth_context, get_current_user_id
+from app.explore.core.config import settings
 from app.explore.core.limiter import limiter
-from app.explore.core.uploads import parse_content_length, read_capped
+from app.explore.core.uploads import (
+    SpooledUpload,
+    parse_content_length,
+    spool_capped,
+)
 from app.explore.db.supabase import user_client, supabase
+from app.explore.db.pool import run_query
 from app.explore.db.rows import json_rows
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Supabase Storage bucket that backs the Document Portal "Files" UI.
-_FILES_BUCKET = "Files"
-
 
 def _safe_storage_key(project_id: int, storage_path: str) -> str:
     """Build the service-role storage key ``{project_id}/{storage_path}`` after
@@ -61,6 +76,16 @@ class IndexFileRequest(BaseModel):
     storage_path: str = Field(
         ..., description="Project-relative path of the file in the 'Files' bucket"
     )
+    background: bool = Field(
+        default=False,
+        description="Enqueue an ingestion job and return 202 with its id "
+        "instead of indexing inline",
+    )
+    incremental: bool = Field(
+        default=True,
+        description="Re-embed only chunks whose text changed (false: delete "
+        "and re-embed the whole file)",
+    )
 
 
 class ByFileRequest(BaseModel):
@@ -139,8 +164,10 @@ async def _is_director(db, user_id: str) -> bool:
 @limiter.limit("10/minute")
 async def upload_document(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
     project_id: int = Form(...),
+    background: bool = Form(False),
     auth: AuthContext = Depends(get_auth_context),
 ):
     """Upload a PDF document for RAG processing.
@@ -150,6 +177,12 @@ async def upload_document(
     of that project: membership stops cross-project tagging, and the director
     gate stops any project member from injecting corpus documents (the insert
     runs as the service role, bypassing RLS, so the check must be explicit).
+
+    With ``background=true`` the extracted pages are queued as an ingestion
+    job and the response is 202 with ``job_id`` set and no chunks yet; poll
+    ``GET /knowledge/jobs/{job_id}`` for the outcome (its ``result`` is this
+    response's inline body). Inline uploads stream (extract, embed and insert
+    page windows concurrently) when ``INGESTION_STREAMING`` is on.
     """
     # Enforce upload size cap via Content-Length header first (fast path),
     # then bound the actual read so an oversize body is never fully buffered.
@@ -177,12 +210,32 @@ async def upload_document(
             status_code=403, detail="Only directors can upload knowledge documents."
         )
 
+    upload: Optional[SpooledUpload] = None
     try:
-        file_bytes = await read_capped(file)
+        upload = await spool_capped(file)
+
+        if settings.INGESTION_STREAMING and not background:
+            document_ids = await ingestion.stream_pdf(
+                RAGService(),
+                upload.source,
+                file.filename,
+                project_id=project_id,
+                user_id=user_id,
+            )
+            if not document_ids:
+                raise HTTPException(
+                    status_code=400, detail="No text could be extracted from the PDF"
+                )
+            return DocumentUploadResponse(
+                success=True,
+                message=f"Successfully uploaded {file.filename}",
+                document_ids=[str(id) for id in document_ids],
+                chunks_created=len(document_ids),
+            )
 
         pdf_parser = PDFParser()
-        pages_data = pdf_parser.extract_text_with_metadata(
-            file_bytes=file_bytes, filename=file.filename
+        pages_data = await extraction.run(
+            pdf_parser.extract_text_with_metadata, upload.source, file.filename
         )
 
         if not pages_data:
@@ -190,19 +243,23 @@ async def upload_document(
                 status_code=400, detail="No text could be extracted from the PDF"
             )
 
-        rag_service = RAGService()
-        all_document_ids = []
-
-        for page_data in pages_data:
-            page_data["metadata"]["upload_date"] = datetime.now().isoformat()
-
-            doc_ids = await rag_service.store_document(
-                content=page_data["content"],
-                metadata=page_data["metadata"],
-                client_id=user_id,
-                project_id=project_id,
+        if background:
+            job = await jobs.enqueue(
+                "upload",
+                project_id,
+                user_id,
+                {"filename": file.filename, "pages": pages_data},
             )
-            all_document_ids.extend(doc_ids)
+            response.status_code = 202
+            return DocumentUploadResponse(
+                success=True,
+                message=f"Queued {file.filename} for processing",
+                job_id=str(job["id"]),
+            )
+
+        all_document_ids = await ingestion.store_pages(
+            RAGService(), pages_data, project_id=project_id, user_id=user_id
+        )
 
         return DocumentUploadResponse(
             success=True,
@@ -211,11 +268,19 @@ async def upload_document(
             chunks_created=len(all_document_ids),
         )
 
+    except extraction.ExtractionError as e:
+        logger.warning("Could not extract %s: %s", file.filename, e)
+        raise HTTPException(
+            status_code=422, detail="The document is too large or complex to process"
+        )
     except HTTPException:
         raise
     except Exception:
         logger.error("Error processing document upload", exc_info=True)
         raise HTTPException(status_code=500, detail="Error processing document")
+    finally:
+        if upload is not None:
+            upload.close()
 
 
 @router.get("/list")
@@ -224,12 +289,14 @@ async def list_documents(user_id: str = Depends(get_current_user_id), limit: int
     try:
         from app.explore.db.supabase import supabase
 
-        result = (
-            supabase.table("client_knowledge")
-            .select("metadata")
-            .eq("uid", user_id)
-            .limit(limit)
-            .execute()
+        result = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .select("metadata")
+                .eq("uid", user_id)
+                .limit(limit)
+                .execute()
+            )
         )
 
         documents = {}
@@ -249,6 +316,7 @@ async def list_documents(user_id: str = Depends(get_current_user_id), limit: int
 @router.post("/knowledge/index-file")
 async def index_file(
     body: IndexFileRequest,
+    response: Response,
     auth: AuthContext = Depends(get_auth_context),
 ):
     """Index a Document Portal file into the project's RAG corpus.
@@ -258,88 +326,62 @@ async def index_file(
     tagged ``source='portal'``. Binary/unsupported types are NOT errors — they
     return ``{"indexed": false, "reason": "unsupported_type"}`` (HTTP 200).
 
-    Re-indexing a replaced file first deletes the prior ``(project_id,
-    storage_path)`` rows so chunks never duplicate. Director + membership gated.
+    Re-indexing a changed file is incremental: only chunks whose text is new
+    are embedded, unchanged ``(project_id, storage_path)`` rows are kept with
+    their position metadata updated, vanished ones are deleted, and the body
+    reports ``reused`` / ``added`` / ``removed`` counts. ``incremental=false``
+    deletes and re-embeds every chunk instead. Director + membership gated.
+
+    With ``background=true`` the work is queued instead and the response is
+    202 ``{"queued": true, "job_id", "status"}``; the job's ``result`` is the
+    body described above. A second request for a file whose job hasn't started
+    yet returns that job.
     """
     await _ensure_director_member(auth, body.project_id)
 
     # Reject any traversal/escaping path BEFORE touching storage (the download
     # runs as the service role, so an escaping key reads another project's data).
-    absolute_path = _safe_storage_key(body.project_id, body.storage_path)
+    _safe_storage_key(body.project_id, body.storage_path)
 
     if not is_extractable(body.storage_path):
         return {"indexed": False, "reason": "unsupported_type"}
 
     try:
-        file_bytes = await asyncio.to_thread(
-            supabase.storage.from_(_FILES_BUCKET).download, absolute_path
+        if body.background:
+            job = await jobs.enqueue(
+                "index_file",
+                body.project_id,
+                auth.user_id,
+                {"storage_path": body.storage_path, "incremental": body.incremental},
+                dedupe_key=body.storage_path,
+            )
+            response.status_code = 202
+            return {"queued": True, "job_id": str(job["id"]), "status": job["status"]}
+
+        return await ingestion.index_portal_file(
+            RAGService(),
+            project_id=body.project_id,
+            storage_path=body.storage_path,
+            user_id=auth.user_id,
+            incremental=body.incremental,
         )
-    except Exception:
+
+    except ingestion.StorageDownloadError:
         logger.error(
-            "Could not download file from storage: %s", absolute_path, exc_info=True
+            "Could not download file from storage: %s/%s",
+            body.project_id,
+            body.storage_path,
+            exc_info=True,
         )
         raise HTTPException(
             status_code=404,
             detail="Could not download file from storage",
         )
-
-    try:
-        content = extract_text(file_bytes=file_bytes, filename=body.storage_path)
-        if content is None:
-            return {"indexed": False, "reason": "unsupported_type"}
-        if not content.strip():
-            return {"indexed": False, "reason": "empty"}
-
-        # Content-hash dedup: if this exact text is already indexed at this
-        # path, skip the delete + re-embed entirely — a re-index of an
-        # unchanged file would otherwise burn an embeddings call to produce
-        # identical chunks. (Hash is over the EXTRACTED text, so a re-saved
-        # file with identical content still dedupes.)
-        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
-        existing = (
-            supabase.table("client_knowledge")
-            .select("id, metadata")
-            .eq("project_id", body.project_id)
-            .eq("storage_path", body.storage_path)
-            .execute()
-        )
-        existing_rows = json_rows(existing.data)
-        if existing_rows:
-            metadata = existing_rows[0].get("metadata")
-            prior_hash = (
-                metadata.get("content_hash") if isinstance(metadata, dict) else None
-            )
-            if prior_hash == content_hash:
-                return {
-                    "indexed": True,
-                    "chunks": len(existing_rows),
-                    "unchanged": True,
-                }
-
-        # Drop any existing chunks for this file so a re-index of a replaced
-        # file doesn't leave stale/duplicate chunks behind.
-        supabase.table("client_knowledge").delete().eq(
-            "project_id", body.project_id
-        ).eq("storage_path", body.storage_path).execute()
-
-        filename = body.storage_path.rsplit("/", 1)[-1]
-        rag_service = RAGService()
-        doc_ids = await rag_service.store_document(
-            content=content,
-            metadata={
-                "filename": filename,
-                "storage_path": body.storage_path,
-                "content_hash": content_hash,
-                "upload_date": datetime.now().isoformat(),
-            },
-            client_id=auth.user_id,
-            project_id=body.project_id,
-            storage_path=body.storage_path,
-            source="portal",
+    except extraction.ExtractionError as e:
+        logger.warning("Could not extract %s: %s", body.storage_path, e)
+        raise HTTPException(
+            status_code=422, detail="The file is too large or complex to index"
         )
-
-        return {"indexed": True, "chunks": len(doc_ids)}
-
     except HTTPException:
         raise
     except Exception:
@@ -350,6 +392,32 @@ async def index_file(
         )
 
 
+@router.get("/knowledge/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: UUID,
+    auth: AuthContext = Depends(get_auth_context),
+):
+    """Status and progress of a background ingestion job.
+
+    Returns the job's ``status`` (queued / running / succeeded / failed),
+    ``attempts``, ``progress`` (stage and counters while running), ``result``
+    (the inline endpoint's response body once succeeded) and ``error``.
+    Membership gated on the job's project; a job in another project is
+    reported as not found.
+    """
+    try:
+        job = await jobs.get_job(str(job_id))
+    except Exception:
+        logger.error("Error loading ingestion job %s", job_id, exc_info=True)
+        raise HTTPException(status_code=500, detail="Error loading job")
+
+    if job is None or not await is_project_member(
+        user_client(auth.access_token), auth.user_id, int(job["project_id"])
+    ):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @router.delete("/knowledge/by-file")
 async def delete_by_file(
     body: ByFileRequest,
@@ -367,14 +435,17 @@ async def delete_by_file(
     _safe_storage_key(body.project_id, body.storage_path)
 
     try:
-        result = (
-            supabase.table("client_knowledge")
-            .delete()
-            .eq("project_id", body.project_id)
-            .eq("storage_path", body.storage_path)
-            .execute()
+        result = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .delete()
+                .eq("project_id", body.project_id)
+                .eq("storage_path", body.storage_path)
+                .execute()
+            )
         )
 
+        corpus.bump(body.project_id)
         deleted = len(result.data) if result.data else 0
         return {"deleted": deleted}
 
@@ -420,13 +491,15 @@ async def index_text(
 
     try:
         content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
-        existing = (
-            supabase.table("client_knowledge")
-            .select("id")
-            .eq("project_id", body.project_id)
-            .eq("metadata->>content_hash", content_hash)
-            .limit(1)
-            .execute()
+        existing = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .select("id")
+                .eq("project_id", body.project_id)
+                .eq("metadata->>content_hash", content_hash)
+                .limit(1)
+                .execute()
+            )
         )
         if existing.data:
             return {"indexed": True, "chunks": 0, "duplicate": True}
@@ -475,15 +548,18 @@ async def move_file_index(
     _safe_storage_key(body.project_id, body.to_path)
 
     try:
-        result = supabase.rpc(
-            "move_client_knowledge_file",
-            {
-                "_project_id": body.project_id,
-                "_from_path": body.from_path,
-                "_to_path": body.to_path,
-            },
-        ).execute()
+        result = await run_query(
+            lambda: supabase.rpc(
+                "move_client_knowledge_file",
+                {
+                    "_project_id": body.project_id,
+                    "_from_path": body.from_path,
+                    "_to_path": body.to_path,
+                },
+            ).execute()
+        )
 
+        corpus.bump(body.project_id)
         moved = result.data if isinstance(result.data, int) else 0
         return {"moved": moved}
 
@@ -519,12 +595,14 @@ async def list_indexed_files(
         )
 
     try:
-        result = (
-            supabase.table("client_knowledge")
-            .select("storage_path")
-            .eq("project_id", project_id)
-            .eq("source", "portal")
-            .execute()
+        result = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .select("storage_path")
+                .eq("project_id", project_id)
+                .eq("source", "portal")
+                .execute()
+            )
         )
 
         counts: dict[str, int] = {}
@@ -0,0 +1,309 @@
+"""Bulk (re-)index every extractable file in the "Files" storage bucket.
+
+The command-line counterpart of ``/documents/knowledge/index-file``: walks
+each project's folder (``{project_id}/...``) in the bucket, and indexes every
+file with a text extractor through ``ingestion.index_portal_file`` —
+``--concurrency`` files at a time, extraction in the process pool
+(``--extraction-workers``) and ``--embedding-concurrency`` embedding
+requests per file.
+
+Progress is checkpointed to ``--state``, a JSON-lines file with one record
+per finished file (``key``, ``etag``, ``status``, ``chunks``). A re-run, or a
+run resumed after a crash, skips files recorded as indexed whose storage
+eTag hasn't changed, without downloading them; failed files are retried.
+Files missing from the state are downloaded and extracted, and
+``index_portal_file`` skips any whose extracted text is already indexed
+(its content-hash check), so nothing is embedded twice.
+
+A throughput line (files/s, chunks/s, embedding $/hour at
+``settings.embedding_price_per_m``) is printed every ``--report-seconds``
+and at the end.
+
+Run from ``backend/``:
+
+    uv run python -m app.explore.backfill --uid <auth user id>
+    uv run python -m app.explore.backfill --uid <id> --project 12 --project 40 \\
+        --concurrency 8 --extraction-workers 4 --state backfill-12-40.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, TextIO
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+from app.explore.db.supabase import supabase
+from app.explore.services import extraction, ingestion
+from app.explore.services.pdf_parser import is_extractable
+from app.explore.services.rag_service import RAGService
+
+logger = logging.getLogger(__name__)
+
+# Objects per storage list request (the API's maximum page size).
+LIST_PAGE_SIZE = 1000
+
+# index_portal_file results that mean the file needs no further work.
+_DONE = ("indexed", "unchanged", "unsupported_type", "empty")
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    """One object in the Files bucket, ``{project_id}/{path}``."""
+
+    project_id: int
+    path: str
+    etag: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.project_id}/{self.path}"
+
+
+async def _list(prefix: str) -> List[Dict[str, Any]]:
+    """Every entry directly under ``prefix`` (files and folders), all pages."""
+    bucket = supabase.storage.from_(ingestion.FILES_BUCKET)
+    entries: List[Dict[str, Any]] = []
+    while True:
+        page = await asyncio.to_thread(
+            bucket.list,
+            prefix,
+            {
+                "limit": LIST_PAGE_SIZE,
+                "offset": len(entries),
+                "sortBy": {"column": "name", "order": "asc"},
+            },
+        )
+        entries.extend(page)
+        if len(page) < LIST_PAGE_SIZE:
+            return entries
+
+
+async def list_projects() -> List[int]:
+    """Ids of the projects with a folder in the bucket."""
+    return sorted(
+        int(entry["name"])
+        for entry in await _list("")
+        if entry.get("id") is None and str(entry.get("name", "")).isdigit()
+    )
+
+
+async def list_files(project_id: int) -> List[StoredFile]:
+    """Every extractable file under ``{project_id}/``, depth first."""
+    files: List[StoredFile] = []
+    folders = [""]
+    while folders:
+        folder = folders.pop()
+        for entry in await _list(f"{project_id}/{folder}".rstrip("/")):
+            path = f"{folder}{entry['name']}"
+            if entry.get("id") is None:
+                folders.append(f"{path}/")
+            elif is_extractable(path):
+                meta = entry.get("metadata") or {}
+                etag = (
+                    meta.get("eTag") or f"{entry.get('updated_at')}:{meta.get('size')}"
+                )
+                files.append(StoredFile(project_id, path, str(etag)))
+    return files
+
+
+class Checkpoint:
+    """The ``--state`` file: one JSON record per finished file, appended and
+    flushed as each finishes; the last record for a key wins."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash
+                    self.records[record["key"]] = record
+        self._file: Optional[TextIO] = None
+
+    def done(self, file: StoredFile) -> bool:
+        record = self.records.get(file.key)
+        return (
+            record is not None
+            and record.get("etag") == file.etag
+            and record.get("status") in _DONE
+        )
+
+    def record(self, file: StoredFile, status: str, **fields: Any) -> None:
+        record = {"key": file.key, "etag": file.etag, "status": status, **fields}
+        self.records[file.key] = record
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Throughput:
+    """Running totals for the progress line."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.tokens_at_start = metrics.value("embeddings.tokens")
+        self.files = 0
+        self.skipped = 0
+        self.failed = 0
+        self.chunks = 0
+        self.embedded = 0
+        # Files found, once every project has been listed.
+        self.total: Optional[int] = None
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        tokens = metrics.value("embeddings.tokens") - self.tokens_at_start
+        dollars = tokens / 1_000_000 * settings.embedding_price_per_m
+        progress = self.files + self.skipped + self.failed
+        of_total = f"/{self.total}" if self.total is not None else ""
+        return (
+            f"{progress}{of_total} files ({self.files} indexed, {self.skipped} "
+            f"skipped, {self.failed} failed) | {self.files / elapsed:.2f} files/s, "
+            f"{self.chunks / elapsed:.1f} chunks/s ({self.embedded} embedded), "
+            f"${dollars / elapsed * 3600:.2f}/hour (${dollars:.4f} so far)"
+        )
+
+
+async def backfill(
+    projects: List[int],
+    uid: str,
+    checkpoint: Checkpoint,
+    concurrency: int = 4,
+    incremental: bool = True,
+    report_seconds: float = 10.0,
+    rag_service: Optional[RAGService] = None,
+) -> Throughput:
+    """Index every extractable file of ``projects`` not yet done in
+    ``checkpoint``, rows attributed to ``uid``."""
+    rag_service = rag_service or RAGService()
+    stats = Throughput()
+    queue: asyncio.Queue[Optional[StoredFile]] = asyncio.Queue(concurrency * 4)
+
+    async def _produce() -> None:
+        found = 0
+        for project_id in projects:
+            for file in await list_files(project_id):
+                found += 1
+                if checkpoint.done(file):
+                    stats.skipped += 1
+                    continue
+                await queue.put(file)
+        stats.total = found
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def _index(file: StoredFile) -> None:
+        try:
+            result = await ingestion.index_portal_file(
+                rag_service,
+                project_id=file.project_id,
+                storage_path=file.path,
+                user_id=uid,
+                incremental=incremental,
+            )
+        except Exception as e:
+            stats.failed += 1
+            logger.warning(f"Backfill of {file.key} failed: {e}")
+            checkpoint.record(file, "failed", error=f"{type(e).__name__}: {e}")
+            return
+        if not result.get("indexed"):
+            stats.skipped += 1
+            checkpoint.record(file, str(result.get("reason")), chunks=0)
+        elif result.get("unchanged"):
+            stats.skipped += 1
+            checkpoint.record(file, "unchanged", chunks=result["chunks"])
+        else:
+            stats.files += 1
+            stats.chunks += result["chunks"]
+            stats.embedded += result.get("added", 0)
+            checkpoint.record(file, "indexed", chunks=result["chunks"])
+
+    async def _work() -> None:
+        while (file := await queue.get()) is not None:
+            await _index(file)
+
+    async def _report() -> None:
+        while True:
+            await asyncio.sleep(report_seconds)
+            print(stats.line(), flush=True)
+
+    reporter = asyncio.ensure_future(_report())
+    tasks = [asyncio.ensure_future(_produce())]
+    tasks.extend(asyncio.ensure_future(_work()) for _ in range(concurrency))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed listing leaves the workers waiting on the queue.
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+    print(stats.line(), flush=True)
+    return stats
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.extraction_workers is not None:
+        settings.EXTRACTION_WORKERS = args.extraction_workers
+    if args.embedding_concurrency is not None:
+        settings.EMBEDDING_CONCURRENCY = args.embedding_concurrency
+    extraction.start_pool()
+    checkpoint = Checkpoint(args.state)
+    try:
+        projects = args.project or await list_projects()
+        print(f"Backfilling {len(projects)} project(s) into state {args.state}")
+        await backfill(
+            projects,
+            args.uid,
+            checkpoint,
+            concurrency=max(1, args.concurrency),
+            incremental=not args.full,
+            report_seconds=args.report_seconds,
+        )
+    finally:
+        checkpoint.close()
+        await extraction.stop_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Index every extractable file in the "Files" storage bucket.'
+    )
+    parser.add_argument(
+        "--uid", required=True, help="auth user id the indexed rows belong to"
+    )
+    parser.add_argument(
+        "--project", type=int, action="append", help="only this project (repeatable)"
+    )
+    parser.add_argument("--state", default="backfill-state.jsonl")
+    parser.add_argument("--concurrency", type=int, default=4, help="files at a time")
+    parser.add_argument("--extraction-workers", type=int)
+    parser.add_argument("--embedding-concurrency", type=int)
+    parser.add_argument(
+        "--full", action="store_true", help="re-embed changed files from scratch"
+    )
+    parser.add_argument("--report-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import List, Optional, Self
+from typing import List, Literal, Optional, Self
 from urllib.parse import urlparse
 
 from pydantic import model_validator
@@ -23,6 +23,7 @@ class Settings(BaseSettings):
     FAST_OUTPUT_PRICE_PER_M: Optional[float] = None
     THINK_INPUT_PRICE_PER_M: Optional[float] = None
     THINK_OUTPUT_PRICE_PER_M: Optional[float] = None
+    EMBEDDING_PRICE_PER_M: Optional[float] = None
     TITLE_MODEL: Optional[str] = None
     EMBEDDING_MODEL: Optional[str] = None
     EMBEDDING_DIMENSIONS: Optional[int] = None
@@ -35,12 +36,169 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:3000"
     ALLOWED_HOSTS: str = "*"
     MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # 10 MB
+    # Upload bodies over UPLOAD_SPOOL_BYTES are spooled to a temp file (in
+    # UPLOAD_SPOOL_DIR, default the system temp dir) instead of held in RAM.
+    UPLOAD_SPOOL_BYTES: int = 1024 * 1024  # 1 MB
+    UPLOAD_SPOOL_DIR: Optional[str] = None
+
+    # Data access (see db/pool.py): max concurrent PostgREST calls per worker
+    # and the per-call wall-clock timeout, in seconds.
+    DB_POOL_SIZE: int = 16
+    DB_TIMEOUT_SECONDS: float = 15.0
+
+    # Bulk chunk inserts with binary COPY (see db/direct.py). DATABASE_URL is a
+    # direct postgres:// DSN (on Supabase, the session or transaction pooler);
+    # with it set and BULK_INSERT_COPY on, insert_chunks copies rows over a
+    # pool of DATABASE_POOL_SIZE connections per worker instead of PostgREST.
+    DATABASE_URL: Optional[str] = None
+    BULK_INSERT_COPY: bool = False
+    DATABASE_POOL_SIZE: int = 4
+    DATABASE_TIMEOUT_SECONDS: float = 60.0
+
+    # Query-embedding cache (per worker, see services/rag_service.py). Size 0
+    # disables it; single-flight makes concurrent identical queries share one
+    # embeddings request.
+    EMBEDDING_CACHE_SIZE: int = 2048
+    EMBEDDING_CACHE_TTL_SECONDS: float = 3600.0
+    EMBEDDING_CACHE_SINGLE_FLIGHT: bool = True
+
+    # Document embedding (services/embedding_batches.py): chunks go out in
+    # sub-batches of at most EMBEDDING_BATCH_SIZE chunks and
+    # EMBEDDING_BATCH_MAX_TOKENS estimated tokens, EMBEDDING_CONCURRENCY
+    # requests at a time. A batch that times out or is rejected as too large
+    # is retried as two halves.
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_BATCH_MAX_TOKENS: int = 16000
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_TIMEOUT_SECONDS: float = 60.0
+
+    # Persistent document-embedding cache (public.embedding_cache, see
+    # services/embedding_cache.py). GC runs every
+    # EMBEDDING_CACHE_GC_INTERVAL_SECONDS (0 = never; once per interval across
+    # all workers, needs migration 20261018000008) and drops entries older
+    # than EMBEDDING_CACHE_GC_MIN_AGE_SECONDS that no chunk references.
+    EMBEDDING_STORE_CACHE: bool = True
+    EMBEDDING_CACHE_GC_INTERVAL_SECONDS: float = 3600.0
+    EMBEDDING_CACHE_GC_MIN_AGE_SECONDS: int = 86400
+
+    # Online re-embedding (app/explore/reembed.py, migration 20261018000006).
+    # While EMBEDDING_NEXT_MODEL is set, new chunks are also embedded with it
+    # (at EMBEDDING_NEXT_DIMENSIONS, default EMBEDDING_DIMENSIONS) and written
+    # to client_knowledge.embedding_next, which the reembed tool fills for the
+    # older rows. EMBEDDING_READ_NEXT switches searches to the next model:
+    # query embeddings and the column searched flip together.
+    EMBEDDING_NEXT_MODEL: Optional[str] = None
+    EMBEDDING_NEXT_DIMENSIONS: Optional[int] = None
+    EMBEDDING_READ_NEXT: bool = False
+
+    # Run hybrid search as one fused RPC (hybrid_search_client_knowledge)
+    # instead of two RPCs + Python fusion. The two-RPC path stays as fallback.
+    HYBRID_SEARCH_FUSED: bool = True
+
+    # Search the half-precision HNSW index (embedding::halfvec, migration
+    # 20261018000001) instead of the float32 one, shortlisting
+    # VECTOR_RESCORE_FACTOR x the requested rows and re-ranking them by exact
+    # float32 similarity (0 = no rescoring). Compare first with
+    # benchmarks/halfvec_recall.py.
+    VECTOR_SEARCH_HALFVEC: bool = False
+    VECTOR_RESCORE_FACTOR: int = 4
+
+    # Rerank result cache (per worker, see services/rag_service.py), keyed on
+    # the query and the candidate set's ids + content hashes. Size 0 disables.
+    RERANK_CACHE_SIZE: int = 1024
+    RERANK_CACHE_TTL_SECONDS: float = 1800.0
+
+    # Retrieval result cache in front of RAGService.retrieve_relevant (per
+    # worker). Corpus writes invalidate it at once on the writing worker; the
+    # TTL bounds staleness from writes made on other workers. Size 0 disables.
+    RETRIEVAL_CACHE_SIZE: int = 512
+    RETRIEVAL_CACHE_TTL_SECONDS: float = 120.0
+
+    # Maximal Marginal Relevance in retrieve_relevant (services/mmr.py): the
+    # reranker keeps MMR_POOL_FACTOR x top_n candidates and MMR picks top_n of
+    # them, trading relevance (weight MMR_LAMBDA) against redundancy with the
+    # passages already picked. 1.0 (the default) disables it: plain rerank
+    # order, without the extra per-turn fetch of the candidates' embeddings
+    # for projects outside the vector cache. 0.7 is a good starting point.
+    MMR_LAMBDA: float = 1.0
+    MMR_POOL_FACTOR: int = 2
+
+    # Prompt-token budget for retrieved document context, per chat mode
+    # (see context_token_budget). Docs are packed best-score-first within it.
+    FAST_CONTEXT_TOKENS: Optional[int] = None
+    THINK_CONTEXT_TOKENS: Optional[int] = None
+
+    # Serve process metrics (cache hit ratios, latency saved) at /metrics.
+    # Defaults to on outside production.
+    METRICS_ENABLED: Optional[bool] = None
+
+    # Per-project in-memory vectors for exact search (services/vector_cache.py).
+    # Off by default; projects above VECTOR_CACHE_MAX_ROWS chunks use the RPC.
+    # VECTOR_CACHE_DIR backs the matrices with mmap'd files shared by workers.
+    VECTOR_CACHE_ENABLED: bool = False
+    VECTOR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    VECTOR_CACHE_MAX_ROWS: int = 20_000
+    VECTOR_CACHE_TTL_SECONDS: float = 300.0
+    VECTOR_CACHE_DIR: Optional[str] = None
+
+    # Background ingestion (services/jobs.py, migration 20261018000003).
+    # /upload and /knowledge/index-file take background=true to enqueue an
+    # ingestion_jobs row instead of processing inline. Each uvicorn worker runs
+    # INGESTION_WORKERS async workers (0 = enqueue only; another process
+    # drains the queue), at most INGESTION_JOBS_PER_PROJECT of them on one
+    # project. A running job renews its lease; one whose lease lapses (worker
+    # died) is claimed again. Failures retry with exponential backoff from
+    # INGESTION_RETRY_BASE_SECONDS, up to INGESTION_JOB_MAX_ATTEMPTS claims.
+    INGESTION_WORKERS: int = 2
+    INGESTION_JOBS_PER_PROJECT: int = 1
+    INGESTION_JOB_LEASE_SECONDS: int = 300
+    INGESTION_JOB_MAX_ATTEMPTS: int = 3
+    INGESTION_POLL_SECONDS: float = 2.0
+    INGESTION_RETRY_BASE_SECONDS: float = 30.0
+
+    # Streaming ingestion (services/pipeline.py): PDF uploads are extracted
+    # INGESTION_PAGE_WINDOW pages at a time and chunked, embedded and inserted
+    # by concurrent stages with at most INGESTION_PIPELINE_DEPTH batches
+    # queued between them, so memory no longer grows with document size.
+    INGESTION_STREAMING: bool = False
+    INGESTION_PAGE_WINDOW: int = 16
+    INGESTION_PIPELINE_DEPTH: int = 2
+
+    # Document text extraction (services/extraction.py) runs in a pool of
+    # EXTRACTION_WORKERS processes per uvicorn worker (0 = a thread in the API
+    # process). A job running past EXTRACTION_TIMEOUT_SECONDS fails and its
+    # pool is replaced; each worker's address space is capped at
+    # EXTRACTION_MAX_MEMORY_MB (0 = no cap) and it is recycled after
+    # EXTRACTION_MAX_TASKS_PER_CHILD jobs (0 = never).
+    EXTRACTION_WORKERS: int = 2
+    EXTRACTION_TIMEOUT_SECONDS: float = 60.0
+    EXTRACTION_MAX_MEMORY_MB: int = 1024
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = 50
+    # Extract .docx/.pptx/.xlsx text by streaming their XML parts
+    # (services/office_xml.py) instead of loading python-docx / python-pptx /
+    # openpyxl object models; false falls back to the libraries.
+    OFFICE_XML_EXTRACTION: bool = True
+    # Document chunk sizing (PDFParser): CHUNK_UNIT=chars keeps the 1000/200
+    # character chunks; CHUNK_UNIT=tokens sizes chunks at CHUNK_TOKENS with
+    # CHUNK_OVERLAP_TOKENS of overlap, counted with the embedding model's
+    # tokenizer (tiktoken, see services/tokens.py; PDFParser raises if the
+    # encoding can't be loaded).
+    CHUNK_UNIT: Literal["chars", "tokens"] = "chars"
+    CHUNK_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 48
 
     # Base URL of the Next.js frontend (used to proxy project calendar lookups).
     PORTAL_BASE_URL: Optional[str] = None
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
+    @model_validator(mode="after")
+    def validate_embedding_migration(self) -> Self:
+        """Reads can only flip to a next model that is being written."""
+        if self.EMBEDDING_READ_NEXT and not self.EMBEDDING_NEXT_MODEL:
+            raise ValueError("EMBEDDING_READ_NEXT requires EMBEDDING_NEXT_MODEL")
+        return self
+
     @model_validator(mode="after")
     def validate_production_security(self) -> Self:
         """Reject development defaults when the service runs in production."""
@@ -116,6 +274,11 @@ class Settings(BaseSettings):
         """Estimated thinking-model output price in USD per million tokens."""
         return self.THINK_OUTPUT_PRICE_PER_M or 0.60
 
+    @property
+    def embedding_price_per_m(self) -> float:
+        """Estimated embedding-model input price in USD per million tokens."""
+        return self.EMBEDDING_PRICE_PER_M or 0.01
+
     @property
     def title_model(self) -> str:
         """Model used for conversation-title generation.
@@ -148,6 +311,32 @@ class Settings(BaseSettings):
         """
         return self.EMBEDDING_DIMENSIONS or 1536
 
+    @property
+    def embedding_next_dimensions(self) -> int:
+        """Dimensions requested from ``EMBEDDING_NEXT_MODEL``."""
+        return self.EMBEDDING_NEXT_DIMENSIONS or self.embedding_dimensions
+
+    @property
+    def read_embedding_model(self) -> str:
+        """Model that query embeddings come from: the next model once
+        ``EMBEDDING_READ_NEXT`` has flipped reads, else ``embedding_model``."""
+        if self.EMBEDDING_READ_NEXT and self.EMBEDDING_NEXT_MODEL:
+            return self.EMBEDDING_NEXT_MODEL
+        return self.embedding_model
+
+    @property
+    def read_embedding_dimensions(self) -> int:
+        if self.EMBEDDING_READ_NEXT and self.EMBEDDING_NEXT_MODEL:
+            return self.embedding_next_dimensions
+        return self.embedding_dimensions
+
+    @property
+    def read_embedding_column(self) -> str:
+        """``client_knowledge`` column searched, matching the query model."""
+        if self.EMBEDDING_READ_NEXT and self.EMBEDDING_NEXT_MODEL:
+            return "embedding_next"
+        return "embedding"
+
     @property
     def rerank_model(self) -> str:
         """Get the OpenRouter rerank model id (empty string disables reranking)."""
@@ -163,6 +352,23 @@ class Settings(BaseSettings):
         """How many reranked documents to keep for the prompt context."""
         return self.RERANK_TOP_N or 8
 
+    @property
+    def fast_context_tokens(self) -> int:
+        """Retrieved-context token budget for fast turns."""
+        return self.FAST_CONTEXT_TOKENS or 6_000
+
+    @property
+    def think_context_tokens(self) -> int:
+        """Retrieved-context token budget for thinking turns."""
+        return self.THINK_CONTEXT_TOKENS or 12_000
+
+    def context_token_budget(self, model: Optional[str]) -> int:
+        """Retrieved-context token budget for the chat model ``model``: the
+        thinking budget for THINK_MODEL, otherwise the fast one."""
+        if model and model == self.think_model:
+            return self.think_context_tokens
+        return self.fast_context_tokens
+
     @property
     def portal_base_url(self) -> str:
         """Base URL of the Next.js frontend for proxied calendar lookups.
@@ -174,6 +380,13 @@ class Settings(BaseSettings):
         """
         return (self.PORTAL_BASE_URL or "http://localhost:3000").rstrip("/")
 
+    @property
+    def metrics_enabled(self) -> bool:
+        """Whether ``/metrics`` is served (default: everywhere but production)."""
+        if self.METRICS_ENABLED is not None:
+            return self.METRICS_ENABLED
+        return self.ENV != "production"
+
     @property
     def supabase_secret(self) -> str:
         """Get the Supabase secret key."""
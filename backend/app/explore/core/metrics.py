@@ -0,0 +1,35 @@
+"""Process-local counters for the retrieval caches, served at ``/metrics``.
+
+Deliberately tiny: named float counters plus "sources" — callables such as a
+cache's ``stats()`` that are sampled when a snapshot is taken. Each uvicorn
+worker reports its own numbers; aggregate across workers in the log/scrape
+pipeline rather than here.
+"""
+
+from typing import Any, Callable, Dict
+
+_counters: Dict[str, float] = {}
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def incr(name: str, value: float = 1.0) -> None:
+    """Add ``value`` to counter ``name`` (created at 0)."""
+    _counters[name] = _counters.get(name, 0.0) + value
+
+
+def value(name: str) -> float:
+    """Current value of counter ``name`` (0 if never incremented)."""
+    return _counters.get(name, 0.0)
+
+
+def register(name: str, source: Callable[[], Dict[str, Any]]) -> None:
+    """Expose ``source()`` under ``name`` in every snapshot."""
+    _sources[name] = source
+
+
+def snapshot() -> Dict[str, Any]:
+    """Current counters and source stats, JSON-serializable."""
+    data: Dict[str, Any] = {"counters": dict(sorted(_counters.items()))}
+    for name, source in _sources.items():
+        data[name] = source()
+    return data
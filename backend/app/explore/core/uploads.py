@@ -4,8 +4,19 @@ Both ``/chat/extract-text`` and ``/documents/upload`` must (a) reject a
 malformed Content-Length without 500ing and (b) bound the actual body read so an
 oversize upload — even one that bypassed the Content-Length fast path via chunked
 transfer-encoding or a spoofed-low header — is never fully buffered into memory.
+
+``spool_capped`` keeps bodies up to ``UPLOAD_SPOOL_BYTES`` in memory and writes
+larger ones to a temp file, so a concurrent burst of 10 MB uploads doesn't
+hold each one in RAM (twice, while a list of chunks was joined). The
+extractors (services/pdf_parser.py) take the result's ``source`` — the bytes or
+the temp file's path — and parse the file in place; a path is also all that
+crosses to an extraction worker process.
 """
 
+import os
+import tempfile
+from typing import IO, Optional, Union
+
 from fastapi import HTTPException, Request, UploadFile
 
 from app.explore.core.config import settings
@@ -30,18 +41,73 @@ def parse_content_length(request: Request) -> None:
         raise HTTPException(status_code=413, detail="File too large")
 
 
-async def read_capped(file: UploadFile) -> bytes:
+class SpooledUpload:
+    """An upload body read by ``spool_capped``: ``data`` in memory, or the
+    ``path`` of a temp file that ``close`` deletes."""
+
+    def __init__(self, data: Optional[bytes], path: Optional[str], size: int) -> None:
+        self.data = data
+        self.path = path
+        self.size = size
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What the extractors take: the bytes, or the temp file's path."""
+        if self.path is not None:
+            return self.path
+        return self.data or b""
+
+    def read_bytes(self) -> bytes:
+        """The whole body as bytes (reads a spilled body back into RAM)."""
+        if self.path is None:
+            return self.data or b""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+async def spool_capped(file: UploadFile) -> SpooledUpload:
     """Read ``file`` in fixed-size chunks, aborting with 413 the moment the
     cumulative size exceeds ``MAX_UPLOAD_BYTES`` — so an oversize body (even one
-    that bypassed the Content-Length fast path) is never fully buffered in RAM."""
-    chunks: list[bytes] = []
+    that bypassed the Content-Length fast path) is never fully buffered in RAM.
+
+    Up to ``UPLOAD_SPOOL_BYTES`` stay in memory; past that the body goes to a
+    temp file in ``UPLOAD_SPOOL_DIR``. The caller must ``close()`` the result.
+    """
+    buffer = bytearray()
+    spill: Optional[IO[bytes]] = None
     total = 0
-    while True:
-        chunk = await file.read(_UPLOAD_CHUNK_BYTES)
-        if not chunk:
-            break
-        total += len(chunk)
-        if total > settings.MAX_UPLOAD_BYTES:
-            raise HTTPException(status_code=413, detail="File too large")
-        chunks.append(chunk)
-    return b"".join(chunks)
+    try:
+        while True:
+            chunk = await file.read(_UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > settings.MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            if spill is None and total > settings.UPLOAD_SPOOL_BYTES:
+                spill = tempfile.NamedTemporaryFile(
+                    prefix="upload-", dir=settings.UPLOAD_SPOOL_DIR, delete=False
+                )
+                spill.write(buffer)
+                buffer = bytearray()
+            if spill is not None:
+                spill.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.unlink(spill.name)
+        raise
+    if spill is not None:
+        spill.close()
+        return SpooledUpload(None, spill.name, total)
+    return SpooledUpload(bytes(buffer), None, total)
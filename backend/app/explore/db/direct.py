@@ -0,0 +1,137 @@
+"""Bulk ``client_knowledge`` inserts with binary COPY over a direct connection.
+
+Through PostgREST a chunk insert is JSON end to end: each 1536-dim embedding
+is formatted as ~30 KB of decimal text, parsed back by PostgREST and then by
+pgvector's ``vector_in``, a float at a time, and the rows go 100 per request
+(``INSERT_BATCH_SIZE``). ``copy_rows`` instead streams a document's rows with
+``COPY ... FROM STDIN (FORMAT binary)`` into a temporary staging table — the
+embeddings as ``real[]``, 6 KB of raw float4 each that neither side formats
+or parses — and merges them into ``client_knowledge`` with one
+``INSERT ... SELECT`` that casts them to ``vector``. Staging and merge run in
+one transaction, so a failure leaves nothing behind and the caller can retry
+the rows through PostgREST. Each statement is bounded by
+``DATABASE_TIMEOUT_SECONDS`` rather than the API roles' statement timeout
+that forced PostgREST inserts into batches, so a whole document goes at once.
+
+The pool is asyncpg's over ``DATABASE_URL``, opened on first use (a worker
+that never ingests never connects) and closed on shutdown. Prepared-statement
+caching is off so the DSN may point at Supabase's transaction-mode pooler; the
+staging table is ``ON COMMIT DROP`` and never outlives its transaction there.
+
+Counters: ``bulk_insert.rows`` and ``bulk_insert.copies``.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Sequence, cast
+
+import asyncpg
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+
+# Columns copied (plus ``ord``, which carries the chunk order through the
+# merge). ``embedding_next`` is only copied when the rows have it — during a
+# re-embed's dual-write — so otherwise the COPY path also works on databases
+# without migration 20261018000006.
+COLUMNS = ("uid", "project_id", "content", "metadata", "embedding")
+OPTIONAL_COLUMNS = ("storage_path", "source", "embedding_next")
+VECTOR_COLUMNS = ("embedding", "embedding_next")
+
+_STAGE = """
+CREATE TEMP TABLE client_knowledge_stage (
+  ord            int,
+  uid            uuid,
+  project_id     bigint,
+  content        text,
+  metadata       jsonb,
+  embedding      real[],
+  embedding_next real[],
+  storage_path   text,
+  source         text
+) ON COMMIT DROP
+"""
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+
+def enabled() -> bool:
+    """Whether ``insert_chunks`` should try the COPY path."""
+    return settings.BULK_INSERT_COPY and bool(settings.DATABASE_URL)
+
+
+async def get_pool() -> asyncpg.Pool:
+    """This process's connection pool, created on first use."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                settings.DATABASE_URL,
+                min_size=0,
+                max_size=settings.DATABASE_POOL_SIZE,
+                statement_cache_size=0,
+                command_timeout=settings.DATABASE_TIMEOUT_SECONDS,
+            )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Close the pool (app shutdown; no-op if it was never opened)."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        await pool.close()
+
+
+def _value(column: str, value: Any) -> Any:
+    if column == "metadata":
+        return json.dumps(value if value is not None else {})
+    return value
+
+
+async def copy_rows(
+    conn: asyncpg.Connection, rows: Sequence[Dict[str, Any]]
+) -> List[int]:
+    """COPY ``rows`` (``insert_chunks``'s PostgREST rows) into
+    ``client_knowledge`` on ``conn``; returns the new ids in row order."""
+    if not rows:
+        return []
+    columns = list(COLUMNS) + [
+        column for column in OPTIONAL_COLUMNS if any(column in row for row in rows)
+    ]
+    records = [
+        (i, *(_value(column, row.get(column)) for column in columns))
+        for i, row in enumerate(rows)
+    ]
+    selected = ", ".join(
+        f"{column}::vector" if column in VECTOR_COLUMNS else column
+        for column in columns
+    )
+    timeout = settings.DATABASE_TIMEOUT_SECONDS
+    async with conn.transaction():
+        await conn.execute(_STAGE, timeout=timeout)
+        await conn.copy_records_to_table(
+            "client_knowledge_stage",
+            records=records,
+            columns=["ord", *columns],
+            timeout=timeout,
+        )
+        # Identity ids are drawn as the ordered rows are inserted, so
+        # RETURNING comes back in chunk order.
+        inserted = await conn.fetch(
+            f"INSERT INTO client_knowledge ({', '.join(columns)}) "
+            f"SELECT {selected} FROM client_knowledge_stage ORDER BY ord "
+            "RETURNING id",
+            timeout=timeout,
+        )
+    metrics.incr("bulk_insert.copies")
+    metrics.incr("bulk_insert.rows", len(inserted))
+    return [int(record["id"]) for record in inserted]
+
+
+async def insert_rows(rows: Sequence[Dict[str, Any]]) -> List[int]:
+    """``copy_rows`` on a pooled connection."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        return await copy_rows(cast(asyncpg.Connection, conn), rows)
@@ -0,0 +1,54 @@
+"""Non-blocking execution of PostgREST calls on a bounded, timed worker pool.
+
+supabase-py's ``Client`` is synchronous: every ``.execute()`` is a blocking
+HTTP round-trip to PostgREST. Called directly inside an ``async def`` it
+freezes the whole uvicorn worker's event loop — and with it every other SSE
+chat stream on that worker — for the length of the round-trip.
+
+``run_query`` is the async data-access entry point for the hot paths (RAG
+search, corpus writes, the knowledge endpoints). It dispatches the blocking
+call onto a DEDICATED thread pool rather than the loop's default executor, so:
+
+* Pool size is explicit (``DB_POOL_SIZE``, default 16): at most that many
+  PostgREST requests are in flight per worker. Each thread reuses the service
+  client's keep-alive ``httpx`` connection pool (100 connections by default,
+  comfortably above the pool size), so there is no per-call TLS handshake.
+  Excess calls queue here instead of exhausting connections or starving the
+  default executor that ``asyncio.to_thread`` callers (auth, storage) share.
+* Every call has a wall-clock timeout (``DB_TIMEOUT_SECONDS``, default 15s,
+  overridable per call). The await raises ``TimeoutError`` at the deadline;
+  the service client's ``postgrest_client_timeout`` is set to the same value
+  so the abandoned thread's HTTP request is torn down too instead of pinning a
+  pool slot.
+"""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from app.explore.core.config import settings
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE, thread_name_prefix="postgrest"
+)
+
+
+async def run_query(fn: Callable[[], T], *, timeout: Optional[float] = None) -> T:
+    """Run the blocking PostgREST call ``fn`` on the DB pool and await it.
+
+    ``fn`` is a zero-argument callable that builds and executes one query
+    (typically a lambda ending in ``.execute()``), so the whole query chain
+    runs off the event loop. Context variables are propagated like
+    ``asyncio.to_thread``. Raises ``TimeoutError`` if the call outlives
+    ``timeout`` seconds (default ``DB_TIMEOUT_SECONDS``).
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    future = loop.run_in_executor(_executor, functools.partial(ctx.run, fn))
+    return await asyncio.wait_for(
+        future, timeout if timeout is not None else settings.DB_TIMEOUT_SECONDS
+    )
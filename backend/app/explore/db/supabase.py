@@ -1,4 +1,4 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from app.explore.core.config import settings
 
 # Fail fast at startup if the service-role credentials are absent or empty.
@@ -14,8 +14,14 @@ if not settings.supabase_secret or not settings.supabase_secret.strip():
         "SUPABASE_SECRET_KEY is not configured — set it in the environment or .env file"
     )
 
-# Initialize client with secret key (service role — bypasses RLS).
-supabase: Client = create_client(settings.SUPABASE_URL, settings.supabase_secret)
+# Initialize client with secret key (service role — bypasses RLS). The
+# PostgREST timeout matches db/pool.py's per-call deadline so a query that
+# run_query has given up on doesn't keep holding a pool thread.
+supabase: Client = create_client(
+    settings.SUPABASE_URL,
+    settings.supabase_secret,
+    options=ClientOptions(postgrest_client_timeout=settings.DB_TIMEOUT_SECONDS),
+)
 
 
 def user_client(access_token: str) -> Client:
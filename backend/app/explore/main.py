@@ -1,15 +1,20 @@
 import logging
-from typing import Any, cast
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, cast
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+from app.explore.core import metrics
 from app.explore.core.config import settings
+from app.explore.core.http import close_http_client
 from app.explore.core.limiter import limiter
+from app.explore.db import direct
 from app.explore.api.v1.router import router as v1_router
+from app.explore.services import embedding_cache, extraction, ingestion, jobs
 from app.explore.schemas.chat import MAX_TOTAL_IMAGE_CHARS
 
 logging.basicConfig(level=logging.INFO)
@@ -22,12 +27,32 @@ _is_prod = settings.ENV == "production"
 # rejected by the post-parse validators.
 _MAX_BODY_BYTES = MAX_TOTAL_IMAGE_CHARS + 4 * 1024 * 1024  # ~32 MB
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """Start the extraction process pool (services/extraction.py), the
+    ingestion job workers (services/jobs.py) and the embedding cache GC
+    (services/embedding_cache.py); on shutdown stop them and close the shared
+    provider HTTP client (core/http.py) and the direct Postgres pool
+    (db/direct.py)."""
+    extraction.start_pool()
+    jobs.start_workers(ingestion.JOB_HANDLERS)
+    embedding_cache.start_gc()
+    yield
+    await embedding_cache.stop_gc()
+    await jobs.stop_workers()
+    await extraction.stop_pool()
+    await close_http_client()
+    await direct.close_pool()
+
+
 app = FastAPI(
     title="SBI Client Portal API",
     description="AI-powered project management dashboard",
     docs_url=None if _is_prod else "/docs",
     redoc_url=None if _is_prod else "/redoc",
     openapi_url=None if _is_prod else "/openapi.json",
+    lifespan=lifespan,
 )
 
 app.state.limiter = limiter
@@ -97,3 +122,15 @@ async def health():
         "status": "healthy",
         "api": "online",
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_snapshot():
+    """Per-worker cache and latency counters (see core/metrics.py).
+
+    Off in production unless METRICS_ENABLED is set: the numbers are not
+    sensitive, but the endpoint is unauthenticated.
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return metrics.snapshot()
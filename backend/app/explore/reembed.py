@@ -0,0 +1,312 @@
+"""Online re-embedding of ``client_knowledge`` into the shadow column.
+
+Moves the corpus to ``EMBEDDING_NEXT_MODEL`` (at ``EMBEDDING_NEXT_DIMENSIONS``)
+without taking search offline (migration 20261018000006 has the whole
+procedure). While the next model is set, the backend dual-writes every new
+chunk to ``embedding`` and ``embedding_next``; this fills ``embedding_next``
+for the rows that existed before, ``--batch-size`` rows at a time: read the
+pending rows' text, embed it with the next model (through the embedding
+cache, ``--embedding-concurrency`` requests at a time), and write the vectors
+back in one ``set_client_knowledge_embedding_next`` call. Reads keep using
+``embedding`` until ``EMBEDDING_READ_NEXT`` is set.
+
+``--tokens-per-minute`` paces the embedding requests under the provider's
+rate limit; a failed batch is retried ``--retries`` times with backoff before
+the run stops. The pending rows are the ones whose ``embedding_next`` is
+still NULL, so a re-run after a crash or a stop carries on from where the
+last written batch left off, and vectors embedded but not yet written come
+back from the embedding cache unbilled.
+
+A progress line (rows done / total, rows/s, tokens/min, $ at
+``--price-per-m``, ETA) is printed every ``--report-seconds`` and at the
+end. ``--status`` prints it once without embedding anything; ``--reset``
+clears ``embedding_next`` (to retarget or abandon a migration).
+
+Run from ``backend/``:
+
+    EMBEDDING_NEXT_MODEL=<model> uv run python -m app.explore.reembed --status
+    EMBEDDING_NEXT_MODEL=<model> uv run python -m app.explore.reembed \\
+        --batch-size 200 --tokens-per-minute 1000000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from postgrest.types import CountMethod
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+from app.explore.db.pool import run_query
+from app.explore.db.rows import json_rows
+from app.explore.db.supabase import supabase
+from app.explore.services.rag_service import RAGService
+from app.explore.services.tokens import estimate_tokens
+from app.explore.services.vector_cache import parse_vector
+
+logger = logging.getLogger(__name__)
+
+# Rows per read / embed / write round. At 1536 dims the write is ~4 MB of
+# JSON, well inside the PostgREST timeout.
+BATCH_SIZE = 200
+
+# Rows cleared per reset_client_knowledge_embedding_next call.
+RESET_BATCH_SIZE = 1000
+
+# Backoff before the first retry of a failed batch; doubles per attempt.
+RETRY_DELAY_SECONDS = 1.0
+
+
+async def count_rows(pending: bool) -> int:
+    """``client_knowledge`` rows, or only those without ``embedding_next``."""
+
+    def _count() -> Any:
+        query = supabase.table("client_knowledge").select("id", count=CountMethod.exact)
+        if pending:
+            query = query.is_("embedding_next", "null")
+        return query.limit(1).execute()
+
+    result = await run_query(_count)
+    return result.count or 0
+
+
+async def filled_dimensions() -> Optional[int]:
+    """Dimensions of an already-filled ``embedding_next`` (None if empty)."""
+    result = await run_query(
+        lambda: (
+            supabase.table("client_knowledge")
+            .select("id, embedding_next")
+            .not_.is_("embedding_next", "null")
+            .limit(1)
+            .execute()
+        )
+    )
+    for row in json_rows(result.data):
+        vector = parse_vector(row.get("embedding_next"))
+        if vector is not None:
+            return int(vector.shape[0])
+    return None
+
+
+async def fetch_pending(after: int, limit: int) -> List[Dict[str, Any]]:
+    """Up to ``limit`` rows past id ``after`` still missing ``embedding_next``."""
+    result = await run_query(
+        lambda: (
+            supabase.table("client_knowledge")
+            .select("id, content")
+            .is_("embedding_next", "null")
+            .gt("id", after)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+    )
+    return json_rows(result.data)
+
+
+async def write(ids: List[int], embeddings: List[List[float]]) -> int:
+    """Set ``embedding_next`` of rows ``ids``; returns how many still existed."""
+    updates = [
+        {"id": row_id, "embedding": embedding}
+        for row_id, embedding in zip(ids, embeddings)
+    ]
+    result = await run_query(
+        lambda: supabase.rpc(
+            "set_client_knowledge_embedding_next", {"_updates": updates}
+        ).execute()
+    )
+    return result.data if isinstance(result.data, int) else 0
+
+
+async def reset() -> int:
+    """Clear ``embedding_next`` everywhere; returns how many rows."""
+    cleared = 0
+    while True:
+        result = await run_query(
+            lambda: supabase.rpc(
+                "reset_client_knowledge_embedding_next",
+                {"_limit": RESET_BATCH_SIZE},
+            ).execute()
+        )
+        batch = result.data if isinstance(result.data, int) else 0
+        cleared += batch
+        if batch == 0:
+            return cleared
+
+
+class RateLimit:
+    """Paces spending to ``per_minute`` units on average (0 = unlimited)."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.per_minute = per_minute
+        self.started = time.monotonic()
+        self.spent = 0.0
+
+    async def spend(self, amount: float) -> None:
+        self.spent += amount
+        if self.per_minute <= 0:
+            return
+        ahead = self.spent / self.per_minute * 60 - (time.monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+class Throughput:
+    """Running totals for the progress line."""
+
+    def __init__(self, total: int, done: int, price_per_m: float) -> None:
+        self.started = time.monotonic()
+        self.tokens_at_start = metrics.value("embeddings.tokens")
+        self.total = total
+        self.done_at_start = done
+        self.done = done
+        self.price_per_m = price_per_m
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        tokens = metrics.value("embeddings.tokens") - self.tokens_at_start
+        dollars = tokens / 1_000_000 * self.price_per_m
+        rate = (self.done - self.done_at_start) / elapsed
+        left = max(self.total - self.done, 0)
+        eta = f"{left / rate / 60:.1f} min" if rate > 0 else "-"
+        percent = self.done / self.total * 100 if self.total else 100.0
+        return (
+            f"{self.done}/{self.total} rows ({percent:.1f}%) | {rate:.1f} rows/s, "
+            f"{tokens / elapsed * 60:.0f} tokens/min, ${dollars:.4f} so far, "
+            f"ETA {eta}"
+        )
+
+
+async def reembed(
+    batch_size: int = BATCH_SIZE,
+    tokens_per_minute: float = 0,
+    retries: int = 3,
+    report_seconds: float = 10.0,
+    price_per_m: Optional[float] = None,
+    rag_service: Optional[RAGService] = None,
+) -> Throughput:
+    """Fill ``embedding_next`` for every pending row with the next model."""
+    model = settings.EMBEDDING_NEXT_MODEL
+    if model is None:
+        raise ValueError("EMBEDDING_NEXT_MODEL is not set")
+    dimensions = settings.embedding_next_dimensions
+    rag_service = rag_service or RAGService()
+    total = await count_rows(pending=False)
+    stats = Throughput(
+        total,
+        total - await count_rows(pending=True),
+        settings.embedding_price_per_m if price_per_m is None else price_per_m,
+    )
+    limit = RateLimit(tokens_per_minute)
+
+    async def _embed(texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                return await rag_service.embed_chunks(texts, model, dimensions)
+            except ValueError as e:
+                if attempt >= retries:
+                    raise
+                delay = RETRY_DELAY_SECONDS * 2**attempt
+                attempt += 1
+                logger.warning(f"Re-embed batch failed ({e}); retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _report() -> None:
+        while True:
+            await asyncio.sleep(report_seconds)
+            print(stats.line(), flush=True)
+
+    reporter = asyncio.ensure_future(_report())
+    try:
+        after = 0
+        while rows := await fetch_pending(after, batch_size):
+            texts = [str(row.get("content") or "") for row in rows]
+            await limit.spend(sum(estimate_tokens(text) for text in texts))
+            embeddings = await _embed(texts)
+            ids = [int(row["id"]) for row in rows]
+            stats.done += await write(ids, embeddings)
+            metrics.incr("reembed.rows", len(rows))
+            after = ids[-1]
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+    print(stats.line(), flush=True)
+    return stats
+
+
+async def _main(args: argparse.Namespace) -> int:
+    model = settings.EMBEDDING_NEXT_MODEL
+    if model is None:
+        print("Set EMBEDDING_NEXT_MODEL (and EMBEDDING_NEXT_DIMENSIONS) first.")
+        return 2
+    if args.reset:
+        print(f"Cleared embedding_next on {await reset()} rows")
+        return 0
+
+    dimensions = settings.embedding_next_dimensions
+    filled = await filled_dimensions()
+    if filled is not None and filled != dimensions:
+        print(
+            f"embedding_next holds {filled}-dim vectors but the next model is "
+            f"configured for {dimensions}; run with --reset to start over."
+        )
+        return 2
+
+    print(
+        f"Re-embedding into embedding_next with {model} ({dimensions} dims); "
+        f"reads use {settings.read_embedding_column}"
+    )
+    if args.status:
+        total = await count_rows(pending=False)
+        pending = await count_rows(pending=True)
+        print(Throughput(total, total - pending, 0.0).line())
+        return 0
+
+    if args.embedding_concurrency is not None:
+        settings.EMBEDDING_CONCURRENCY = args.embedding_concurrency
+    stats = await reembed(
+        batch_size=max(1, args.batch_size),
+        tokens_per_minute=args.tokens_per_minute,
+        retries=max(0, args.retries),
+        report_seconds=args.report_seconds,
+        price_per_m=args.price_per_m,
+    )
+    if stats.done >= stats.total and not settings.EMBEDDING_READ_NEXT:
+        print(
+            "Every row is filled: set EMBEDDING_READ_NEXT=true and restart the "
+            "workers to flip reads (their vector cache reloads for the new model)."
+        )
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fill client_knowledge.embedding_next with EMBEDDING_NEXT_MODEL."
+    )
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        default=0,
+        help="embedding rate limit, estimated tokens (0 = unlimited)",
+    )
+    parser.add_argument("--embedding-concurrency", type=int)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--report-seconds", type=float, default=10.0)
+    parser.add_argument(
+        "--price-per-m", type=float, help="next model's USD per million tokens"
+    )
+    parser.add_argument("--status", action="store_true", help="print progress only")
+    parser.add_argument(
+        "--reset", action="store_true", help="clear embedding_next on every row"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
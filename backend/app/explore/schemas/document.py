@@ -37,6 +37,9 @@ class DocumentUploadResponse(BaseModel):
         default=[], description="IDs of created document chunks"
     )
     chunks_created: int = Field(default=0, description="Number of chunks created")
+    job_id: Optional[str] = Field(
+        default=None, description="Ingestion job id (background uploads only)"
+    )
 
 
 class DocumentListItem(BaseModel):
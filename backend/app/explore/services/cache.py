@@ -0,0 +1,136 @@
+"""Bounded in-process caches for the retrieval hot path.
+
+``TTLCache`` is a small LRU map with a per-entry time-to-live and hit/miss
+counters. It is process-local on purpose: every uvicorn worker keeps its own
+copy, so nothing here needs a lock beyond the event loop's single thread, and
+a worker restart simply starts cold.
+
+``get_or_load`` adds optional single-flight: while one coroutine is loading a
+key, concurrent callers for the same key await that load instead of issuing
+their own request (e.g. several tool calls embedding the same query in one
+``asyncio.gather``). A failed load is never cached; its waiters see the same
+exception.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """LRU cache with per-entry TTL and hit/miss/eviction counters.
+
+    ``maxsize <= 0`` disables caching entirely (every lookup misses and nothing
+    is stored), so callers can wire a size setting straight through.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, single_flight: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.single_flight = single_flight
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "asyncio.Future[V]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return the live value for ``key`` (refreshing its LRU position), or
+        ``None`` on a miss. Expired entries are dropped on access."""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Store ``value`` under ``key``, evicting least-recently-used entries
+        past ``maxsize``."""
+        if not self.enabled:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Drop every entry (or those whose key matches ``predicate``); returns
+        how many were removed."""
+        if predicate is None:
+            removed = len(self._data)
+            self._data.clear()
+            return removed
+        doomed = [key for key in self._data if predicate(key)]
+        for key in doomed:
+            del self._data[key]
+        return len(doomed)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[V]]) -> V:
+        """Return the cached value for ``key``, loading (and caching) it on a
+        miss. With ``single_flight``, concurrent misses share one load."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        if self.single_flight:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    # The LEADER was cancelled (not us): load it ourselves.
+                    task = asyncio.current_task()
+                    if not pending.cancelled() or (task and task.cancelling()):
+                        raise
+
+        future: "asyncio.Future[V]" = asyncio.get_running_loop().create_future()
+        if self.single_flight:
+            self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a load nobody else awaited doesn't log
+            # "exception was never retrieved" at garbage collection.
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        self.set(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the counters, for logs and the metrics endpoint."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
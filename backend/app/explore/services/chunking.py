@@ -0,0 +1,181 @@
+"""Recursive text splitting for ``PDFParser.chunk_text``.
+
+``RecursiveSplitter`` produces exactly the chunks of langchain's
+``RecursiveCharacterTextSplitter`` as ``chunk_text`` used to configure it
+(separators kept at the start of the following piece, chunks stripped):
+split on the first separator present in the text, merge pieces into chunks
+of at most ``chunk_size`` carrying up to ``chunk_overlap`` over from the
+previous chunk, and recurse with the remaining separators into any piece
+that is still too long.
+
+It does the same work with less of it: separators are literal, so presence
+is a substring test and splitting is ``str.split`` rather than regexes with
+capture groups; pieces are tracked by length, so the merge window is a span
+of the text and each chunk one slice (no per-piece strings re-joined, no
+list re-sliced on every pop); and nothing is imported or built per call.
+
+Sizes are in characters, or in tokens of an embedding model's tokenizer
+(``services/tokens.py``) when the splitter is given a ``length``: character
+counts swing 3-4x in tokens between prose, spreadsheet TSV, code and CJK
+text, token counts are what the model truncates at and bills for. A chunk's
+size is the sum of its pieces' counts, as in langchain; pieces start at a
+separator, so that rarely differs from counting the joined text.
+``splitter_for`` returns one shared instance per configuration.
+"""
+
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from app.explore.services import tokens
+
+# Paragraphs, then lines, then sentences, then words, then characters.
+DEFAULT_SEPARATORS: Tuple[str, ...] = ("\n\n", "\n", ". ", " ", "")
+
+# Token counts of pieces up to TOKEN_CACHE_MAX_CHARS characters (words, short
+# lines and table cells, which recur constantly) are cached per splitter, up
+# to TOKEN_CACHE_SIZE of them; longer pieces are counted directly.
+TOKEN_CACHE_MAX_CHARS: int = 256
+TOKEN_CACHE_SIZE: int = 65536
+
+
+def _piece_widths(text: str, separator: str) -> List[int]:
+    """Lengths of the pieces of ``text`` split on ``separator``, each piece
+    after the first starting with the separator (the first is dropped when
+    empty). The pieces tile ``text``, so widths locate them."""
+    if not separator:
+        return [1] * len(text)
+    first, *rest = text.split(separator)
+    widths = [len(first)] if first else []
+    width = len(separator)
+    widths.extend(width + len(piece) for piece in rest)
+    return widths
+
+
+def token_length(model: str) -> Callable[[str], int]:
+    """Token count under ``model``'s tokenizer, short texts cached."""
+    count = tokens.token_counter(model)
+    cached = lru_cache(maxsize=TOKEN_CACHE_SIZE)(count)
+
+    def _length(text: str) -> int:
+        return cached(text) if len(text) <= TOKEN_CACHE_MAX_CHARS else count(text)
+
+    return _length
+
+
+class RecursiveSplitter:
+    """Splits text into overlapping chunks of at most ``chunk_size``
+    characters, or ``length`` units (single pieces that can't be split
+    further may exceed it)."""
+
+    def __init__(
+        self,
+        chunk_size: int,
+        chunk_overlap: int,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+        length: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if not 0 <= chunk_overlap <= chunk_size:
+            raise ValueError(
+                f"chunk_overlap must be between 0 and chunk_size "
+                f"({chunk_size}), got {chunk_overlap}"
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+        self._length = length
+
+    def length(self, text: str) -> int:
+        """Size of ``text`` in this splitter's unit."""
+        return len(text) if self._length is None else self._length(text)
+
+    def split(self, text: str) -> List[str]:
+        chunks: List[str] = []
+        self._split(text, 0, chunks)
+        return chunks
+
+    def _split(self, text: str, level: int, chunks: List[str]) -> None:
+        separators = self.separators
+        separator = separators[-1]
+        next_level = len(separators)
+        for i in range(level, len(separators)):
+            if not separators[i]:
+                separator = ""
+                break
+            if separators[i] in text:
+                separator, next_level = separators[i], i + 1
+                break
+
+        widths = _piece_widths(text, separator)
+        sizes = widths
+        if self._length is not None:
+            measure, sizes, start = self._length, [], 0
+            for width in widths:
+                sizes.append(measure(text[start : start + width]))
+                start += width
+
+        # Pieces smaller than chunk_size are merged in runs; larger ones are
+        # split again with the next separators (or kept whole at the last).
+        run_start = 0
+        offset = 0
+        for i, size in enumerate(sizes):
+            if size >= self.chunk_size:
+                if run_start < i:
+                    self._merge(text, offset, widths, sizes, run_start, i, chunks)
+                    offset += sum(widths[run_start:i])
+                piece = text[offset : offset + widths[i]]
+                if next_level >= len(separators):
+                    chunks.append(piece)
+                else:
+                    self._split(piece, next_level, chunks)
+                offset += widths[i]
+                run_start = i + 1
+        if run_start < len(sizes):
+            self._merge(text, offset, widths, sizes, run_start, len(sizes), chunks)
+
+    def _merge(
+        self,
+        text: str,
+        offset: int,
+        widths: List[int],
+        sizes: List[int],
+        first: int,
+        stop: int,
+        chunks: List[str],
+    ) -> None:
+        """Pack pieces ``first..stop`` (starting at ``text[offset]``) into
+        chunks, sliding a window that keeps up to ``chunk_overlap`` from one
+        chunk to the next. Chunks are slices of ``text``."""
+        limit, overlap = self.chunk_size, self.chunk_overlap
+        window_start = window_end = offset  # text span of the window
+        total = 0
+        lo = first  # first piece in the window
+        for i in range(first, stop):
+            size = sizes[i]
+            if total + size > limit and lo < i:
+                chunk = text[window_start:window_end].strip()
+                if chunk:
+                    chunks.append(chunk)
+                while total > overlap or (total + size > limit and total > 0):
+                    total -= sizes[lo]
+                    window_start += widths[lo]
+                    lo += 1
+            total += size
+            window_end += widths[i]
+        chunk = text[window_start:window_end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+
+@lru_cache(maxsize=16)
+def splitter_for(
+    chunk_size: int,
+    chunk_overlap: int,
+    model: Optional[str] = None,
+    separators: Tuple[str, ...] = DEFAULT_SEPARATORS,
+) -> RecursiveSplitter:
+    """The shared splitter for one configuration: sizes in characters, or in
+    tokens of ``model`` when one is given."""
+    length = token_length(model) if model is not None else None
+    return RecursiveSplitter(chunk_size, chunk_overlap, separators, length)
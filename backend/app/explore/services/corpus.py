@@ -0,0 +1,31 @@
+"""Per-project corpus generation counters.
+
+Every write to a project's slice of ``client_knowledge`` (chunk inserts,
+re-index deletes, by-file deletes, moves) calls ``bump(project_id)``. Caches
+derived from the corpus record the generation they were built at and treat a
+mismatch as stale, so a write is visible to the next search on the same
+worker without any explicit cache plumbing at the write site.
+
+Counters are process-local, like the caches they version: another uvicorn
+worker's writes are only picked up when its own cache entries expire (each
+cache bounds that with a TTL).
+"""
+
+from typing import Dict, Optional
+
+_generations: Dict[Optional[int], int] = {}
+
+
+def generation(project_id: Optional[int]) -> int:
+    """Current generation of ``project_id``'s corpus (0 until first bumped).
+
+    ``None`` versions the legacy NULL-project rows.
+    """
+    return _generations.get(project_id, 0)
+
+
+def bump(project_id: Optional[int]) -> int:
+    """Mark ``project_id``'s corpus as changed; returns the new generation."""
+    new = _generations.get(project_id, 0) + 1
+    _generations[project_id] = new
+    return new
@@ -0,0 +1,127 @@
+"""Document-embedding requests split into bounded sub-batches.
+
+``embed_texts`` embeds a document's chunks for ``RAGService.store_document``.
+One request for a whole book is megabytes of JSON, slow to build and parse,
+can exceed the provider's input limits, and fails as a whole. Instead the
+chunks are cut into contiguous sub-batches of at most
+``EMBEDDING_BATCH_SIZE`` items and ``EMBEDDING_BATCH_MAX_TOKENS`` estimated
+tokens (``tokens.estimate_tokens``), sent ``EMBEDDING_CONCURRENCY`` at a
+time. A sub-batch rejected as too large (HTTP 413) or timing out is split in
+half and retried, down to single chunks; any other error fails the call.
+The result is in input order: ``embed_texts(...)[i]`` embeds ``texts[i]``.
+Billed tokens are counted in ``embeddings.tokens``.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import APITimeoutError
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+from app.explore.services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def plan_batches(
+    texts: List[str], max_items: int, max_tokens: int
+) -> List[Tuple[int, int]]:
+    """Contiguous ``[start, end)`` ranges covering ``texts`` in order, each
+    within ``max_items`` and ``max_tokens`` (a single text over the token cap
+    gets a batch of its own)."""
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    used = 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if i > start and (i - start >= max_items or used + cost > max_tokens):
+            batches.append((start, i))
+            start, used = i, 0
+        used += cost
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _splittable(error: BaseException) -> bool:
+    """Errors a smaller request can fix: payload too large, or a timeout."""
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError)):
+        return True
+    # openai.APIStatusError (and most HTTP client errors) carry status_code.
+    return getattr(error, "status_code", None) == 413
+
+
+async def embed_texts(
+    client: Any,
+    texts: List[str],
+    max_items: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """Embed ``texts`` with ``client`` (an ``AsyncOpenAI``) in sub-batches
+    (see module docstring). Limits default to the ``EMBEDDING_*`` settings;
+    ``model`` (at ``dimensions``, if given) to ``embedding_model``."""
+    if not texts:
+        return []
+    batches = plan_batches(
+        texts,
+        max(max_items or settings.EMBEDDING_BATCH_SIZE, 1),
+        max(max_tokens or settings.EMBEDDING_BATCH_MAX_TOKENS, 1),
+    )
+    semaphore = asyncio.Semaphore(max(concurrency or settings.EMBEDDING_CONCURRENCY, 1))
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+    if model is None:
+        model, dimensions = settings.embedding_model, settings.embedding_dimensions
+    params: Dict[str, Any] = {"model": model}
+    if dimensions:
+        params["dimensions"] = dimensions
+
+    async def _embed(start: int, end: int) -> None:
+        try:
+            async with semaphore:
+                result = await asyncio.wait_for(
+                    client.embeddings.create(input=texts[start:end], **params),
+                    settings.EMBEDDING_BATCH_TIMEOUT_SECONDS,
+                )
+        except Exception as e:
+            if end - start <= 1 or not _splittable(e):
+                raise
+            # Split outside the semaphore so the halves can take its slots.
+            middle = (start + end) // 2
+            logger.warning(
+                f"Embedding batch of {end - start} failed ({type(e).__name__}); "
+                f"retrying as {middle - start} + {end - middle}"
+            )
+            metrics.incr("embeddings.batch_splits")
+            await asyncio.gather(_embed(start, middle), _embed(middle, end))
+            return
+        data = result.data or []
+        if len(data) != end - start:
+            raise ValueError(
+                f"Embeddings API returned {len(data)} results for {end - start} inputs"
+            )
+        # result.data is sorted by index, so data[j] embeds texts[start + j].
+        for j, item in enumerate(data):
+            vectors[start + j] = list(item.embedding)
+        metrics.incr("embeddings.batches")
+        # Billed tokens as the provider reports them, else our estimate.
+        billed = getattr(getattr(result, "usage", None), "prompt_tokens", None)
+        if not isinstance(billed, int):
+            billed = sum(estimate_tokens(text) for text in texts[start:end])
+        metrics.incr("embeddings.tokens", billed)
+
+    tasks = [asyncio.ensure_future(_embed(start, end)) for start, end in batches]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # The document fails as a whole: don't keep paying for the rest.
+        for task in tasks:
+            task.cancel()
+        raise
+    # Every slot is filled once all batches succeeded.
+    return [vector for vector in vectors if vector is not None]
@@ -0,0 +1,213 @@
+"""Persistent, content-addressed cache of document-chunk embeddings.
+
+``public.embedding_cache`` (migration 20261018000005) maps (embedding model,
+dimensions, SHA-256 of the chunk text) to the chunk's embedding. The same
+text comes back whenever a file is re-indexed or re-uploaded, saved from chat
+or shared by several projects; ``embed_texts`` serves those from the table
+and only sends the rest to the embeddings API (``embedding_batches``), then
+writes the new vectors back. The cache is best-effort: a failed lookup or
+write is logged and the chunks are simply embedded.
+
+``collect_garbage`` (run every ``EMBEDDING_CACHE_GC_INTERVAL_SECONDS`` by
+``start_gc``) drops entries no ``client_knowledge`` row references any more,
+by ``metadata.chunk_hash``. Every worker calls it, but the scan runs once per
+interval across all of them: ``gc_embedding_cache`` (migration
+20261018000008) returns 0 while another run holds its lock or when one ran
+within the interval.
+
+Counters: ``embeddings.cache_hits`` / ``embeddings.cache_misses`` (chunks),
+``embeddings.tokens_saved`` (estimated) and ``embeddings.dollars_saved`` (at
+``settings.embedding_price_per_m``).
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+from app.explore.db.pool import run_query
+from app.explore.db.rows import json_rows
+from app.explore.db.supabase import supabase
+from app.explore.services import embedding_batches
+from app.explore.services.tokens import estimate_tokens
+from app.explore.services.vector_cache import parse_vector
+
+logger = logging.getLogger(__name__)
+
+# Share of EMBEDDING_CACHE_GC_INTERVAL_SECONDS that must pass between GC runs
+# (any worker's): the margin keeps the worker that ran last from being turned
+# away by its own run when its timer fires slightly early.
+GC_INTERVAL_MARGIN: float = 0.9
+
+# Hashes per lookup RPC and rows per write-back upsert (a 1536-dim vector is
+# ~20 KB of JSON, so writes are sized like client_knowledge inserts).
+LOOKUP_BATCH_SIZE: int = 1000
+WRITE_BATCH_SIZE: int = 100
+
+
+def chunk_hash(content: str) -> str:
+    """Hex SHA-256 of a chunk's text: the cache key, and what
+    ``client_knowledge`` rows store as ``metadata.chunk_hash``."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+async def lookup(
+    hashes: List[str], model: Optional[str] = None, dimensions: Optional[int] = None
+) -> Dict[str, List[float]]:
+    """Cached embeddings for ``hashes`` under ``model`` / ``dimensions``
+    (default: the current ones)."""
+    model = model or settings.embedding_model
+    dimensions = dimensions or settings.embedding_dimensions
+    found: Dict[str, List[float]] = {}
+    for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+        batch = hashes[start : start + LOOKUP_BATCH_SIZE]
+        result = await run_query(
+            lambda: supabase.rpc(
+                "get_cached_embeddings",
+                {
+                    "_model": model,
+                    "_dimensions": dimensions,
+                    "_hashes": batch,
+                },
+            ).execute()
+        )
+        for row in json_rows(result.data):
+            vector = parse_vector(row.get("embedding"))
+            if vector is not None and len(vector) == dimensions:
+                found[str(row["content_hash"])] = vector.tolist()
+    return found
+
+
+async def store(
+    embeddings: Dict[str, List[float]],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> None:
+    """Write ``{hash: embedding}`` back (existing entries are left as is)."""
+    rows = [
+        {
+            "model": model or settings.embedding_model,
+            "dimensions": dimensions or settings.embedding_dimensions,
+            "content_hash": digest,
+            "embedding": embedding,
+        }
+        for digest, embedding in embeddings.items()
+    ]
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        batch = rows[start : start + WRITE_BATCH_SIZE]
+        await run_query(
+            lambda: (
+                supabase.table("embedding_cache")
+                .upsert(
+                    batch,
+                    on_conflict="model,dimensions,content_hash",
+                    ignore_duplicates=True,
+                )
+                .execute()
+            )
+        )
+
+
+async def embed_texts(
+    client: Any,
+    texts: List[str],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """``embedding_batches.embed_texts`` behind the cache: same contract
+    (``result[i]`` embeds ``texts[i]``, ``model`` defaulting to the current
+    one). Repeated texts are embedded once."""
+    if model is None:
+        model, dimensions = settings.embedding_model, settings.embedding_dimensions
+    if not settings.EMBEDDING_STORE_CACHE:
+        return await embedding_batches.embed_texts(
+            client, texts, model=model, dimensions=dimensions
+        )
+
+    hashes = [chunk_hash(text) for text in texts]
+    unique = list(dict.fromkeys(hashes))
+    try:
+        cached = await lookup(unique, model, dimensions)
+    except Exception as e:
+        logger.warning(f"Embedding cache lookup failed: {e}")
+        cached = {}
+
+    text_by_hash = dict(zip(hashes, texts))
+    missing = [digest for digest in unique if digest not in cached]
+    hits = [digest for digest in hashes if digest in cached]
+    if missing:
+        vectors = await embedding_batches.embed_texts(
+            client,
+            [text_by_hash[digest] for digest in missing],
+            model=model,
+            dimensions=dimensions,
+        )
+        fresh = dict(zip(missing, vectors))
+        try:
+            await store(fresh, model, dimensions)
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+        cached.update(fresh)
+
+    if hits:
+        saved = sum(estimate_tokens(text_by_hash[digest]) for digest in hits)
+        metrics.incr("embeddings.cache_hits", len(hits))
+        metrics.incr("embeddings.tokens_saved", saved)
+        metrics.incr(
+            "embeddings.dollars_saved",
+            saved / 1_000_000 * settings.embedding_price_per_m,
+        )
+    metrics.incr("embeddings.cache_misses", len(missing))
+    return [cached[digest] for digest in hashes]
+
+
+async def collect_garbage() -> int:
+    """Delete unreferenced entries older than
+    ``EMBEDDING_CACHE_GC_MIN_AGE_SECONDS``; returns how many (0 when another
+    worker's run holds the lock or ran within the interval)."""
+    min_interval = settings.EMBEDDING_CACHE_GC_INTERVAL_SECONDS * GC_INTERVAL_MARGIN
+    result = await run_query(
+        lambda: supabase.rpc(
+            "gc_embedding_cache",
+            {
+                "_min_age_seconds": settings.EMBEDDING_CACHE_GC_MIN_AGE_SECONDS,
+                "_min_interval_seconds": int(min_interval),
+            },
+        ).execute()
+    )
+    deleted = result.data if isinstance(result.data, int) else 0
+    metrics.incr("embeddings.cache_evicted", deleted)
+    return deleted
+
+
+async def _gc_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await collect_garbage()
+            if deleted:
+                logger.info(f"Embedding cache GC removed {deleted} entries")
+        except Exception as e:
+            logger.warning(f"Embedding cache GC failed: {e}")
+
+
+_gc_task: Optional[asyncio.Task] = None
+
+
+def start_gc() -> None:
+    """Start the periodic GC task (app startup; no-op when disabled)."""
+    global _gc_task
+    interval = settings.EMBEDDING_CACHE_GC_INTERVAL_SECONDS
+    if _gc_task is None and settings.EMBEDDING_STORE_CACHE and interval > 0:
+        _gc_task = asyncio.create_task(_gc_loop(interval), name="embedding-cache-gc")
+
+
+async def stop_gc() -> None:
+    """Cancel the GC task (app shutdown)."""
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        await asyncio.gather(_gc_task, return_exceptions=True)
+        _gc_task = None
@@ -0,0 +1,219 @@
+"""Document text extraction off the event loop.
+
+pypdf and the python-docx / python-pptx / openpyxl extractors are pure-Python
+and CPU-bound: called from an async handler, a 200-page PDF stalls every chat
+stream on that uvicorn worker for seconds (and a thread would still hold the
+GIL). ``run`` sends the work to a ``ProcessPoolExecutor`` of
+``EXTRACTION_WORKERS`` processes instead:
+
+  * at most ``EXTRACTION_WORKERS`` jobs are submitted at a time; the rest
+    wait their turn in the event loop, so a job is running from the moment
+    it is submitted.
+  * each job gets ``EXTRACTION_TIMEOUT_SECONDS`` of wall-clock time from
+    submission (time spent waiting for a worker doesn't count). A job that
+    overruns can't be interrupted inside its worker, so the whole pool is
+    replaced and its processes are killed; other jobs that were running on
+    it are resubmitted once to the new pool. A job that never started is
+    just cancelled.
+  * each worker's address space is capped at ``EXTRACTION_MAX_MEMORY_MB``
+    (``RLIMIT_AS``, where the platform has it), so a hostile document raises
+    ``MemoryError`` in the worker instead of growing the API process.
+  * workers are recycled after ``EXTRACTION_MAX_TASKS_PER_CHILD`` jobs, which
+    returns whatever the parsers leaked or fragmented.
+
+Timeouts, memory errors and dead workers surface as ``ExtractionError``;
+anything else the extractor raises (``ValueError``, ``HTTPException`` from
+the zip-bomb guard, ...) is re-raised as is. With ``EXTRACTION_WORKERS=0``
+(or before ``start_pool``) jobs run in a thread, still under the timeout.
+
+Counters: ``extraction.jobs`` / ``extraction.job_ms`` (wall time including
+queueing), ``extraction.timeouts``, ``extraction.failures`` and
+``extraction.pool_restarts``; the ``extraction`` source reports the current
+queue depth.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ExtractionError(Exception):
+    """Extraction timed out, ran out of memory or lost its worker process."""
+
+
+class _Rejected(Exception):
+    """``HTTPException`` in transit from a worker (it doesn't pickle: its
+    constructor arguments aren't kept in ``args``)."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _init_worker(max_memory_bytes: int) -> None:
+    """Worker initializer: cap the address space (no-op without ``resource``)."""
+    if max_memory_bytes <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (max_memory_bytes, max_memory_bytes))
+
+
+def _call(func: Callable[..., T], *args: Any) -> T:
+    """Run ``func`` in a worker, making its exceptions picklable."""
+    try:
+        return func(*args)
+    except HTTPException as e:
+        raise _Rejected(e.status_code, e.detail) from None
+
+
+class ExtractionPool:
+    """A process pool for extractor calls, replaced wholesale on a timeout."""
+
+    def __init__(
+        self, workers: int, max_tasks_per_child: int, max_memory_bytes: int
+    ) -> None:
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_memory_bytes = max_memory_bytes
+        self._executor = self._new_executor()
+        # Held from submission to completion: the executor's own queue would
+        # otherwise start each job's timeout while it waits for a worker.
+        self._slots = asyncio.Semaphore(workers)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # fork is unsafe in a threaded server and incompatible with
+        # max_tasks_per_child; forkserver keeps worker start-up cheap.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.max_memory_bytes,),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace ``broken`` (if still current) and kill its workers."""
+        if broken is not self._executor:
+            return
+        metrics.incr("extraction.pool_restarts")
+        self._executor = self._new_executor()
+        processes = list((getattr(broken, "_processes", None) or {}).values())
+        broken.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+
+    async def run(self, func: Callable[..., T], *args: Any, timeout: float) -> T:
+        async with self._slots:
+            return await self._run(func, *args, timeout=timeout)
+
+    async def _run(self, func: Callable[..., T], *args: Any, timeout: float) -> T:
+        for attempt in range(2):
+            executor = self._executor
+            job = executor.submit(_call, func, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+            except TimeoutError:
+                # A job no worker had picked up just cancels; a running one
+                # can only be stopped by killing its pool.
+                if not job.cancel():
+                    self._restart(executor)
+                raise
+            except BrokenProcessPool:
+                if attempt == 0 and executor is not self._executor:
+                    # Killed with the rest of a pool another job timed out on.
+                    continue
+                self._restart(executor)
+                raise ExtractionError("Extraction worker exited unexpectedly")
+        raise AssertionError("unreachable")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool: Optional[ExtractionPool] = None
+# Jobs submitted and not yet finished (running or waiting for a worker).
+_in_flight = 0
+
+
+def _stats() -> Dict[str, Any]:
+    workers = _pool.workers if _pool is not None else 0
+    return {
+        "workers": workers,
+        "in_flight": _in_flight,
+        "queued": max(0, _in_flight - workers) if workers else 0,
+    }
+
+
+metrics.register("extraction", _stats)
+
+
+async def run(func: Callable[..., T], *args: Any) -> T:
+    """``func(*args)`` in an extraction worker (a thread without a pool).
+
+    ``func`` and its arguments must be picklable: a module-level function or
+    a bound method of a plain object such as ``PDFParser``.
+    """
+    global _in_flight
+    timeout = settings.EXTRACTION_TIMEOUT_SECONDS
+    started = time.perf_counter()
+    _in_flight += 1
+    try:
+        if _pool is not None:
+            return await _pool.run(func, *args, timeout=timeout)
+        return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+    except TimeoutError:
+        metrics.incr("extraction.timeouts")
+        raise ExtractionError(f"Extraction took longer than {timeout:g}s") from None
+    except _Rejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail) from None
+    except MemoryError:
+        metrics.incr("extraction.failures")
+        raise ExtractionError("Extraction ran out of memory") from None
+    except ExtractionError:
+        metrics.incr("extraction.failures")
+        raise
+    finally:
+        _in_flight -= 1
+        metrics.incr("extraction.jobs")
+        metrics.incr("extraction.job_ms", (time.perf_counter() - started) * 1000)
+
+
+def start_pool() -> None:
+    """Start this process's extraction pool (app startup; no-op at 0 workers)."""
+    global _pool
+    if _pool is None and settings.EXTRACTION_WORKERS > 0:
+        _pool = ExtractionPool(
+            settings.EXTRACTION_WORKERS,
+            settings.EXTRACTION_MAX_TASKS_PER_CHILD,
+            settings.EXTRACTION_MAX_MEMORY_MB * 1024 * 1024,
+        )
+
+
+async def stop_pool() -> None:
+    """Shut the pool down, waiting for running jobs (app shutdown)."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown)
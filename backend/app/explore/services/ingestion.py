@@ -0,0 +1,366 @@
+"""Document ingestion shared by the endpoints and the background job workers.
+
+``index_portal_file`` and ``store_pages`` hold the work behind
+``/documents/knowledge/index-file`` and ``/documents/upload``. The endpoints
+call them inline (the default) or, with ``background=true``, enqueue a job
+whose handler (``JOB_HANDLERS``, run by ``services/jobs.py``) calls the same
+function. Both are safe to re-run after a partial failure: a re-index matches
+whatever rows the file has against its current chunks, and an upload job
+first deletes any rows a previous attempt of the same job inserted.
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.explore.core import metrics
+from app.explore.db.pool import run_query
+from app.explore.db.rows import json_rows
+from app.explore.db.supabase import supabase
+from app.explore.core.config import settings
+from app.explore.services import corpus, extraction, pipeline
+from app.explore.services.jobs import Handler, Progress
+from app.explore.services.pdf_parser import DocumentSource, extract_text
+from app.explore.services.rag_service import RAGService, chunk_hash
+
+logger = logging.getLogger(__name__)
+
+# Supabase Storage bucket that backs the Document Portal "Files" UI.
+FILES_BUCKET = "Files"
+
+# Rows per metadata-patch RPC / delete-by-id statement in an incremental
+# re-index (ids and small JSON patches only, so far more than an insert).
+ROW_BATCH_SIZE = 500
+
+
+class StorageDownloadError(Exception):
+    """The file could not be downloaded from the Files bucket."""
+
+
+async def _report(progress: Optional[Progress], **fields: Any) -> None:
+    if progress is not None:
+        await progress(fields)
+
+
+async def index_portal_file(
+    rag_service: RAGService,
+    project_id: int,
+    storage_path: str,
+    user_id: str,
+    progress: Optional[Progress] = None,
+    incremental: bool = True,
+) -> Dict[str, Any]:
+    """Download, extract and (re-)index a Document Portal file.
+
+    ``storage_path`` must already be validated against the project prefix
+    (``documents._safe_storage_key``). Returns the index-file response body:
+    ``{"indexed": false, "reason": ...}`` for unsupported or empty files,
+    ``{"indexed": true, "chunks": n, "unchanged": true}`` when the extracted
+    text is already indexed at this path, else ``{"indexed": true,
+    "chunks": n, "reused": r, "added": a, "removed": d}``. Raises
+    ``StorageDownloadError`` if the download fails.
+
+    A changed file is re-indexed incrementally (``_reindex_incremental``)
+    unless ``incremental`` is false, which deletes and re-embeds every chunk.
+    """
+    await _report(progress, stage="downloading")
+    try:
+        file_bytes = await asyncio.to_thread(
+            supabase.storage.from_(FILES_BUCKET).download,
+            f"{project_id}/{storage_path}",
+        )
+    except Exception as e:
+        raise StorageDownloadError(str(e)) from e
+
+    await _report(progress, stage="extracting")
+    content = await extraction.run(extract_text, file_bytes, storage_path)
+    if content is None:
+        return {"indexed": False, "reason": "unsupported_type"}
+    if not content.strip():
+        return {"indexed": False, "reason": "empty"}
+
+    # Content-hash dedup: if this exact text is already indexed at this
+    # path, skip the delete + re-embed entirely — a re-index of an
+    # unchanged file would otherwise burn an embeddings call to produce
+    # identical chunks. (Hash is over the EXTRACTED text, so a re-saved
+    # file with identical content still dedupes.) Every row must carry the
+    # hash: an interrupted incremental re-index leaves a mix.
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    existing = await run_query(
+        lambda: (
+            supabase.table("client_knowledge")
+            .select("id, content, metadata")
+            .eq("project_id", project_id)
+            .eq("storage_path", storage_path)
+            .execute()
+        )
+    )
+    existing_rows = json_rows(existing.data)
+    if existing_rows and all(
+        _metadata(row).get("content_hash") == content_hash for row in existing_rows
+    ):
+        return {"indexed": True, "chunks": len(existing_rows), "unchanged": True}
+
+    metadata = {
+        "filename": storage_path.rsplit("/", 1)[-1],
+        "storage_path": storage_path,
+        "content_hash": content_hash,
+        "upload_date": datetime.now().isoformat(),
+    }
+    await _report(progress, stage="embedding")
+    if incremental and existing_rows:
+        return await _reindex_incremental(
+            rag_service,
+            project_id,
+            storage_path,
+            user_id,
+            content,
+            metadata,
+            existing_rows,
+        )
+
+    # Drop any existing chunks for this file so a re-index of a replaced
+    # file doesn't leave stale/duplicate chunks behind.
+    await run_query(
+        lambda: (
+            supabase.table("client_knowledge")
+            .delete()
+            .eq("project_id", project_id)
+            .eq("storage_path", storage_path)
+            .execute()
+        )
+    )
+    corpus.bump(project_id)
+
+    doc_ids = await rag_service.store_document(
+        content=content,
+        metadata=metadata,
+        client_id=user_id,
+        project_id=project_id,
+        storage_path=storage_path,
+        source="portal",
+    )
+    return {
+        "indexed": True,
+        "chunks": len(doc_ids),
+        "reused": 0,
+        "added": len(doc_ids),
+        "removed": len(existing_rows),
+    }
+
+
+def _metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = row.get("metadata")
+    return metadata if isinstance(metadata, dict) else {}
+
+
+async def _reindex_incremental(
+    rag_service: RAGService,
+    project_id: int,
+    storage_path: str,
+    user_id: str,
+    content: str,
+    metadata: Dict[str, Any],
+    existing_rows: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Re-index a changed file by chunk hash instead of from scratch.
+
+    The new text is chunked and each chunk matched (as a multiset, so
+    repeated chunks pair up one to one) against the ``chunk_hash`` of the
+    file's rows — rows stored before chunk hashes existed are hashed from
+    their content. Only unmatched chunks are embedded and inserted; matched
+    rows keep their embedding and get their position (``chunk_index`` /
+    ``total_chunks``) and the file metadata patched in place
+    (``patch_client_knowledge_metadata``); rows left unmatched are deleted.
+    New rows go in before anything is removed, and a re-run after a partial
+    failure matches whatever the previous attempt left behind.
+    """
+    chunks = rag_service.pdf_parser.chunk_text(content)
+    rows_by_hash: Dict[str, List[int]] = {}
+    for row in existing_rows:
+        digest = _metadata(row).get("chunk_hash") or chunk_hash(
+            str(row.get("content") or "")
+        )
+        rows_by_hash.setdefault(digest, []).append(int(row["id"]))
+
+    added: List[int] = []
+    patches: List[Dict[str, Any]] = []
+    for i, chunk in enumerate(chunks):
+        digest = chunk_hash(chunk)
+        matches = rows_by_hash.get(digest)
+        if not matches:
+            added.append(i)
+            continue
+        patches.append(
+            {
+                "id": matches.pop(0),
+                "metadata": {
+                    **metadata,
+                    "chunk_index": i,
+                    "total_chunks": len(chunks),
+                    "chunk_hash": digest,
+                },
+            }
+        )
+    removed = [row_id for ids in rows_by_hash.values() for row_id in ids]
+
+    try:
+        doc_ids = await rag_service.store_chunks(
+            [chunks[i] for i in added],
+            [
+                {**metadata, "chunk_index": i, "total_chunks": len(chunks)}
+                for i in added
+            ],
+            client_id=user_id,
+            project_id=project_id,
+            storage_path=storage_path,
+            source="portal",
+        )
+        for start in range(0, len(patches), ROW_BATCH_SIZE):
+            batch = patches[start : start + ROW_BATCH_SIZE]
+            await run_query(
+                lambda: supabase.rpc(
+                    "patch_client_knowledge_metadata",
+                    {"_project_id": project_id, "_updates": batch},
+                ).execute()
+            )
+        for start in range(0, len(removed), ROW_BATCH_SIZE):
+            ids = removed[start : start + ROW_BATCH_SIZE]
+            await run_query(
+                lambda: (
+                    supabase.table("client_knowledge")
+                    .delete()
+                    .eq("project_id", project_id)
+                    .in_("id", ids)
+                    .execute()
+                )
+            )
+    finally:
+        corpus.bump(project_id)
+
+    metrics.incr("reindex.chunks_reused", len(patches))
+    metrics.incr("reindex.chunks_embedded", len(added))
+    logger.info(
+        f"Incremental re-index of {storage_path}: {len(patches)} reused, "
+        f"{len(added)} added, {len(removed)} removed"
+    )
+    return {
+        "indexed": True,
+        "chunks": len(chunks),
+        "reused": len(patches),
+        "added": len(doc_ids),
+        "removed": len(removed),
+    }
+
+
+async def store_pages(
+    rag_service: RAGService,
+    pages: List[Dict[str, Any]],
+    project_id: int,
+    user_id: str,
+    job_id: Optional[str] = None,
+    progress: Optional[Progress] = None,
+) -> List[int]:
+    """Chunk, embed and store extracted PDF pages (``PDFParser`` output) as
+    one document (``RAGService.store_pages``).
+
+    With ``job_id`` every chunk is tagged ``metadata.ingestion_job_id`` and
+    rows left by an earlier attempt of the same job are removed first, so a
+    retried upload job never duplicates chunks. With ``INGESTION_STREAMING``
+    the pages go through the streaming pipeline (``services/pipeline.py``).
+    """
+    metadata = await _upload_metadata(project_id, job_id)
+    if settings.INGESTION_STREAMING:
+        return await pipeline.store_stream(
+            rag_service,
+            pipeline.iter_pages(pages),
+            client_id=user_id,
+            project_id=project_id,
+            metadata=metadata,
+            progress=progress,
+        )
+    await _report(progress, stage="embedding", pages_total=len(pages))
+    return await rag_service.store_pages(
+        pages, client_id=user_id, project_id=project_id, metadata=metadata
+    )
+
+
+async def stream_pdf(
+    rag_service: RAGService,
+    source: DocumentSource,
+    filename: str,
+    project_id: int,
+    user_id: str,
+    progress: Optional[Progress] = None,
+) -> List[int]:
+    """Extract, chunk, embed and store a PDF upload as one streaming pass
+    (``pipeline.store_stream``), never holding all its pages or chunks.
+    Same chunks and metadata as ``store_pages`` over the extracted pages."""
+    return await pipeline.store_stream(
+        rag_service,
+        pipeline.pdf_pages(rag_service.pdf_parser, source, filename),
+        client_id=user_id,
+        project_id=project_id,
+        metadata=await _upload_metadata(project_id, None),
+        progress=progress,
+    )
+
+
+async def _upload_metadata(project_id: int, job_id: Optional[str]) -> Dict[str, Any]:
+    """Metadata for every chunk of an upload; for a job, first removes the
+    rows a previous attempt of it inserted."""
+    metadata: Dict[str, Any] = {"upload_date": datetime.now().isoformat()}
+    if job_id is None:
+        return metadata
+    await run_query(
+        lambda: (
+            supabase.table("client_knowledge")
+            .delete()
+            .eq("project_id", project_id)
+            .eq("metadata->>ingestion_job_id", job_id)
+            .execute()
+        )
+    )
+    corpus.bump(project_id)
+    metadata["ingestion_job_id"] = job_id
+    return metadata
+
+
+async def _run_index_file_job(
+    job: Dict[str, Any], progress: Progress
+) -> Dict[str, Any]:
+    return await index_portal_file(
+        RAGService(),
+        project_id=int(job["project_id"]),
+        storage_path=job["payload"]["storage_path"],
+        user_id=job["uid"],
+        progress=progress,
+        incremental=job["payload"].get("incremental", True),
+    )
+
+
+async def _run_upload_job(job: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+    payload = job["payload"]
+    doc_ids = await store_pages(
+        RAGService(),
+        payload["pages"],
+        project_id=int(job["project_id"]),
+        user_id=job["uid"],
+        job_id=str(job["id"]),
+        progress=progress,
+    )
+    return {
+        "success": True,
+        "message": f"Successfully uploaded {payload['filename']}",
+        "document_ids": [str(doc_id) for doc_id in doc_ids],
+        "chunks_created": len(doc_ids),
+    }
+
+
+# Job kind -> handler, for services/jobs.py.
+JOB_HANDLERS: Dict[str, Handler] = {
+    "index_file": _run_index_file_job,
+    "upload": _run_upload_job,
+}
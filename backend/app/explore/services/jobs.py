@@ -0,0 +1,381 @@
+"""Persistent background job queue (``public.ingestion_jobs``).
+
+``enqueue`` inserts a job (coalescing a duplicate still-queued job for the
+same ``dedupe_key``) and wakes this process's workers. ``JobWorkerPool`` runs
+``INGESTION_WORKERS`` async workers per uvicorn worker; each loops:
+
+  1. ``claim_ingestion_job`` — FOR UPDATE SKIP LOCKED, so no two workers
+     (in any process) get the same job. Projects with the fewest running jobs
+     go first, and projects this pool already runs
+     ``INGESTION_JOBS_PER_PROJECT`` jobs for are skipped, so one project's
+     bulk upload can't starve everyone else.
+  2. Run the kind's handler while a heartbeat renews the lease
+     (``locked_at``). A worker that dies stops renewing, and once the lease
+     lapses the job is claimable again; handlers must therefore be safe to
+     re-run (see services/ingestion.py).
+  3. Record the result, or schedule a retry with exponential backoff
+     (``failed`` once ``max_attempts`` claims are used up).
+
+Every state write after the claim is guarded by ``locked_by``: a worker that
+lost its lease (e.g. stalled past it) can't overwrite the new owner's state.
+It also stops working on the job: when a renewal matches no row (another
+worker reclaimed it) or renewals have failed for most of a lease, the
+heartbeat cancels the handler and nothing more is written, so two workers
+never run the same job's inserts side by side.
+On shutdown in-flight jobs are handed back to the queue without using up an
+attempt.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.explore.core import metrics
+from app.explore.core.config import settings
+from app.explore.db.pool import run_query
+from app.explore.db.rows import json_rows
+from app.explore.db.supabase import supabase
+
+logger = logging.getLogger(__name__)
+
+# Progress reporter handed to handlers: takes a small JSON-able dict (stage,
+# counters) that the status endpoint shows while the job runs.
+Progress = Callable[[Dict[str, Any]], Awaitable[None]]
+Handler = Callable[[Dict[str, Any], Progress], Awaitable[Any]]
+
+# Columns returned by the status endpoint.
+JOB_STATUS_COLUMNS = (
+    "id, kind, project_id, status, attempts, max_attempts, progress, result, "
+    "error, created_at, updated_at, started_at, finished_at"
+)
+
+# Retry delays grow as base * 2**(attempt - 1), capped here.
+MAX_RETRY_DELAY_SECONDS: float = 900.0
+
+# enqueue_ingestion_job calls per enqueue. Before migration 20261018000007
+# the RPC returned a NULL row when a worker claimed the queued duplicate
+# mid-call; calling it again then inserts a fresh job.
+ENQUEUE_ATTEMPTS: int = 3
+
+# Progress updates are written at most this often per job (the last one
+# before completion may be dropped; the final result supersedes it).
+PROGRESS_INTERVAL_SECONDS: float = 1.0
+
+
+class PermanentJobError(Exception):
+    """A handler error that retrying cannot fix (the job fails at once)."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next claim after ``attempts`` failed ones
+    (exponential, capped, with +-20% jitter so retries don't align)."""
+    base = settings.INGESTION_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return min(base, MAX_RETRY_DELAY_SECONDS) * random.uniform(0.8, 1.2)
+
+
+async def enqueue(
+    kind: str,
+    project_id: int,
+    uid: Optional[str],
+    payload: Dict[str, Any],
+    dedupe_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Persist a job and return its row. A still-queued job with the same
+    ``(project_id, dedupe_key)`` is returned instead of adding a second."""
+    params = {
+        "_kind": kind,
+        "_project_id": project_id,
+        "_uid": uid,
+        "_payload": payload,
+        "_dedupe_key": dedupe_key,
+        "_max_attempts": settings.INGESTION_JOB_MAX_ATTEMPTS,
+    }
+    for _ in range(ENQUEUE_ATTEMPTS):
+        result = await run_query(
+            lambda: supabase.rpc("enqueue_ingestion_job", params).execute()
+        )
+        data = result.data
+        rows = json_rows(data) if isinstance(data, list) else json_rows([data])
+        # A NULL composite comes back as an object of nulls.
+        if rows and rows[0].get("id"):
+            metrics.incr("jobs.enqueued")
+            if _pool is not None:
+                _pool.wake()
+            return rows[0]
+    raise RuntimeError("enqueue_ingestion_job returned no job")
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """The job's status row, or ``None`` if there is no such job."""
+    result = await run_query(
+        lambda: (
+            supabase.table("ingestion_jobs")
+            .select(JOB_STATUS_COLUMNS)
+            .eq("id", job_id)
+            .limit(1)
+            .execute()
+        )
+    )
+    rows = json_rows(result.data)
+    return rows[0] if rows else None
+
+
+class JobWorkerPool:
+    """A bounded set of async workers draining ``ingestion_jobs`` (see module
+    docstring)."""
+
+    def __init__(self, handlers: Dict[str, Handler], workers: int):
+        self.handlers = handlers
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._running: Dict[int, int] = {}
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        for n in range(self.workers):
+            self._tasks.append(
+                asyncio.create_task(self._work(f"{self._owner}:{n}"), name=f"jobs-{n}")
+            )
+        logger.info(f"Started {self.workers} ingestion job workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def wake(self) -> None:
+        """Skip the idle poll wait (a job was just enqueued here)."""
+        self._wake.set()
+
+    async def _work(self, worker: str) -> None:
+        while True:
+            try:
+                job = await self._claim(worker)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wake.wait(), settings.INGESTION_POLL_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(worker, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Recording the outcome failed; the lease expiry recovers it.
+                logger.error(f"Job {job.get('id')} bookkeeping failed: {e}")
+
+    async def _claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        busy = [
+            project_id
+            for project_id, count in self._running.items()
+            if count >= max(settings.INGESTION_JOBS_PER_PROJECT, 1)
+        ]
+        result = await run_query(
+            lambda: supabase.rpc(
+                "claim_ingestion_job",
+                {
+                    "_worker": worker,
+                    "_lease_seconds": settings.INGESTION_JOB_LEASE_SECONDS,
+                    "_skip_projects": busy,
+                },
+            ).execute()
+        )
+        rows = json_rows(result.data)
+        return rows[0] if rows else None
+
+    async def _run(self, job: Dict[str, Any], progress: Progress) -> Any:
+        handler = self.handlers.get(job.get("kind", ""))
+        if handler is None:
+            raise PermanentJobError(f"no handler for job kind {job.get('kind')!r}")
+        return await handler(job, progress)
+
+    async def _execute(self, worker: str, job: Dict[str, Any]) -> None:
+        job_id = str(job["id"])
+        project_id = int(job["project_id"])
+        self._running[project_id] = self._running.get(project_id, 0) + 1
+        run = asyncio.create_task(self._run(job, self._progress_writer(worker, job_id)))
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(worker, job_id, run, lost))
+        started = time.perf_counter()
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if lost.is_set() and not (task is not None and task.cancelling()):
+                # The heartbeat stopped the handler: the job is (or will be)
+                # another worker's, so leave its state alone.
+                metrics.incr("jobs.lease_lost")
+                return
+            # Shutdown: hand the job back without spending an attempt.
+            await self._update(
+                worker,
+                job_id,
+                status="queued",
+                attempts=max(int(job.get("attempts", 1)) - 1, 0),
+                locked_by=None,
+                locked_at=None,
+                run_after=_now().isoformat(),
+            )
+            raise
+        except Exception as e:
+            await self._fail(worker, job, e)
+        else:
+            if not await self._update(
+                worker,
+                job_id,
+                status="succeeded",
+                result=result,
+                error=None,
+                locked_by=None,
+                finished_at=_now().isoformat(),
+            ):
+                logger.warning(f"Job {job_id} finished after losing its lease")
+                metrics.incr("jobs.lease_lost")
+                return
+            metrics.incr("jobs.succeeded")
+            logger.info(
+                f"Job {job_id} ({job.get('kind')}) succeeded in "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+        finally:
+            heartbeat.cancel()
+            run.cancel()
+            self._running[project_id] -= 1
+            if not self._running[project_id]:
+                del self._running[project_id]
+
+    async def _fail(self, worker: str, job: Dict[str, Any], error: Exception) -> None:
+        job_id = str(job["id"])
+        attempts = int(job.get("attempts", 1))
+        final = isinstance(error, PermanentJobError) or attempts >= int(
+            job.get("max_attempts", settings.INGESTION_JOB_MAX_ATTEMPTS)
+        )
+        # Stored and shown to the poller: the exception type only, never its
+        # text (it can carry provider or database details).
+        message = (
+            str(error) if isinstance(error, PermanentJobError) else type(error).__name__
+        )
+        logger.error(
+            f"Job {job_id} ({job.get('kind')}) attempt {attempts} failed",
+            exc_info=error,
+        )
+        if final:
+            await self._update(
+                worker,
+                job_id,
+                status="failed",
+                error=message,
+                locked_by=None,
+                finished_at=_now().isoformat(),
+            )
+            metrics.incr("jobs.failed")
+            return
+        delay = retry_delay(attempts)
+        await self._update(
+            worker,
+            job_id,
+            status="queued",
+            error=message,
+            locked_by=None,
+            locked_at=None,
+            run_after=(_now() + timedelta(seconds=delay)).isoformat(),
+        )
+        metrics.incr("jobs.retried")
+
+    async def _heartbeat(
+        self, worker: str, job_id: str, run: asyncio.Task, lost: asyncio.Event
+    ) -> None:
+        """Renew the lease every third of it; cancel ``run`` (and set ``lost``)
+        once the lease is gone. Renewals that keep failing give up one
+        interval before the lease lapses, so the handler's in-flight writes
+        land before another worker can claim the job."""
+        lease = settings.INGESTION_JOB_LEASE_SECONDS
+        interval = max(lease / 3, 1.0)
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await self._update(worker, job_id, locked_at=_now().isoformat()):
+                    renewed = time.monotonic()
+                    continue
+                reason = "the job was reclaimed"
+            except Exception as e:
+                logger.warning(f"Job {job_id} lease renewal failed: {e}")
+                if time.monotonic() - renewed < lease - interval:
+                    continue
+                reason = "renewals kept failing"
+            logger.warning(f"Job {job_id} lost its lease ({reason}); stopping it")
+            lost.set()
+            run.cancel()
+            return
+
+    def _progress_writer(self, worker: str, job_id: str) -> Progress:
+        last = 0.0
+
+        async def _write(progress: Dict[str, Any]) -> None:
+            nonlocal last
+            now = time.monotonic()
+            if now - last < PROGRESS_INTERVAL_SECONDS:
+                return
+            last = now
+            try:
+                await self._update(worker, job_id, progress=progress)
+            except Exception as e:
+                logger.warning(f"Job {job_id} progress update failed: {e}")
+
+        return _write
+
+    @staticmethod
+    async def _update(worker: str, job_id: str, **fields: Any) -> bool:
+        """Write ``fields`` if ``worker`` still holds the job; returns whether
+        it did (no row matched once the lease has passed to another worker)."""
+        fields["updated_at"] = _now().isoformat()
+        result = await run_query(
+            lambda: (
+                supabase.table("ingestion_jobs")
+                .update(fields)
+                .eq("id", job_id)
+                .eq("locked_by", worker)
+                .execute()
+            )
+        )
+        return bool(json_rows(result.data))
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_workers(handlers: Dict[str, Handler]) -> None:
+    """Start this process's worker pool (app startup; no-op at 0 workers)."""
+    global _pool
+    if _pool is None and settings.INGESTION_WORKERS > 0:
+        _pool = JobWorkerPool(handlers, settings.INGESTION_WORKERS)
+        _pool.start()
+
+
+async def stop_workers() -> None:
+    """Stop the pool, returning in-flight jobs to the queue (app shutdown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
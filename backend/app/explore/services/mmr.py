@@ -0,0 +1,78 @@
+"""Maximal Marginal Relevance (MMR) over a retrieval shortlist.
+
+Chunks are cut with a 200-char overlap (``PDFParser.chunk_text``), so the
+hybrid search + rerank shortlist often holds several near-identical passages
+from the same page. Each one costs a ``rerank_top_n`` slot and context
+tokens without adding information. MMR picks the final set greedily,
+trading each candidate's relevance against its similarity to what has
+already been picked:
+
+    score(d) = lambda * relevance(d) - (1 - lambda) * max_{s in picked} cos(d, s)
+
+``lambda = 1`` is the plain relevance order; lower values favour diversity.
+The candidate set is small (``top_n * MMR_POOL_FACTOR`` rows), so the whole
+selection is one Gram matrix plus ``k`` vectorized argmax steps.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Cosine similarity above which two chunks count as the same passage when
+# reporting what MMR dropped; lower-similarity drops are swaps, not savings.
+NEAR_DUPLICATE_SIMILARITY: float = 0.9
+
+
+def normalize_rows(matrix: NDArray[np.float32]) -> NDArray[np.float32]:
+    """Scale each row to unit length (zero rows are left as is)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32, copy=False)
+
+
+def select(
+    embeddings: NDArray[np.float32],
+    relevance: Sequence[float],
+    k: int,
+    lambda_mult: float,
+) -> List[int]:
+    """Indices of the ``k`` rows MMR picks, in pick order.
+
+    ``embeddings`` must be unit-normalized. ``relevance`` is min-max scaled to
+    [0, 1] first so it is on the same footing as cosine similarity whatever
+    scorer produced it (rerank score, RRF score or raw similarity).
+    """
+    n = embeddings.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    rel = np.asarray(relevance, dtype=np.float32)
+    spread = float(rel.max() - rel.min())
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones_like(rel)
+
+    gram = embeddings @ embeddings.T
+    max_sim = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picked: List[int] = []
+    for _ in range(k):
+        scores = lambda_mult * rel - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(max_sim, gram[best], out=max_sim)
+    return picked
+
+
+def displaced_duplicates(
+    embeddings: NDArray[np.float32], picked: Sequence[int], baseline: int
+) -> List[int]:
+    """Rows of the plain top-``baseline`` that MMR left out because a picked
+    row already covers them (cosine >= ``NEAR_DUPLICATE_SIMILARITY``)."""
+    chosen = set(picked)
+    dropped = [i for i in range(min(baseline, embeddings.shape[0])) if i not in chosen]
+    if not dropped or not picked:
+        return []
+    closest = (embeddings[dropped] @ embeddings[list(picked)].T).max(axis=1)
+    return [i for i, sim in zip(dropped, closest) if sim >= NEAR_DUPLICATE_SIMILARITY]
@@ -0,0 +1,309 @@
+"""Lean text extraction for Office Open XML (.docx / .pptx / .xlsx).
+
+python-docx, python-pptx and openpyxl each reopen the archive and build an
+object model of the whole package (every part, every shape, every cell's
+style) when the extractors only want text. These functions take the
+``ZipFile`` ``pdf_parser`` already opened for the zip-bomb check and
+stream-parse just the XML parts that hold text with ``ElementTree.iterparse``,
+dropping each paragraph / shape / row as soon as its text is out. Peak memory
+is one such element plus, for workbooks, the shared-string table.
+
+The output is the text the library-based extractors produce, element for
+element:
+
+  * docx — top-level body paragraphs (not tables or text boxes, like
+    ``Document.paragraphs``); runs and hyperlinks, with ``w:tab`` as a tab,
+    line breaks as newlines and page/column breaks dropped.
+  * pptx — slides in presentation order; each top-level shape with a text
+    body, paragraphs joined by newlines and ``a:br`` as ``\\v``.
+  * xlsx — worksheets in workbook order, one tab-separated line per row of
+    non-empty cells, values rendered as openpyxl's ``data_only`` values are
+    (numbers, booleans, shared/inline strings, dates by number format).
+"""
+
+import posixpath
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_X = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_OFFICE_DOCUMENT = "/officeDocument"
+
+
+def _rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Tuple[str, str]]:
+    """``{rId: (type, target part)}`` for ``part`` ("" = the package)."""
+    folder, name = posixpath.split(part)
+    rels_name = posixpath.join(folder, "_rels", f"{name}.rels")
+    try:
+        root = ET.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    rels: Dict[str, Tuple[str, str]] = {}
+    for rel in root.iter(f"{_REL}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target") or ""
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(folder, target))
+        rels[rel.get("Id") or ""] = (rel.get("Type") or "", path)
+    return rels
+
+
+def _main_part(zf: zipfile.ZipFile) -> str:
+    for rel_type, path in _rels(zf, "").values():
+        if rel_type.endswith(_OFFICE_DOCUMENT):
+            return path
+    raise ValueError("Not an Office Open XML package (no main document part)")
+
+
+def _iter_children(stream: IO[bytes], parent_tag: str) -> Iterator[ET.Element]:
+    """Each complete child of the (first) ``parent_tag`` element, in order.
+
+    Children are detached as they are yielded, so only one is held at a time.
+    """
+    parent: Optional[ET.Element] = None
+    depth = 0
+    parent_depth = -1
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if parent is None and elem.tag == parent_tag:
+                parent, parent_depth = elem, depth
+            continue
+        depth -= 1
+        if parent is not None and depth == parent_depth:
+            yield elem
+            parent.clear()
+        elif elem is parent:
+            return
+
+
+# ---------------------------------------------------------------------------
+# .docx
+# ---------------------------------------------------------------------------
+
+
+def _docx_paragraph_text(p: ET.Element) -> str:
+    parts: List[str] = []
+    for child in p:
+        if child.tag == f"{_W}r":
+            runs = [child]
+        elif child.tag == f"{_W}hyperlink":
+            runs = child.findall(f"{_W}r")
+        else:
+            continue
+        for run in runs:
+            for elem in run:
+                tag = elem.tag
+                if tag == f"{_W}t":
+                    parts.append(elem.text or "")
+                elif tag in (f"{_W}tab", f"{_W}ptab"):
+                    parts.append("\t")
+                elif tag == f"{_W}cr":
+                    parts.append("\n")
+                elif tag == f"{_W}br":
+                    if elem.get(f"{_W}type", "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif tag == f"{_W}noBreakHyphen":
+                    parts.append("-")
+    return "".join(parts)
+
+
+def extract_docx(zf: zipfile.ZipFile) -> str:
+    """Top-level paragraph text of a .docx, one paragraph per line."""
+    parts: List[str] = []
+    with zf.open(_main_part(zf)) as stream:
+        for child in _iter_children(stream, f"{_W}body"):
+            if child.tag == f"{_W}p":
+                text = _docx_paragraph_text(child)
+                if text and text.strip():
+                    parts.append(text)
+    return "\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# .pptx
+# ---------------------------------------------------------------------------
+
+
+def _pptx_paragraph_text(p: ET.Element) -> str:
+    parts: List[str] = []
+    for child in p:
+        if child.tag in (f"{_A}r", f"{_A}fld"):
+            parts.append(child.findtext(f"{_A}t") or "")
+        elif child.tag == f"{_A}br":
+            parts.append("\v")
+    return "".join(parts)
+
+
+def _slide_parts(zf: zipfile.ZipFile) -> List[str]:
+    presentation = _main_part(zf)
+    rels = _rels(zf, presentation)
+    root = ET.fromstring(zf.read(presentation))
+    slides: List[str] = []
+    for slide_id in root.iter(f"{_P}sldId"):
+        rel = rels.get(slide_id.get(f"{_R}id") or "")
+        if rel is not None:
+            slides.append(rel[1])
+    return slides
+
+
+def extract_pptx(zf: zipfile.ZipFile) -> str:
+    """Text of every top-level text shape across the slides of a .pptx."""
+    parts: List[str] = []
+    for slide in _slide_parts(zf):
+        with zf.open(slide) as stream:
+            for shape in _iter_children(stream, f"{_P}spTree"):
+                if shape.tag != f"{_P}sp":
+                    continue
+                body = shape.find(f"{_P}txBody")
+                if body is None:
+                    continue
+                text = "\n".join(
+                    _pptx_paragraph_text(p) for p in body.findall(f"{_A}p")
+                )
+                if text and text.strip():
+                    parts.append(text)
+    return "\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# .xlsx
+# ---------------------------------------------------------------------------
+
+
+def _string_item_text(si: ET.Element) -> str:
+    """Plain text of a shared/inline string (``t`` and rich-text runs, not
+    phonetic ``rPh`` hints)."""
+    parts = [si.findtext(f"{_X}t") or ""]
+    parts.extend(run.findtext(f"{_X}t") or "" for run in si.findall(f"{_X}r"))
+    return "".join(parts)
+
+
+def _shared_strings(zf: zipfile.ZipFile, path: Optional[str]) -> List[str]:
+    if path is None or path not in zf.NameToInfo:
+        return []
+    with zf.open(path) as stream:
+        return [_string_item_text(si) for si in _iter_children(stream, f"{_X}sst")]
+
+
+def _date_styles(zf: zipfile.ZipFile, path: Optional[str]) -> Tuple[Set[int], Set[int]]:
+    """Indices of the cell formats (``cellXfs``) that show dates / durations."""
+    from openpyxl.styles.numbers import (
+        builtin_format_code,
+        is_date_format,
+        is_timedelta_format,
+    )
+
+    if path is None or path not in zf.NameToInfo:
+        return set(), set()
+    root = ET.fromstring(zf.read(path))
+    custom = {
+        int(fmt.get("numFmtId") or 0): fmt.get("formatCode") or ""
+        for fmt in root.iter(f"{_X}numFmt")
+    }
+    dates: Set[int] = set()
+    durations: Set[int] = set()
+    cell_xfs = root.find(f"{_X}cellXfs")
+    for index, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt_id = int(xf.get("numFmtId") or 0)
+        code = custom.get(fmt_id) or builtin_format_code(fmt_id)
+        if code and is_date_format(code):
+            dates.add(index)
+        if code and is_timedelta_format(code):
+            durations.add(index)
+    return dates, durations
+
+
+class _CellReader:
+    """Renders ``<c>`` elements as openpyxl's read-only ``data_only`` values."""
+
+    def __init__(
+        self,
+        shared: List[str],
+        dates: Set[int],
+        durations: Set[int],
+        epoch: object,
+    ) -> None:
+        self.shared = shared
+        self.dates = dates
+        self.durations = durations
+        self.epoch = epoch
+
+    def value(self, cell: ET.Element) -> object:
+        from openpyxl.utils.datetime import from_excel, from_ISO8601
+
+        data_type = cell.get("t", "n")
+        if data_type == "inlineStr":
+            inline = cell.find(f"{_X}is")
+            return _string_item_text(inline) if inline is not None else None
+        value = cell.findtext(f"{_X}v") or None
+        if value is None:
+            return None
+        if data_type == "n":
+            number = (
+                float(value)
+                if "." in value or "E" in value or "e" in value
+                else int(value)
+            )
+            style = int(cell.get("s") or 0)
+            if style in self.dates:
+                try:
+                    return from_excel(
+                        number, self.epoch, timedelta=style in self.durations
+                    )
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == "s":
+            return self.shared[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return value
+
+
+def extract_xlsx(zf: zipfile.ZipFile) -> str:
+    """Cell values of every worksheet of a .xlsx, one TSV line per row."""
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+
+    workbook = _main_part(zf)
+    rels = _rels(zf, workbook)
+    root = ET.fromstring(zf.read(workbook))
+    properties = root.find(f"{_X}workbookPr")
+    date1904 = properties is not None and properties.get("date1904") in ("1", "true")
+
+    def _related(suffix: str) -> Optional[str]:
+        return next(
+            (path for kind, path in rels.values() if kind.endswith(suffix)), None
+        )
+
+    dates, durations = _date_styles(zf, _related("/styles"))
+    reader = _CellReader(
+        _shared_strings(zf, _related("/sharedStrings")),
+        dates,
+        durations,
+        CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900,
+    )
+
+    parts: List[str] = []
+    for sheet in root.iter(f"{_X}sheet"):
+        rel = rels.get(sheet.get(f"{_R}id") or "")
+        if rel is None or not rel[0].endswith("/worksheet"):
+            continue
+        with zf.open(rel[1]) as stream:
+            for row in _iter_children(stream, f"{_X}sheetData"):
+                values = (reader.value(cell) for cell in row.iter(f"{_X}c"))
+                cells = [str(value) for value in values if value is not None]
+                if cells:
+                    parts.append("\t".join(cells))
+    return "\n".join(parts)
@@ -1,10 +1,34 @@
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Dict, Any, Optional, Union
 from pypdf import PdfReader
 from fastapi import HTTPException
 import io
 import os
 import zipfile
 
+from app.explore.core.config import settings
+from app.explore.services import chunking, office_xml
+
+
+# What the extractors read: the document's bytes, or the path of a file holding
+# them (a spooled upload, see core/uploads.py) — parsed in place, and cheap to
+# send to an extraction worker process.
+DocumentSource = Union[bytes, str]
+
+
+@contextmanager
+def open_source(source: DocumentSource) -> Iterator[BinaryIO]:
+    """A seekable binary file over ``source`` (no copy of in-memory bytes)."""
+    if isinstance(source, bytes):
+        yield io.BytesIO(source)
+    else:
+        with open(source, "rb") as f:
+            yield f
+
+
+def _source_size(source: DocumentSource) -> int:
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
 
 # Plain-text / markup formats whose bytes can be decoded directly as UTF-8.
 _PLAINTEXT_EXTENSIONS = {".txt", ".md"}
@@ -33,6 +57,7 @@ _DOCX_EXTENSIONS = {".docx"}
 _PPTX_EXTENSIONS = {".pptx"}
 _XLSX_EXTENSIONS = {".xlsx"}
 _PDF_EXTENSIONS = {".pdf"}
+_OFFICE_EXTENSIONS = _DOCX_EXTENSIONS | _PPTX_EXTENSIONS | _XLSX_EXTENSIONS
 
 # Every extension the dispatcher can turn into plain text. Anything else
 # (images, archives, audio, ...) is "not indexable" — not an error.
@@ -45,7 +70,7 @@ SUPPORTED_EXTENSIONS = (
 )
 
 
-def _check_zip_bomb(file_bytes: bytes) -> None:
+def _check_zip_bomb(source: DocumentSource) -> None:
     """Inspect a zip archive's Central Directory for zip-bomb signatures.
 
     Reads only metadata (no decompression) and raises ``HTTPException(400)``
@@ -63,11 +88,15 @@ def _check_zip_bomb(file_bytes: bytes) -> None:
     downstream Office parser produce its own error.
     """
     try:
-        with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf:
+        with open_source(source) as f, zipfile.ZipFile(f) as zf:
             members = zf.infolist()
     except zipfile.BadZipFile:
         return
+    _check_zip_members(members, _source_size(source))
 
+
+def _check_zip_members(members: List[zipfile.ZipInfo], archive_size: int) -> None:
+    """The ``_check_zip_bomb`` limits, for an archive that is already open."""
     if len(members) > _ZIP_MAX_MEMBER_COUNT:
         raise HTTPException(
             status_code=400,
@@ -88,7 +117,6 @@ def _check_zip_bomb(file_bytes: bytes) -> None:
             ),
         )
 
-    archive_size = len(file_bytes)
     if archive_size > 0 and total_uncompressed > archive_size * _ZIP_MAX_RATIO:
         ratio = total_uncompressed / archive_size
         raise HTTPException(
@@ -110,38 +138,61 @@ def is_extractable(filename: str) -> bool:
     return _file_extension(filename) in SUPPORTED_EXTENSIONS
 
 
-def _extract_plaintext(file_bytes: bytes) -> str:
+def _extract_plaintext(source: DocumentSource) -> str:
     """Decode raw text/markdown bytes as UTF-8 (replacing undecodable bytes)."""
-    return file_bytes.decode("utf-8", errors="replace")
+    if isinstance(source, bytes):
+        return source.decode("utf-8", errors="replace")
+    with open(source, encoding="utf-8", errors="replace") as f:
+        return f.read()
 
 
-def _extract_pdf(file_bytes: bytes) -> str:
+def _extract_pdf(source: DocumentSource) -> str:
     """Concatenate the text of every PDF page into a single string."""
-    reader = PdfReader(io.BytesIO(file_bytes))
     parts: List[str] = []
-    for page in reader.pages:
-        text = page.extract_text()
-        if text and text.strip():
-            parts.append(text)
+    with open_source(source) as f:
+        for page in PdfReader(f).pages:
+            text = page.extract_text()
+            if text and text.strip():
+                parts.append(text)
     return "\n\n".join(parts)
 
 
-def _extract_docx(file_bytes: bytes) -> str:
+def _extract_office(source: DocumentSource, ext: str) -> str:
+    """Extract a .docx / .pptx / .xlsx with the lean XML engine
+    (``services/office_xml.py``): the archive is opened once, for both the
+    zip-bomb limits and the text parts."""
+    with open_source(source) as f:
+        try:
+            zf = zipfile.ZipFile(f)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"Not a valid {ext} file: {e}")
+        with zf:
+            _check_zip_members(zf.infolist(), _source_size(source))
+            if ext in _DOCX_EXTENSIONS:
+                return office_xml.extract_docx(zf)
+            if ext in _PPTX_EXTENSIONS:
+                return office_xml.extract_pptx(zf)
+            return office_xml.extract_xlsx(zf)
+
+
+def _extract_docx(source: DocumentSource) -> str:
     """Extract paragraph text from a .docx (Word) document."""
-    _check_zip_bomb(file_bytes)
+    _check_zip_bomb(source)
     from docx import Document
 
-    document = Document(io.BytesIO(file_bytes))
+    with open_source(source) as f:
+        document = Document(f)
     parts = [p.text for p in document.paragraphs if p.text and p.text.strip()]
     return "\n".join(parts)
 
 
-def _extract_pptx(file_bytes: bytes) -> str:
+def _extract_pptx(source: DocumentSource) -> str:
     """Extract text from every shape across all slides of a .pptx deck."""
-    _check_zip_bomb(file_bytes)
+    _check_zip_bomb(source)
     from pptx import Presentation
 
-    presentation = Presentation(io.BytesIO(file_bytes))
+    with open_source(source) as f:
+        presentation = Presentation(f)
     parts: List[str] = []
     for slide in presentation.slides:
         for shape in slide.shapes:
@@ -155,24 +206,26 @@ def _extract_pptx(file_bytes: bytes) -> str:
     return "\n".join(parts)
 
 
-def _extract_xlsx(file_bytes: bytes) -> str:
+def _extract_xlsx(source: DocumentSource) -> str:
     """Extract cell values from every sheet of a .xlsx workbook as TSV rows."""
-    _check_zip_bomb(file_bytes)
+    _check_zip_bomb(source)
     from openpyxl import load_workbook
 
-    workbook = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
     parts: List[str] = []
-    for sheet in workbook.worksheets:
-        for row in sheet.iter_rows(values_only=True):
-            cells = [str(c) for c in row if c is not None]
-            if cells:
-                parts.append("\t".join(cells))
-    workbook.close()
+    with open_source(source) as f:
+        # read_only streams rows from the open file, so keep it open until done.
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        for sheet in workbook.worksheets:
+            for row in sheet.iter_rows(values_only=True):
+                cells = [str(c) for c in row if c is not None]
+                if cells:
+                    parts.append("\t".join(cells))
+        workbook.close()
     return "\n".join(parts)
 
 
-def extract_text(file_bytes: bytes, filename: str) -> Optional[str]:
-    """Extract plain text from ``file_bytes`` based on ``filename``'s extension.
+def extract_text(source: DocumentSource, filename: str) -> Optional[str]:
+    """Extract plain text from ``source`` based on ``filename``'s extension.
 
     Dispatches to the right extractor for PDF, .txt, .md, .docx, .pptx and
     .xlsx. Returns ``None`` for any unsupported/binary type (images, archives,
@@ -181,69 +234,107 @@ def extract_text(file_bytes: bytes, filename: str) -> Optional[str]:
     """
     ext = _file_extension(filename)
     if ext in _PLAINTEXT_EXTENSIONS:
-        return _extract_plaintext(file_bytes)
+        return _extract_plaintext(source)
     if ext in _PDF_EXTENSIONS:
-        return _extract_pdf(file_bytes)
+        return _extract_pdf(source)
+    if settings.OFFICE_XML_EXTRACTION and ext in _OFFICE_EXTENSIONS:
+        return _extract_office(source, ext)
     if ext in _DOCX_EXTENSIONS:
-        return _extract_docx(file_bytes)
+        return _extract_docx(source)
     if ext in _PPTX_EXTENSIONS:
-        return _extract_pptx(file_bytes)
+        return _extract_pptx(source)
     if ext in _XLSX_EXTENSIONS:
-        return _extract_xlsx(file_bytes)
+        return _extract_xlsx(source)
     return None
 
 
 class PDFParser:
     """Service for extracting text and metadata from PDF files."""
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        unit: Optional[str] = None,
+    ):
+        """Chunks are measured in ``unit`` ("chars" or "tokens", default
+        ``settings.CHUNK_UNIT``); sizes default to 1000/200 characters or
+        ``CHUNK_TOKENS`` / ``CHUNK_OVERLAP_TOKENS`` tokens. Token units raise
+        ``ValueError`` here if the embedding model's tokenizer can't be
+        loaded, rather than chunking by a character estimate."""
+        self.unit = unit or settings.CHUNK_UNIT
+        if self.unit not in ("chars", "tokens"):
+            raise ValueError(f"Unknown chunk unit: {self.unit}")
+        tokens = self.unit == "tokens"
+        if chunk_size is None:
+            chunk_size = settings.CHUNK_TOKENS if tokens else 1000
+        if chunk_overlap is None:
+            chunk_overlap = settings.CHUNK_OVERLAP_TOKENS if tokens else 200
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        if tokens:
+            self._splitter()
 
     def extract_text_with_metadata(
-        self, file_bytes: bytes, filename: str
+        self, source: DocumentSource, filename: str
     ) -> List[Dict[str, Any]]:
         """Extract text from a PDF file with page-level metadata."""
+        return self.extract_page_window(source, filename)["pages"]
+
+    def extract_page_window(
+        self,
+        source: DocumentSource,
+        filename: str,
+        start: int = 0,
+        count: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Extract ``count`` pages (all by default) from index ``start``.
+
+        Returns ``{"pages": [...], "total_pages": n}``, pages as
+        ``extract_text_with_metadata`` gives them (blank pages skipped), so a
+        caller can walk a large PDF a window at a time.
+        """
         pages_data = []
 
         try:
-            pdf_reader = PdfReader(io.BytesIO(file_bytes))
-            total_pages = len(pdf_reader.pages)
-
-            for page_num, page in enumerate(pdf_reader.pages, start=1):
-                text = page.extract_text()
-
-                if text and text.strip():
-                    pages_data.append(
-                        {
-                            "content": self._clean_text(text),
-                            "metadata": {
-                                "filename": filename,
-                                "page_number": page_num,
-                                "total_pages": total_pages,
-                                "file_type": "pdf",
-                            },
-                        }
-                    )
+            with open_source(source) as f:
+                pdf_reader = PdfReader(f)
+                total_pages = len(pdf_reader.pages)
+                stop = total_pages if count is None else min(total_pages, start + count)
+
+                for index in range(start, stop):
+                    text = pdf_reader.pages[index].extract_text()
+
+                    if text and text.strip():
+                        pages_data.append(
+                            {
+                                "content": self._clean_text(text),
+                                "metadata": {
+                                    "filename": filename,
+                                    "page_number": index + 1,
+                                    "total_pages": total_pages,
+                                    "file_type": "pdf",
+                                },
+                            }
+                        )
 
         except Exception as e:
             raise ValueError(f"Failed to parse PDF: {str(e)}")
 
-        return pages_data
+        return {"pages": pages_data, "total_pages": total_pages}
 
     def chunk_text(self, text: str) -> List[str]:
         """Split text into overlapping chunks for embedding."""
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        chunks = self._splitter().split(text)
+        return [chunk.strip() for chunk in chunks if chunk.strip()]
 
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""],
-        )
+    def measure(self, text: str) -> int:
+        """Size of ``text`` in this parser's chunk unit."""
+        return self._splitter().length(text)
 
-        chunks = splitter.split_text(text)
-        return [chunk.strip() for chunk in chunks if chunk.strip()]
+    def _splitter(self) -> chunking.RecursiveSplitter:
+        model = settings.embedding_model if self.unit == "tokens" else None
+        return chunking.splitter_for(self.chunk_size, self.chunk_overlap, model)
 
     def chunk_pages(self, pages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Chunk extracted page data into smaller pieces for embedding."""
@@ -269,6 +360,25 @@ class PDFParser:
 
         return chunked_data
 
+    def chunk_document(self, pages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chunk a whole document's pages in one pass, in page order.
+
+        Pages longer than ``chunk_size`` are split as ``chunk_text`` would
+        split them alone, each chunk keeping its page's metadata plus
+        ``chunk_index`` / ``total_chunks`` within the page (what
+        ``RAGService.store_document`` records per page). Runs of consecutive
+        shorter pages are packed into one chunk while they fit in
+        ``chunk_size``, tagged with the first page's metadata and
+        ``page_end`` (the last page) — a deck of one-line slides becomes a
+        few useful chunks instead of one fragment per slide.
+        """
+        chunker = DocumentChunker(self)
+        chunked: List[Dict[str, Any]] = []
+        for page in pages_data:
+            chunked.extend(chunker.add(page))
+        chunked.extend(chunker.finish())
+        return chunked
+
     def _clean_text(self, text: str) -> str:
         """Clean extracted text by normalizing whitespace."""
         lines = text.split("\n")
@@ -280,3 +390,62 @@ class PDFParser:
                 cleaned_lines.append(cleaned_line)
 
         return "\n".join(cleaned_lines)
+
+
+class DocumentChunker:
+    """``PDFParser.chunk_document`` one page at a time, for pages that arrive
+    incrementally (``services/pipeline.py``): ``add`` returns the chunks
+    each page completes and ``finish`` the rest. Only the current run of
+    short pages is buffered."""
+
+    def __init__(self, parser: PDFParser):
+        self.parser = parser
+        self._run: List[Dict[str, Any]] = []
+        self._run_length = 0
+        # Size of the "\n\n" joining pages in a run.
+        self._joiner = parser.measure("\n\n")
+
+    def add(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        content = page["content"].strip()
+        if not content:
+            return []
+        length = self.parser.measure(content)
+        if length > self.parser.chunk_size:
+            return self.finish() + self._split(page)
+        chunked: List[Dict[str, Any]] = []
+        joiner = self._joiner
+        if self._run and self._run_length + joiner + length > self.parser.chunk_size:
+            chunked = self.finish()
+        self._run_length += length + (joiner if self._run else 0)
+        self._run.append(page)
+        return chunked
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Flush the buffered run of short pages."""
+        run, self._run, self._run_length = self._run, [], 0
+        if len(run) == 1:
+            return self._split(run[0])
+        if not run:
+            return []
+        metadata = dict(run[0]["metadata"])
+        metadata["page_end"] = run[-1]["metadata"].get("page_number")
+        return [
+            {
+                "content": "\n\n".join(p["content"].strip() for p in run),
+                "metadata": {**metadata, "chunk_index": 0, "total_chunks": 1},
+            }
+        ]
+
+    def _split(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        chunks = self.parser.chunk_text(page["content"])
+        return [
+            {
+                "content": chunk,
+                "metadata": {
+                    **page["metadata"],
+                    "chunk_index": chunk_idx,
+                    "total_chunks": len(chunks),
+                },
+            }
+            for chunk_idx, chunk in enumerate(chunks)
+        ]
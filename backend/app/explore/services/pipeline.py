@@ -0,0 +1,143 @@
+"""Streaming ingestion: extract, chunk, embed and insert as overlapping stages.
+
+The staged path (``RAGService.store_pages``) holds the whole document at
+every step: all pages, then all chunks, then all embeddings, then all rows.
+``store_stream`` runs three tasks joined by bounded queues instead:
+
+  1. produce — pull pages from an async source (``pdf_pages`` extracts a PDF
+     ``INGESTION_PAGE_WINDOW`` pages at a time in the extraction pool), chunk
+     them with a ``DocumentChunker`` and queue batches of
+     ``EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY`` chunks;
+  2. embed — ``RAGService.embed_chunks`` one batch at a time (itself split
+     into concurrent requests);
+  3. insert — ``RAGService.insert_chunks``.
+
+Each queue holds at most ``INGESTION_PIPELINE_DEPTH`` batches, so a slow
+stage stalls the ones before it and memory stays bounded by a page window
+plus a few batches, however long the document. Extraction of the next window
+overlaps embedding, which overlaps inserting. Chunks, metadata and row order
+are the same as ``store_pages`` produces.
+
+Progress (``stage="streaming"``, ``pages_done`` / ``pages_total``,
+``chunks_embedded``, ``chunks_stored``) goes to the job-status reporter after
+every batch. A failing stage cancels the others; rows already inserted stay,
+as with a failed ``store_chunks``.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.explore.core.config import settings
+from app.explore.services import extraction
+from app.explore.services.jobs import Progress
+from app.explore.services.pdf_parser import (
+    DocumentChunker,
+    DocumentSource,
+    PDFParser,
+)
+from app.explore.services.rag_service import RAGService
+
+Chunk = Dict[str, Any]
+
+
+async def pdf_pages(
+    parser: PDFParser, source: DocumentSource, filename: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """A PDF's non-blank pages, extracted a window at a time (pass a spooled
+    upload's path rather than its bytes: each window re-sends ``source`` to
+    the extraction worker)."""
+    window = max(1, settings.INGESTION_PAGE_WINDOW)
+    start = 0
+    while True:
+        result = await extraction.run(
+            parser.extract_page_window, source, filename, start, window
+        )
+        for page in result["pages"]:
+            yield page
+        start += window
+        if start >= result["total_pages"]:
+            return
+
+
+async def iter_pages(pages: Iterable[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Already-extracted pages (e.g. an upload job's payload) as a source."""
+    for page in pages:
+        yield page
+
+
+async def store_stream(
+    rag_service: RAGService,
+    pages: AsyncIterator[Dict[str, Any]],
+    client_id: str,
+    project_id: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    progress: Optional[Progress] = None,
+) -> List[int]:
+    """Chunk, embed and store ``pages`` as one document, streaming; same
+    result as ``RAGService.store_pages``. Returns the new row ids."""
+    batch_size = settings.EMBEDDING_BATCH_SIZE * max(1, settings.EMBEDDING_CONCURRENCY)
+    depth = max(1, settings.INGESTION_PIPELINE_DEPTH)
+    to_embed: asyncio.Queue[Optional[List[Chunk]]] = asyncio.Queue(depth)
+    to_insert: asyncio.Queue[Optional[Tuple[List[Chunk], List[List[float]]]]] = (
+        asyncio.Queue(depth)
+    )
+    state: Dict[str, Any] = {
+        "stage": "streaming",
+        "pages_done": 0,
+        "pages_total": None,
+        "chunks_embedded": 0,
+        "chunks_stored": 0,
+    }
+    document_ids: List[int] = []
+
+    async def _report() -> None:
+        if progress is not None:
+            await progress(dict(state))
+
+    async def _produce() -> None:
+        chunker = DocumentChunker(rag_service.pdf_parser)
+        pending: List[Chunk] = []
+        async for page in pages:
+            state["pages_done"] += 1
+            state["pages_total"] = page["metadata"].get("total_pages")
+            pending.extend(chunker.add(page))
+            while len(pending) >= batch_size:
+                await to_embed.put(pending[:batch_size])
+                pending = pending[batch_size:]
+        pending.extend(chunker.finish())
+        for start in range(0, len(pending), batch_size):
+            await to_embed.put(pending[start : start + batch_size])
+        await to_embed.put(None)
+
+    async def _embed() -> None:
+        while (batch := await to_embed.get()) is not None:
+            vectors = await rag_service.embed_chunks([c["content"] for c in batch])
+            state["chunks_embedded"] += len(batch)
+            await to_insert.put((batch, vectors))
+            await _report()
+        await to_insert.put(None)
+
+    async def _insert() -> None:
+        while (item := await to_insert.get()) is not None:
+            batch, vectors = item
+            document_ids.extend(
+                await rag_service.insert_chunks(
+                    [c["content"] for c in batch],
+                    [{**c["metadata"], **(metadata or {})} for c in batch],
+                    vectors,
+                    client_id=client_id,
+                    project_id=project_id,
+                )
+            )
+            state["chunks_stored"] += len(batch)
+            await _report()
+
+    tasks = [asyncio.ensure_future(stage()) for stage in (_produce, _embed, _insert)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A stage that died leaves the others blocked on its queue.
+        for task in tasks:
+            task.cancel()
+        raise
+    return document_ids
@@ -1,13 +1,26 @@
 import asyncio
+import hashlib
+import json
 import logging
 import re
-from typing import List, Dict, Any, Optional
-import httpx
+import time
+from array import array
+from typing import List, Dict, Any, Hashable, Optional, Tuple
+import numpy as np
+from numpy.typing import NDArray
 from openai import AsyncOpenAI
+from app.explore.core import metrics
 from app.explore.core.config import settings
+from app.explore.core.http import get_http_client
+from app.explore.db import direct
 from app.explore.db.supabase import supabase
+from app.explore.db.pool import run_query
 from app.explore.db.rows import json_rows
+from app.explore.services import corpus, embedding_cache, mmr, tokens
+from app.explore.services.cache import TTLCache
+from app.explore.services.embedding_cache import chunk_hash
 from app.explore.services.pdf_parser import PDFParser
+from app.explore.services.vector_cache import ProjectVectorCache, parse_vector
 
 logger = logging.getLogger(__name__)
 
@@ -38,12 +51,71 @@ MIN_VECTOR_SIMILARITY: float = 0.25
 # the timeout while keeping round-trips low.
 INSERT_BATCH_SIZE: int = 100
 
+# Reciprocal Rank Fusion constant: a doc at (1-based) rank r in a leg scores
+# weight / (RRF_K + r). 60 is the standard value from the RRF paper and is
+# passed to hybrid_search_client_knowledge so both fusion paths agree.
+RRF_K: int = 60
+
+# Query embeddings, keyed on (model, dimensions, whitespace-normalized query).
+# Agents re-issue the same search_documents query across tool iterations, turns
+# and users of a project; a hit skips a paid 150-400 ms OpenRouter round-trip.
+# Shared by every RAGService instance in the worker. Vectors are held as packed
+# float64 arrays (~12 KB each at 1536 dims) rather than lists of float objects.
+_query_embedding_cache: TTLCache[array] = TTLCache(
+    maxsize=settings.EMBEDDING_CACHE_SIZE,
+    ttl=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    single_flight=settings.EMBEDDING_CACHE_SINGLE_FLIGHT,
+)
+
+# Rerank results, keyed on (model, query hash, sorted candidate (id, content
+# hash) pairs, top_n) -> [((id, content hash), relevance_score), ...] in
+# reranked order. Follow-up turns and repeated tool calls re-rank the same
+# candidate set; a hit skips a 300-800 ms cross-encoder call.
+_rerank_cache: TTLCache[List[Tuple[Tuple[str, str], Any]]] = TTLCache(
+    maxsize=settings.RERANK_CACHE_SIZE,
+    ttl=settings.RERANK_CACHE_TTL_SECONDS,
+    single_flight=False,
+)
+
+# Final retrieve_relevant results (post-rerank), keyed on scope + query +
+# corpus generations (see _retrieval_cache_key). A hit skips the whole
+# retrieval stage: embedding, both search legs and the reranker. Writes on
+# this worker take effect immediately via the generation counters; the TTL
+# bounds staleness from writes on other workers.
+_retrieval_cache: TTLCache[List[Dict[str, Any]]] = TTLCache(
+    maxsize=settings.RETRIEVAL_CACHE_SIZE,
+    ttl=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+    single_flight=False,
+)
+
+# Exact in-memory search for project-scoped vector queries (see
+# services/vector_cache.py). A zero byte budget when disabled makes every
+# search fall through to match_client_knowledge.
+_vector_cache = ProjectVectorCache(
+    max_bytes=settings.VECTOR_CACHE_MAX_BYTES if settings.VECTOR_CACHE_ENABLED else 0,
+    max_rows=settings.VECTOR_CACHE_MAX_ROWS,
+    ttl=settings.VECTOR_CACHE_TTL_SECONDS,
+    dimensions=settings.read_embedding_dimensions,
+    mmap_dir=settings.VECTOR_CACHE_DIR,
+    column=settings.read_embedding_column,
+    model=settings.read_embedding_model,
+)
+
+metrics.register("embedding_cache", _query_embedding_cache.stats)
+metrics.register("rerank_cache", _rerank_cache.stats)
+metrics.register("retrieval_cache", _retrieval_cache.stats)
+metrics.register("vector_cache", _vector_cache.stats)
+
 # Canonical 8-4-4-4-12 UUID, as issued by Supabase auth.
 _UUID_RE = re.compile(
     r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}",
     re.IGNORECASE,
 )
 
+# Section headers of the prompt context (build_context_string / pack_context).
+_ATTACHMENTS_HEADER = "=== Session Attachments ===\n"
+_DOCUMENTS_HEADER = "\n=== Retrieved Documents ===\n"
+
 
 class RAGService:
     """Service for embedding generation, vector storage, and hybrid search."""
@@ -55,20 +127,92 @@ class RAGService:
         self.pdf_parser = PDFParser()
 
     async def generate_embedding(self, text: str) -> List[float]:
-        """Generate an embedding vector for the given text."""
+        """Generate an embedding vector for the given query text.
+
+        Results are cached per worker (see ``_query_embedding_cache``). The key
+        and the text actually embedded are both whitespace-normalized, so
+        "roof  R-value" and "roof R-value" share one entry; case is preserved
+        because it can change the embedding.
+        """
+        normalized = " ".join(text.split())
+        key = self._embedding_cache_key(normalized)
+
+        async def _load() -> array:
+            return array("d", await self._embed_query(normalized))
+
+        return (await _query_embedding_cache.get_or_load(key, _load)).tolist()
+
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several query texts with at most ONE embeddings request.
+
+        Same normalization and cache as ``generate_embedding``: cached texts
+        are served from ``_query_embedding_cache``, and the distinct misses
+        go out as a single list-input call whose results are then cached.
+        Raises ``ValueError`` if that call fails.
+        """
+        normalized = [" ".join(text.split()) for text in texts]
+        found: Dict[str, array] = {}
+        for text in dict.fromkeys(normalized):
+            cached = _query_embedding_cache.get(self._embedding_cache_key(text))
+            if cached is not None:
+                found[text] = cached
+        missing = [text for text in dict.fromkeys(normalized) if text not in found]
+        if missing:
+            for text, embedding in zip(missing, await self._embed_queries(missing)):
+                packed = array("d", embedding)
+                _query_embedding_cache.set(self._embedding_cache_key(text), packed)
+                found[text] = packed
+        return [found[text].tolist() for text in normalized]
+
+    @staticmethod
+    def _embedding_cache_key(normalized: str) -> Hashable:
+        return (
+            settings.read_embedding_model,
+            settings.read_embedding_dimensions,
+            normalized,
+        )
+
+    async def _embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Call the embeddings API once for several texts (uncached).
+        ``result.data`` is ordered by input index."""
         try:
             params: Dict[str, Any] = {
-                "model": settings.embedding_model,
+                "model": settings.read_embedding_model,
+                "input": texts,
+            }
+            if settings.read_embedding_dimensions:
+                params["dimensions"] = settings.read_embedding_dimensions
+
+            result = await self.client.embeddings.create(**params)
+            if not result.data or len(result.data) != len(texts):
+                raise ValueError(
+                    f"Embeddings API returned {len(result.data or [])} results "
+                    f"for {len(texts)} queries"
+                )
+            logger.info(
+                f"Generated {len(texts)} embeddings in one request: "
+                f"model={settings.read_embedding_model}"
+            )
+            return [list(item.embedding) for item in result.data]
+        except Exception as e:
+            logger.error(f"Batch query embedding failed: {e}")
+            raise ValueError(f"Failed to generate embeddings: {str(e)}")
+
+    async def _embed_query(self, text: str) -> List[float]:
+        """Call the embeddings API for a single text (uncached)."""
+        try:
+            params: Dict[str, Any] = {
+                "model": settings.read_embedding_model,
                 "input": text,
             }
-            if settings.embedding_dimensions:
-                params["dimensions"] = settings.embedding_dimensions
+            if settings.read_embedding_dimensions:
+                params["dimensions"] = settings.read_embedding_dimensions
 
             result = await self.client.embeddings.create(**params)
             if result.data:
                 embedding = list(result.data[0].embedding)
                 logger.info(
-                    f"Generated embedding: model={settings.embedding_model}, dims={len(embedding)}"
+                    f"Generated embedding: model={settings.read_embedding_model}, dims={len(embedding)}"
                 )
                 return embedding
             raise ValueError("No embeddings returned from API")
@@ -98,63 +242,176 @@ class RAGService:
         callers.
         """
         chunks = self.pdf_parser.chunk_text(content)
+        return await self.store_chunks(
+            chunks,
+            [
+                {**metadata, "chunk_index": i, "total_chunks": len(chunks)}
+                for i in range(len(chunks))
+            ],
+            client_id=client_id,
+            project_id=project_id,
+            storage_path=storage_path,
+            source=source,
+        )
+
+    async def store_pages(
+        self,
+        pages: List[Dict[str, Any]],
+        client_id: str,
+        project_id: Optional[int] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> List[int]:
+        """Chunk, embed, and store a whole extracted document in one pass.
+
+        ``pages`` is ``PDFParser`` page output. All pages are chunked together
+        (``PDFParser.chunk_document``: per-page metadata such as
+        ``page_number`` is kept, short pages are packed together), embedded
+        in shared sub-batches and inserted in ``INSERT_BATCH_SIZE`` groups,
+        rather than one ``store_document`` call (an embeddings request and an
+        INSERT at least) per page. ``metadata`` is added to every chunk.
+        """
+        chunks = self.pdf_parser.chunk_document(pages)
+        return await self.store_chunks(
+            [chunk["content"] for chunk in chunks],
+            [{**chunk["metadata"], **(metadata or {})} for chunk in chunks],
+            client_id=client_id,
+            project_id=project_id,
+        )
+
+    async def store_chunks(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        client_id: str,
+        project_id: Optional[int] = None,
+        storage_path: Optional[str] = None,
+        source: str = "manual",
+    ) -> List[int]:
+        """Embed ``chunks`` and insert them, ``chunks[i]`` with
+        ``metadatas[i]`` plus its ``chunk_hash`` (which an incremental
+        re-index matches unchanged chunks by). Returns the new row ids."""
         if not chunks:
             return []
+        embeddings = await self.embed_chunks(chunks)
+        return await self.insert_chunks(
+            chunks,
+            metadatas,
+            embeddings,
+            client_id=client_id,
+            project_id=project_id,
+            storage_path=storage_path,
+            source=source,
+        )
 
-        # Batch-embed all chunks in a single API call (one round-trip instead of N).
-        # The OpenAI embeddings API accepts a list for `input`; result.data is
-        # returned sorted by index, so result.data[i] always corresponds to chunks[i].
+    async def embed_chunks(
+        self,
+        chunks: List[str],
+        model: Optional[str] = None,
+        dimensions: Optional[int] = None,
+    ) -> List[List[float]]:
+        """The first half of ``store_chunks``: ``result[i]`` embeds
+        ``chunks[i]`` with ``model`` (default ``embedding_model``). Raises
+        ``ValueError`` if embedding fails."""
+        # Cached (services/embedding_cache.py), then sub-batched, concurrent
+        # embedding (services/embedding_batches.py); embeddings[i] always
+        # corresponds to chunks[i].
         try:
-            params: Dict[str, Any] = {
-                "model": settings.embedding_model,
-                "input": chunks,
-            }
-            if settings.embedding_dimensions:
-                params["dimensions"] = settings.embedding_dimensions
-
-            emb_result = await self.client.embeddings.create(**params)
+            embeddings = await embedding_cache.embed_texts(
+                self.client, chunks, model=model, dimensions=dimensions
+            )
         except Exception as e:
             logger.error(f"Batch embedding generation failed: {e}")
             raise ValueError(f"Failed to generate embeddings: {str(e)}")
 
-        if not emb_result.data or len(emb_result.data) != len(chunks):
-            raise ValueError(
-                f"Embeddings API returned {len(emb_result.data) if emb_result.data else 0} "
-                f"results for {len(chunks)} chunks"
-            )
-
         logger.info(
             f"Batch-embedded {len(chunks)} chunks "
-            f"(model={settings.embedding_model}, dims={len(emb_result.data[0].embedding)})"
+            f"(model={model or settings.embedding_model}, dims={len(embeddings[0])})"
         )
+        return embeddings
+
+    async def embed_next(self, chunks: List[str]) -> Optional[List[List[float]]]:
+        """Dual-write half of an online re-embed (app/explore/reembed.py):
+        ``chunks`` embedded with ``EMBEDDING_NEXT_MODEL`` for
+        ``embedding_next``, or None when no migration is running.
+
+        Until reads have flipped (``EMBEDDING_READ_NEXT``) a failure only
+        logs: the rows keep a NULL ``embedding_next`` and the reembed tool
+        fills them. After the flip it raises like ``embed_chunks``.
+        """
+        model = settings.EMBEDDING_NEXT_MODEL
+        if model is None or not chunks:
+            return None
+        try:
+            return await self.embed_chunks(
+                chunks, model, settings.embedding_next_dimensions
+            )
+        except ValueError as e:
+            if settings.EMBEDDING_READ_NEXT:
+                raise
+            metrics.incr("reembed.dual_write_failures")
+            logger.warning(f"Dual-write embedding with {model} failed: {e}")
+            return None
 
+    async def insert_chunks(
+        self,
+        chunks: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: List[List[float]],
+        client_id: str,
+        project_id: Optional[int] = None,
+        storage_path: Optional[str] = None,
+        source: str = "manual",
+    ) -> List[int]:
+        """The second half of ``store_chunks``: insert already-embedded
+        chunks (and, during a re-embed, their ``embed_next`` vectors).
+        Returns the new row ids."""
+        next_embeddings = await self.embed_next(chunks)
         # Build all rows, preserving chunk order.
         rows = [
             {
                 "uid": client_id,
                 "project_id": project_id,
                 "content": chunk,
-                "metadata": {**metadata, "chunk_index": i, "total_chunks": len(chunks)},
-                "embedding": list(emb_result.data[i].embedding),
+                "metadata": {**metadatas[i], "chunk_hash": chunk_hash(chunk)},
+                "embedding": embeddings[i],
                 "storage_path": storage_path,
                 "source": source,
             }
             for i, chunk in enumerate(chunks)
         ]
+        if next_embeddings is not None:
+            for row, embedding in zip(rows, next_embeddings):
+                row["embedding_next"] = embedding
 
         # Batched bulk insert (see INSERT_BATCH_SIZE). A mid-batch failure can
         # leave a partial document behind, but both index paths delete by
         # (project_id, storage_path) / dedupe by content hash before storing,
         # so a retry self-heals rather than duplicating.
         document_ids: List[int] = []
-        for start in range(0, len(rows), INSERT_BATCH_SIZE):
-            batch = rows[start : start + INSERT_BATCH_SIZE]
-            insert_result = supabase.table("client_knowledge").insert(batch).execute()
-            insert_rows = json_rows(insert_result.data)
-            if insert_rows:
-                document_ids.extend(
-                    int(row["id"]) for row in insert_rows if row.get("id") is not None
+        try:
+            if direct.enabled():
+                # One binary COPY for the whole document (db/direct.py). It is
+                # all-or-nothing, so on failure PostgREST inserts every row.
+                try:
+                    return await direct.insert_rows(rows)
+                except Exception as e:
+                    metrics.incr("bulk_insert.fallbacks")
+                    logger.warning(f"COPY insert failed, using PostgREST: {e}")
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                batch = rows[start : start + INSERT_BATCH_SIZE]
+                insert_result = await run_query(
+                    lambda: supabase.table("client_knowledge").insert(batch).execute()
                 )
+                insert_rows = json_rows(insert_result.data)
+                if insert_rows:
+                    document_ids.extend(
+                        int(row["id"])
+                        for row in insert_rows
+                        if row.get("id") is not None
+                    )
+        finally:
+            # Even a partial insert changed the corpus.
+            corpus.bump(project_id)
         return document_ids
 
     async def search_documents(
@@ -180,17 +437,31 @@ class RAGService:
             logger.error(f"Vector search failed - embedding error: {e}")
             return []
 
+        if _vector_cache.serves(project_ids, client_id):
+            cached = await self._cached_vector_search(
+                project_ids, query_embedding, limit, similarity_threshold
+            )
+            if cached is not None:
+                return cached
+
+        rpc_name = "match_client_knowledge"
+        rpc_params: Dict[str, Any] = {
+            "_query_embedding": query_embedding,
+            "_match_count": limit,
+            "_filter_uid": client_id,
+            "_filter_project_ids": project_ids or None,
+            "_similarity_threshold": similarity_threshold,
+        }
+        if settings.read_embedding_column == "embedding_next":
+            rpc_name = "match_client_knowledge_next"
+        elif settings.VECTOR_SEARCH_HALFVEC:
+            rpc_name = "match_client_knowledge_halfvec"
+            rpc_params["_rescore_factor"] = settings.VECTOR_RESCORE_FACTOR
+
         try:
-            result = supabase.rpc(
-                "match_client_knowledge",
-                {
-                    "_query_embedding": query_embedding,
-                    "_match_count": limit,
-                    "_filter_uid": client_id,
-                    "_filter_project_ids": project_ids or None,
-                    "_similarity_threshold": similarity_threshold,
-                },
-            ).execute()
+            result = await run_query(
+                lambda: supabase.rpc(rpc_name, rpc_params).execute()
+            )
 
             if result.data and isinstance(result.data, list) and len(result.data) > 0:
                 documents = []
@@ -214,10 +485,62 @@ class RAGService:
                     f"Vector search returned no results for projects {project_ids} uid={client_id} (threshold={similarity_threshold})"
                 )
         except Exception as e:
-            logger.error(f"RPC match_client_knowledge failed: {e}")
+            logger.error(f"RPC {rpc_name} failed: {e}")
 
         return []
 
+    async def _cached_vector_search(
+        self,
+        project_ids: List[int],
+        query_embedding: List[float],
+        limit: int,
+        similarity_threshold: float,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Answer a project-scoped vector search from ``_vector_cache``.
+
+        Exact top-k runs in memory; only the winning rows' content/metadata is
+        fetched, by id. Returns ``None`` (use the RPC) when a project can't be
+        served from memory or the fetch fails.
+        """
+        try:
+            hits = await _vector_cache.search(
+                project_ids, query_embedding, limit, similarity_threshold
+            )
+            if hits is None:
+                return None
+            if not hits:
+                return []
+            hit_ids = [chunk_id for chunk_id, _ in hits]
+            result = await run_query(
+                lambda: (
+                    supabase.table("client_knowledge")
+                    .select("id, content, metadata")
+                    .in_("id", hit_ids)
+                    .execute()
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Vector cache search failed, using RPC: {e}")
+            return None
+
+        # Rows deleted since the cache loaded simply drop out.
+        by_id = {row.get("id"): row for row in json_rows(result.data)}
+        documents = [
+            {
+                "id": chunk_id,
+                "content": by_id[chunk_id].get("content", ""),
+                "metadata": by_id[chunk_id].get("metadata") or {},
+                "similarity_score": similarity,
+            }
+            for chunk_id, similarity in hits
+            if chunk_id in by_id
+        ]
+        logger.info(
+            f"Vector cache search returned {len(documents)} results "
+            f"for projects {project_ids}"
+        )
+        return documents
+
     async def hybrid_search(
         self,
         query: str,
@@ -226,7 +549,35 @@ class RAGService:
         limit: int = 5,
         vector_weight: float = 0.7,
     ) -> List[Dict[str, Any]]:
-        """Perform hybrid search combining vector similarity and keyword matching."""
+        """Perform hybrid search combining vector similarity and keyword matching.
+
+        Each leg fetches ``limit * 2`` candidates and the legs are combined with
+        weighted Reciprocal Rank Fusion. With ``HYBRID_SEARCH_FUSED`` on, both
+        legs and the fusion run server-side in ONE round-trip
+        (``hybrid_search_client_knowledge``) that returns only the final
+        ``limit`` rows; if that RPC fails (or isn't deployed yet) this falls
+        back to the two-RPC path with fusion in Python.
+
+        Scopes the in-memory vector cache can answer skip the fused RPC: the
+        vector leg is then served locally and only the keyword leg hits
+        Postgres.
+        """
+        if not project_ids and not client_id:
+            return []
+
+        if settings.HYBRID_SEARCH_FUSED and not _vector_cache.serves(
+            project_ids, client_id
+        ):
+            fused = await self._fused_hybrid_search(
+                query=query,
+                project_ids=project_ids,
+                client_id=client_id,
+                limit=limit,
+                vector_weight=vector_weight,
+            )
+            if fused is not None:
+                return fused
+
         # Run vector and keyword searches concurrently.
         vector_results, keyword_results = await asyncio.gather(
             self.search_documents(
@@ -244,11 +595,24 @@ class RAGService:
             ),
         )
 
-        # Reciprocal Rank Fusion
+        return self._reciprocal_rank_fusion(
+            vector_results, keyword_results, limit, vector_weight
+        )
+
+    @staticmethod
+    def _reciprocal_rank_fusion(
+        vector_results: List[Dict[str, Any]],
+        keyword_results: List[Dict[str, Any]],
+        limit: int,
+        vector_weight: float,
+    ) -> List[Dict[str, Any]]:
+        """Weighted RRF over the two legs; the Python twin of the fusion done
+        by ``hybrid_search_client_knowledge``. Annotates each doc with its
+        ``combined_score`` and 1-based per-leg ranks (``None`` if absent)."""
         # Keys must be stable and non-None; skip id-less docs so multiple
         # None-id candidates never collapse into one corrupted bucket.
         combined_scores: Dict[Any, Dict[str, Any]] = {}
-        k = 60
+        k = RRF_K
 
         # Score vector results
         for rank, doc in enumerate(vector_results):
@@ -256,7 +620,12 @@ class RAGService:
             if doc_id is None:
                 continue
             rrf_score = vector_weight / (k + rank + 1)
-            combined_scores[doc_id] = {**doc, "combined_score": rrf_score}
+            combined_scores[doc_id] = {
+                **doc,
+                "combined_score": rrf_score,
+                "vector_rank": rank + 1,
+                "keyword_rank": None,
+            }
 
         # Add keyword results
         keyword_weight = 1 - vector_weight
@@ -268,8 +637,14 @@ class RAGService:
 
             if doc_id in combined_scores:
                 combined_scores[doc_id]["combined_score"] += rrf_score
+                combined_scores[doc_id]["keyword_rank"] = rank + 1
             else:
-                combined_scores[doc_id] = {**doc, "combined_score": rrf_score}
+                combined_scores[doc_id] = {
+                    **doc,
+                    "combined_score": rrf_score,
+                    "vector_rank": None,
+                    "keyword_rank": rank + 1,
+                }
 
         # Sort by combined score and return top results
         sorted_results = sorted(
@@ -278,6 +653,176 @@ class RAGService:
 
         return sorted_results[:limit]
 
+    async def _fused_hybrid_search(
+        self,
+        query: str,
+        project_ids: List[int],
+        client_id: Optional[str],
+        limit: int,
+        vector_weight: float,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Single-round-trip hybrid search via ``hybrid_search_client_knowledge``.
+
+        Returns ``None`` when the RPC fails so ``hybrid_search`` can fall back
+        to the two-RPC path. If the query can't be embedded, the vector leg is
+        simply absent: the result is the keyword leg alone, exactly what the
+        two-RPC path would produce, without paying for a second failed
+        embedding call.
+        """
+        try:
+            query_embedding = await self.generate_embedding(query)
+        except Exception as e:
+            logger.error(f"Fused hybrid search - embedding error: {e}")
+            keyword_results = await self._keyword_search(
+                query=query,
+                project_ids=project_ids,
+                client_id=client_id,
+                limit=limit * 2,
+            )
+            return self._reciprocal_rank_fusion(
+                [], keyword_results, limit, vector_weight
+            )
+
+        rpc_params: Dict[str, Any] = {
+            "_query_embedding": query_embedding,
+            "_query": query,
+            "_match_count": limit,
+            "_candidate_count": limit * 2,
+            "_filter_uid": client_id or None,
+            "_filter_project_ids": project_ids or None,
+            "_similarity_threshold": MIN_VECTOR_SIMILARITY,
+            "_vector_weight": vector_weight,
+            "_rrf_k": RRF_K,
+        }
+        # Only sent when enabled, so the call still resolves against a
+        # database without the halfvec / embedding_next migrations.
+        rpc_params.update(self._vector_leg_params())
+
+        try:
+            result = await run_query(
+                lambda: supabase.rpc(
+                    "hybrid_search_client_knowledge", rpc_params
+                ).execute()
+            )
+        except Exception as e:
+            logger.warning(f"Fused hybrid search RPC failed, using two-RPC path: {e}")
+            return None
+
+        documents = [self._fused_document(row) for row in json_rows(result.data)]
+        logger.info(
+            f"Fused hybrid search returned {len(documents)} results "
+            f"for projects {project_ids} uid={client_id}"
+        )
+        return documents
+
+    @staticmethod
+    def _vector_leg_params() -> Dict[str, Any]:
+        """Vector-leg options of the fused hybrid RPCs: the shadow column
+        once reads have flipped to it (no halfvec index there), else halfvec
+        when enabled."""
+        if settings.read_embedding_column == "embedding_next":
+            return {"_embedding_next": True}
+        if settings.VECTOR_SEARCH_HALFVEC:
+            return {"_halfvec": True, "_rescore_factor": settings.VECTOR_RESCORE_FACTOR}
+        return {}
+
+    @staticmethod
+    def _fused_document(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a ``hybrid_search_client_knowledge`` row to a result document."""
+        return {
+            "id": row.get("id"),
+            "content": row.get("content", ""),
+            "metadata": row.get("metadata") or {},
+            "similarity_score": float(row.get("similarity") or 0.0),
+            "combined_score": float(row.get("combined_score") or 0.0),
+            "vector_rank": row.get("vector_rank"),
+            "keyword_rank": row.get("keyword_rank"),
+        }
+
+    async def _batch_hybrid_search(
+        self,
+        queries: List[str],
+        project_ids: List[int],
+        client_id: Optional[str],
+        limit: int,
+        vector_weight: float = 0.7,
+    ) -> List[List[Dict[str, Any]]]:
+        """``hybrid_search`` for several queries; one result list per query.
+
+        With the fused RPC enabled this is one embeddings request plus ONE
+        ``hybrid_search_client_knowledge_batch`` round-trip, which runs the
+        fused search once per query server-side, so every list matches the
+        single-query call. A single query, a scope served by the in-memory
+        vector cache, or a failed embed/RPC falls back to per-query
+        ``hybrid_search`` calls run concurrently.
+        """
+
+        async def _per_query() -> List[List[Dict[str, Any]]]:
+            return list(
+                await asyncio.gather(
+                    *(
+                        self.hybrid_search(
+                            query=query,
+                            project_ids=project_ids,
+                            client_id=client_id,
+                            limit=limit,
+                            vector_weight=vector_weight,
+                        )
+                        for query in queries
+                    )
+                )
+            )
+
+        if (
+            len(queries) < 2
+            or not settings.HYBRID_SEARCH_FUSED
+            or _vector_cache.serves(project_ids, client_id)
+        ):
+            return await _per_query()
+
+        try:
+            embeddings = await self.generate_embeddings(queries)
+        except Exception as e:
+            logger.warning(f"Batch hybrid search - embedding error: {e}")
+            return await _per_query()
+
+        rpc_params: Dict[str, Any] = {
+            # pgvector text literals; the RPC casts them per query.
+            "_query_embeddings": [
+                json.dumps(embedding, separators=(",", ":")) for embedding in embeddings
+            ],
+            "_queries": queries,
+            "_match_count": limit,
+            "_candidate_count": limit * 2,
+            "_filter_uid": client_id or None,
+            "_filter_project_ids": project_ids or None,
+            "_similarity_threshold": MIN_VECTOR_SIMILARITY,
+            "_vector_weight": vector_weight,
+            "_rrf_k": RRF_K,
+        }
+        rpc_params.update(self._vector_leg_params())
+
+        try:
+            result = await run_query(
+                lambda: supabase.rpc(
+                    "hybrid_search_client_knowledge_batch", rpc_params
+                ).execute()
+            )
+        except Exception as e:
+            logger.warning(f"Batch hybrid search RPC failed, searching per query: {e}")
+            return await _per_query()
+
+        grouped: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for row in json_rows(result.data):
+            index = row.get("query_index")
+            if isinstance(index, int) and 0 <= index < len(queries):
+                grouped[index].append(self._fused_document(row))
+        logger.info(
+            f"Batch hybrid search: {len(queries)} queries in one round-trip, "
+            f"{sum(len(docs) for docs in grouped)} results for projects {project_ids}"
+        )
+        return grouped
+
     async def rerank(
         self, query: str, documents: List[Dict[str, Any]], top_n: int
     ) -> List[Dict[str, Any]]:
@@ -295,22 +840,39 @@ class RAGService:
         if not settings.rerank_model or len(documents) <= 1:
             return documents[:top_n]
 
-        try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                resp = await client.post(
-                    "https://openrouter.ai/api/v1/rerank",
-                    headers={"Authorization": f"Bearer {settings.api_key}"},
-                    json={
-                        "model": settings.rerank_model,
-                        "query": query,
-                        "documents": [d.get("content", "") for d in documents],
-                        "top_n": top_n,
-                    },
+        key, doc_keys = self._rerank_cache_key(query, documents, top_n)
+        cached = _rerank_cache.get(key)
+        if cached is not None:
+            by_key = dict(zip(doc_keys, documents))
+            calls = metrics.value("rerank.calls")
+            metrics.incr("rerank.cache_hits")
+            if calls:
+                metrics.incr(
+                    "rerank.latency_saved_ms", metrics.value("rerank.call_ms") / calls
                 )
-                resp.raise_for_status()
-                results = resp.json().get("results", [])
+            return [
+                {**by_key[doc_key], "rerank_score": score} for doc_key, score in cached
+            ]
+
+        try:
+            started = time.perf_counter()
+            resp = await get_http_client().post(
+                "https://openrouter.ai/api/v1/rerank",
+                headers={"Authorization": f"Bearer {settings.api_key}"},
+                json={
+                    "model": settings.rerank_model,
+                    "query": query,
+                    "documents": [d.get("content", "") for d in documents],
+                    "top_n": top_n,
+                },
+            )
+            resp.raise_for_status()
+            results = resp.json().get("results", [])
+            metrics.incr("rerank.calls")
+            metrics.incr("rerank.call_ms", (time.perf_counter() - started) * 1000)
 
             reranked: List[Dict[str, Any]] = []
+            ordering: List[Tuple[Tuple[str, str], Any]] = []
             for r in results:
                 idx = r.get("index")
                 if idx is None or idx < 0 or idx >= len(documents):
@@ -318,8 +880,10 @@ class RAGService:
                 doc = dict(documents[idx])
                 doc["rerank_score"] = r.get("relevance_score")
                 reranked.append(doc)
+                ordering.append((doc_keys[idx], doc["rerank_score"]))
 
             if reranked:
+                _rerank_cache.set(key, ordering)
                 logger.info(
                     f"Reranked {len(documents)} candidates -> {len(reranked)} "
                     f"(model={settings.rerank_model})"
@@ -332,6 +896,31 @@ class RAGService:
 
         return documents[:top_n]
 
+    @staticmethod
+    def _rerank_cache_key(
+        query: str, documents: List[Dict[str, Any]], top_n: int
+    ) -> Tuple[Hashable, List[Tuple[str, str]]]:
+        """Cache key for a rerank call, plus each document's (id, content
+        hash) in input order.
+
+        The key covers the model, the query, the candidate SET (sorted, so the
+        same candidates in a different first-stage order still hit) and
+        ``top_n``. Hashing content as well as ids means a chunk whose text
+        changed can never be served a stale score.
+        """
+        doc_keys = [
+            (
+                str(doc.get("id")),
+                hashlib.blake2b(
+                    str(doc.get("content", "")).encode("utf-8"), digest_size=16
+                ).hexdigest(),
+            )
+            for doc in documents
+        ]
+        query_hash = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        key = (settings.rerank_model, query_hash, tuple(sorted(doc_keys)), top_n)
+        return key, doc_keys
+
     async def retrieve_relevant(
         self,
         query: str,
@@ -357,21 +946,300 @@ class RAGService:
         single source of truth for both the prompt context and the citation
         sources, keeping the model's ``[n]`` markers aligned with the rendered
         source chips.
+
+        With ``MMR_LAMBDA < 1`` the reranker keeps ``MMR_POOL_FACTOR`` times
+        as many documents and Maximal Marginal Relevance picks ``top_n`` of
+        them (see ``_diversify``), so overlapping chunks of the same passage
+        don't crowd out other evidence.
+
+        Results are cached per worker (``_retrieval_cache``), keyed on the
+        scope, the whitespace-normalized query, ``top_n`` and the scope's
+        corpus generations, so every write path (which bumps the generation
+        via ``services.corpus``) makes older entries unreachable.
         """
         effective_client_id = None if strict else client_id
         if not project_ids and not effective_client_id:
             return []
         keep = top_n if top_n is not None else settings.rerank_top_n
+        normalized = " ".join(query.split())
+        key = self._retrieval_cache_key(
+            normalized, project_ids, effective_client_id, strict, keep
+        )
+        cached = _retrieval_cache.get(key)
+        if cached is not None:
+            logger.info(f"Retrieval cache hit for projects {project_ids}")
+            return [dict(doc) for doc in cached]
+
         candidates = await self.hybrid_search(
-            query=query,
+            query=normalized,
             project_ids=project_ids,
             client_id=effective_client_id,
             limit=settings.rerank_candidates,
         )
         if not candidates:
             return []
+        docs = await self._select_documents(
+            normalized, candidates, keep, project_ids, effective_client_id
+        )
+        self._cache_retrieval(key, candidates, docs)
+        return docs
+
+    async def retrieve_relevant_batch(
+        self,
+        queries: List[str],
+        project_ids: List[int],
+        client_id: Optional[str] = None,
+        top_n: Optional[int] = None,
+        strict: bool = False,
+    ) -> List[List[Dict[str, Any]]]:
+        """``retrieve_relevant`` for several queries of one tool iteration.
+
+        Returns one list per query, in input order, each identical to what
+        ``retrieve_relevant`` would return for that query. Cache hits and
+        repeated queries are resolved first; the remaining queries share one
+        embeddings request (``generate_embeddings``), one search round-trip
+        (``_batch_hybrid_search``) and one MMR embedding fetch, while each
+        still gets its own (cached) rerank call.
+        """
+        effective_client_id = None if strict else client_id
+        if not project_ids and not effective_client_id:
+            return [[] for _ in queries]
+        keep = top_n if top_n is not None else settings.rerank_top_n
+        normalized = [" ".join(query.split()) for query in queries]
+
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        keys: Dict[str, Hashable] = {}
+        for text in dict.fromkeys(normalized):
+            key = self._retrieval_cache_key(
+                text, project_ids, effective_client_id, strict, keep
+            )
+            cached = _retrieval_cache.get(key)
+            if cached is not None:
+                results[text] = cached
+            else:
+                keys[text] = key
+        if results:
+            logger.info(
+                f"Retrieval cache hit for {len(results)} of "
+                f"{len(results) + len(keys)} queries (projects {project_ids})"
+            )
+
+        pending = list(keys)
+        if pending:
+            candidate_lists = await self._batch_hybrid_search(
+                pending,
+                project_ids=project_ids,
+                client_id=effective_client_id,
+                limit=settings.rerank_candidates,
+            )
+            shared_embeddings: Optional[
+                "asyncio.Future[Dict[int, NDArray[np.float32]]]"
+            ] = None
+            if settings.MMR_LAMBDA < 1.0 and any(
+                len(candidates) > keep for candidates in candidate_lists
+            ):
+                ids = {
+                    doc.get("id"): None
+                    for candidates in candidate_lists
+                    for doc in candidates
+                }
+                shared_embeddings = asyncio.ensure_future(
+                    self._candidate_embeddings(
+                        project_ids, list(ids), effective_client_id
+                    )
+                )
+            selected = await asyncio.gather(
+                *(
+                    self._select_documents(
+                        text,
+                        candidates,
+                        keep,
+                        project_ids,
+                        effective_client_id,
+                        shared_embeddings,
+                    )
+                    for text, candidates in zip(pending, candidate_lists)
+                )
+            )
+            for text, candidates, docs in zip(pending, candidate_lists, selected):
+                if candidates:
+                    self._cache_retrieval(keys[text], candidates, docs)
+                results[text] = docs
+
+        return [[dict(doc) for doc in results[text]] for text in normalized]
+
+    async def _select_documents(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        keep: int,
+        project_ids: List[int],
+        client_id: Optional[str] = None,
+        embeddings: Optional["asyncio.Future[Dict[int, NDArray[np.float32]]]"] = None,
+    ) -> List[Dict[str, Any]]:
+        """Stage 2 of retrieval: rerank ``candidates`` down to ``keep`` docs,
+        diversified by MMR when enabled. ``embeddings`` lets a batch share one
+        candidate-embedding fetch; by default this call makes its own."""
+        if not candidates:
+            return []
+        if settings.MMR_LAMBDA < 1.0 and len(candidates) > keep:
+            # The embedding fetch overlaps the reranker call, so MMR adds no
+            # round-trip latency to the turn.
+            pool = keep * max(settings.MMR_POOL_FACTOR, 1)
+            fetch = (
+                asyncio.shield(embeddings)
+                if embeddings is not None
+                else self._candidate_embeddings(
+                    project_ids, [doc.get("id") for doc in candidates], client_id
+                )
+            )
+            docs, vectors = await asyncio.gather(
+                self.rerank(query=query, documents=candidates, top_n=pool), fetch
+            )
+            return self._diversify(docs, vectors, keep)
         return await self.rerank(query=query, documents=candidates, top_n=keep)
 
+    @staticmethod
+    def _cache_retrieval(
+        key: Hashable, candidates: List[Dict[str, Any]], docs: List[Dict[str, Any]]
+    ) -> None:
+        # Don't pin a degraded result: if the reranker was wanted but failed,
+        # the next turn should try again.
+        reranker_failed = (
+            bool(settings.rerank_model)
+            and len(candidates) > 1
+            and not any("rerank_score" in doc for doc in docs)
+        )
+        if not reranker_failed:
+            _retrieval_cache.set(key, [dict(doc) for doc in docs])
+
+    async def _candidate_embeddings(
+        self,
+        project_ids: List[int],
+        chunk_ids: List[Any],
+        client_id: Optional[str] = None,
+    ) -> Dict[int, NDArray[np.float32]]:
+        """Unit-normalized embeddings of the shortlisted chunks, for MMR.
+
+        Rows resident in ``_vector_cache`` are read from memory; the rest come
+        from one ``id, embedding`` select by id, scoped like the search that
+        shortlisted them (``_scope_or_filter``). Best-effort: a failed fetch
+        returns what was found so far and ``_diversify`` falls back to the
+        rerank order.
+        """
+        ids = [int(chunk_id) for chunk_id in chunk_ids if chunk_id is not None]
+        found = _vector_cache.vectors(project_ids, ids)
+        missing = [chunk_id for chunk_id in ids if chunk_id not in found]
+        scope = self._scope_or_filter(project_ids, client_id)
+        if not missing or scope is None:
+            return found
+        column = settings.read_embedding_column
+        try:
+            result = await run_query(
+                lambda: (
+                    supabase.table("client_knowledge")
+                    .select(f"id, {column}")
+                    .or_(scope)
+                    .in_("id", missing)
+                    .execute()
+                )
+            )
+        except Exception as e:
+            logger.warning(f"MMR embedding fetch failed, keeping rerank order: {e}")
+            return found
+        for row in json_rows(result.data):
+            vector = parse_vector(row.get(column))
+            if vector is not None:
+                found[int(row["id"])] = mmr.normalize_rows(vector[None, :])[0]
+        return found
+
+    @staticmethod
+    def _diversify(
+        docs: List[Dict[str, Any]],
+        embeddings: Dict[int, NDArray[np.float32]],
+        keep: int,
+    ) -> List[Dict[str, Any]]:
+        """Pick ``keep`` of the reranked ``docs`` by Maximal Marginal Relevance.
+
+        Relevance comes from ``_relevance_scores``, so a reranker outage still
+        diversifies the fused order. Without an embedding for every doc the
+        plain top ``keep`` is returned (counted as ``mmr.fallbacks``). Logs,
+        and counts under ``mmr.*`` in ``/metrics``, the prompt tokens of
+        near-duplicate chunks that MMR kept out of the context.
+        """
+        if len(docs) <= keep:
+            return docs
+        vectors = [embeddings.get(doc["id"]) for doc in docs]
+        if any(vector is None for vector in vectors):
+            metrics.incr("mmr.fallbacks")
+            logger.info("MMR skipped: embeddings missing for some candidates")
+            return docs[:keep]
+
+        matrix = np.stack([vector for vector in vectors if vector is not None])
+        picked = mmr.select(
+            matrix, RAGService._relevance_scores(docs), keep, settings.MMR_LAMBDA
+        )
+
+        displaced = mmr.displaced_duplicates(matrix, picked, keep)
+        tokens_saved = sum(
+            tokens.count_tokens(str(docs[i].get("content", ""))) for i in displaced
+        )
+        metrics.incr("mmr.turns")
+        metrics.incr("mmr.duplicates_dropped", len(displaced))
+        metrics.incr("mmr.tokens_saved", tokens_saved)
+        logger.info(
+            f"MMR kept {keep} of {len(docs)} candidates, dropped "
+            f"{len(displaced)} near-duplicates (~{tokens_saved} prompt tokens saved)"
+        )
+        return [docs[i] for i in picked]
+
+    @staticmethod
+    def _relevance_scores(docs: List[Dict[str, Any]]) -> List[float]:
+        """One comparable score per doc: the best scorer that EVERY doc carries
+        (rerank, then RRF, then vector similarity), else rank order. Mixing
+        scorers would compare numbers on different scales."""
+        score_key = next(
+            (
+                key
+                for key in ("rerank_score", "combined_score", "similarity_score")
+                if all(doc.get(key) is not None for doc in docs)
+            ),
+            None,
+        )
+        return [
+            float(doc[score_key]) if score_key else float(len(docs) - rank)
+            for rank, doc in enumerate(docs)
+        ]
+
+    @staticmethod
+    def _retrieval_cache_key(
+        normalized_query: str,
+        project_ids: List[int],
+        client_id: Optional[str],
+        strict: bool,
+        top_n: int,
+    ) -> Hashable:
+        """Key for ``_retrieval_cache``: the scope, the query, ``top_n``, the
+        models and MMR lambda involved, and the corpus generation of every
+        project (and of the legacy NULL-project rows when ``client_id`` is in
+        scope). Any write to the scope changes the key, so a stale entry can
+        never match."""
+        scope = tuple(sorted(set(project_ids)))
+        generations = tuple(corpus.generation(pid) for pid in scope)
+        if client_id:
+            generations += (corpus.generation(None),)
+        return (
+            scope,
+            client_id,
+            strict,
+            normalized_query,
+            top_n,
+            settings.read_embedding_model,
+            settings.rerank_model,
+            settings.MMR_LAMBDA,
+            generations,
+        )
+
     @staticmethod
     def _scope_or_filter(
         project_ids: List[int], client_id: Optional[str]
@@ -414,15 +1282,17 @@ class RAGService:
         if scope is None:
             return []
         try:
-            result = supabase.rpc(
-                "keyword_search_client_knowledge",
-                {
-                    "_query": query,
-                    "_match_count": limit,
-                    "_filter_uid": client_id or None,
-                    "_filter_project_ids": project_ids or None,
-                },
-            ).execute()
+            result = await run_query(
+                lambda: supabase.rpc(
+                    "keyword_search_client_knowledge",
+                    {
+                        "_query": query,
+                        "_match_count": limit,
+                        "_filter_uid": client_id or None,
+                        "_filter_project_ids": project_ids or None,
+                    },
+                ).execute()
+            )
 
             result_rows = json_rows(result.data)
             if not result_rows:
@@ -464,13 +1334,15 @@ class RAGService:
         if not words or scope is None:
             return []
 
-        result = (
-            supabase.table("client_knowledge")
-            .select("id, content, metadata")
-            .or_(scope)
-            .ilike("content", f"%{words[0]}%")
-            .limit(limit)
-            .execute()
+        result = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .select("id, content, metadata")
+                .or_(scope)
+                .ilike("content", f"%{words[0]}%")
+                .limit(limit)
+                .execute()
+            )
         )
 
         result_rows = json_rows(result.data)
@@ -496,29 +1368,24 @@ class RAGService:
         """Render a prompt context string from already-retrieved docs + attachments.
 
         Pure (no I/O) so it can be reused wherever docs were fetched once.
+        Budgets by characters and keeps docs in order until one overflows;
+        ``pack_context`` is the token-budgeted variant.
         """
         context_parts: List[str] = []
         current_length = 0
 
         if attachments:
-            context_parts.append("=== Session Attachments ===\n")
+            context_parts.append(_ATTACHMENTS_HEADER)
             for att in attachments:
-                att_text = f"\n[File: {att.get('filename', 'attachment')}]\n{att.get('content', '')}\n"
+                att_text = _attachment_text(att)
                 if current_length + len(att_text) < max_context_length:
                     context_parts.append(att_text)
                     current_length += len(att_text)
 
         if retrieved_docs:
-            context_parts.append("\n=== Retrieved Documents ===\n")
+            context_parts.append(_DOCUMENTS_HEADER)
             for doc in retrieved_docs:
-                metadata = doc.get("metadata", {})
-                filename = metadata.get("filename", "Unknown")
-                page = metadata.get("page_number", "")
-                page_str = f" (Page {page})" if page else ""
-
-                doc_text = (
-                    f"\n[Source: {filename}{page_str}]\n{doc.get('content', '')}\n"
-                )
+                doc_text = _document_text(doc)
 
                 if current_length + len(doc_text) < max_context_length:
                     context_parts.append(doc_text)
@@ -529,3 +1396,71 @@ class RAGService:
         return (
             "".join(context_parts) if context_parts else "No relevant documents found."
         )
+
+    @staticmethod
+    def pack_context(
+        retrieved_docs: List[Dict[str, Any]],
+        model: str,
+        token_budget: int,
+        attachments: Optional[List[Dict[str, str]]] = None,
+    ) -> Tuple[str, List[Dict[str, Any]], int]:
+        """Token-budgeted ``build_context_string``.
+
+        Tokens are counted for ``model`` (``services.tokens``). Attachments are
+        taken first, in order, while they fit. The remaining budget is packed
+        with the highest-scoring docs (``tokens.pack``); a doc that doesn't fit
+        is skipped, not the end of the pass. Kept docs are emitted in their
+        input (citation) order.
+
+        Returns ``(context_text, kept_docs, context_tokens)``. Build citation
+        sources from ``kept_docs`` so ``[n]`` markers match the prompt.
+        """
+        context_parts: List[str] = []
+        used = 0
+
+        if attachments:
+            used += tokens.count_tokens(_ATTACHMENTS_HEADER, model)
+            context_parts.append(_ATTACHMENTS_HEADER)
+            for att in attachments:
+                att_text = _attachment_text(att)
+                cost = tokens.count_tokens(att_text, model)
+                if used + cost <= token_budget:
+                    context_parts.append(att_text)
+                    used += cost
+
+        kept: List[Dict[str, Any]] = []
+        if retrieved_docs:
+            header_cost = tokens.count_tokens(_DOCUMENTS_HEADER, model)
+            doc_texts = [_document_text(doc) for doc in retrieved_docs]
+            costs = [tokens.count_tokens(text, model) for text in doc_texts]
+            picked = tokens.pack(
+                costs,
+                RAGService._relevance_scores(retrieved_docs),
+                token_budget - used - header_cost,
+            )
+            if picked:
+                context_parts.append(_DOCUMENTS_HEADER)
+                context_parts.extend(doc_texts[i] for i in picked)
+                used += header_cost + sum(costs[i] for i in picked)
+                kept = [retrieved_docs[i] for i in picked]
+            if len(picked) < len(retrieved_docs):
+                logger.info(
+                    f"Context packing kept {len(picked)} of {len(retrieved_docs)} "
+                    f"docs ({used} tokens, budget {token_budget})"
+                )
+
+        if not context_parts:
+            return "No relevant documents found.", kept, 0
+        return "".join(context_parts), kept, used
+
+
+def _attachment_text(att: Dict[str, str]) -> str:
+    return f"\n[File: {att.get('filename', 'attachment')}]\n{att.get('content', '')}\n"
+
+
+def _document_text(doc: Dict[str, Any]) -> str:
+    metadata = doc.get("metadata", {})
+    filename = metadata.get("filename", "Unknown")
+    page = metadata.get("page_number", "")
+    page_str = f" (Page {page})" if page else ""
+    return f"\n[Source: {filename}{page_str}]\n{doc.get('content', '')}\n"
@@ -0,0 +1,89 @@
+"""Prompt-token counting and token-budgeted packing.
+
+``count_tokens`` counts with ``tiktoken``: the model's own encoding for
+OpenAI models, ``o200k_base`` for everything else (the closest public BPE to
+the large-vocabulary tokenizers of the DeepSeek/Qwen models served through
+OpenRouter). tiktoken downloads an encoding's BPE file on first use (the
+Docker image fetches them at build time); if that fails, prompt budgets fall
+back to a characters-per-token estimate, but ``token_counter`` (chunk sizing,
+where an estimate would defeat the point) raises. Counts are cached per
+(text, model): retrieved chunks recur across tool iterations and turns, so
+most counts are lookups.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Callable, List, Optional, Sequence
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Fallback estimate for English prose (OpenAI's rule of thumb). It undercounts
+# code and non-Latin scripts, so budgets built on it should keep some slack.
+CHARS_PER_TOKEN: int = 4
+
+# Encoding for models tiktoken doesn't know (every non-OpenAI model).
+DEFAULT_ENCODING: str = "o200k_base"
+
+
+def estimate_tokens(text: str) -> int:
+    """Character-based token estimate (rounds up)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str) -> Optional[tiktoken.Encoding]:
+    # OpenRouter ids carry a provider prefix ("openai/gpt-4o").
+    name = model.rsplit("/", 1)[-1]
+    try:
+        try:
+            return tiktoken.encoding_for_model(name)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding for {model!r} unavailable: {e}")
+        return None
+
+
+def token_counter(model: str = "") -> Callable[[str], int]:
+    """Uncached ``count_tokens`` for one ``model``, for callers that count
+    many distinct texts and keep their own cache (``services/chunking.py``).
+    Raises ``ValueError`` if the model's encoding can't be loaded."""
+    encoding = _encoding(model)
+    if encoding is None:
+        raise ValueError(f"No tokenizer available for {model!r}")
+
+    def _count(text: str) -> int:
+        return len(encoding.encode(text, disallowed_special=())) if text else 0
+
+    return _count
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = "") -> int:
+    """Prompt tokens ``text`` costs for ``model`` (see module docstring)."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def pack(costs: Sequence[int], scores: Sequence[float], budget: int) -> List[int]:
+    """Indices of the items to keep within ``budget``, in input order.
+
+    Greedy 0/1 knapsack by score: items are taken best-score first and an item
+    that doesn't fit is skipped rather than ending the pass, so one long chunk
+    never crowds out a shorter, higher-ranked one behind it. Ties keep input
+    order.
+    """
+    order = sorted(range(len(costs)), key=lambda i: -scores[i])
+    kept: List[int] = []
+    used = 0
+    for i in order:
+        if used + costs[i] <= budget:
+            kept.append(i)
+            used += costs[i]
+    return sorted(kept)
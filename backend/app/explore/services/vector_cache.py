@@ -0,0 +1,442 @@
+"""Per-project in-process embedding cache with exact top-k search.
+
+Most projects hold a few hundred to a few thousand chunks. For those, the HNSW
+query behind ``match_client_knowledge`` is the wrong tool: the index is built
+over the whole table, so ``project_id = ANY(...)`` is applied as a post-filter
+(recall drops when a project is a small slice of the corpus), and every search
+still pays a PostgREST round-trip. An exact dot product over the project's own
+vectors is both faster and exact at this size.
+
+``ProjectVectorCache`` keeps, per project, a contiguous float32 matrix of
+unit-normalized embeddings plus a parallel int64 array of chunk ids — no chunk
+text, which ``RAGService`` fetches by id for the final top-k only. Entries:
+
+* load lazily on the first search for a project, via keyset-paginated
+  ``id, embedding`` selects on the DB pool (single-flight per project);
+* are versioned by ``services.corpus`` generations: a write on this worker
+  bumps the project and the next search reloads it. ``ttl`` bounds staleness
+  from writes made on other workers;
+* are LRU-evicted across projects once their total size passes ``max_bytes``;
+* are skipped for projects above ``max_rows`` chunks — ``search`` returns
+  ``None`` and the caller uses the RPC (the size check is remembered for the
+  same generation/TTL, so large projects cost one extra count per TTL).
+
+With ``mmap_dir`` set, each loaded matrix is also written to
+``{mmap_dir}/project-{id}-{rows}-{max_id}-{dims}-{model}.*.npy`` and opened
+with ``mmap_mode="r"``. The name is a stamp of the project's current contents
+(row count and highest chunk id, read in the same query as the size check)
+and of the embedding model (a short hash of ``model``), so every uvicorn
+worker on the host maps the same file and shares its pages through the OS
+page cache, and a worker that finds a matching file skips the paginated load
+entirely. Re-embedding rewrites vectors in place without changing the row
+count or ids; the model in the stamp is what keeps a worker on the new model
+from mapping the old model's file.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+from postgrest.types import CountMethod
+
+from app.explore.db.pool import run_query
+from app.explore.db.rows import json_rows
+from app.explore.db.supabase import supabase
+from app.explore.services import corpus
+
+logger = logging.getLogger(__name__)
+
+# Rows per ``id, embedding`` page. At 1536 dims a page is ~20 MB of JSON,
+# well inside the PostgREST timeout.
+LOAD_PAGE_SIZE: int = 1000
+
+
+@dataclass
+class _ProjectVectors:
+    ids: NDArray[np.int64]
+    matrix: NDArray[np.float32]
+    generation: int
+    loaded_at: float
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.ids.nbytes + self.matrix.nbytes)
+
+
+class ProjectVectorCache:
+    """LRU, byte-bounded map of project id -> (ids, unit-normalized matrix).
+
+    ``max_bytes <= 0`` disables the cache: ``search`` always returns ``None``.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_rows: int,
+        ttl: float,
+        dimensions: int,
+        mmap_dir: Optional[str] = None,
+        column: str = "embedding",
+        model: str = "",
+    ):
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.dimensions = dimensions
+        # client_knowledge column loaded: embedding_next once an online
+        # re-embed has flipped reads (app/explore/reembed.py).
+        self.column = column
+        # Embedding model of ``column``'s vectors; part of the mmap file stamp.
+        self.model = model
+        self.mmap_dir = Path(mmap_dir) if mmap_dir else None
+        self._entries: "OrderedDict[int, _ProjectVectors]" = OrderedDict()
+        # project id -> (generation, checked_at) for projects over max_rows.
+        self._oversize: Dict[int, Tuple[int, float]] = {}
+        self._inflight: Dict[int, "asyncio.Future[Optional[_ProjectVectors]]"] = {}
+        self.hits = 0
+        self.loads = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def serves(self, project_ids: Sequence[int], client_id: Optional[str]) -> bool:
+        """Whether ``search`` may answer this scope: projects only (no legacy
+        NULL-project rows) and none already known to be over ``max_rows``."""
+        if not self.enabled or client_id or not project_ids:
+            return False
+        now = time.monotonic()
+        return not any(
+            self._is_oversize(pid, now) for pid in project_ids if pid in self._oversize
+        )
+
+    def invalidate(self, project_id: Optional[int] = None) -> None:
+        """Drop one project's entry (or every entry)."""
+        if project_id is None:
+            self._entries.clear()
+            self._oversize.clear()
+            return
+        self._entries.pop(project_id, None)
+        self._oversize.pop(project_id, None)
+
+    async def search(
+        self,
+        project_ids: Sequence[int],
+        query_embedding: Sequence[float],
+        limit: int,
+        similarity_threshold: float = 0.0,
+    ) -> Optional[List[Tuple[int, float]]]:
+        """Exact cosine top-``limit`` over the given projects' chunks.
+
+        Returns ``(chunk_id, similarity)`` pairs, best first, keeping only
+        similarities above ``similarity_threshold`` (same ``>`` as the RPC).
+        Returns ``None`` when any project can't be served from memory (too
+        large, or the load failed) so the caller falls back to the RPC.
+        """
+        if not self.enabled or not project_ids or limit <= 0:
+            return None
+
+        entries: List[_ProjectVectors] = []
+        for pid in dict.fromkeys(project_ids):
+            entry = await self._get(pid)
+            if entry is None:
+                self.fallbacks += 1
+                return None
+            entries.append(entry)
+
+        # A few ms of BLAS for mid-sized projects; keep it off the event loop.
+        return await asyncio.to_thread(
+            _top_k, entries, query_embedding, limit, similarity_threshold
+        )
+
+    def vectors(
+        self, project_ids: Sequence[int], chunk_ids: Sequence[int]
+    ) -> Dict[int, NDArray[np.float32]]:
+        """Unit-normalized embeddings of ``chunk_ids`` that are already
+        resident and current for ``project_ids``. Never loads; ids that are
+        not in memory are simply absent from the result."""
+        found: Dict[int, NDArray[np.float32]] = {}
+        if not self.enabled or not chunk_ids:
+            return found
+        wanted = np.asarray(chunk_ids, dtype=np.int64)
+        now = time.monotonic()
+        for pid in dict.fromkeys(project_ids):
+            entry = self._entries.get(pid)
+            if (
+                entry is None
+                or entry.generation != corpus.generation(pid)
+                or now - entry.loaded_at >= self.ttl
+            ):
+                continue
+            rows = np.flatnonzero(np.isin(entry.ids, wanted))
+            for row in rows:
+                found[int(entry.ids[row])] = np.asarray(entry.matrix[row])
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of the counters, for logs and the metrics endpoint."""
+        return {
+            "projects": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "loads": self.loads,
+            "fallbacks": self.fallbacks,
+            "evictions": self.evictions,
+        }
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _is_oversize(self, project_id: int, now: float) -> bool:
+        checked = self._oversize.get(project_id)
+        if checked is None:
+            return False
+        gen, checked_at = checked
+        if gen == corpus.generation(project_id) and now - checked_at < self.ttl:
+            return True
+        del self._oversize[project_id]
+        return False
+
+    async def _get(self, project_id: int) -> Optional[_ProjectVectors]:
+        now = time.monotonic()
+        entry = self._entries.get(project_id)
+        if (
+            entry is not None
+            and entry.generation == corpus.generation(project_id)
+            and now - entry.loaded_at < self.ttl
+        ):
+            self._entries.move_to_end(project_id)
+            self.hits += 1
+            return entry
+        if self._is_oversize(project_id, now):
+            return None
+
+        pending = self._inflight.get(project_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The loading request was cancelled (not us): use the RPC.
+                task = asyncio.current_task()
+                if not pending.cancelled() or (task and task.cancelling()):
+                    raise
+                return None
+
+        future: "asyncio.Future[Optional[_ProjectVectors]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._inflight[project_id] = future
+        try:
+            loaded = await self._load(project_id)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            logger.warning(f"Vector cache load failed for project {project_id}: {e}")
+            loaded = None
+        finally:
+            if self._inflight.get(project_id) is future:
+                del self._inflight[project_id]
+        future.set_result(loaded)
+        return loaded
+
+    async def _load(self, project_id: int) -> Optional[_ProjectVectors]:
+        # Read the generation BEFORE touching the DB: a write that lands while
+        # we load bumps it, so the entry is already stale and gets reloaded.
+        gen = corpus.generation(project_id)
+        self._entries.pop(project_id, None)
+
+        stamp = await run_query(
+            lambda: (
+                supabase.table("client_knowledge")
+                .select("id", count=CountMethod.exact)
+                .eq("project_id", project_id)
+                .order("id", desc=True)
+                .limit(1)
+                .execute()
+            )
+        )
+        rows = stamp.count or 0
+        stamp_rows = json_rows(stamp.data)
+        max_id = int(stamp_rows[0]["id"]) if stamp_rows else 0
+        size = rows * (self.dimensions * 4 + 8)
+        if rows > self.max_rows or size > self.max_bytes:
+            logger.info(
+                f"Vector cache: project {project_id} has {rows} chunks, "
+                f"above the in-memory limit; using the RPC"
+            )
+            self._oversize[project_id] = (gen, time.monotonic())
+            return None
+
+        entry = self._load_mmap(project_id, rows, max_id, gen)
+        if entry is None:
+            ids, matrix = await self._fetch(project_id, max_id)
+            entry = _ProjectVectors(ids, matrix, gen, time.monotonic())
+            entry = self._save_mmap(project_id, rows, max_id, entry)
+
+        self.loads += 1
+        self._entries[project_id] = entry
+        self._entries.move_to_end(project_id)
+        self._evict()
+        logger.info(
+            f"Vector cache: loaded project {project_id} "
+            f"({len(entry.ids)} chunks, {entry.nbytes / 1e6:.1f} MB)"
+        )
+        return entry
+
+    async def _fetch(
+        self, project_id: int, max_id: int
+    ) -> Tuple[NDArray[np.int64], NDArray[np.float32]]:
+        """Keyset-paginate ``id, <column>`` for the project up to ``max_id``."""
+        column = self.column
+        ids: List[int] = []
+        vectors: List[NDArray[np.float32]] = []
+        last_id = 0
+        while True:
+            after = last_id
+            page = await run_query(
+                lambda: (
+                    supabase.table("client_knowledge")
+                    .select(f"id, {column}")
+                    .eq("project_id", project_id)
+                    .gt("id", after)
+                    .lte("id", max_id)
+                    .order("id")
+                    .limit(LOAD_PAGE_SIZE)
+                    .execute()
+                )
+            )
+            page_rows = json_rows(page.data)
+            for row in page_rows:
+                vector = parse_vector(row.get(column))
+                if vector is None or vector.shape[0] != self.dimensions:
+                    continue
+                ids.append(int(row["id"]))
+                vectors.append(vector)
+            if len(page_rows) < LOAD_PAGE_SIZE:
+                break
+            last_id = int(page_rows[-1]["id"])
+
+        if not vectors:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty((0, self.dimensions), dtype=np.float32),
+            )
+        matrix = np.stack(vectors)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return np.asarray(ids, dtype=np.int64), matrix
+
+    def _mmap_paths(self, project_id: int, rows: int, max_id: int) -> Tuple[Path, Path]:
+        assert self.mmap_dir is not None
+        model = hashlib.sha1(self.model.encode()).hexdigest()[:12]
+        stem = f"project-{project_id}-{rows}-{max_id}-{self.dimensions}-{model}"
+        if self.column != "embedding":
+            # Same rows, other vectors: never map the other column's file.
+            stem += f"-{self.column}"
+        return self.mmap_dir / f"{stem}.ids.npy", self.mmap_dir / f"{stem}.f32.npy"
+
+    def _load_mmap(
+        self, project_id: int, rows: int, max_id: int, gen: int
+    ) -> Optional[_ProjectVectors]:
+        if self.mmap_dir is None:
+            return None
+        ids_path, matrix_path = self._mmap_paths(project_id, rows, max_id)
+        try:
+            ids = np.load(ids_path, mmap_mode="r")
+            matrix = np.load(matrix_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if matrix.ndim != 2 or matrix.shape != (len(ids), self.dimensions):
+            return None
+        return _ProjectVectors(ids, matrix, gen, time.monotonic())
+
+    def _save_mmap(
+        self, project_id: int, rows: int, max_id: int, entry: _ProjectVectors
+    ) -> _ProjectVectors:
+        """Persist ``entry`` for the other workers and return its mmap'd view.
+        Best-effort: on any I/O error the in-memory entry is returned as is."""
+        if self.mmap_dir is None:
+            return entry
+        ids_path, matrix_path = self._mmap_paths(project_id, rows, max_id)
+        try:
+            self.mmap_dir.mkdir(parents=True, exist_ok=True)
+            # Drop files stamped with this project's older contents.
+            for stale in self.mmap_dir.glob(f"project-{project_id}-*.npy"):
+                if stale not in (ids_path, matrix_path):
+                    stale.unlink(missing_ok=True)
+            # Write-then-rename so a concurrently mapping worker never sees a
+            # partial file.
+            for path, array in ((ids_path, entry.ids), (matrix_path, entry.matrix)):
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                with open(tmp, "wb") as fh:
+                    np.save(fh, array)
+                os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Vector cache: could not write {matrix_path}: {e}")
+            return entry
+        return self._load_mmap(project_id, rows, max_id, entry.generation) or entry
+
+    def _evict(self) -> None:
+        total = self.nbytes
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+            self.evictions += 1
+
+
+def parse_vector(value: object) -> Optional[NDArray[np.float32]]:
+    """PostgREST returns ``vector`` columns as their text form ``"[0.1,...]"``."""
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list) or not value:
+        return None
+    return np.asarray(value, dtype=np.float32)
+
+
+def _top_k(
+    entries: Sequence[_ProjectVectors],
+    query_embedding: Sequence[float],
+    limit: int,
+    similarity_threshold: float,
+) -> List[Tuple[int, float]]:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(query))
+    if norm == 0.0:
+        return []
+    query /= norm
+
+    if len(entries) == 1:
+        ids = entries[0].ids
+        scores = entries[0].matrix @ query
+    else:
+        ids = np.concatenate([entry.ids for entry in entries])
+        scores = np.concatenate([entry.matrix @ query for entry in entries])
+    if scores.size == 0:
+        return []
+
+    if limit < scores.size:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        top = np.arange(scores.size)
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [
+        (int(ids[i]), float(scores[i])) for i in top if scores[i] > similarity_threshold
+    ]
@@ -0,0 +1,5 @@
+"""Offline and live benchmarks for the retrieval and ingestion pipelines.
+
+Run by hand, except the synthetic recall gate of ``benchmarks.retrieval``,
+which CI runs against ``retrieval_baseline.json``.
+"""
@@ -0,0 +1,213 @@
+"""Rows/s and CPU per chunk of bulk chunk inserts, PostgREST JSON vs COPY.
+
+Inserts ``--docs`` documents of ``--chunks`` chunks (``--dims``-dim unit
+embeddings, ~1000-character contents) into a scratch copy of
+``client_knowledge`` in its own schema on ``--dsn``, the two ways
+``RAGService.insert_chunks`` can:
+
+    postgrest  what a ``supabase.table("client_knowledge").insert(batch)``
+               costs both ends of PostgREST: the rows are JSON-encoded
+               (INSERT_BATCH_SIZE per request) and inserted with the
+               ``json_populate_recordset`` statement PostgREST builds for a
+               bulk insert. PostgREST's own HTTP and parsing work is not
+               included, so this flatters the current path
+    copy       ``db.direct.copy_rows``: binary COPY into a staging table and
+               one INSERT ... SELECT per document
+
+For each it reports rows/s (wall), client CPU ms per chunk (this process) and,
+when the server runs on this host, the backend's CPU ms per chunk (from
+``/proc``). ``--hnsw`` adds the production HNSW index, whose per-row upkeep
+both paths pay alike. The scratch schema is dropped at the end.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.bulk_insert --dsn postgresql://postgres@localhost/postgres
+    uv run python -m benchmarks.bulk_insert --dsn ... --docs 20 --chunks 500 --hnsw
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import configure_environment
+
+MODES = ("postgrest", "copy")
+
+SCHEMA = "bulk_insert_bench"
+
+
+def _documents(
+    docs: int, chunks: int, dims: int, seed: int
+) -> List[List[Dict[str, Any]]]:
+    """``insert_chunks``'s rows for ``docs`` documents."""
+    rng = np.random.default_rng(seed)
+    uid = str(uuid.uuid4())
+    documents = []
+    for d in range(docs):
+        vectors = rng.normal(size=(chunks, dims)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        documents.append(
+            [
+                {
+                    "uid": uid,
+                    "project_id": 1,
+                    "content": f"Document {d} chunk {i}. " + "lorem ipsum " * 80,
+                    "metadata": {"chunk_index": i, "chunk_hash": f"{d}-{i}"},
+                    "embedding": vector.tolist(),
+                    "storage_path": f"1/document-{d}.pdf",
+                    "source": "upload",
+                }
+                for i, vector in enumerate(vectors)
+            ]
+        )
+    return documents
+
+
+async def _setup(conn: Any, dims: int, hnsw: bool) -> None:
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+    await conn.execute(
+        f"""
+        CREATE TABLE {SCHEMA}.client_knowledge (
+          id             bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+          created_at     timestamptz NOT NULL DEFAULT now(),
+          uid            uuid NOT NULL,
+          content        text NOT NULL,
+          metadata       jsonb DEFAULT '{{}}'::jsonb,
+          embedding      vector({dims}),
+          project_id     bigint,
+          storage_path   text,
+          source         text NOT NULL DEFAULT 'manual',
+          embedding_next vector
+        )
+        """
+    )
+    if hnsw:
+        await conn.execute(
+            f"CREATE INDEX ON {SCHEMA}.client_knowledge "
+            "USING hnsw (embedding vector_cosine_ops)"
+        )
+
+
+async def _insert_postgrest(conn: Any, rows: List[Dict[str, Any]]) -> int:
+    from app.explore.services.rag_service import INSERT_BATCH_SIZE
+
+    columns = ", ".join(rows[0])
+    inserted = 0
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        body = json.dumps(rows[start : start + INSERT_BATCH_SIZE])
+        result = await conn.fetch(
+            f"INSERT INTO client_knowledge ({columns}) SELECT {columns} "
+            "FROM json_populate_recordset(NULL::client_knowledge, $1::json) "
+            "RETURNING id",
+            body,
+        )
+        # PostgREST returns the inserted rows as JSON; the client parses them.
+        inserted += len(json.loads(json.dumps([dict(r) for r in result])))
+    return inserted
+
+
+def _backend_cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def run_mode(
+    mode: str, dsn: str, documents: List[List[Dict[str, Any]]]
+) -> Dict[str, Optional[float]]:
+    import asyncpg
+
+    from app.explore.db import direct
+
+    conn = await asyncpg.connect(
+        dsn, server_settings={"search_path": f"{SCHEMA}, public, extensions"}
+    )
+    try:
+        await conn.execute("TRUNCATE client_knowledge")
+        pid = await conn.fetchval("SELECT pg_backend_pid()")
+        server_start = _backend_cpu_seconds(pid)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rows = 0
+        for document in documents:
+            if mode == "copy":
+                rows += len(await direct.copy_rows(conn, document))
+            else:
+                rows += await _insert_postgrest(conn, document)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        server_end = _backend_cpu_seconds(pid)
+    finally:
+        await conn.close()
+    server = (
+        (server_end - server_start) / rows * 1000
+        if server_start is not None and server_end is not None
+        else None
+    )
+    return {
+        "rows": float(rows),
+        "rows_per_s": rows / wall,
+        "client_ms": cpu / rows * 1000,
+        "server_ms": server,
+    }
+
+
+async def _main(args: argparse.Namespace) -> None:
+    import asyncpg
+
+    configure_environment()
+    documents = _documents(args.docs, args.chunks, args.dims, args.seed)
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await _setup(conn, args.dims, args.hnsw)
+    finally:
+        await conn.close()
+    try:
+        print(
+            f"{args.docs} documents x {args.chunks} chunks, {args.dims} dims"
+            f"{', HNSW index' if args.hnsw else ''}"
+        )
+        print(
+            f"{'mode':<11}{'rows/s':>9}{'client ms/chunk':>17}{'server ms/chunk':>17}"
+        )
+        for mode in MODES:
+            r = await run_mode(mode, args.dsn, documents)
+            server = r["server_ms"]
+            print(
+                f"{mode:<11}{r['rows_per_s']:>9.0f}{r['client_ms']:>17.3f}"
+                + (f"{server:>17.3f}" if server is not None else f"{'-':>17}")
+            )
+    finally:
+        conn = await asyncpg.connect(args.dsn)
+        try:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        finally:
+            await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Chunk insert throughput, PostgREST JSON vs binary COPY."
+    )
+    parser.add_argument("--dsn", required=True, help="postgres:// DSN (scratch DB)")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--hnsw", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Chunk count and embedding spend, character vs token chunk sizing.
+
+Chunks a corpus with ``PDFParser`` in both units (``CHUNK_UNIT=chars``:
+1000/200 characters; ``tokens``: ``CHUNK_TOKENS`` / ``CHUNK_OVERLAP_TOKENS``)
+and measures every chunk with the embedding model's tokenizer
+(``services/tokens.py``), reporting per corpus and unit:
+
+    chunks        how many rows (and embedding inputs) the corpus becomes
+    tok/chunk     mean, 5th / 95th percentile and max tokens per chunk; the
+                  spread is what token sizing removes
+    tokens        total tokens sent to the embeddings API (overlap included)
+    $             at ``settings.embedding_price_per_m``
+
+The corpus is synthetic text of four kinds (English prose, spreadsheet TSV,
+code, CJK prose), or with ``--dir`` every indexable file under a directory,
+extracted with ``extract_text`` and grouped by extension. ``--model`` sizes
+and measures with another embedding model's tokenizer (default
+``EMBEDDING_MODEL``); the header names the tiktoken encoding used.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.chunk_sizing
+    uv run python -m benchmarks.chunk_sizing --dir ~/project-files
+    uv run python -m benchmarks.chunk_sizing --model openai/text-embedding-3-small
+"""
+
+import argparse
+import os
+import random
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.stats import percentile
+from benchmarks.synthetic import configure_environment
+
+UNITS = ("chars", "tokens")
+
+_WORDS = (
+    "the drainage survey shows the culvert under the access road is "
+    "undersized for a ten year storm and the retaining wall needs a permit"
+).split()
+_CJK = "排水調査によると道路下の暗渠は十年確率降雨に対して断面が不足している擁壁には許可が必要です"
+
+
+def _prose(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    while sum(map(len, parts)) < chars:
+        sentences = (
+            " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 24))).capitalize()
+            for _ in range(rng.randint(2, 6))
+        )
+        parts.append(". ".join(sentences) + ".\n\n")
+    return "".join(parts)
+
+
+def _tsv(rng: random.Random, chars: int) -> str:
+    rows: List[str] = []
+    while sum(map(len, rows)) < chars:
+        n = len(rows)
+        rows.append(
+            f"PN-{n:05d}\t{rng.choice(_WORDS)}\t2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}"
+            f"\t{rng.randint(0, 10**6) / 100}\t{rng.randint(0, 500)}"
+            f"\t{rng.random():.6f}\tTrue\n"
+        )
+    return "".join(rows)
+
+
+def _code(rng: random.Random, chars: int) -> str:
+    lines: List[str] = []
+    while sum(map(len, lines)) < chars:
+        n = len(lines)
+        lines.append(
+            f"def flow_{n}(q_in, area_{n % 7}):\n"
+            f"    velocity = q_in / max(area_{n % 7}, 1e-9)  # m/s\n"
+            f"    return {{'v': velocity, 'ok': velocity < {rng.randint(1, 9)}.5}}\n\n"
+        )
+    return "".join(lines)
+
+
+def _cjk(rng: random.Random, chars: int) -> str:
+    parts: List[str] = []
+    while sum(map(len, parts)) < chars:
+        sentence = "".join(rng.choice(_CJK) for _ in range(rng.randint(20, 60)))
+        parts.append(sentence + ("。\n\n" if rng.random() < 0.3 else "。"))
+    return "".join(parts)
+
+
+def synthetic_corpus(chars: int, seed: int) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    return {
+        name: [make(rng, chars)]
+        for name, make in (
+            ("prose", _prose),
+            ("tsv", _tsv),
+            ("code", _code),
+            ("cjk", _cjk),
+        )
+    }
+
+
+def directory_corpus(root: str) -> Dict[str, List[str]]:
+    from app.explore.services.pdf_parser import extract_text
+
+    corpus: Dict[str, List[str]] = defaultdict(list)
+    for folder, _, names in os.walk(root):
+        for name in names:
+            try:
+                text = extract_text(os.path.join(folder, name), name)
+            except Exception as e:
+                print(f"skipped {name}: {e}")
+                continue
+            if text and text.strip():
+                corpus[os.path.splitext(name)[1].lower() or "(none)"].append(text)
+    return dict(corpus)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Chunk count and embedding spend, chars vs tokens sizing."
+    )
+    parser.add_argument("--dir", help="chunk the files under this directory")
+    parser.add_argument("--kb", type=int, default=512, help="synthetic KB per kind")
+    parser.add_argument("--seed", type=int, default=3)
+    parser.add_argument("--model", help="embedding model whose tokenizer to use")
+    args = parser.parse_args()
+
+    configure_environment()
+    if args.model:
+        os.environ["EMBEDDING_MODEL"] = args.model
+    from app.explore.core.config import settings
+    from app.explore.services import tokens
+    from app.explore.services.pdf_parser import PDFParser
+
+    model = settings.embedding_model
+    count = tokens.token_counter(model)
+    encoding = tokens._encoding(model)
+    print(
+        f"model {model}, tokenizer: {encoding.name if encoding else '-'}; "
+        f"chars 1000/200, tokens "
+        f"{settings.CHUNK_TOKENS}/{settings.CHUNK_OVERLAP_TOKENS}"
+    )
+    corpus = (
+        directory_corpus(args.dir)
+        if args.dir
+        else synthetic_corpus(args.kb * 1024, args.seed)
+    )
+
+    print(
+        f"{'corpus':<8}{'unit':<8}{'chunks':>8}{'mean':>7}{'p5':>6}{'p95':>6}"
+        f"{'max':>6}{'tokens':>10}{'$':>9}"
+    )
+    totals = {unit: [0.0, 0.0] for unit in UNITS}
+    for name, texts in corpus.items():
+        for unit in UNITS:
+            chunker = PDFParser(unit=unit)
+            sizes: List[float] = [
+                count(c) for text in texts for c in chunker.chunk_text(text)
+            ]
+            if not sizes:
+                continue
+            spent = sum(sizes)
+            totals[unit][0] += len(sizes)
+            totals[unit][1] += spent
+            print(
+                f"{name:<8}{unit:<8}{len(sizes):>8}{spent / len(sizes):>7.0f}"
+                f"{percentile(sizes, 5):>6.0f}{percentile(sizes, 95):>6.0f}"
+                f"{max(sizes):>6.0f}{spent:>10.0f}"
+                f"{spent / 1e6 * settings.embedding_price_per_m:>9.4f}"
+            )
+    for unit, (chunks, spent) in totals.items():
+        print(
+            f"{'total':<8}{unit:<8}{chunks:>8.0f}{'':>25}{spent:>10.0f}"
+            f"{spent / 1e6 * settings.embedding_price_per_m:>9.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Chunking throughput (MB/s), langchain's splitter vs ``services/chunking``.
+
+Chunks synthetic text shaped like each extractor's output:
+
+    txt    prose in paragraphs (blank-line separated) of a few sentences
+    pdf    ``PDFParser`` pages: whitespace-normalized lines, single newlines
+    xlsx   ``extract_text`` of a workbook: one tab-separated line per row
+
+two ways, with the parser's default 1000/200 configuration:
+
+    langchain   a ``RecursiveCharacterTextSplitter`` built per call (what
+                ``chunk_text`` did before)
+    cached      ``PDFParser.chunk_text`` on the shared ``RecursiveSplitter``
+
+each per page (``--page-chars`` characters per call, as ``upload_document``
+chunks a PDF) and whole (the full ``--mb`` in one call). Reports the best of
+``--repeat`` runs and the chunk count, and checks the chunks are identical.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.chunking
+    uv run python -m benchmarks.chunking --mb 20 --page-chars 3000
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic import configure_environment
+
+FORMATS = ("txt", "pdf", "xlsx")
+ENGINES = ("langchain", "cached")
+
+_WORDS = (
+    "invoice drainage culvert survey retaining wall easement stormwater "
+    "grading permit elevation setback parcel the of and to a in for"
+).split()
+
+
+def _words(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(low, high)))
+
+
+def _text(fmt: str, total_chars: int, rng: random.Random) -> str:
+    parts: List[str] = []
+    size = 0
+    while size < total_chars:
+        if fmt == "txt":
+            part = ". ".join(_words(rng, 6, 20) for _ in range(rng.randint(2, 8)))
+            part += ".\n\n"
+        elif fmt == "pdf":
+            part = _words(rng, 8, 14) + "\n"
+        else:
+            row = [f"item {size}", rng.choice(_WORDS), "2024-01-01 00:00:00"]
+            row.extend(str(rng.randint(0, 10**6) / 4) for _ in range(5))
+            part = "\t".join(row) + "\n"
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def _pages(text: str, page_chars: int) -> List[str]:
+    return [text[i : i + page_chars] for i in range(0, len(text), page_chars)]
+
+
+def _engine(name: str) -> Callable[[str], List[str]]:
+    from app.explore.services.pdf_parser import PDFParser
+
+    parser = PDFParser()
+    if name == "cached":
+        return parser.chunk_text
+
+    def _langchain(text: str) -> List[str]:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=parser.chunk_size,
+            chunk_overlap=parser.chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", ". ", " ", ""],
+        )
+        return [c.strip() for c in splitter.split_text(text) if c.strip()]
+
+    return _langchain
+
+
+def _time(chunk: Callable[[str], List[str]], inputs: List[str], repeat: int):
+    best = float("inf")
+    chunks: List[str] = []
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        chunks = [c for text in inputs for c in chunk(text)]
+        best = min(best, time.perf_counter() - started)
+    return best, chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Chunking throughput, langchain splitter vs cached splitter."
+    )
+    parser.add_argument("--mb", type=float, default=5.0)
+    parser.add_argument("--page-chars", type=int, default=2500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    configure_environment()
+    engines = {name: _engine(name) for name in ENGINES}
+    rng = random.Random(args.seed)
+    total_chars = int(args.mb * 1024 * 1024)
+
+    print(
+        f"{'format':<7}{'calls':<7}{'engine':<11}{'MB/s':>8}{'chunks':>9}{'speedup':>9}"
+    )
+    for fmt in FORMATS:
+        text = _text(fmt, total_chars, rng)
+        mb = len(text.encode()) / (1024 * 1024)
+        for calls, inputs in (
+            ("page", _pages(text, args.page_chars)),
+            ("whole", [text]),
+        ):
+            results: Dict[str, tuple] = {
+                name: _time(chunk, inputs, args.repeat)
+                for name, chunk in engines.items()
+            }
+            baseline = results["langchain"][0]
+            for name, (seconds, chunks) in results.items():
+                print(
+                    f"{fmt:<7}{calls:<7}{name:<11}{mb / seconds:>8.1f}"
+                    f"{len(chunks):>9}{baseline / seconds:>8.1f}x"
+                )
+            if results["cached"][1] != results["langchain"][1]:
+                print(f"{fmt}/{calls}: chunks DIFFER")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Recall@k and latency of halfvec search vs the float32 column.
+
+Two modes:
+
+``--synthetic`` (no database): builds a clustered corpus of unit vectors in
+NumPy, then compares exact float32 top-k with (a) top-k over the float16-cast
+matrix and (b) a float16 shortlist of ``k * rescore_factor`` re-ranked in
+float32. This isolates the quantization error from HNSW approximation error
+(recall only; brute-force NumPy timings say nothing about index latency).
+
+``--project-id`` (live): pulls the project's stored embeddings through the
+service-role client, uses ``--queries`` of them as query vectors, computes the
+exact float32 ground truth in NumPy, and times ``match_client_knowledge``
+against ``match_client_knowledge_halfvec`` with and without rescoring (needs
+migration 20261018000001).
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.halfvec_recall --synthetic
+    uv run python -m benchmarks.halfvec_recall --project-id 42 --queries 50
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from benchmarks.stats import percentile, recall, top_k
+
+
+def _report(name: str, recalls: List[float], latencies_ms: List[float]) -> None:
+    line = f"{name:<28} recall@k={statistics.fmean(recalls):.4f}"
+    if latencies_ms:
+        line += (
+            f"  p50={percentile(latencies_ms, 50):7.2f} ms"
+            f"  p95={percentile(latencies_ms, 95):7.2f} ms"
+        )
+    print(line)
+
+
+def run_synthetic(
+    rows: int, dims: int, queries: int, k: int, rescore_factor: int, seed: int
+) -> None:
+    rng = np.random.default_rng(seed)
+    # Clustered data: real embeddings of one project are far from isotropic,
+    # and tight clusters are where quantization flips near-ties.
+    centroids = rng.normal(size=(max(rows // 200, 1), dims)).astype(np.float32)
+    matrix = centroids[rng.integers(0, len(centroids), rows)]
+    matrix += 0.35 * rng.normal(size=matrix.shape).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    # pgvector stores halfvec as float16 but accumulates distances in float32;
+    # round-tripping through float16 models exactly that.
+    half = matrix.astype(np.float16).astype(np.float32)
+
+    query_rows = matrix[rng.choice(rows, queries, replace=False)]
+    query_rows = query_rows + 0.2 * rng.normal(size=query_rows.shape).astype(np.float32)
+    query_rows /= np.linalg.norm(query_rows, axis=1, keepdims=True)
+
+    half_recalls: List[float] = []
+    rescored_recalls: List[float] = []
+    for query in query_rows:
+        truth = top_k(matrix @ query, k).tolist()
+        half_scores = half @ query.astype(np.float16).astype(np.float32)
+        half_recalls.append(recall(top_k(half_scores, k).tolist(), truth))
+        shortlist = top_k(half_scores, min(rows, k * rescore_factor))
+        rescored = shortlist[top_k(matrix[shortlist] @ query, k)]
+        rescored_recalls.append(recall(rescored.tolist(), truth))
+
+    print(
+        f"synthetic: {rows} rows x {dims} dims, {queries} queries, k={k}, "
+        f"rescore_factor={rescore_factor}"
+    )
+    print(f"vector payload per row: float32={dims * 4} B, float16={dims * 2} B (-50%)")
+    _report("float16", half_recalls, [])
+    _report(f"float16 + rescore x{rescore_factor}", rescored_recalls, [])
+
+
+def _load_project(project_id: int) -> Tuple[List[int], NDArray[np.float32]]:
+    from app.explore.db.rows import json_rows
+    from app.explore.db.supabase import supabase
+
+    ids: List[int] = []
+    vectors: List[List[float]] = []
+    last_id = 0
+    while True:
+        page = (
+            supabase.table("client_knowledge")
+            .select("id, embedding")
+            .eq("project_id", project_id)
+            .gt("id", last_id)
+            .order("id")
+            .limit(1000)
+            .execute()
+        )
+        rows = json_rows(page.data)
+        for row in rows:
+            embedding = row.get("embedding")
+            if isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            if embedding:
+                ids.append(int(row["id"]))
+                vectors.append(embedding)
+        if len(rows) < 1000:
+            break
+        last_id = int(rows[-1]["id"])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return ids, matrix
+
+
+def run_live(
+    project_id: int, queries: int, k: int, rescore_factor: int, seed: int
+) -> None:
+    from app.explore.db.rows import json_rows
+    from app.explore.db.supabase import supabase
+
+    ids, matrix = _load_project(project_id)
+    if len(ids) <= k:
+        raise SystemExit(f"project {project_id} has only {len(ids)} embedded chunks")
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(ids), min(queries, len(ids)), replace=False)
+
+    def _rpc(name: str, extra: Dict[str, Any]) -> Callable[[List[float]], List[int]]:
+        def _call(query: List[float]) -> List[int]:
+            result = supabase.rpc(
+                name,
+                {
+                    "_query_embedding": query,
+                    "_match_count": k,
+                    "_filter_project_ids": [project_id],
+                    "_similarity_threshold": -1.0,
+                    **extra,
+                },
+            ).execute()
+            return [int(r["id"]) for r in json_rows(result.data)]
+
+        return _call
+
+    variants = {
+        "vector(1536) HNSW": _rpc("match_client_knowledge", {}),
+        "halfvec HNSW": _rpc("match_client_knowledge_halfvec", {"_rescore_factor": 0}),
+        f"halfvec + rescore x{rescore_factor}": _rpc(
+            "match_client_knowledge_halfvec", {"_rescore_factor": rescore_factor}
+        ),
+    }
+    recalls: Dict[str, List[float]] = {name: [] for name in variants}
+    latencies: Dict[str, List[float]] = {name: [] for name in variants}
+    id_array = np.asarray(ids)
+    for pick in picks:
+        query = matrix[pick]
+        truth = id_array[top_k(matrix @ query, k)].tolist()
+        for name, call in variants.items():
+            started = time.perf_counter()
+            found = call(query.tolist())
+            latencies[name].append((time.perf_counter() - started) * 1000)
+            recalls[name].append(recall(found, truth))
+
+    print(
+        f"project {project_id}: {len(ids)} chunks, {len(picks)} queries, k={k} "
+        f"(latency includes the PostgREST round-trip)"
+    )
+    for name in variants:
+        _report(name, recalls[name], latencies[name])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recall@k and latency of halfvec search vs the float32 column."
+    )
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--synthetic", action="store_true")
+    mode.add_argument("--project-id", type=int)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(
+            args.rows, args.dims, args.queries, args.k, args.rescore_factor, args.seed
+        )
+    else:
+        run_live(args.project_id, args.queries, args.k, args.rescore_factor, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Upload ingestion throughput (pages/second), per-page vs whole-document.
+
+Stores the same synthetic document two ways with the real service code:
+
+    per-page   one ``RAGService.store_document`` call per page (the upload
+               path before whole-document ingestion)
+    document   one ``RAGService.store_pages`` call (chunks every page in one
+               pass, embeds across page boundaries in shared sub-batches and
+               inserts in ``INSERT_BATCH_SIZE`` groups)
+
+Embeddings come from the hash embedder and inserts go to
+``benchmarks.synthetic.KnowledgeSink``; ``--embed-ms`` and ``--insert-ms`` /
+``--insert-row-ms`` simulate the provider and database round-trips, which are
+what dominate in production. Pages default to ~2,500 characters (a dense PDF
+page); use ``--words-per-page 20`` for a slide deck of one-line pages.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.ingestion
+    uv run python -m benchmarks.ingestion --pages 300 --embed-ms 400
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List
+from unittest.mock import patch
+
+from benchmarks.synthetic import (
+    Corpus,
+    HashEmbedder,
+    KnowledgeSink,
+    configure_environment,
+)
+
+MODES = ("per-page", "document")
+
+
+def _pages(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    corpus = Corpus.generate(
+        args.pages, 1, seed=args.seed, words_per_chunk=args.words_per_page
+    )
+    return [
+        {
+            "content": content,
+            "metadata": {
+                "filename": "benchmark.pdf",
+                "page_number": n,
+                "total_pages": args.pages,
+                "file_type": "pdf",
+            },
+        }
+        for n, content in enumerate(corpus.contents, start=1)
+    ]
+
+
+async def run_mode(
+    mode: str, pages: List[Dict[str, Any]], args: argparse.Namespace
+) -> Dict[str, float]:
+    from app.explore.services import rag_service
+
+    embedder = HashEmbedder(args.dims, seed=args.seed)
+    client = embedder.embeddings_client(latency_ms=args.embed_ms)
+    requests = 0
+    create = client.embeddings.create
+
+    async def counted(*a: Any, **kw: Any) -> Any:
+        nonlocal requests
+        requests += 1
+        return await create(*a, **kw)
+
+    client.embeddings.create = counted
+    sink = KnowledgeSink(latency_ms=args.insert_ms, row_ms=args.insert_row_ms)
+    with patch.object(rag_service, "supabase", sink):
+        service = rag_service.RAGService()
+        service.client = client
+        started = time.perf_counter()
+        if mode == "per-page":
+            for page in pages:
+                await service.store_document(
+                    content=page["content"],
+                    metadata=dict(page["metadata"]),
+                    client_id="benchmark",
+                    project_id=1,
+                )
+        else:
+            await service.store_pages(pages, client_id="benchmark", project_id=1)
+        elapsed = time.perf_counter() - started
+    return {
+        "seconds": elapsed,
+        "pages_per_second": len(pages) / elapsed,
+        "chunks": float(len(sink.rows)),
+        "embedding_requests": float(requests),
+        "inserts": float(sink.statements),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Upload ingestion pages/second, per-page vs whole-document."
+    )
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--embed-ms", type=float, default=150.0)
+    parser.add_argument("--insert-ms", type=float, default=20.0)
+    parser.add_argument("--insert-row-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configure_environment()
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    pages = _pages(args)
+    print(
+        f"{args.pages} pages (~{args.words_per_page} words each), "
+        f"embed {args.embed_ms:g} ms/request, insert {args.insert_ms:g} ms "
+        f"+ {args.insert_row_ms:g} ms/row"
+    )
+    print(
+        f"{'mode':<10}{'seconds':>9}{'pages/s':>10}{'chunks':>8}"
+        f"{'embed reqs':>12}{'inserts':>9}"
+    )
+    results = {mode: asyncio.run(run_mode(mode, pages, args)) for mode in MODES}
+    for mode, r in results.items():
+        print(
+            f"{mode:<10}{r['seconds']:>9.2f}{r['pages_per_second']:>10.1f}"
+            f"{int(r['chunks']):>8}{int(r['embedding_requests']):>12}"
+            f"{int(r['inserts']):>9}"
+        )
+    speedup = (
+        results["document"]["pages_per_second"]
+        / results["per-page"]["pages_per_second"]
+    )
+    print(f"speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Office text extraction: the library extractors vs the streaming XML engine.
+
+Builds one large document of each Office type with python-docx, python-pptx
+and openpyxl (``--paragraphs`` paragraphs, ``--slides`` slides, ``--rows``
+rows of ``--cols`` cells) and extracts it through ``pdf_parser.extract_text``
+with ``OFFICE_XML_EXTRACTION`` off (``library``) and on (``lean``):
+
+    library    python-docx / python-pptx / openpyxl read-only, each reopening
+               the archive after the zip-bomb check and building its model
+    lean       ``services/office_xml.py``: one ``ZipFile``, the text parts
+               stream-parsed with ``iterparse``
+
+Each (format, engine) pair runs in a fresh process and reports the best of
+``--repeat`` wall times and the peak RSS (``ru_maxrss``) above the
+post-import baseline. The two engines' outputs are compared, too.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.office
+    uv run python -m benchmarks.office --paragraphs 50000 --rows 100000
+"""
+
+import argparse
+import datetime
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Dict, Tuple, cast
+
+from benchmarks.stats import peak_rss_mb
+from benchmarks.synthetic import configure_environment
+
+ENGINES = ("library", "lean")
+FORMATS = ("docx", "pptx", "xlsx")
+
+_WORDS = (
+    "invoice drainage culvert survey retaining wall easement stormwater "
+    "grading permit elevation setback parcel"
+).split()
+
+
+def _sentence(n: int, words: int = 24) -> str:
+    return " ".join(_WORDS[(n + i) % len(_WORDS)] for i in range(words))
+
+
+def _write_docx(path: str, paragraphs: int) -> None:
+    from docx import Document
+
+    document = Document()
+    for n in range(paragraphs):
+        if n % 50 == 0:
+            document.add_heading(f"Section {n // 50 + 1}", 1)
+        document.add_paragraph(_sentence(n))
+    document.save(path)
+
+
+def _write_pptx(path: str, slides: int) -> None:
+    from pptx import Presentation
+    from pptx.shapes.autoshape import Shape
+
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for n in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        title = slide.shapes.title
+        if title is not None:
+            title.text = f"Slide {n + 1}"
+        cast(Shape, slide.placeholders[1]).text_frame.text = "\n".join(
+            _sentence(n + i, 12) for i in range(6)
+        )
+    presentation.save(path)
+
+
+def _write_xlsx(path: str, rows: int, cols: int) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    start = datetime.datetime(2024, 1, 1)
+    for n in range(rows):
+        row = [f"item {n}", _WORDS[n % len(_WORDS)], start + datetime.timedelta(n)]
+        row.extend(n * 0.5 + c for c in range(max(0, cols - len(row))))
+        sheet.append(row)
+    workbook.save(path)
+
+
+def _run(engine: str, path: str, repeat: int, queue: "multiprocessing.Queue") -> None:
+    configure_environment()
+    os.environ["OFFICE_XML_EXTRACTION"] = "true" if engine == "lean" else "false"
+    # Import both engines' dependencies before taking the baseline.
+    import docx  # noqa: F401
+    import openpyxl  # noqa: F401
+    import openpyxl.styles.numbers  # noqa: F401
+    import openpyxl.utils.datetime  # noqa: F401
+    import pptx  # noqa: F401
+
+    from app.explore.services.pdf_parser import extract_text
+
+    baseline = peak_rss_mb()
+    best = float("inf")
+    text = ""
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        text = extract_text(path, os.path.basename(path)) or ""
+        best = min(best, time.perf_counter() - started)
+    queue.put(
+        {
+            "seconds": best,
+            "peak_mb": peak_rss_mb() - baseline,
+            "chars": len(text),
+            "digest": hashlib.sha256(text.encode()).hexdigest(),
+        }
+    )
+
+
+def run_engine(engine: str, path: str, repeat: int) -> Dict[str, object]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(engine, path, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _write(fmt: str, path: str, args: argparse.Namespace) -> str:
+    if fmt == "docx":
+        _write_docx(path, args.paragraphs)
+        return f"{args.paragraphs} paragraphs"
+    if fmt == "pptx":
+        _write_pptx(path, args.slides)
+        return f"{args.slides} slides"
+    _write_xlsx(path, args.rows, args.cols)
+    return f"{args.rows}x{args.cols} cells"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Office text extraction, library extractors vs streaming XML."
+    )
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--slides", type=int, default=500)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--cols", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'format':<7}{'document':>20}{'MB':>7}{'engine':>9}{'seconds':>9}"
+        f"{'peak MB':>9}{'chars':>10}"
+    )
+    results: Dict[Tuple[str, str], Dict[str, object]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"benchmark.{fmt}")
+            described = _write(fmt, path, args)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            for engine in ENGINES:
+                r = results[fmt, engine] = run_engine(engine, path, args.repeat)
+                print(
+                    f"{fmt:<7}{described:>20}{size_mb:>7.1f}{engine:>9}"
+                    f"{r['seconds']:>9.2f}{r['peak_mb']:>9.1f}{r['chars']:>10}"
+                )
+    for fmt in FORMATS:
+        same = results[fmt, "library"]["digest"] == results[fmt, "lean"]["digest"]
+        print(f"{fmt}: outputs {'identical' if same else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
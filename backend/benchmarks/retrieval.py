@@ -0,0 +1,318 @@
+"""Per-stage latency and recall@k of ``RAGService.retrieve_relevant``, offline.
+
+Runs the real service code against the stand-ins in ``benchmarks.synthetic``:
+a synthetic corpus (``--sizes`` chunks spread over ``--projects`` projects),
+the hash embedder in place of OpenRouter embeddings, an in-memory
+``match_client_knowledge`` / ``keyword_search_client_knowledge`` in place of
+Supabase and an exact-cosine reranker in place of the rerank endpoint. The
+two-RPC path is benchmarked (``HYBRID_SEARCH_FUSED`` off) so each stage is
+timed on its own:
+
+    embed    generate_embedding (query embedding, caches cleared per query)
+    vector   search_documents, excluding the embedding it awaits
+    keyword  _keyword_search
+    fuse     _reciprocal_rank_fusion
+    rerank   rerank
+    total    retrieve_relevant, including MMR
+
+Recall@k compares against exact cosine top-k over the query's project with
+the same embedder: ``vector`` is the vector leg's top k, ``candidates`` the
+share of the true top k that survives into the fused reranker input and
+``final`` what retrieve_relevant returns (so it includes MMR's trade-off).
+Every input is seeded, so recall is reproducible to the last digit; latency
+is the Python-side cost unless ``--embed-ms`` / ``--rpc-ms`` / ``--rerank-ms``
+add simulated round-trips.
+
+As a regression gate it exits non-zero when ``final`` recall drops below
+``--min-recall``, total p95 exceeds ``--max-p95-ms``, MMR is on but fell
+back to the plain rerank order (``mmr.fallbacks``: its embedding fetch
+failed, so ``final`` no longer measures MMR), or a run is worse than
+a ``--baseline`` file written earlier by ``--save-baseline`` (latency by more
+than ``--latency-tolerance``, recall by more than ``--recall-tolerance``).
+
+``benchmarks/retrieval_baseline.json`` holds recall only (latency baselines
+are machine-specific) and is what CI gates on. Recall below ~10k chunks is
+capped by ``MIN_VECTOR_SIMILARITY``: small projects have true neighbours
+under the threshold, which the vector leg drops by design.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.retrieval
+    uv run python -m benchmarks.retrieval --sizes 1000,10000 \
+        --baseline benchmarks/retrieval_baseline.json
+    uv run python -m benchmarks.retrieval --save-baseline /tmp/retrieval.json
+    uv run python -m benchmarks.retrieval --baseline /tmp/retrieval.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import statistics
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from benchmarks.stats import percentile, recall
+from benchmarks.synthetic import (
+    Corpus,
+    HashEmbedder,
+    InMemoryKnowledge,
+    RerankClient,
+    configure_environment,
+)
+
+STAGES = ("embed", "vector", "keyword", "fuse", "rerank", "total")
+RECALLS = ("vector", "candidates", "final")
+
+# Embedding time spent inside the current search_documents call, so the
+# vector stage can be reported without it.
+_nested_embed_ms: contextvars.ContextVar[Optional[List[float]]] = (
+    contextvars.ContextVar("_nested_embed_ms", default=None)
+)
+
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+
+def _instrument(
+    service: Any, timings: Dict[str, List[float]], legs: Dict[str, List[Any]]
+) -> None:
+    """Wrap the stage methods of ``service`` (an instance) to record their
+    latency in ``timings`` and the vector leg / fused candidates in ``legs``."""
+    generate_embedding = service.generate_embedding
+    search_documents = service.search_documents
+    keyword_search = service._keyword_search
+    fuse = service._reciprocal_rank_fusion
+    rerank = service.rerank
+
+    async def timed_embedding(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await generate_embedding(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            timings["embed"].append(elapsed)
+            nested = _nested_embed_ms.get()
+            if nested is not None:
+                nested.append(elapsed)
+
+    async def timed_vector(*args: Any, **kwargs: Any) -> Any:
+        nested: List[float] = []
+        token = _nested_embed_ms.set(nested)
+        started = time.perf_counter()
+        try:
+            docs = await search_documents(*args, **kwargs)
+            legs["vector"] = [doc["id"] for doc in docs]
+            return docs
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            timings["vector"].append(elapsed - sum(nested))
+            _nested_embed_ms.reset(token)
+
+    async def timed_keyword(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await keyword_search(*args, **kwargs)
+        finally:
+            timings["keyword"].append((time.perf_counter() - started) * 1000)
+
+    def timed_fuse(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        docs = fuse(*args, **kwargs)
+        timings["fuse"].append((time.perf_counter() - started) * 1000)
+        legs["candidates"] = [doc["id"] for doc in docs]
+        return docs
+
+    async def timed_rerank(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await rerank(*args, **kwargs)
+        finally:
+            timings["rerank"].append((time.perf_counter() - started) * 1000)
+
+    setattr(service, "generate_embedding", timed_embedding)
+    setattr(service, "search_documents", timed_vector)
+    setattr(service, "_keyword_search", timed_keyword)
+    setattr(service, "_reciprocal_rank_fusion", timed_fuse)
+    setattr(service, "rerank", timed_rerank)
+
+
+async def run_size(
+    chunks: int, args: argparse.Namespace
+) -> Dict[str, Dict[str, float]]:
+    from app.explore.core import metrics
+    from app.explore.core.config import settings
+    from app.explore.services import rag_service
+
+    started = time.perf_counter()
+    corpus = Corpus.generate(chunks, args.projects, seed=args.seed)
+    embedder = HashEmbedder(args.dims, seed=args.seed)
+    store = InMemoryKnowledge(
+        corpus, embedder.embed(corpus.contents), latency_ms=args.rpc_ms
+    )
+    print(
+        f"\n{chunks} chunks / {args.projects} projects, {args.queries} queries, "
+        f"k={args.k}, dims={args.dims} "
+        f"(corpus built in {time.perf_counter() - started:.1f} s)"
+    )
+
+    caches = [
+        rag_service._query_embedding_cache,
+        rag_service._rerank_cache,
+        rag_service._retrieval_cache,
+    ]
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    recalls: Dict[str, List[float]] = {name: [] for name in RECALLS}
+    rerank_client = RerankClient(embedder, latency_ms=args.rerank_ms)
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(rag_service, "supabase", store))
+        stack.enter_context(
+            patch.object(rag_service, "get_http_client", lambda: rerank_client)
+        )
+        for name, value in {
+            "HYBRID_SEARCH_FUSED": False,
+            "VECTOR_SEARCH_HALFVEC": False,
+            "MMR_LAMBDA": args.mmr_lambda,
+        }.items():
+            stack.enter_context(patch.object(settings, name, value))
+
+        service = rag_service.RAGService()
+        service.client = embedder.embeddings_client(latency_ms=args.embed_ms)
+        legs: Dict[str, List[Any]] = {}
+        _instrument(service, timings, legs)
+        fallbacks = metrics.value("mmr.fallbacks")
+
+        for project_id, query in corpus.queries(args.queries, seed=args.seed + 1):
+            if not args.warm:
+                for cache in caches:
+                    cache.invalidate()
+            legs.clear()
+            started = time.perf_counter()
+            docs = await service.retrieve_relevant(
+                query, [project_id], top_n=args.k, strict=True
+            )
+            timings["total"].append((time.perf_counter() - started) * 1000)
+
+            truth = store.exact_top_k(embedder.embed([query])[0], [project_id], args.k)
+            recalls["vector"].append(recall(legs.get("vector", [])[: args.k], truth))
+            recalls["candidates"].append(recall(legs.get("candidates", []), truth))
+            recalls["final"].append(recall([doc["id"] for doc in docs], truth))
+        fallbacks = metrics.value("mmr.fallbacks") - fallbacks
+
+    print(f"{'stage':<10}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    result: Dict[str, Dict[str, float]] = {
+        "p95_ms": {},
+        "recall": {},
+        "mmr": {"fallbacks": float(fallbacks)},
+    }
+    for stage in STAGES:
+        values = timings[stage]
+        if not values:
+            print(f"{stage:<10}{0:>7}")
+            continue
+        print(
+            f"{stage:<10}{len(values):>7}"
+            f"{percentile(values, 50):>10.3f}"
+            f"{percentile(values, 95):>10.3f}"
+            f"{percentile(values, 99):>10.3f}"
+        )
+        result["p95_ms"][stage] = percentile(values, 95)
+    for name in RECALLS:
+        result["recall"][name] = statistics.fmean(recalls[name])
+    print(
+        f"recall@{args.k}: "
+        + "  ".join(f"{name}={result['recall'][name]:.4f}" for name in RECALLS)
+    )
+    return result
+
+
+def check(results: Results, args: argparse.Namespace) -> List[str]:
+    """Gate violations of ``results`` (empty when the run passes)."""
+    failures: List[str] = []
+    baseline: Results = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    for size, result in results.items():
+        final = result["recall"]["final"]
+        if args.min_recall is not None and final < args.min_recall:
+            failures.append(f"{size}: final recall {final:.4f} < {args.min_recall}")
+        mmr_fallbacks = result.get("mmr", {}).get("fallbacks", 0.0)
+        if mmr_fallbacks:
+            failures.append(
+                f"{size}: MMR fell back to rerank order on {mmr_fallbacks:.0f} "
+                "queries (see the 'MMR embedding fetch failed' warning)"
+            )
+        total = result["p95_ms"].get("total", 0.0)
+        if args.max_p95_ms is not None and total > args.max_p95_ms:
+            failures.append(f"{size}: total p95 {total:.2f} ms > {args.max_p95_ms} ms")
+        base = baseline.get(size)
+        if base is None:
+            continue
+        for name, value in base.get("recall", {}).items():
+            current = result["recall"].get(name, 0.0)
+            if current < value - args.recall_tolerance:
+                failures.append(
+                    f"{size}: {name} recall {current:.4f} < baseline {value:.4f}"
+                )
+        for stage, value in base.get("p95_ms", {}).items():
+            current = result["p95_ms"].get(stage)
+            if current is not None and current > value * (1 + args.latency_tolerance):
+                failures.append(
+                    f"{size}: {stage} p95 {current:.3f} ms > baseline "
+                    f"{value:.3f} ms + {args.latency_tolerance:.0%}"
+                )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Per-stage latency and recall@k of retrieve_relevant, offline."
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000,100000", help="comma-separated chunk counts"
+    )
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--mmr-lambda", type=float, default=0.7)
+    parser.add_argument("--embed-ms", type=float, default=0.0)
+    parser.add_argument("--rpc-ms", type=float, default=0.0)
+    parser.add_argument("--rerank-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--warm", action="store_true", help="keep the retrieval caches between queries"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-recall", type=float)
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--baseline")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--latency-tolerance", type=float, default=0.25)
+    parser.add_argument("--recall-tolerance", type=float, default=0.01)
+    args = parser.parse_args()
+
+    configure_environment()
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    results: Results = {}
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        results[str(size)] = asyncio.run(run_size(size, args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nbaseline written to {args.save_baseline}")
+
+    failures = check(results, args)
+    if failures:
+        print("\nREGRESSION:")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Small helpers shared by the benchmarks: recall, exact top-k, percentiles,
+peak RSS."""
+
+import resource
+import sys
+from typing import List, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+def recall(found: Sequence[int], truth: Sequence[int]) -> float:
+    """Fraction of ``truth`` present in ``found`` (1.0 for an empty truth)."""
+    return len(set(found) & set(truth)) / len(truth) if truth else 1.0
+
+
+def top_k(scores: NDArray[np.float32], k: int) -> NDArray[np.intp]:
+    """Indices of the ``k`` highest ``scores``, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (``values`` must be non-empty)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    """This process's peak resident set size so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,435 @@
+"""Synthetic corpus and in-process stand-ins for the retrieval pipeline's I/O.
+
+Everything ``RAGService.retrieve_relevant`` talks to can be replaced by the
+objects here, so the real service code runs end to end with no network:
+
+``Corpus``
+    Chunks spread across many projects. Each project writes about a few
+    topics (topic words drawn from a shared pseudo-word vocabulary), mixed
+    with filler words common to every document, so projects overlap
+    lexically the way real tenants do.
+
+``HashEmbedder``
+    A deterministic bag-of-words embedder: every token maps to a fixed random
+    direction seeded from its hash, and a text is the normalized sum of its
+    tokens plus a shared "domain" offset. The offset puts unrelated texts at
+    cosine ~0.15 and related ones well above ``MIN_VECTOR_SIMILARITY``, like
+    the production model. ``embeddings_client()`` wraps it in an object that
+    answers ``client.embeddings.create(...)`` like ``AsyncOpenAI``.
+
+``InMemoryKnowledge``
+    Answers the two search RPCs (``match_client_knowledge`` by exact cosine,
+    ``keyword_search_client_knowledge`` with ``plainto_tsquery`` AND
+    semantics and a term-frequency rank) and the ``client_knowledge`` select
+    by id (optionally scoped with ``_scope_or_filter``'s ``or_``), through the
+    same ``.rpc(...).execute()`` / ``.table(...)`` chain as the supabase
+    client.
+
+``KnowledgeSink``
+    Accepts ``client_knowledge`` inserts (``.table(...).insert(rows)``) and
+    hands back ids, for the ingestion benchmarks.
+
+``RerankClient``
+    Stands in for the shared httpx client on the rerank endpoint, scoring
+    each candidate by exact cosine to the query (a perfect cross-encoder with
+    respect to the embedder), so recall losses measure first-stage retrieval
+    and MMR, not reranker noise.
+
+Simulated latencies (``*_ms``) default to zero; the benchmark then measures
+the Python-side cost of each stage.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from benchmarks.stats import top_k
+
+_TOKEN_RE = re.compile(r"\w+")
+
+_SYLLABLES = [
+    c + v for c in "bdfgklmnprstvz" for v in ("a", "e", "i", "o", "u", "ai", "ou")
+]
+
+
+def configure_environment() -> None:
+    """Environment for importing ``app.explore`` offline: Settings validation
+    needs these, and nothing here ever reaches the network."""
+    for name, value in {
+        "SUPABASE_URL": "https://benchmark.invalid",
+        "SUPABASE_PUBLIC_KEY": "benchmark",
+        "SUPABASE_SECRET_KEY": "benchmark",
+        "OPEN_ROUTER_KEY": "benchmark",
+    }.items():
+        os.environ.setdefault(name, value)
+    # The module-level vector cache reads this at import: keep it off so the
+    # vector stage goes through the (stand-in) RPC.
+    os.environ["VECTOR_CACHE_ENABLED"] = "false"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _vocabulary(size: int, rng: np.random.Generator) -> List[str]:
+    words: Dict[str, None] = {}
+    while len(words) < size:
+        count = int(rng.integers(2, 5))
+        words[
+            "".join(_SYLLABLES[i] for i in rng.integers(0, len(_SYLLABLES), count))
+        ] = None
+    return list(words)
+
+
+@dataclass
+class Corpus:
+    """Chunk texts with their project assignment (row ``i`` has id ``i + 1``)."""
+
+    contents: List[str]
+    project_ids: NDArray[np.int64]
+    filler_words: List[str] = field(repr=False)
+
+    @classmethod
+    def generate(
+        cls,
+        chunks: int,
+        projects: int,
+        seed: int = 0,
+        words_per_chunk: int = 80,
+        topics_per_project: int = 3,
+    ) -> "Corpus":
+        rng = np.random.default_rng(seed)
+        topic_count = max(projects * topics_per_project // 2, topics_per_project)
+        vocabulary = _vocabulary(topic_count * 40 + 2_000, rng)
+        filler = vocabulary[:2_000]
+        topics = [
+            vocabulary[2_000 + t * 40 : 2_000 + (t + 1) * 40]
+            for t in range(topic_count)
+        ]
+        # Topics are shared between pairs of projects on average.
+        project_topics = [
+            rng.choice(topic_count, topics_per_project, replace=False)
+            for _ in range(projects)
+        ]
+        # Zipf-ish filler frequencies, like function words in real prose.
+        filler_p = 1.0 / np.arange(1, len(filler) + 1)
+        filler_p /= filler_p.sum()
+
+        project_ids = rng.integers(1, projects + 1, chunks).astype(np.int64)
+        contents: List[str] = []
+        for project_id in project_ids:
+            topic = topics[int(rng.choice(project_topics[project_id - 1]))]
+            topical = int(words_per_chunk * 0.5)
+            words = [topic[i] for i in rng.integers(0, len(topic), topical)]
+            words += [
+                filler[i]
+                for i in rng.choice(len(filler), words_per_chunk - topical, p=filler_p)
+            ]
+            rng.shuffle(words)
+            contents.append(" ".join(words))
+        return cls(contents, project_ids, filler)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def queries(
+        self, count: int, words: int = 4, seed: int = 1
+    ) -> List[Tuple[int, str]]:
+        """``count`` (project_id, query) pairs. Each query is ``words`` distinct
+        non-filler words of one random chunk, so both legs can find it."""
+        rng = np.random.default_rng(seed)
+        filler = set(self.filler_words[:200])
+        pairs: List[Tuple[int, str]] = []
+        while len(pairs) < count:
+            row = int(rng.integers(0, len(self.contents)))
+            candidates = sorted(set(tokenize(self.contents[row])) - filler)
+            if len(candidates) < words:
+                continue
+            picked = rng.choice(len(candidates), words, replace=False)
+            query = " ".join(candidates[i] for i in picked)
+            pairs.append((int(self.project_ids[row]), query))
+        return pairs
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words embedder (see module docstring)."""
+
+    # Weight of the shared direction: unrelated texts land at ~b^2 / (1 + b^2).
+    DOMAIN_WEIGHT: float = 0.42
+
+    def __init__(self, dimensions: int = 384, seed: int = 0):
+        self.dimensions = dimensions
+        self._seed = seed
+        self._token_vectors: Dict[str, NDArray[np.float32]] = {}
+        domain = np.random.default_rng(seed).standard_normal(dimensions)
+        self._domain = (domain / np.linalg.norm(domain)).astype(np.float32)
+
+    def _token_vector(self, token: str) -> NDArray[np.float32]:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            digest = hashlib.blake2b(
+                f"{self._seed}:{token}".encode("utf-8"), digest_size=8
+            ).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vector = rng.standard_normal(self.dimensions).astype(np.float32)
+            vector /= np.linalg.norm(vector)
+            self._token_vectors[token] = vector
+        return vector
+
+    def embed(self, texts: Sequence[str]) -> NDArray[np.float32]:
+        """Unit-normalized embeddings, one row per text."""
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            bag = (
+                np.sum([self._token_vector(t) for t in tokens], axis=0)
+                if tokens
+                else np.zeros(self.dimensions, dtype=np.float32)
+            )
+            norm = float(np.linalg.norm(bag))
+            if norm > 0:
+                bag /= norm
+            vector = bag + self.DOMAIN_WEIGHT * self._domain
+            out[row] = vector / np.linalg.norm(vector)
+        return out
+
+    def embeddings_client(self, latency_ms: float = 0.0) -> Any:
+        """An object usable as ``RAGService.client`` (only ``embeddings``)."""
+        embedder = self
+
+        class _Embeddings:
+            async def create(self, *, input: Any, **_: Any) -> Any:
+                if latency_ms:
+                    await asyncio.sleep(latency_ms / 1000)
+                texts = [input] if isinstance(input, str) else list(input)
+                vectors = embedder.embed(texts)
+                return SimpleNamespace(
+                    data=[SimpleNamespace(embedding=v.tolist()) for v in vectors]
+                )
+
+        return SimpleNamespace(embeddings=_Embeddings())
+
+
+class InMemoryKnowledge:
+    """Exact stand-in for the search RPCs and id selects (see module docstring)."""
+
+    def __init__(
+        self, corpus: Corpus, embeddings: NDArray[np.float32], latency_ms: float = 0.0
+    ):
+        self.corpus = corpus
+        self.embeddings = embeddings
+        self.latency_ms = latency_ms
+        self._vector_text: Dict[int, str] = {}
+        self._rows_by_project: Dict[int, NDArray[np.intp]] = {}
+        order = np.argsort(corpus.project_ids, kind="stable")
+        bounds = np.searchsorted(
+            corpus.project_ids[order], np.unique(corpus.project_ids), side="left"
+        )
+        for project_id, rows in zip(
+            np.unique(corpus.project_ids), np.split(order, bounds[1:])
+        ):
+            self._rows_by_project[int(project_id)] = rows
+        # Inverted index: token -> {row: term frequency}.
+        self._postings: Dict[str, Dict[int, int]] = {}
+        for row, content in enumerate(corpus.contents):
+            for token in tokenize(content):
+                counts = self._postings.setdefault(token, {})
+                counts[row] = counts.get(row, 0) + 1
+
+    def vector_text(self, row: int) -> str:
+        """A row's embedding as PostgREST returns ``vector`` columns (text),
+        formatted once so the stand-in doesn't dominate the fetch it serves."""
+        text = self._vector_text.get(row)
+        if text is None:
+            text = "[" + ",".join(f"{x:.6g}" for x in self.embeddings[row]) + "]"
+            self._vector_text[row] = text
+        return text
+
+    def scope_rows(self, project_ids: Optional[Sequence[int]]) -> NDArray[np.intp]:
+        rows = [self._rows_by_project.get(int(p)) for p in project_ids or []]
+        found = [r for r in rows if r is not None]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+    def exact_top_k(
+        self, query_embedding: NDArray[np.float32], project_ids: Sequence[int], k: int
+    ) -> List[int]:
+        """Ground truth: ids of the ``k`` nearest chunks in scope."""
+        rows = self.scope_rows(project_ids)
+        scores = self.embeddings[rows] @ query_embedding
+        return [int(rows[i]) + 1 for i in top_k(scores, k)]
+
+    def _row(self, row: int, **extra: Any) -> Dict[str, Any]:
+        return {
+            "id": row + 1,
+            "content": self.corpus.contents[row],
+            "metadata": {"project_id": int(self.corpus.project_ids[row])},
+            **extra,
+        }
+
+    def _match(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rows = self.scope_rows(params.get("_filter_project_ids"))
+        query = np.asarray(params["_query_embedding"], dtype=np.float32)
+        scores = self.embeddings[rows] @ query
+        threshold = params.get("_similarity_threshold", 0.0)
+        return [
+            self._row(int(rows[i]), similarity=float(scores[i]))
+            for i in top_k(scores, params.get("_match_count", 10))
+            if scores[i] >= threshold
+        ]
+
+    def _keyword(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        terms = sorted(set(tokenize(params.get("_query") or "")))
+        if not terms:
+            return []
+        scope = set(self.scope_rows(params.get("_filter_project_ids")).tolist())
+        postings = [self._postings.get(t, {}) for t in terms]
+        postings.sort(key=len)
+        matches = [
+            row
+            for row in postings[0]
+            if row in scope and all(row in p for p in postings[1:])
+        ]
+        # ts_rank without length normalization grows with term frequency.
+        ranks = {row: 0.1 * sum(np.log1p(p[row]) for p in postings) for row in matches}
+        best = sorted(matches, key=lambda row: (-ranks[row], row))
+        return [
+            self._row(row, rank=ranks[row])
+            for row in best[: params.get("_match_count", 10)]
+        ]
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> Any:
+        handlers = {
+            "match_client_knowledge": self._match,
+            "keyword_search_client_knowledge": self._keyword,
+        }
+        if name not in handlers:
+            raise RuntimeError(f"function public.{name} is not emulated")
+        return _Query(self, lambda: handlers[name](params))
+
+    def table(self, name: str) -> "_Select":
+        if name != "client_knowledge":
+            raise RuntimeError(f"table {name} is not emulated")
+        return _Select(self)
+
+
+class _Query:
+    def __init__(self, store: InMemoryKnowledge, run: Any):
+        self._store = store
+        self._run = run
+
+    def execute(self) -> Any:
+        if self._store.latency_ms:
+            time.sleep(self._store.latency_ms / 1000)
+        return SimpleNamespace(data=self._run())
+
+
+class _Select:
+    """``.select(columns).or_(scope).in_("id", ids).execute()`` over the
+    corpus. ``scope`` is ``RAGService._scope_or_filter``'s: ``project_id.in``
+    matches by project; the synthetic corpus has no legacy NULL-project rows,
+    so a ``project_id.is.null`` clause matches nothing."""
+
+    _PROJECTS = re.compile(r"project_id\.in\.\(([\d,]*)\)")
+    _LEGACY = re.compile(r"and\(uid\.eq\.[0-9a-fA-F-]+,project_id\.is\.null\)")
+
+    def __init__(self, store: InMemoryKnowledge):
+        self._store = store
+        self._columns: List[str] = []
+        self._ids: List[int] = []
+        self._projects: Optional[Set[int]] = None
+
+    def select(self, columns: str) -> "_Select":
+        self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def or_(self, scope: str) -> "_Select":
+        projects: Set[int] = set()
+        rest = self._LEGACY.sub("", self._PROJECTS.sub("", scope)).strip(",")
+        if rest:
+            raise RuntimeError(f"filter {rest!r} is not emulated")
+        for match in self._PROJECTS.finditer(scope):
+            projects.update(int(p) for p in match.group(1).split(",") if p)
+        self._projects = projects
+        return self
+
+    def in_(self, column: str, values: Sequence[int]) -> "_Select":
+        if column != "id":
+            raise RuntimeError(f"filter on {column} is not emulated")
+        self._ids = [int(v) for v in values]
+        return self
+
+    def _project(self, chunk_id: int) -> Dict[str, Any]:
+        row = self._store._row(chunk_id - 1)
+        if "embedding" in self._columns:
+            row["embedding"] = self._store.vector_text(chunk_id - 1)
+        return {c: row[c] for c in self._columns}
+
+    def execute(self) -> Any:
+        valid = [
+            i
+            for i in self._ids
+            if 1 <= i <= len(self._store.corpus)
+            and (
+                self._projects is None
+                or int(self._store.corpus.project_ids[i - 1]) in self._projects
+            )
+        ]
+        return _Query(self._store, lambda: [self._project(i) for i in valid]).execute()
+
+
+class KnowledgeSink:
+    """Stand-in for ``client_knowledge`` inserts (see module docstring). Each
+    statement sleeps ``latency_ms`` plus ``row_ms`` per row (payload and index
+    maintenance grow with the batch)."""
+
+    def __init__(self, latency_ms: float = 0.0, row_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.row_ms = row_ms
+        self.rows: List[Dict[str, Any]] = []
+        self.statements = 0
+
+    def table(self, name: str) -> "KnowledgeSink":
+        if name != "client_knowledge":
+            raise RuntimeError(f"table {name} is not emulated")
+        return self
+
+    def insert(self, rows: List[Dict[str, Any]]) -> Any:
+        def _execute() -> Any:
+            delay = self.latency_ms + self.row_ms * len(rows)
+            if delay:
+                time.sleep(delay / 1000)
+            first = len(self.rows) + 1
+            self.rows.extend(rows)
+            self.statements += 1
+            return SimpleNamespace(data=[{"id": first + i} for i in range(len(rows))])
+
+        return SimpleNamespace(execute=_execute)
+
+
+class RerankClient:
+    """Stand-in for ``get_http_client()`` on the rerank endpoint."""
+
+    def __init__(self, embedder: HashEmbedder, latency_ms: float = 0.0):
+        self._embedder = embedder
+        self._latency_ms = latency_ms
+
+    async def post(self, url: str, *, json: Dict[str, Any], **_: Any) -> Any:
+        if self._latency_ms:
+            await asyncio.sleep(self._latency_ms / 1000)
+        query = self._embedder.embed([json["query"]])[0]
+        scores = self._embedder.embed(json["documents"]) @ query
+        order = np.argsort(-scores, kind="stable")[: json.get("top_n", len(scores))]
+        payload = {
+            "results": [
+                {"index": int(i), "relevance_score": float(scores[i])} for i in order
+            ]
+        }
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: payload)
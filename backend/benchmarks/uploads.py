@@ -0,0 +1,179 @@
+"""Peak RSS per concurrent PDF upload, buffered vs disk-spooled.
+
+Reads ``--uploads`` concurrent uploads of the same synthetic PDF (a few pages
+of text plus an unreferenced padding stream, ``--mb`` in total) and extracts
+their pages, the way ``/documents/upload`` does:
+
+    buffered   the previous ``read_capped``: 64 KB chunks collected in a list
+               and joined into one ``bytes``, parsed from a ``BytesIO``
+    spooled    ``core.uploads.spool_capped`` (bodies over
+               ``UPLOAD_SPOOL_BYTES`` go to a temp file) and the extractor
+               parsing the file in place, by path
+
+Each mode runs in a fresh process and reports its peak RSS (``ru_maxrss``)
+above the post-import baseline, divided by the number of uploads. Extraction
+runs in threads (``EXTRACTION_WORKERS=0``) so that its memory is counted here;
+with a worker pool, ``buffered`` also pickles every body to a worker.
+
+Run from ``backend/``:
+
+    uv run python -m benchmarks.uploads
+    uv run python -m benchmarks.uploads --uploads 16 --mb 10
+"""
+
+import argparse
+import asyncio
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, cast
+
+from benchmarks.stats import peak_rss_mb
+from benchmarks.synthetic import configure_environment
+
+MODES = ("buffered", "spooled")
+
+# Starlette spools request bodies over 1 MB to disk before the handler runs.
+_STARLETTE_SPOOL_BYTES = 1024 * 1024
+
+
+def _write_pdf(path: str, pages: int, total_bytes: int) -> None:
+    """A valid PDF with ``pages`` text pages, padded to ``total_bytes`` by a
+    stream object no page references (so a lazy parser never loads it)."""
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids ["
+        + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(pages))
+        + b"] /Count %d >>" % pages,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        lines = b" ".join(
+            b"(Page %d line %d of the benchmark upload.) Tj 0 -14 Td" % (i + 1, n)
+            for n in range(40)
+        )
+        content = b"BT /F1 11 Tf 72 760 Td " + lines + b" ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+        )
+    padding = max(0, total_bytes - sum(len(o) + 32 for o in objects))
+    objects.append(
+        b"<< /Length %d >>\nstream\n" % padding + b"\0" * padding + b"\nendstream"
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.7\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    with open(path, "wb") as f:
+        f.write(out.getvalue())
+
+
+async def _upload(mode: str, pdf_path: str) -> int:
+    from fastapi import UploadFile
+
+    from app.explore.core.uploads import _UPLOAD_CHUNK_BYTES, spool_capped
+    from app.explore.services import extraction
+    from app.explore.services.pdf_parser import PDFParser
+
+    body = tempfile.SpooledTemporaryFile(max_size=_STARLETTE_SPOOL_BYTES)
+    with open(pdf_path, "rb") as f:
+        shutil.copyfileobj(f, body)
+    body.seek(0)
+    file = UploadFile(filename="upload.pdf", file=cast(BinaryIO, body))
+    parser = PDFParser()
+    try:
+        if mode == "buffered":
+            chunks: List[bytes] = []
+            while chunk := await file.read(_UPLOAD_CHUNK_BYTES):
+                chunks.append(chunk)
+            file_bytes = b"".join(chunks)
+            pages = await extraction.run(
+                parser.extract_text_with_metadata, file_bytes, "upload.pdf"
+            )
+        else:
+            upload = await spool_capped(file)
+            try:
+                pages = await extraction.run(
+                    parser.extract_text_with_metadata, upload.source, "upload.pdf"
+                )
+            finally:
+                upload.close()
+    finally:
+        await file.close()
+    return len(pages)
+
+
+def _run_mode(
+    mode: str, pdf_path: str, uploads: int, queue: "multiprocessing.Queue"
+) -> None:
+    configure_environment()
+    os.environ["EXTRACTION_WORKERS"] = "0"
+    os.environ["MAX_UPLOAD_BYTES"] = str(os.path.getsize(pdf_path) + 1)
+
+    # Import and warm every code path before taking the baseline.
+    asyncio.run(_upload(mode, pdf_path))
+    baseline = peak_rss_mb()
+
+    async def _burst() -> List[int]:
+        return await asyncio.gather(*(_upload(mode, pdf_path) for _ in range(uploads)))
+
+    pages = asyncio.run(_burst())
+    peak = peak_rss_mb()
+    queue.put({"pages": float(pages[0]), "peak_mb": peak - baseline})
+
+
+def run_mode(mode: str, pdf_path: str, uploads: int) -> Dict[str, float]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run_mode, args=(mode, pdf_path, uploads, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Peak RSS per concurrent PDF upload, buffered vs spooled."
+    )
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--mb", type=float, default=10.0)
+    parser.add_argument("--pages", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "upload.pdf")
+        _write_pdf(pdf_path, args.pages, int(args.mb * 1024 * 1024))
+        size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        print(
+            f"{args.uploads} concurrent uploads of a {size_mb:.1f} MB PDF "
+            f"({args.pages} text pages)"
+        )
+        print(f"{'mode':<10}{'peak MB':>9}{'MB/upload':>11}{'pages':>7}")
+        results = {mode: run_mode(mode, pdf_path, args.uploads) for mode in MODES}
+    for mode, r in results.items():
+        print(
+            f"{mode:<10}{r['peak_mb']:>9.1f}{r['peak_mb'] / args.uploads:>11.2f}"
+            f"{int(r['pages']):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -36,6 +36,13 @@ os.environ.setdefault("EMBEDDING_MODEL", "qwen/qwen3-embedding-8b")
 os.environ.setdefault("ENV", "development")
 os.environ.setdefault("CORS_ORIGINS", "http://localhost:3000")
 os.environ.setdefault("ALLOWED_HOSTS", "*")
+# No background job workers polling the mocked Supabase client.
+os.environ.setdefault("INGESTION_WORKERS", "0")
+# Stored documents embed straight through the (mocked) API; the persistent
+# embedding cache is covered by test_services_embedding_cache.py.
+os.environ.setdefault("EMBEDDING_STORE_CACHE", "false")
+# Extract in a thread: patched extractors can't be sent to a worker process.
+os.environ.setdefault("EXTRACTION_WORKERS", "0")
 
 
 # ---------------------------------------------------------------------------
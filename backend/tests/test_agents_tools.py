@@ -3,6 +3,8 @@
 Covers:
   - execute_tool: unknown tool name returns error string, not raise
   - execute_tool: search_documents injects project_id server-side (model cannot override)
+  - execute_tool: search_documents packs to the model's token budget and reports it
+  - execute_tools: several search_documents calls share one batched retrieval
   - execute_tool: search_sbi_knowledge returns SBI text, no sources
   - execute_tool: each live-data tool calls _scoped_project_ids server-side
   - execute_tool: tool exception returns generic error string (never raises)
@@ -14,7 +16,8 @@ from __future__ import annotations
 from unittest.mock import AsyncMock, MagicMock, patch
 
 
-from app.explore.agents.tools import TOOLS, execute_tool
+import app.explore.agents.tools as tools_mod
+from app.explore.agents.tools import TOOLS, execute_tool, execute_tools
 
 
 # ---------------------------------------------------------------------------
@@ -195,7 +198,9 @@ class TestExecuteToolSearchDocuments:
             captured_args["project_id"] = project_id
             return [project_id] if project_id else []
 
-        async def _fake_search_docs(query, project_ids, client_id, strict=False):
+        async def _fake_search_docs(
+            query, project_ids, client_id, strict=False, **kwargs
+        ):
             return "context text", [
                 {
                     "filename": "doc.pdf",
@@ -237,7 +242,9 @@ class TestExecuteToolSearchDocuments:
             captured_scope["project_id_used"] = project_id
             return []
 
-        async def _fake_search_docs(query, project_ids, client_id, strict=False):
+        async def _fake_search_docs(
+            query, project_ids, client_id, strict=False, **kwargs
+        ):
             return "no docs", []
 
         with (
@@ -263,6 +270,122 @@ class TestExecuteToolSearchDocuments:
         assert captured_scope["project_id_used"] == 5
 
 
+class TestSearchDocumentsPacking:
+    async def test_context_is_packed_and_tokens_reported(self):
+        docs = [
+            {
+                "content": "a" * 40,
+                "metadata": {"filename": "a.pdf"},
+                "rerank_score": 0.9,
+            },
+            {
+                "content": "b" * 40,
+                "metadata": {"filename": "b.pdf"},
+                "rerank_score": 0.1,
+            },
+        ]
+        usage = {"context_tokens": 5}
+
+        with (
+            patch(
+                "app.explore.agents.tools.rag_service.retrieve_relevant",
+                new=AsyncMock(return_value=docs),
+            ),
+            # Patched on the class (pydantic models reject instance patching);
+            # type() because other tests reload the config module.
+            patch.object(
+                type(tools_mod.settings), "context_token_budget", return_value=30
+            ) as budget,
+        ):
+            text, sources = await execute_tool(
+                name="search_documents",
+                args={"query": "roof"},
+                client_id="uid",
+                access_token="tok",
+                resolved_project_ids=[7],
+                model="think-model",
+                usage=usage,
+            )
+
+        budget.assert_called_once_with("think-model")
+        assert [s["filename"] for s in sources] == ["a.pdf"]
+        assert "b.pdf" not in text
+        assert usage["context_tokens"] > 5
+
+
+class TestExecuteTools:
+    DOCS = {
+        "roof": [{"content": "R-30", "metadata": {"filename": "roof.pdf"}}],
+        "hvac": [{"content": "ducts", "metadata": {"filename": "hvac.pdf"}}],
+    }
+
+    async def test_searches_are_batched_and_order_is_kept(self):
+        batch = AsyncMock(
+            side_effect=lambda queries, **kwargs: [self.DOCS[q] for q in queries]
+        )
+        single = AsyncMock()
+        with (
+            patch(
+                "app.explore.agents.tools.rag_service.retrieve_relevant_batch",
+                new=batch,
+            ),
+            patch("app.explore.agents.tools.rag_service.retrieve_relevant", new=single),
+        ):
+            results = await execute_tools(
+                [
+                    ("search_documents", {"query": "roof"}),
+                    ("search_sbi_knowledge", {"query": "sbi"}),
+                    ("search_documents", {"query": "hvac"}),
+                ],
+                client_id="uid",
+                access_token="tok",
+                project_id=7,
+                resolved_project_ids=[7],
+            )
+
+        batch.assert_awaited_once()
+        assert batch.await_args is not None
+        assert batch.await_args.kwargs["queries"] == ["roof", "hvac"]
+        assert batch.await_args.kwargs["strict"] is True
+        single.assert_not_awaited()
+        assert "R-30" in results[0][0]
+        assert results[0][1][0]["filename"] == "roof.pdf"
+        assert results[1][1] == []
+        assert "ducts" in results[2][0]
+
+    async def test_single_search_uses_execute_tool(self):
+        with patch(
+            "app.explore.agents.tools.execute_tool",
+            new=AsyncMock(return_value=("text", [])),
+        ) as tool:
+            results = await execute_tools(
+                [("search_documents", {"query": "roof"})],
+                client_id="uid",
+                access_token="tok",
+                resolved_project_ids=[7],
+            )
+
+        tool.assert_awaited_once()
+        assert results == [("text", [])]
+
+    async def test_batch_failure_is_an_error_string_per_call(self):
+        with patch(
+            "app.explore.agents.tools.rag_service.retrieve_relevant_batch",
+            new=AsyncMock(side_effect=RuntimeError("boom")),
+        ):
+            results = await execute_tools(
+                [
+                    ("search_documents", {"query": "roof"}),
+                    ("search_documents", {"query": "hvac"}),
+                ],
+                client_id="uid",
+                access_token="tok",
+                resolved_project_ids=[7],
+            )
+
+        assert all("encountered an error" in text for text, _ in results)
+
+
 # ---------------------------------------------------------------------------
 # execute_tool — live-data tools use _scoped_project_ids
 # ---------------------------------------------------------------------------
@@ -0,0 +1,149 @@
+"""Tests for app.explore.backfill — the bulk indexing CLI."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.explore import backfill
+from app.explore.backfill import Checkpoint, StoredFile
+
+
+class _Bucket:
+    """Fake storage bucket over ``{path: etag}``, listing like the API: the
+    entries directly under a prefix, folders with ``id`` None, paged."""
+
+    def __init__(self, objects: Dict[str, str]):
+        self.objects = objects
+        self.calls: List[Dict[str, Any]] = []
+
+    def list(self, prefix: str, options: Dict[str, Any]) -> List[Dict[str, Any]]:
+        self.calls.append({"prefix": prefix, **options})
+        base = f"{prefix}/" if prefix else ""
+        entries: Dict[str, Dict[str, Any]] = {}
+        for path, etag in self.objects.items():
+            if not path.startswith(base):
+                continue
+            name, _, rest = path[len(base) :].partition("/")
+            entries[name] = (
+                {"name": name, "id": None, "metadata": None}
+                if rest
+                else {"name": name, "id": path, "metadata": {"eTag": etag}}
+            )
+        ordered = [entries[name] for name in sorted(entries)]
+        offset, limit = options["offset"], options["limit"]
+        return ordered[offset : offset + limit]
+
+
+def _supabase(bucket: Any) -> MagicMock:
+    client = MagicMock()
+    client.storage.from_.return_value = bucket
+    return client
+
+
+OBJECTS = {
+    "7/a.pdf": "e1",
+    "7/notes.txt": "e2",
+    "7/photo.png": "e3",
+    "7/plans/b.docx": "e4",
+    "7/plans/old/c.xlsx": "e5",
+    "9/d.md": "e6",
+    "readme.txt": "e7",
+}
+
+
+class TestListing:
+    async def test_lists_project_folders(self):
+        with patch.object(backfill, "supabase", _supabase(_Bucket(OBJECTS))):
+            assert await backfill.list_projects() == [7, 9]
+
+    async def test_walks_folders_and_keeps_extractable_files(self, monkeypatch):
+        monkeypatch.setattr(backfill, "LIST_PAGE_SIZE", 2)
+        bucket = _Bucket(OBJECTS)
+        with patch.object(backfill, "supabase", _supabase(bucket)):
+            files = await backfill.list_files(7)
+
+        assert sorted((f.path, f.etag) for f in files) == [
+            ("a.pdf", "e1"),
+            ("notes.txt", "e2"),
+            ("plans/b.docx", "e4"),
+            ("plans/old/c.xlsx", "e5"),
+        ]
+        # Four entries at the top level: two full pages and an empty one.
+        assert [c["offset"] for c in bucket.calls if c["prefix"] == "7"] == [0, 2, 4]
+        assert {c["prefix"] for c in bucket.calls} == {"7", "7/plans", "7/plans/old"}
+
+
+class TestCheckpoint:
+    def test_resumes_from_the_state_file(self, tmp_path):
+        path = str(tmp_path / "state.jsonl")
+        a, b = StoredFile(7, "a.pdf", "e1"), StoredFile(7, "b.pdf", "e2")
+        state = Checkpoint(path)
+        state.record(a, "indexed", chunks=3)
+        state.record(b, "failed", error="boom")
+        state.close()
+        with open(path, "a") as f:
+            f.write('{"key": "7/c.pdf", "et')  # cut short by a crash
+
+        resumed = Checkpoint(path)
+        assert resumed.done(a)
+        assert not resumed.done(b)  # failures are retried
+        assert not resumed.done(StoredFile(7, "a.pdf", "changed"))
+        assert "7/c.pdf" not in resumed.records
+
+
+class TestBackfill:
+    async def test_indexes_new_files_and_records_outcomes(self, tmp_path):
+        state = Checkpoint(str(tmp_path / "state.jsonl"))
+        state.record(StoredFile(7, "a.pdf", "e1"), "indexed", chunks=2)
+        results = {
+            "notes.txt": {"indexed": True, "chunks": 4, "added": 4},
+            "plans/b.docx": {"indexed": True, "chunks": 3, "unchanged": True},
+            "plans/old/c.xlsx": RuntimeError("download failed"),
+            "d.md": {"indexed": False, "reason": "empty"},
+        }
+
+        async def _index(rag, project_id, storage_path, user_id, incremental):
+            assert user_id == "uid-1" and incremental
+            result = results[storage_path]
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with (
+            patch.object(backfill, "supabase", _supabase(_Bucket(OBJECTS))),
+            patch.object(
+                backfill.ingestion, "index_portal_file", AsyncMock(side_effect=_index)
+            ),
+        ):
+            stats = await backfill.backfill(
+                [7, 9], "uid-1", state, concurrency=2, rag_service=MagicMock()
+            )
+        state.close()
+
+        assert (stats.total, stats.files, stats.skipped, stats.failed) == (5, 1, 3, 1)
+        assert (stats.chunks, stats.embedded) == (4, 4)
+        statuses = {key: r["status"] for key, r in state.records.items()}
+        assert statuses == {
+            "7/a.pdf": "indexed",
+            "7/notes.txt": "indexed",
+            "7/plans/b.docx": "unchanged",
+            "7/plans/old/c.xlsx": "failed",
+            "9/d.md": "empty",
+        }
+        assert "download failed" in state.records["7/plans/old/c.xlsx"]["error"]
+        assert "5/5 files (1 indexed, 3 skipped, 1 failed)" in stats.line()
+
+    async def test_listing_failure_stops_the_workers(self, tmp_path):
+        bucket = MagicMock()
+        bucket.list.side_effect = RuntimeError("storage down")
+        with patch.object(backfill, "supabase", _supabase(bucket)):
+            with pytest.raises(RuntimeError):
+                await backfill.backfill(
+                    [7],
+                    "uid",
+                    Checkpoint(str(tmp_path / "state.jsonl")),
+                    rag_service=MagicMock(),
+                )
@@ -0,0 +1,22 @@
+"""Tests for app.explore.core.http — the shared provider HTTP client."""
+
+from __future__ import annotations
+
+from app.explore.core.http import close_http_client, get_http_client
+
+
+async def test_client_is_shared_until_closed() -> None:
+    first = get_http_client()
+    assert get_http_client() is first
+
+    await close_http_client()
+
+    assert first.is_closed
+    second = get_http_client()
+    assert second is not first
+    await close_http_client()
+
+
+async def test_close_without_client_is_a_noop() -> None:
+    await close_http_client()
+    await close_http_client()
@@ -0,0 +1,53 @@
+"""Tests for app.explore.core.uploads.spool_capped — bounded, disk-spooled
+upload reads."""
+
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.explore.core import uploads
+
+
+@pytest.fixture(autouse=True)
+def _small_spool(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.settings, "UPLOAD_SPOOL_BYTES", 100_000)
+    monkeypatch.setattr(uploads.settings, "UPLOAD_SPOOL_DIR", str(tmp_path))
+
+
+def _upload(body: bytes) -> UploadFile:
+    return UploadFile(filename="a.pdf", file=io.BytesIO(body))
+
+
+async def test_small_upload_stays_in_memory(tmp_path):
+    upload = await uploads.spool_capped(_upload(b"x" * 1000))
+
+    assert upload.path is None
+    assert upload.source == b"x" * 1000
+    assert upload.size == 1000
+    assert os.listdir(tmp_path) == []
+
+
+async def test_large_upload_is_spooled_to_disk_and_removed_on_close(tmp_path):
+    body = os.urandom(300_000)
+    upload = await uploads.spool_capped(_upload(body))
+
+    assert upload.path is not None and upload.source == upload.path
+    assert os.path.dirname(upload.path) == str(tmp_path)
+    assert upload.read_bytes() == body
+    assert upload.size == len(body)
+    upload.close()
+    assert os.listdir(tmp_path) == []
+    upload.close()  # idempotent
+
+
+async def test_oversize_upload_is_rejected_and_leaves_no_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(uploads.settings, "MAX_UPLOAD_BYTES", 200_000)
+    with pytest.raises(HTTPException) as exc:
+        await uploads.spool_capped(_upload(b"x" * 300_000))
+
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
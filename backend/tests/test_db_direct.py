@@ -0,0 +1,134 @@
+"""Tests for app.explore.db.direct — bulk chunk inserts with binary COPY."""
+
+from __future__ import annotations
+
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, cast
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import asyncpg
+
+from app.explore.core import metrics
+from app.explore.db import direct
+
+
+class _Connection:
+    """Records the statements and COPY ``copy_rows`` issues."""
+
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+        self.copies: List[Dict[str, Any]] = []
+        self.transactions = 0
+
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[None]:
+        self.transactions += 1
+        yield
+
+    def transaction(self) -> Any:
+        return self._transaction()
+
+    async def execute(self, query: str, timeout: float | None = None) -> str:
+        self.statements.append(query)
+        return "CREATE TABLE"
+
+    async def copy_records_to_table(self, table: str, **kwargs: Any) -> str:
+        self.copies.append({"table": table, **kwargs})
+        return f"COPY {len(kwargs['records'])}"
+
+    async def fetch(self, query: str, timeout: float | None = None) -> list:
+        self.statements.append(query)
+        return [{"id": 100 + i} for i in range(len(self.copies[-1]["records"]))]
+
+
+def _rows(n: int, **extra: Any) -> List[Dict[str, Any]]:
+    return [
+        {
+            "uid": "00000000-0000-0000-0000-000000000001",
+            "project_id": 7,
+            "content": f"chunk {i}",
+            "metadata": {"chunk_hash": f"h{i}"},
+            "embedding": [float(i), 0.5],
+            "storage_path": "7/doc.pdf",
+            "source": "upload",
+            **extra,
+        }
+        for i in range(n)
+    ]
+
+
+class TestCopyRows:
+    async def test_stages_with_copy_and_merges_in_one_transaction(self):
+        conn = _Connection()
+        rows_before = metrics.value("bulk_insert.rows")
+
+        ids = await direct.copy_rows(cast(asyncpg.Connection, conn), _rows(3))
+
+        assert ids == [100, 101, 102]
+        assert conn.transactions == 1
+        stage, merge = conn.statements
+        assert "CREATE TEMP TABLE client_knowledge_stage" in stage
+        assert "ON COMMIT DROP" in stage
+        (copy,) = conn.copies
+        assert copy["table"] == "client_knowledge_stage"
+        assert copy["columns"] == [
+            "ord",
+            "uid",
+            "project_id",
+            "content",
+            "metadata",
+            "embedding",
+            "storage_path",
+            "source",
+        ]
+        first = copy["records"][0]
+        assert first[0] == 0
+        assert json.loads(first[4]) == {"chunk_hash": "h0"}
+        assert first[5] == [0.0, 0.5]
+        assert "embedding::vector" in merge
+        assert "embedding_next" not in merge
+        assert "ORDER BY ord" in merge
+        assert metrics.value("bulk_insert.rows") == rows_before + 3
+
+    async def test_dual_written_rows_copy_embedding_next(self):
+        conn = _Connection()
+
+        await direct.copy_rows(
+            cast(asyncpg.Connection, conn), _rows(2, embedding_next=[1.0])
+        )
+
+        assert conn.copies[0]["columns"][-1] == "embedding_next"
+        assert conn.copies[0]["records"][1][-1] == [1.0]
+        assert "embedding_next::vector" in conn.statements[-1]
+
+    async def test_no_rows_is_a_no_op(self):
+        conn = _Connection()
+        assert await direct.copy_rows(cast(asyncpg.Connection, conn), []) == []
+        assert conn.statements == []
+
+
+class TestPool:
+    def test_enabled_needs_a_dsn_and_the_flag(self, monkeypatch):
+        monkeypatch.setattr(direct.settings, "BULK_INSERT_COPY", True)
+        monkeypatch.setattr(direct.settings, "DATABASE_URL", None)
+        assert not direct.enabled()
+        monkeypatch.setattr(direct.settings, "DATABASE_URL", "postgresql://db/x")
+        assert direct.enabled()
+        monkeypatch.setattr(direct.settings, "BULK_INSERT_COPY", False)
+        assert not direct.enabled()
+
+    async def test_pool_is_created_once_and_closed(self, monkeypatch):
+        monkeypatch.setattr(direct.settings, "DATABASE_URL", "postgresql://db/x")
+        pool = MagicMock()
+        pool.close = AsyncMock()
+        create = AsyncMock(return_value=pool)
+        with patch.object(direct.asyncpg, "create_pool", create):
+            assert await direct.get_pool() is pool
+            assert await direct.get_pool() is pool
+            await direct.close_pool()
+            await direct.close_pool()
+
+        create.assert_awaited_once()
+        assert create.call_args.kwargs["statement_cache_size"] == 0
+        pool.close.assert_awaited_once()
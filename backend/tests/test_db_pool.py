@@ -0,0 +1,62 @@
+"""Tests for app.explore.db.pool — the bounded PostgREST executor."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+from app.explore.db.pool import run_query
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "_request_id", default=""
+)
+
+
+async def test_run_query_executes_off_the_event_loop_thread() -> None:
+    loop_thread = threading.get_ident()
+
+    result = await run_query(lambda: threading.current_thread().name)
+
+    assert threading.get_ident() == loop_thread
+    assert result.startswith("postgrest")
+
+
+async def test_run_query_returns_the_call_result() -> None:
+    assert await run_query(lambda: {"data": [1, 2]}) == {"data": [1, 2]}
+
+
+async def test_run_query_propagates_exceptions() -> None:
+    def _boom() -> None:
+        raise RuntimeError("postgrest down")
+
+    with pytest.raises(RuntimeError, match="postgrest down"):
+        await run_query(_boom)
+
+
+async def test_run_query_times_out() -> None:
+    with pytest.raises(TimeoutError):
+        await run_query(lambda: time.sleep(0.5), timeout=0.05)
+
+
+async def test_blocking_query_does_not_stall_other_coroutines() -> None:
+    ticks = 0
+
+    async def _ticker() -> None:
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    await asyncio.gather(run_query(lambda: time.sleep(0.2)), _ticker())
+
+    assert ticks == 5
+
+
+async def test_run_query_propagates_context_variables() -> None:
+    _request_id.set("req-42")
+
+    assert await run_query(_request_id.get) == "req-42"
@@ -3,6 +3,7 @@
 Covers:
   - extract-text: oversized upload → 413 (Content-Length header + actual body)
   - extract-text: valid small text/pdf file works (parser mocked)
+  - extract-text: extraction timeout / memory error → 422
   - extract-text: requires auth (no header → 401)
   - Rate-limit decorator is wired to the router (smoke check)
   - SSE endpoint: valid request emits SSE events (agent mocked)
@@ -22,6 +23,7 @@ from fastapi.testclient import TestClient
 
 from app.explore.main import app
 from app.explore.api.deps import AuthContext
+from app.explore.services import extraction
 
 
 # ---------------------------------------------------------------------------
@@ -168,6 +170,23 @@ class TestExtractText:
         assert body["file_type"] == "pdf"
         assert "PDF page text" in body["content"]
 
+    def test_extraction_timeout_returns_422(self):
+        """A document the extraction pool gives up on is a 422, not a 400."""
+        client = self._client_with_auth()
+        with patch(
+            "app.explore.api.v1.endpoints.chat.extraction.run",
+            side_effect=extraction.ExtractionError("Extraction took longer than 60s"),
+        ):
+            resp = client.post(
+                "/api/v1/chat/extract-text",
+                files={"file": ("report.pdf", b"%PDF-1.4 fake", "application/pdf")},
+                headers={"Authorization": "Bearer test-token"},
+            )
+        assert resp.status_code == 422
+        assert resp.json()["detail"] == (
+            "The document is too large or complex to process"
+        )
+
     def test_no_auth_header_returns_401(self):
         """Without Authorization header the endpoint must reject with 401."""
         app.dependency_overrides.clear()
@@ -10,6 +10,8 @@ Covers:
   - upload: non-director gets 403
   - list: requires auth
   - index-text: director-gated save-to-knowledge (happy path, dedup, caps)
+  - upload / index-file with background=true: enqueue a job, 202 + job id
+  - jobs/{id}: status for project members, 404 otherwise
 """
 
 from __future__ import annotations
@@ -219,7 +221,7 @@ class TestDocumentUpload:
         ]
 
         mock_rag = MagicMock()
-        mock_rag.store_document = AsyncMock(return_value=[42])
+        mock_rag.store_pages = AsyncMock(return_value=[42])
 
         with (
             patch(
@@ -250,6 +252,49 @@ class TestDocumentUpload:
         assert body["success"] is True
         assert body["chunks_created"] == 1
 
+    def test_background_upload_enqueues_extracted_pages(self):
+        from app.explore.api.deps import get_auth_context
+
+        app.dependency_overrides[get_auth_context] = _auth_override
+
+        fake_pages = [{"content": "page", "metadata": {"filename": "doc.pdf"}}]
+        enqueue = AsyncMock(return_value={"id": "job-1", "status": "queued"})
+        mock_rag = MagicMock()
+        mock_rag.store_pages = AsyncMock()
+
+        with (
+            patch(
+                "app.explore.api.v1.endpoints.documents.is_project_member",
+                new=AsyncMock(return_value=True),
+            ),
+            patch(
+                "app.explore.api.v1.endpoints.documents._is_director",
+                new=AsyncMock(return_value=True),
+            ),
+            patch("app.explore.api.v1.endpoints.documents.PDFParser") as MockParser,
+            patch(
+                "app.explore.api.v1.endpoints.documents.RAGService",
+                return_value=mock_rag,
+            ),
+            patch("app.explore.services.jobs.enqueue", new=enqueue),
+        ):
+            MockParser.return_value.extract_text_with_metadata.return_value = fake_pages
+            client = TestClient(app, raise_server_exceptions=False)
+            resp = client.post(
+                "/api/v1/documents/upload",
+                files={"file": ("doc.pdf", b"%PDF-1.4 content", "application/pdf")},
+                data={"project_id": "1", "background": "true"},
+                headers={"Authorization": "Bearer test-token"},
+            )
+
+        assert resp.status_code == 202
+        assert resp.json()["job_id"] == "job-1"
+        assert resp.json()["chunks_created"] == 0
+        kind, project_id, uid, payload = enqueue.call_args.args
+        assert (kind, project_id, uid) == ("upload", 1, "test-uid-1234")
+        assert payload == {"filename": "doc.pdf", "pages": fake_pages}
+        mock_rag.store_pages.assert_not_called()
+
 
 class TestDocumentList:
     """GET /api/v1/documents/list"""
@@ -420,3 +465,85 @@ class TestIndexText:
             json={"project_id": 7, "filename": "a.txt", "content": "   "},
         )
         assert resp.status_code == 400
+
+
+class TestIngestionJobs:
+    """POST index-file with background=true, GET /knowledge/jobs/{id}"""
+
+    JOB_ID = "6f1c2b8e-1d2a-4c3b-9e8f-0a1b2c3d4e5f"
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def _client(self, monkeypatch, member: bool = True):
+        import app.explore.api.v1.endpoints.documents as docs_mod
+        from app.explore.api.deps import get_auth_context
+
+        app.dependency_overrides[get_auth_context] = _auth_override
+
+        async def _member(*a, **k):
+            return member
+
+        async def _yes(*a, **k):
+            return True
+
+        monkeypatch.setattr(docs_mod, "is_project_member", _member)
+        monkeypatch.setattr(docs_mod, "_is_director", _yes)
+        return TestClient(app, raise_server_exceptions=False)
+
+    def test_background_index_file_enqueues_deduped_job(self, monkeypatch):
+        from app.explore.services import jobs
+
+        client = self._client(monkeypatch)
+        enqueue = AsyncMock(return_value={"id": self.JOB_ID, "status": "queued"})
+        monkeypatch.setattr(jobs, "enqueue", enqueue)
+        resp = client.post(
+            "/api/v1/documents/knowledge/index-file",
+            headers={"Authorization": "Bearer test-token"},
+            json={"project_id": 7, "storage_path": "specs/a.pdf", "background": True},
+        )
+        assert resp.status_code == 202
+        assert resp.json() == {
+            "queued": True,
+            "job_id": self.JOB_ID,
+            "status": "queued",
+        }
+        assert enqueue.call_args.args[:2] == ("index_file", 7)
+        assert enqueue.call_args.args[3] == {
+            "storage_path": "specs/a.pdf",
+            "incremental": True,
+        }
+        assert enqueue.call_args.kwargs["dedupe_key"] == "specs/a.pdf"
+
+    def test_job_status_for_member(self, monkeypatch):
+        from app.explore.services import jobs
+
+        client = self._client(monkeypatch)
+        row = {"id": self.JOB_ID, "project_id": 7, "status": "running"}
+        monkeypatch.setattr(jobs, "get_job", AsyncMock(return_value=row))
+        resp = client.get(
+            f"/api/v1/documents/knowledge/jobs/{self.JOB_ID}",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "running"
+
+    def test_job_in_another_project_is_not_found(self, monkeypatch):
+        from app.explore.services import jobs
+
+        client = self._client(monkeypatch, member=False)
+        row = {"id": self.JOB_ID, "project_id": 8, "status": "running"}
+        monkeypatch.setattr(jobs, "get_job", AsyncMock(return_value=row))
+        resp = client.get(
+            f"/api/v1/documents/knowledge/jobs/{self.JOB_ID}",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        assert resp.status_code == 404
+
+    def test_malformed_job_id_is_rejected(self, monkeypatch):
+        client = self._client(monkeypatch)
+        resp = client.get(
+            "/api/v1/documents/knowledge/jobs/not-a-uuid",
+            headers={"Authorization": "Bearer test-token"},
+        )
+        assert resp.status_code == 422
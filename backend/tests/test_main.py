@@ -5,6 +5,7 @@ Covers:
   - Security headers on all responses
   - CORS configured origins
   - Health endpoints: / and /health — correct shape, no version field
+  - /metrics: cache stats snapshot, hidden when METRICS_ENABLED is off
 """
 
 from __future__ import annotations
@@ -360,3 +361,24 @@ class TestSettings:
             SUPABASE_PUBLIC_KEY="k",
         )
         assert s.rerank_top_n == 8
+
+
+# ---------------------------------------------------------------------------
+# Metrics endpoint
+# ---------------------------------------------------------------------------
+
+
+class TestMetrics:
+    def test_metrics_reports_cache_stats(self, client: TestClient):
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        body = resp.json()
+        assert "counters" in body
+        assert {"embedding_cache", "rerank_cache"} <= body.keys()
+        assert "hit_ratio" in body["rerank_cache"]
+
+    def test_metrics_hidden_when_disabled(self, client: TestClient):
+        with patch("app.explore.main.settings") as mock_settings:
+            mock_settings.metrics_enabled = False
+            resp = client.get("/metrics")
+        assert resp.status_code == 404
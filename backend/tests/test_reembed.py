@@ -0,0 +1,176 @@
+"""Tests for app.explore.reembed — the online re-embedding tool."""
+
+from __future__ import annotations
+
+import argparse
+import json
+from typing import Any, Dict, List, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.explore import reembed
+
+
+class _Query:
+    """The PostgREST chains the tool issues, over ``_Table.rows``."""
+
+    def __init__(self, table: "_Table"):
+        self._table = table
+        self._columns: List[str] = []
+        self._count = False
+        self._negate = False
+        self._filters: List[Any] = []
+        self._limit: Optional[int] = None
+
+    def select(self, columns: str, count: Any = None) -> "_Query":
+        self._columns = [c.strip() for c in columns.split(",")]
+        self._count = count is not None
+        return self
+
+    @property
+    def not_(self) -> "_Query":
+        self._negate = True
+        return self
+
+    def is_(self, column: str, value: str) -> "_Query":
+        negate, self._negate = self._negate, False
+        self._filters.append(lambda r: (r.get(column) is None) != negate)
+        return self
+
+    def gt(self, column: str, value: Any) -> "_Query":
+        self._filters.append(lambda r: r[column] > value)
+        return self
+
+    def order(self, column: str) -> "_Query":
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self._limit = n
+        return self
+
+    def execute(self) -> MagicMock:
+        rows = sorted(
+            (r for r in self._table.rows if all(f(r) for f in self._filters)),
+            key=lambda r: r["id"],
+        )
+        count = len(rows) if self._count else None
+        rows = rows[: self._limit] if self._limit is not None else rows
+        data = [{c: r.get(c) for c in self._columns} for r in rows]
+        return MagicMock(data=data, count=count)
+
+
+class _Table:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def rpc(self, name: str, params: Dict[str, Any]) -> MagicMock:
+        by_id = {row["id"]: row for row in self.rows}
+        updated = 0
+        if name == "set_client_knowledge_embedding_next":
+            for update in params["_updates"]:
+                if update["id"] in by_id:
+                    by_id[update["id"]]["embedding_next"] = json.dumps(
+                        update["embedding"]
+                    )
+                    updated += 1
+        elif name == "reset_client_knowledge_embedding_next":
+            for row in [r for r in self.rows if r.get("embedding_next")][
+                : params["_limit"]
+            ]:
+                row["embedding_next"] = None
+                updated += 1
+        chain = MagicMock()
+        chain.execute.return_value = MagicMock(data=updated)
+        return chain
+
+    def client(self) -> MagicMock:
+        client = MagicMock()
+        client.table.side_effect = lambda name: _Query(self)
+        client.rpc.side_effect = self.rpc
+        return client
+
+
+def _embedder(fail_on: Optional[int] = None) -> MagicMock:
+    """A RAGService whose ``embed_chunks`` fails on call ``fail_on``."""
+    calls: List[List[str]] = []
+
+    async def _embed(texts, model, dimensions):
+        calls.append(texts)
+        if len(calls) == fail_on:
+            raise ValueError("Failed to generate embeddings: 429")
+        return [[float(len(text))] * dimensions for text in texts]
+
+    service = MagicMock()
+    service.embed_chunks = AsyncMock(side_effect=_embed)
+    service.calls = calls
+    return service
+
+
+@pytest.fixture(autouse=True)
+def _next_model(monkeypatch):
+    monkeypatch.setattr(reembed.settings, "EMBEDDING_NEXT_MODEL", "next/model")
+    monkeypatch.setattr(reembed.settings, "EMBEDDING_NEXT_DIMENSIONS", 3)
+    monkeypatch.setattr(reembed, "RETRY_DELAY_SECONDS", 0.0)
+
+
+def _rows() -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = [
+        {"id": i, "content": "x" * i, "embedding_next": None} for i in range(1, 6)
+    ]
+    rows[2]["embedding_next"] = "[3,3,3]"  # dual-written
+    return rows
+
+
+class TestReembed:
+    async def test_fills_pending_rows_and_resumes_after_a_failure(self):
+        table = _Table(_rows())
+        first = _embedder(fail_on=2)
+        with patch.object(reembed, "supabase", table.client()):
+            with pytest.raises(ValueError):
+                await reembed.reembed(batch_size=2, retries=0, rag_service=first)
+            # The first batch was written before the failure.
+            assert [r["id"] for r in table.rows if r["embedding_next"]] == [1, 2, 3]
+
+            second = _embedder()
+            stats = await reembed.reembed(batch_size=2, rag_service=second)
+
+        assert second.calls == [["xxxx", "xxxxx"]]
+        assert (stats.done, stats.total) == (5, 5)
+        assert json.loads(table.rows[4]["embedding_next"]) == [5.0, 5.0, 5.0]
+        _, model, dimensions = second.embed_chunks.call_args.args
+        assert (model, dimensions) == ("next/model", 3)
+
+    async def test_failed_batches_are_retried(self):
+        table = _Table(_rows())
+        service = _embedder(fail_on=1)
+        with patch.object(reembed, "supabase", table.client()):
+            stats = await reembed.reembed(rag_service=service)
+
+        assert len(service.calls) == 2
+        assert stats.done == 5
+        assert "5/5 rows (100.0%)" in stats.line()
+
+    async def test_reset_clears_every_row(self, monkeypatch):
+        monkeypatch.setattr(reembed, "RESET_BATCH_SIZE", 1)
+        table = _Table(_rows())
+        with patch.object(reembed, "supabase", table.client()):
+            assert await reembed.reset() == 1
+            assert await reembed.count_rows(pending=True) == 5
+
+
+async def test_rate_limit_paces_to_the_budget():
+    limit = reembed.RateLimit(per_minute=600)
+    with patch.object(reembed.asyncio, "sleep", AsyncMock()) as sleep:
+        await limit.spend(100)  # ten seconds' worth
+    assert sleep.await_args is not None
+    assert sleep.await_args.args[0] == pytest.approx(10.0, abs=0.5)
+
+
+async def test_refuses_to_mix_dimensions(capsys, monkeypatch):
+    monkeypatch.setattr(reembed.settings, "EMBEDDING_NEXT_DIMENSIONS", 4)
+    table = _Table(_rows())  # row 3 holds a 3-dim vector
+    args = argparse.Namespace(reset=False, status=True)
+    with patch.object(reembed, "supabase", table.client()):
+        assert await reembed._main(args) == 2
+    assert "--reset" in capsys.readouterr().out
@@ -0,0 +1,150 @@
+"""Tests for app.explore.services.cache.TTLCache."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.explore.services.cache import TTLCache
+
+
+class TestTTLCache:
+    def test_get_miss_then_hit(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60)
+        assert cache.get("k") is None
+        cache.set("k", "v")
+        assert cache.get("k") == "v"
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction_drops_least_recently_used(self):
+        cache: TTLCache[int] = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # refresh a; b is now LRU
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+
+    def test_entries_expire_after_ttl(self):
+        cache: TTLCache[int] = TTLCache(maxsize=4, ttl=10)
+        with patch("app.explore.services.cache.time.monotonic", return_value=100.0):
+            cache.set("k", 1)
+        with patch("app.explore.services.cache.time.monotonic", return_value=109.0):
+            assert cache.get("k") == 1
+        with patch("app.explore.services.cache.time.monotonic", return_value=111.0):
+            assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_zero_maxsize_disables_storage(self):
+        cache: TTLCache[int] = TTLCache(maxsize=0, ttl=60)
+        cache.set("k", 1)
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_invalidate_with_predicate(self):
+        cache: TTLCache[int] = TTLCache(maxsize=8, ttl=60)
+        for key in ("p1:a", "p1:b", "p2:a"):
+            cache.set(key, 1)
+        assert cache.invalidate(lambda k: str(k).startswith("p1:")) == 2
+        assert cache.get("p2:a") == 1
+        assert cache.invalidate() == 1
+
+    def test_stats_reports_hit_ratio(self):
+        cache: TTLCache[int] = TTLCache(maxsize=4, ttl=60)
+        cache.set("k", 1)
+        cache.get("k")
+        cache.get("missing")
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+
+
+class TestGetOrLoad:
+    async def test_loads_once_then_serves_from_cache(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60)
+        calls = 0
+
+        async def _load() -> str:
+            nonlocal calls
+            calls += 1
+            return "value"
+
+        assert await cache.get_or_load("k", _load) == "value"
+        assert await cache.get_or_load("k", _load) == "value"
+        assert calls == 1
+
+    async def test_single_flight_coalesces_concurrent_loads(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60, single_flight=True)
+        calls = 0
+
+        async def _load() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(
+            *(cache.get_or_load("k", _load) for _ in range(5))
+        )
+        assert results == ["value"] * 5
+        assert calls == 1
+        assert cache.coalesced == 4
+
+    async def test_without_single_flight_each_miss_loads(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60, single_flight=False)
+        calls = 0
+
+        async def _load() -> str:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        await asyncio.gather(*(cache.get_or_load("k", _load) for _ in range(3)))
+        assert calls == 3
+
+    async def test_failed_load_is_not_cached_and_reaches_waiters(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60)
+
+        async def _fail() -> str:
+            await asyncio.sleep(0.01)
+            raise ValueError("provider down")
+
+        results = await asyncio.gather(
+            cache.get_or_load("k", _fail),
+            cache.get_or_load("k", _fail),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(cache) == 0
+
+        async def _ok() -> str:
+            return "recovered"
+
+        assert await cache.get_or_load("k", _ok) == "recovered"
+
+    async def test_waiter_reloads_when_leader_is_cancelled(self):
+        cache: TTLCache[str] = TTLCache(maxsize=4, ttl=60)
+        started = asyncio.Event()
+
+        async def _slow() -> str:
+            started.set()
+            await asyncio.sleep(10)
+            return "never"
+
+        async def _fast() -> str:
+            return "fresh"
+
+        leader = asyncio.create_task(cache.get_or_load("k", _slow))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_load("k", _fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await waiter == "fresh"
@@ -0,0 +1,176 @@
+"""Tests for chunking: RecursiveSplitter against langchain's splitter.
+
+The golden corpus is hand-written edge cases plus seeded random documents
+shaped like plain text, PDF pages (single newlines) and spreadsheet rows
+(tabs), split under several (chunk_size, chunk_overlap) configurations;
+every chunk list must equal ``RecursiveCharacterTextSplitter``'s as
+``chunk_text`` used to build it, in characters and with a token length.
+"""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.explore.core.config import settings
+from app.explore.services import chunking
+from app.explore.services.pdf_parser import PDFParser
+
+CONFIGS = [(1000, 200), (200, 50), (50, 0), (64, 64), (1, 0)]
+
+_WORDS = "the survey of drainage, culvert and grading. Permit ü 東京 x".split()
+
+
+def _document(rng: random.Random) -> str:
+    """Random text mixing paragraph, line, sentence and word breaks, long
+    unbroken runs and stray whitespace."""
+    parts = []
+    for _ in range(rng.randint(1, 60)):
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append("y" * rng.randint(1, 1500))
+        elif roll < 0.1:
+            parts.append(rng.choice(["\n\n", "\n", ". ", "  ", "\t", " \n \n"]))
+        else:
+            words = [rng.choice(_WORDS) for _ in range(rng.randint(1, 80))]
+            end = rng.choice([". ", ".\n", "\n\n", "\n", " ", "\t"])
+            parts.append(" ".join(words) + end)
+    return "".join(parts)
+
+
+def _pdf_page(rng: random.Random) -> str:
+    return "\n".join(
+        " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 15)))
+        for _ in range(rng.randint(1, 60))
+    )
+
+
+def _sheet(rng: random.Random) -> str:
+    return "\n".join(
+        "\t".join(str(rng.randint(0, 10**6)) for _ in range(rng.randint(1, 12)))
+        for _ in range(rng.randint(1, 200))
+    )
+
+
+_EDGE_CASES = [
+    "",
+    " ",
+    "\n\n\n",
+    "short",
+    "a" * 5000,
+    "Sentence one. Sentence two. " * 100,
+    "line\n" * 500,
+    "para\n\n" * 300,
+    ("word " * 300 + "\n\n") * 5,
+    "x. " * 2000,
+    "\n\n".join(["p" * 999, "q" * 1000, "r" * 1001]),
+]
+
+_rng = random.Random(20261018)
+GOLDEN = (
+    _EDGE_CASES
+    + [_document(_rng) for _ in range(60)]
+    + [_pdf_page(_rng) for _ in range(30)]
+    + [_sheet(_rng) for _ in range(30)]
+)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", CONFIGS)
+def test_matches_langchain_on_golden_corpus(chunk_size, chunk_overlap):
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=list(chunking.DEFAULT_SEPARATORS),
+    )
+    splitter = chunking.RecursiveSplitter(chunk_size, chunk_overlap)
+    for text in GOLDEN:
+        assert splitter.split(text) == reference.split_text(text), repr(text[:80])
+
+
+def test_chunk_text_shares_one_splitter_per_configuration():
+    chunking.splitter_for.cache_clear()
+    PDFParser().chunk_text("alpha. beta")
+    PDFParser().chunk_text("gamma")
+    PDFParser(chunk_size=500, chunk_overlap=50).chunk_text("delta")
+    info = chunking.splitter_for.cache_info()
+    assert (info.misses, info.hits) == (2, 1)
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(0, 0), (10, -1), (10, 11)])
+def test_rejects_invalid_configuration(chunk_size, chunk_overlap):
+    with pytest.raises(ValueError):
+        chunking.RecursiveSplitter(chunk_size, chunk_overlap)
+
+
+def _cjk_weighted(text: str) -> int:
+    """Stand-in tokenizer: one token per CJK character, one per four others."""
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+@pytest.fixture
+def tokenizer(monkeypatch):
+    monkeypatch.setattr(chunking.tokens, "token_counter", lambda model: _cjk_weighted)
+    chunking.splitter_for.cache_clear()
+    yield
+    chunking.splitter_for.cache_clear()
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(250, 50), (20, 5)])
+def test_token_lengths_match_langchain(chunk_size, chunk_overlap):
+    reference = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=_cjk_weighted,
+        separators=list(chunking.DEFAULT_SEPARATORS),
+    )
+    splitter = chunking.RecursiveSplitter(
+        chunk_size, chunk_overlap, length=_cjk_weighted
+    )
+    for text in GOLDEN:
+        assert splitter.split(text) == reference.split_text(text), repr(text[:80])
+
+
+def test_token_unit_sizes_chunks_in_tokens(tokenizer):
+    parser = PDFParser(unit="tokens", chunk_size=100, chunk_overlap=0)
+    latin = parser.chunk_text("drainage survey " * 200)
+    cjk = parser.chunk_text("東京の排水調査。" * 200)
+    assert all(_cjk_weighted(chunk) <= 100 for chunk in latin + cjk)
+    # 3200 chars of Latin text is ~800 tokens; 1600 CJK chars ~1600.
+    assert 8 <= len(latin) <= 10
+    assert 16 <= len(cjk) <= 18
+
+
+def test_token_unit_defaults_and_page_packing(tokenizer, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_UNIT", "tokens")
+    parser = PDFParser()
+    assert (parser.chunk_size, parser.chunk_overlap) == (
+        settings.CHUNK_TOKENS,
+        settings.CHUNK_OVERLAP_TOKENS,
+    )
+    # 8 pages of 400 chars: ~100 tokens each, packed two to a chunk.
+    pages = [
+        {"content": "word " * 80, "metadata": {"page_number": n}} for n in range(8)
+    ]
+    chunks = parser.chunk_document(pages)
+    assert [c["metadata"]["page_end"] for c in chunks] == [1, 3, 5, 7]
+
+
+def test_rejects_unknown_unit():
+    with pytest.raises(ValueError):
+        PDFParser(unit="words")
+
+
+def test_token_unit_without_a_tokenizer_fails_at_construction(monkeypatch):
+    # No silent fallback to a characters-per-token estimate.
+    monkeypatch.setattr(chunking.tokens, "_encoding", lambda model: None)
+    chunking.splitter_for.cache_clear()
+    try:
+        with pytest.raises(ValueError, match="No tokenizer"):
+            PDFParser(unit="tokens")
+        assert PDFParser(unit="chars").chunk_text("still fine") == ["still fine"]
+    finally:
+        chunking.splitter_for.cache_clear()
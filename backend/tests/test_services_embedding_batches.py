@@ -0,0 +1,153 @@
+"""Tests for app.explore.services.embedding_batches — sub-batched embedding."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.explore.core import metrics
+from app.explore.services import embedding_batches
+from app.explore.services.embedding_batches import embed_texts, plan_batches
+
+
+def _vector(text: str) -> List[float]:
+    return [float(len(text)), float(text.count("x"))]
+
+
+class _PayloadTooLarge(Exception):
+    """Stands in for openai.APIStatusError with an HTTP 413 response."""
+
+    status_code = 413
+
+
+class _Client:
+    """Fake AsyncOpenAI: embeds each input as ``_vector(text)``, returning
+    the batch in input order. Batches over ``reject_over`` inputs get HTTP
+    413."""
+
+    def __init__(self, reject_over: Optional[int] = None, delay: float = 0.0):
+        self.reject_over = reject_over
+        self.delay = delay
+        self.sizes: List[int] = []
+        self.active = 0
+        self.peak = 0
+        self.embeddings = MagicMock()
+        self.embeddings.create = self._create
+
+    async def _create(self, input: List[str], **kwargs):
+        self.sizes.append(len(input))
+        if self.reject_over is not None and len(input) > self.reject_over:
+            raise _PayloadTooLarge("Payload Too Large")
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return MagicMock(data=[MagicMock(embedding=_vector(t)) for t in input])
+
+
+class TestPlanBatches:
+    def test_caps_items_and_tokens_in_order(self):
+        texts = ["a" * 40] * 5  # 10 estimated tokens each
+        assert plan_batches(texts, max_items=2, max_tokens=100) == [
+            (0, 2),
+            (2, 4),
+            (4, 5),
+        ]
+        assert plan_batches(texts, max_items=10, max_tokens=30) == [(0, 3), (3, 5)]
+
+    def test_oversized_text_gets_its_own_batch(self):
+        texts = ["a" * 8, "a" * 4000, "a" * 8]
+        assert plan_batches(texts, max_items=10, max_tokens=100) == [
+            (0, 1),
+            (1, 2),
+            (2, 3),
+        ]
+
+
+class TestEmbedTexts:
+    async def test_order_preserved_across_concurrent_batches(self):
+        texts = [f"chunk {i} " + "x" * (i % 7) for i in range(50)]
+        client = _Client(delay=0.001)
+        vectors = await embed_texts(
+            client, texts, max_items=8, max_tokens=10_000, concurrency=3
+        )
+
+        assert vectors == [_vector(t) for t in texts]
+        assert sum(client.sizes) == 50 and max(client.sizes) <= 8
+        assert client.peak <= 3
+
+    async def test_too_large_batch_is_halved(self):
+        texts = [f"t{i}" for i in range(8)]
+        client = _Client(reject_over=2)
+        vectors = await embed_texts(client, texts, max_items=8, max_tokens=10_000)
+
+        assert vectors == [_vector(t) for t in texts]
+        assert client.sizes[0] == 8
+        assert sorted(s for s in client.sizes if s <= 2) == [2, 2, 2, 2]
+
+    async def test_timeout_is_halved(self, monkeypatch):
+        monkeypatch.setattr(
+            embedding_batches.settings, "EMBEDDING_BATCH_TIMEOUT_SECONDS", 0.05
+        )
+        calls: List[int] = []
+
+        async def _create(input, **kwargs):
+            calls.append(len(input))
+            if len(input) > 1:
+                await asyncio.sleep(1)
+            return MagicMock(data=[MagicMock(embedding=_vector(t)) for t in input])
+
+        client = MagicMock()
+        client.embeddings.create = _create
+        vectors = await embed_texts(client, ["a", "bb"], max_items=2)
+
+        assert vectors == [_vector("a"), _vector("bb")]
+        assert calls == [2, 1, 1]
+
+    async def test_other_errors_fail_the_call(self):
+        client = MagicMock()
+
+        async def _create(input, **kwargs):
+            raise RuntimeError("bad request")
+
+        client.embeddings.create = _create
+        with pytest.raises(RuntimeError):
+            await embed_texts(client, ["a", "b", "c"], max_items=1)
+
+    async def test_single_chunk_that_is_too_large_fails(self):
+        with pytest.raises(_PayloadTooLarge):
+            await embed_texts(_Client(reject_over=0), ["a", "b"], max_items=2)
+
+    async def test_result_count_mismatch_raises(self):
+        client = MagicMock()
+
+        async def _create(input, **kwargs):
+            return MagicMock(data=[])
+
+        client.embeddings.create = _create
+        with pytest.raises(ValueError):
+            await embed_texts(client, ["a"])
+
+    async def test_counts_billed_tokens(self):
+        before = metrics.value("embeddings.tokens")
+        # MagicMock usage isn't an int, so the batch falls back to estimates.
+        await embed_texts(_Client(), ["a" * 40, "b" * 8], max_items=1)
+        assert metrics.value("embeddings.tokens") - before == 12
+
+        client = _Client()
+        create = client._create
+
+        async def _with_usage(input, **kwargs):
+            result = await create(input, **kwargs)
+            result.usage.prompt_tokens = 7
+            return result
+
+        client.embeddings.create = _with_usage
+        before = metrics.value("embeddings.tokens")
+        await embed_texts(client, ["a" * 40, "b" * 8], max_items=1)
+        assert metrics.value("embeddings.tokens") - before == 14
@@ -0,0 +1,141 @@
+"""Tests for app.explore.services.embedding_cache — the persistent cache of
+document-chunk embeddings in front of the embeddings API."""
+
+from __future__ import annotations
+
+from typing import List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.explore.core import metrics
+from app.explore.services import embedding_cache
+from app.explore.services.embedding_cache import chunk_hash
+
+
+@pytest.fixture(autouse=True)
+def _enabled(monkeypatch):
+    monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_STORE_CACHE", True)
+    monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_DIMENSIONS", 2)
+
+
+def _supabase(cached: dict) -> MagicMock:
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = MagicMock(
+        data=[
+            {"content_hash": digest, "embedding": str(vector)}
+            for digest, vector in cached.items()
+        ]
+    )
+    table = client.table.return_value
+    table.upsert.return_value = table
+    table.execute.return_value = MagicMock(data=[])
+    return client
+
+
+def _embed(texts: List[str]) -> List[List[float]]:
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+class TestEmbedTexts:
+    async def test_hits_skip_the_api_and_misses_are_written_back(self):
+        client = _supabase({chunk_hash("old"): [9.0, 9.0]})
+        api = AsyncMock(side_effect=lambda _client, texts, **_: _embed(texts))
+        hits = metrics.value("embeddings.cache_hits")
+        dollars = metrics.value("embeddings.dollars_saved")
+        with (
+            patch.object(embedding_cache, "supabase", client),
+            patch.object(embedding_cache.embedding_batches, "embed_texts", api),
+        ):
+            vectors = await embedding_cache.embed_texts(
+                MagicMock(), ["old", "new", "new"]
+            )
+
+        assert vectors == [[9.0, 9.0], [3.0, 1.0], [3.0, 1.0]]
+        # Only the miss goes to the API, once despite appearing twice.
+        assert api.call_args.args[1] == ["new"]
+        name, params = client.rpc.call_args.args
+        assert name == "get_cached_embeddings"
+        assert params["_hashes"] == [chunk_hash("old"), chunk_hash("new")]
+        written = client.table.return_value.upsert.call_args.args[0]
+        assert [row["content_hash"] for row in written] == [chunk_hash("new")]
+        assert written[0]["embedding"] == [3.0, 1.0]
+        assert metrics.value("embeddings.cache_hits") == hits + 1
+        assert metrics.value("embeddings.dollars_saved") > dollars
+
+    async def test_wrong_dimension_entries_are_misses(self):
+        client = _supabase({chunk_hash("a"): [1.0, 2.0, 3.0]})
+        api = AsyncMock(side_effect=lambda _client, texts, **_: _embed(texts))
+        with (
+            patch.object(embedding_cache, "supabase", client),
+            patch.object(embedding_cache.embedding_batches, "embed_texts", api),
+        ):
+            assert await embedding_cache.embed_texts(MagicMock(), ["a"]) == [[1.0, 1.0]]
+
+    async def test_cache_failures_fall_back_to_the_api(self):
+        client = MagicMock()
+        client.rpc.side_effect = RuntimeError("relation does not exist")
+        client.table.side_effect = RuntimeError("relation does not exist")
+        api = AsyncMock(side_effect=lambda _client, texts, **_: _embed(texts))
+        with (
+            patch.object(embedding_cache, "supabase", client),
+            patch.object(embedding_cache.embedding_batches, "embed_texts", api),
+        ):
+            assert await embedding_cache.embed_texts(MagicMock(), ["ab"]) == [
+                [2.0, 1.0]
+            ]
+
+    async def test_disabled_goes_straight_to_the_api(self, monkeypatch):
+        monkeypatch.setattr(embedding_cache.settings, "EMBEDDING_STORE_CACHE", False)
+        client = _supabase({})
+        api = AsyncMock(return_value=[[1.0, 1.0]])
+        with (
+            patch.object(embedding_cache, "supabase", client),
+            patch.object(embedding_cache.embedding_batches, "embed_texts", api),
+        ):
+            await embedding_cache.embed_texts(MagicMock(), ["a"])
+
+        client.rpc.assert_not_called()
+
+    async def test_entries_are_keyed_by_the_requested_model(self):
+        client = _supabase({})
+        api = AsyncMock(return_value=[[1.0, 1.0, 1.0]])
+        with (
+            patch.object(embedding_cache, "supabase", client),
+            patch.object(embedding_cache.embedding_batches, "embed_texts", api),
+        ):
+            await embedding_cache.embed_texts(
+                MagicMock(), ["a"], model="next/model", dimensions=3
+            )
+
+        params = client.rpc.call_args.args[1]
+        assert (params["_model"], params["_dimensions"]) == ("next/model", 3)
+        assert api.call_args.kwargs == {"model": "next/model", "dimensions": 3}
+        written = client.table.return_value.upsert.call_args.args[0]
+        assert (written[0]["model"], written[0]["dimensions"]) == ("next/model", 3)
+
+
+async def test_collect_garbage_reports_deleted_rows():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = MagicMock(data=3)
+    with patch.object(embedding_cache, "supabase", client):
+        assert await embedding_cache.collect_garbage() == 3
+
+    name, params = client.rpc.call_args.args
+    assert name == "gc_embedding_cache"
+    assert params["_min_age_seconds"] == (
+        embedding_cache.settings.EMBEDDING_CACHE_GC_MIN_AGE_SECONDS
+    )
+
+
+async def test_collect_garbage_runs_once_per_interval_across_workers(monkeypatch):
+    monkeypatch.setattr(
+        embedding_cache.settings, "EMBEDDING_CACHE_GC_INTERVAL_SECONDS", 3600.0
+    )
+    client = MagicMock()
+    # Another worker ran (or is running) the GC: the RPC declines with 0.
+    client.rpc.return_value.execute.return_value = MagicMock(data=0)
+    with patch.object(embedding_cache, "supabase", client):
+        assert await embedding_cache.collect_garbage() == 0
+
+    assert client.rpc.call_args.args[1]["_min_interval_seconds"] == 3240
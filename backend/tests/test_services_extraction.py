@@ -0,0 +1,99 @@
+"""Tests for app.explore.services.extraction — the extraction process pool
+(timeouts, memory cap, error transport) and its in-thread fallback."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+
+from app.explore.core import metrics
+from app.explore.services import extraction
+from app.explore.services.pdf_parser import extract_text
+
+
+def _zip_with_members(count: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i in range(count):
+            archive.writestr(f"m{i}.xml", "")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+async def pool(monkeypatch):
+    monkeypatch.setattr(extraction.settings, "EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(extraction.settings, "EXTRACTION_MAX_MEMORY_MB", 512)
+    extraction.start_pool()
+    assert extraction._pool is not None
+    # Start both workers up front so timings below exclude process start-up.
+    await asyncio.gather(
+        extraction.run(time.sleep, 0.2), extraction.run(time.sleep, 0.2)
+    )
+    yield extraction._pool
+    await extraction.stop_pool()
+
+
+class TestPool:
+    async def test_runs_the_extractor_in_a_worker(self, pool):
+        assert await extraction.run(extract_text, b"hello", "notes.txt") == "hello"
+
+    async def test_http_exceptions_cross_the_process_boundary(self, pool):
+        with pytest.raises(HTTPException) as exc:
+            await extraction.run(extract_text, _zip_with_members(2001), "x.docx")
+        assert exc.value.status_code == 400
+        assert "member count" in exc.value.detail
+
+    async def test_memory_cap_is_an_extraction_error(self, pool):
+        with pytest.raises(extraction.ExtractionError):
+            await extraction.run(bytearray, 2 * 1024**3)
+
+    async def test_timeout_replaces_the_pool(self, pool, monkeypatch):
+        monkeypatch.setattr(extraction.settings, "EXTRACTION_TIMEOUT_SECONDS", 0.5)
+        timeouts = metrics.value("extraction.timeouts")
+        with pytest.raises(extraction.ExtractionError):
+            await extraction.run(time.sleep, 30)
+        assert metrics.value("extraction.timeouts") == timeouts + 1
+        # The replacement pool serves the next job (given time to start up).
+        monkeypatch.setattr(extraction.settings, "EXTRACTION_TIMEOUT_SECONDS", 30.0)
+        assert await extraction.run(extract_text, b"ok", "a.md") == "ok"
+
+    async def test_jobs_killed_with_a_timed_out_pool_are_resubmitted(self, pool):
+        restarts = metrics.value("extraction.pool_restarts")
+        stuck = asyncio.create_task(pool.run(time.sleep, 30, timeout=1.0))
+        victim = asyncio.create_task(pool.run(time.sleep, 2, timeout=30.0))
+        with pytest.raises(TimeoutError):
+            await stuck
+        assert await victim is None
+        assert metrics.value("extraction.pool_restarts") == restarts + 1
+
+    async def test_waiting_for_a_worker_does_not_count_toward_the_timeout(
+        self, pool, monkeypatch
+    ):
+        monkeypatch.setattr(extraction.settings, "EXTRACTION_TIMEOUT_SECONDS", 1.0)
+        restarts = metrics.value("extraction.pool_restarts")
+        # Six 0.6 s jobs on two workers take ~1.8 s; each runs well inside 1 s.
+        results = await asyncio.gather(
+            *(extraction.run(time.sleep, 0.6) for _ in range(6))
+        )
+        assert results == [None] * 6
+        assert metrics.value("extraction.pool_restarts") == restarts
+
+
+class TestInline:
+    async def test_runs_in_a_thread_without_a_pool(self):
+        assert extraction._pool is None
+        assert await extraction.run(extract_text, b"inline", "a.txt") == "inline"
+
+    async def test_timeout_applies_inline(self, monkeypatch):
+        monkeypatch.setattr(extraction.settings, "EXTRACTION_TIMEOUT_SECONDS", 0.05)
+        with pytest.raises(extraction.ExtractionError):
+            await extraction.run(time.sleep, 0.3)
+
+    async def test_queue_depth_is_reported(self):
+        snapshot = metrics.snapshot()["extraction"]
+        assert snapshot == {"workers": 0, "in_flight": 0, "queued": 0}
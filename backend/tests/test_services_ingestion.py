@@ -0,0 +1,197 @@
+"""Tests for app.explore.services.ingestion — shared inline/background work."""
+
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.explore.services import ingestion
+from app.explore.services.pdf_parser import PDFParser
+from app.explore.services.rag_service import chunk_hash
+
+
+def _supabase() -> MagicMock:
+    client = MagicMock()
+    table = client.table.return_value
+    for method in ("select", "delete", "eq", "in_"):
+        getattr(table, method).return_value = table
+    table.execute.return_value = MagicMock(data=[])
+    return client
+
+
+class TestStorePages:
+    async def test_job_attempt_clears_its_earlier_rows_and_tags_chunks(self):
+        client = _supabase()
+        rag = MagicMock()
+        rag.store_pages = AsyncMock(return_value=[1, 2, 3])
+        pages = [
+            {"content": "one", "metadata": {"page_number": 1}},
+            {"content": "two", "metadata": {"page_number": 2}},
+        ]
+        with patch.object(ingestion, "supabase", client):
+            ids = await ingestion.store_pages(rag, pages, 7, "uid", job_id="job-1")
+
+        assert ids == [1, 2, 3]
+        client.table.return_value.delete.assert_called_once()
+        client.table.return_value.eq.assert_any_call(
+            "metadata->>ingestion_job_id", "job-1"
+        )
+        call = rag.store_pages.call_args
+        assert call.args[0] == pages
+        assert call.kwargs["metadata"]["ingestion_job_id"] == "job-1"
+        assert call.kwargs["metadata"]["upload_date"]
+
+    async def test_inline_upload_deletes_nothing(self):
+        client = _supabase()
+        rag = MagicMock()
+        rag.store_pages = AsyncMock(return_value=[1])
+        pages = [{"content": "one", "metadata": {}}]
+        with patch.object(ingestion, "supabase", client):
+            await ingestion.store_pages(rag, pages, 7, "uid")
+
+        client.table.return_value.delete.assert_not_called()
+
+    async def test_streaming_mode_uses_the_pipeline(self, monkeypatch):
+        monkeypatch.setattr(ingestion.settings, "INGESTION_STREAMING", True)
+        client = _supabase()
+        rag = MagicMock()
+        rag.store_pages = AsyncMock()
+        stream = AsyncMock(return_value=[4, 5])
+        progress = AsyncMock()
+        pages = [{"content": "one", "metadata": {}}]
+        with (
+            patch.object(ingestion, "supabase", client),
+            patch.object(ingestion.pipeline, "store_stream", stream),
+        ):
+            ids = await ingestion.store_pages(
+                rag, pages, 7, "uid", job_id="job-1", progress=progress
+            )
+
+        assert ids == [4, 5]
+        rag.store_pages.assert_not_called()
+        call = stream.call_args
+        assert [page async for page in call.args[1]] == pages
+        assert call.kwargs["metadata"]["ingestion_job_id"] == "job-1"
+        assert call.kwargs["progress"] is progress
+
+
+class TestIndexPortalFile:
+    async def test_download_failure_raises(self):
+        client = _supabase()
+        client.storage.from_.return_value.download.side_effect = OSError("404")
+        with patch.object(ingestion, "supabase", client):
+            with pytest.raises(ingestion.StorageDownloadError):
+                await ingestion.index_portal_file(MagicMock(), 7, "a.txt", "uid")
+
+    async def test_reports_progress_and_stores(self):
+        client = _supabase()
+        client.storage.from_.return_value.download.return_value = b"hello world"
+        rag = MagicMock()
+        rag.store_document = AsyncMock(return_value=[1, 2])
+        stages = []
+
+        async def _progress(update):
+            stages.append(update["stage"])
+
+        with patch.object(ingestion, "supabase", client):
+            result = await ingestion.index_portal_file(
+                rag, 7, "notes/a.txt", "uid", progress=_progress
+            )
+
+        assert result == {
+            "indexed": True,
+            "chunks": 2,
+            "reused": 0,
+            "added": 2,
+            "removed": 0,
+        }
+        assert stages == ["downloading", "extracting", "embedding"]
+        client.storage.from_.return_value.download.assert_called_once_with(
+            "7/notes/a.txt"
+        )
+        assert rag.store_document.call_args.kwargs["source"] == "portal"
+
+
+class TestIncrementalReindex:
+    """A changed file re-embeds only its new chunks (chunk_hash matching)."""
+
+    def _rag(self) -> MagicMock:
+        rag = MagicMock()
+        rag.pdf_parser = PDFParser(chunk_size=20, chunk_overlap=0)
+        rag.store_chunks = AsyncMock(return_value=[100])
+        rag.store_document = AsyncMock()
+        return rag
+
+    def _client(self, text: str, rows: list) -> MagicMock:
+        client = _supabase()
+        client.storage.from_.return_value.download.return_value = text.encode()
+        client.table.return_value.execute.side_effect = [
+            MagicMock(data=rows),  # existing rows for the file
+            MagicMock(data=[]),  # delete of vanished rows
+        ]
+        return client
+
+    async def test_only_changed_chunks_are_embedded(self):
+        rag = self._rag()
+        old = rag.pdf_parser.chunk_text("alpha beta gamma\n\ndelta epsilon\n\nzeta")
+        rows = [
+            {
+                "id": 1,
+                "content": old[0],
+                "metadata": {"chunk_hash": chunk_hash(old[0])},
+            },
+            # Stored before chunk hashes existed: matched by its content.
+            {"id": 2, "content": old[1], "metadata": {"chunk_index": 1}},
+            {"id": 3, "content": old[2], "metadata": {}},
+        ]
+        new_text = "alpha beta gamma\n\nnew paragraph\n\ndelta epsilon"
+        client = self._client(new_text, rows)
+        with patch.object(ingestion, "supabase", client):
+            result = await ingestion.index_portal_file(rag, 7, "a.txt", "uid")
+
+        assert result == {
+            "indexed": True,
+            "chunks": 3,
+            "reused": 2,
+            "added": 1,
+            "removed": 1,
+        }
+        rag.store_document.assert_not_called()
+        chunks, metadatas = rag.store_chunks.call_args.args
+        assert chunks == ["new paragraph"]
+        assert metadatas[0]["chunk_index"] == 1
+        assert metadatas[0]["total_chunks"] == 3
+
+        name, params = client.rpc.call_args.args
+        assert name == "patch_client_knowledge_metadata"
+        assert params["_project_id"] == 7
+        positions = {u["id"]: u["metadata"]["chunk_index"] for u in params["_updates"]}
+        assert positions == {1: 0, 2: 2}
+        assert all(u["metadata"]["chunk_hash"] for u in params["_updates"])
+        client.table.return_value.in_.assert_called_once_with("id", [3])
+
+    async def test_unchanged_text_skips_everything(self):
+        rag = self._rag()
+        text = "same text"
+        digest = ingestion.hashlib.sha256(text.encode()).hexdigest()
+        client = self._client(text, [{"id": 1, "metadata": {"content_hash": digest}}])
+        with patch.object(ingestion, "supabase", client):
+            result = await ingestion.index_portal_file(rag, 7, "a.txt", "uid")
+
+        assert result == {"indexed": True, "chunks": 1, "unchanged": True}
+        rag.store_chunks.assert_not_called()
+        client.rpc.assert_not_called()
+
+    async def test_full_mode_deletes_and_re_embeds(self):
+        rag = self._rag()
+        rag.store_document = AsyncMock(return_value=[10, 11])
+        client = self._client("new text", [{"id": 1, "content": "x", "metadata": {}}])
+        with patch.object(ingestion, "supabase", client):
+            result = await ingestion.index_portal_file(
+                rag, 7, "a.txt", "uid", incremental=False
+            )
+
+        assert result["reused"] == 0 and result["removed"] == 1
+        rag.store_chunks.assert_not_called()
+        client.table.return_value.delete.assert_called_once()
@@ -0,0 +1,215 @@
+"""Tests for app.explore.services.jobs — the ingestion job queue workers."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.explore.services import jobs
+
+JOB = {"id": "job-1", "kind": "index_file", "project_id": 7, "attempts": 1}
+
+
+def _supabase(rpc_data: Any = None, updated: bool = True) -> MagicMock:
+    """Fake client; ``updated=False`` makes every guarded UPDATE match no row
+    (another worker holds the lease)."""
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value = MagicMock(data=rpc_data)
+    table = client.table.return_value
+    table.update.return_value = table
+    table.eq.return_value = table
+    table.execute.return_value = MagicMock(data=[{"id": "job-1"}] if updated else [])
+    return client
+
+
+def _updates(client: MagicMock) -> List[Dict[str, Any]]:
+    return [c.args[0] for c in client.table.return_value.update.call_args_list]
+
+
+def _pool(handler: Any) -> jobs.JobWorkerPool:
+    return jobs.JobWorkerPool({"index_file": handler}, workers=1)
+
+
+class TestExecute:
+    async def test_success_records_result(self):
+        client = _supabase()
+        handler = AsyncMock(return_value={"indexed": True, "chunks": 3})
+        with patch.object(jobs, "supabase", client):
+            await _pool(handler)._execute("w1", {**JOB, "max_attempts": 3})
+
+        final = _updates(client)[-1]
+        assert final["status"] == "succeeded"
+        assert final["result"] == {"indexed": True, "chunks": 3}
+        assert final["locked_by"] is None
+        # Writes are guarded by the lease owner.
+        client.table.return_value.eq.assert_any_call("locked_by", "w1")
+
+    async def test_failure_is_retried_later_without_leaking_text(self):
+        client = _supabase()
+        handler = AsyncMock(side_effect=RuntimeError("postgres://user:secret@db"))
+        with patch.object(jobs, "supabase", client):
+            await _pool(handler)._execute("w1", {**JOB, "max_attempts": 3})
+
+        final = _updates(client)[-1]
+        assert final["status"] == "queued"
+        assert final["error"] == "RuntimeError"
+        run_after = datetime.fromisoformat(final["run_after"])
+        assert run_after > datetime.now(timezone.utc)
+
+    async def test_last_attempt_fails_the_job(self):
+        client = _supabase()
+        handler = AsyncMock(side_effect=RuntimeError("boom"))
+        with patch.object(jobs, "supabase", client):
+            await _pool(handler)._execute(
+                "w1", {**JOB, "attempts": 3, "max_attempts": 3}
+            )
+
+        final = _updates(client)[-1]
+        assert final["status"] == "failed"
+        assert final["finished_at"]
+
+    async def test_permanent_error_fails_at_once_with_its_message(self):
+        client = _supabase()
+        handler = AsyncMock(side_effect=jobs.PermanentJobError("bad payload"))
+        with patch.object(jobs, "supabase", client):
+            await _pool(handler)._execute("w1", {**JOB, "max_attempts": 3})
+
+        final = _updates(client)[-1]
+        assert final["status"] == "failed"
+        assert final["error"] == "bad payload"
+
+    async def test_unknown_kind_fails(self):
+        client = _supabase()
+        with patch.object(jobs, "supabase", client):
+            await _pool(AsyncMock())._execute("w1", {**JOB, "kind": "nope"})
+
+        assert _updates(client)[-1]["status"] == "failed"
+
+    async def test_shutdown_returns_job_without_spending_an_attempt(self):
+        client = _supabase()
+        started = asyncio.Event()
+
+        async def _slow(job, progress):
+            started.set()
+            await asyncio.sleep(60)
+
+        pool = _pool(_slow)
+        with patch.object(jobs, "supabase", client):
+            task = asyncio.create_task(
+                pool._execute("w1", {**JOB, "attempts": 2, "max_attempts": 3})
+            )
+            await started.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        final = _updates(client)[-1]
+        assert final["status"] == "queued"
+        assert final["attempts"] == 1
+        assert pool._running == {}
+
+    async def test_lease_stolen_mid_handler_stops_it_without_writing(self, monkeypatch):
+        # A 3 s lease renews every second; the first renewal finds the job
+        # reclaimed by another worker.
+        monkeypatch.setattr(jobs.settings, "INGESTION_JOB_LEASE_SECONDS", 3)
+        client = _supabase(updated=False)
+        inserts: List[int] = []
+        cancelled = asyncio.Event()
+
+        async def _upload(job, progress):
+            try:
+                while True:
+                    inserts.append(len(inserts))
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        pool = _pool(_upload)
+        lost = jobs.metrics.value("jobs.lease_lost")
+        with patch.object(jobs, "supabase", client):
+            await asyncio.wait_for(pool._execute("w1", dict(JOB)), 5)
+
+        assert cancelled.is_set()
+        # Only the failed renewal was attempted: no outcome was recorded.
+        assert [set(u) for u in _updates(client)] == [{"locked_at", "updated_at"}]
+        assert jobs.metrics.value("jobs.lease_lost") == lost + 1
+        assert pool._running == {}
+        stopped_at = len(inserts)
+        await asyncio.sleep(0.2)
+        assert len(inserts) == stopped_at
+
+
+class TestClaim:
+    async def test_projects_at_their_limit_are_skipped(self):
+        client = _supabase(rpc_data=[])
+        pool = _pool(AsyncMock())
+        pool._running = {7: 1, 8: 0}
+        with patch.object(jobs, "supabase", client):
+            assert await pool._claim("w1") is None
+
+        name, params = client.rpc.call_args.args
+        assert name == "claim_ingestion_job"
+        assert params["_skip_projects"] == [7]
+
+    async def test_returns_claimed_row(self):
+        client = _supabase(rpc_data=[JOB])
+        with patch.object(jobs, "supabase", client):
+            assert await _pool(AsyncMock())._claim("w1") == JOB
+
+
+class TestProgress:
+    async def test_updates_are_throttled(self):
+        client = _supabase()
+        with patch.object(jobs, "supabase", client):
+            write = _pool(AsyncMock())._progress_writer("w1", "job-1")
+            await write({"stage": "downloading"})
+            await write({"stage": "extracting"})
+
+        assert [u["progress"] for u in _updates(client)] == [{"stage": "downloading"}]
+
+
+class TestEnqueue:
+    async def test_returns_the_row_and_wakes_local_workers(self):
+        client = _supabase(rpc_data={"id": "job-9", "status": "queued"})
+        pool = _pool(AsyncMock())
+        with patch.object(jobs, "supabase", client), patch.object(jobs, "_pool", pool):
+            job = await jobs.enqueue(
+                "index_file", 7, "uid", {"storage_path": "a.pdf"}, dedupe_key="a.pdf"
+            )
+
+        assert job["id"] == "job-9"
+        assert pool._wake.is_set()
+        assert client.rpc.call_args.args[1]["_dedupe_key"] == "a.pdf"
+
+    async def test_null_row_is_retried(self):
+        """The queued duplicate was claimed mid-call: the RPC returned a NULL
+        composite, and calling it again enqueues a fresh job."""
+        client = _supabase()
+        client.rpc.return_value.execute.side_effect = [
+            MagicMock(data={"id": None, "status": None}),
+            MagicMock(data={"id": "job-10", "status": "queued"}),
+        ]
+        with patch.object(jobs, "supabase", client):
+            job = await jobs.enqueue("index_file", 7, "uid", {}, dedupe_key="a.pdf")
+
+        assert job["id"] == "job-10"
+        assert client.rpc.call_count == 2
+
+    async def test_missing_row_raises(self):
+        client = _supabase(rpc_data=None)
+        with patch.object(jobs, "supabase", client):
+            with pytest.raises(RuntimeError):
+                await jobs.enqueue("upload", 7, "uid", {})
+        assert client.rpc.call_count == jobs.ENQUEUE_ATTEMPTS
+
+
+def test_retry_delay_grows_and_is_capped():
+    with patch.object(jobs.random, "uniform", return_value=1.0):
+        delays = [jobs.retry_delay(n) for n in (1, 2, 3, 10)]
+    assert delays[0] < delays[1] < delays[2]
+    assert delays[3] == jobs.MAX_RETRY_DELAY_SECONDS
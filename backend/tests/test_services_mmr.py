@@ -0,0 +1,43 @@
+"""Tests for app.explore.services.mmr."""
+
+from __future__ import annotations
+
+import numpy as np
+
+from app.explore.services import mmr
+
+
+def _unit(*rows: list[float]) -> np.ndarray:
+    return mmr.normalize_rows(np.asarray(rows, dtype=np.float32))
+
+
+# Rows 0 and 1 are near-duplicates; row 2 points elsewhere.
+VECTORS = _unit([1.0, 0.0, 0.0], [0.99, 0.05, 0.0], [0.2, 1.0, 0.0])
+
+
+class TestSelect:
+    def test_lambda_one_is_relevance_order(self):
+        assert mmr.select(VECTORS, [0.9, 0.8, 0.1], 3, 1.0) == [0, 1, 2]
+
+    def test_near_duplicate_loses_to_novel_candidate(self):
+        assert mmr.select(VECTORS, [0.9, 0.8, 0.5], 2, 0.5) == [0, 2]
+
+    def test_k_is_capped_at_candidate_count(self):
+        assert sorted(mmr.select(VECTORS, [1, 1, 1], 10, 0.7)) == [0, 1, 2]
+        assert mmr.select(VECTORS, [1, 1, 1], 0, 0.7) == []
+
+    def test_relevance_scale_does_not_matter(self):
+        small = mmr.select(VECTORS, [0.009, 0.008, 0.005], 2, 0.5)
+        large = mmr.select(VECTORS, [90.0, 80.0, 50.0], 2, 0.5)
+        assert small == large == [0, 2]
+
+
+class TestDisplacedDuplicates:
+    def test_reports_only_dropped_near_duplicates(self):
+        assert mmr.displaced_duplicates(VECTORS, [0, 2], 2) == [1]
+
+    def test_dropped_but_distinct_is_not_counted(self):
+        assert mmr.displaced_duplicates(VECTORS, [0, 1], 3) == []
+
+    def test_nothing_dropped(self):
+        assert mmr.displaced_duplicates(VECTORS, [0, 1], 2) == []
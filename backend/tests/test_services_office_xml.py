@@ -0,0 +1,150 @@
+"""Tests for office_xml: the streaming Office extractors match the libraries.
+
+Each document is built with python-docx / python-pptx / openpyxl and
+extracted twice through ``extract_text``, with ``OFFICE_XML_EXTRACTION`` off
+(the library extractors) and on; the text must be identical.
+"""
+
+from __future__ import annotations
+
+import datetime
+import io
+import zipfile
+from typing import cast
+
+import pytest
+from fastapi import HTTPException
+
+import app.explore.services.pdf_parser as parser_mod
+from app.explore.core.config import settings
+from app.explore.services.pdf_parser import extract_text
+
+
+def _docx() -> bytes:
+    from docx import Document
+    from docx.enum.text import WD_BREAK
+
+    document = Document()
+    document.add_heading("Quarterly report", 0)
+    paragraph = document.add_paragraph("Alpha\tbeta ")
+    paragraph.add_run("bold").bold = True
+    paragraph.runs[-1].add_break()
+    paragraph.add_run("after a line break")
+    paragraph.add_run().add_break(WD_BREAK.PAGE)
+    document.add_paragraph("")
+    document.add_paragraph("   ")
+    document.add_table(rows=2, cols=2).cell(0, 0).text = "table text"
+    document.add_paragraph("Last paragraph — ünïcode")
+    buf = io.BytesIO()
+    document.save(buf)
+    return buf.getvalue()
+
+
+def _pptx() -> bytes:
+    from pptx import Presentation
+    from pptx.shapes.autoshape import Shape
+    from pptx.util import Inches
+
+    presentation = Presentation()
+    for i in range(3):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        title = slide.shapes.title
+        assert title is not None
+        title.text = f"Slide {i}"
+        cast(
+            Shape, slide.placeholders[1]
+        ).text_frame.text = "Point one\nPoint two\vsoft break"
+        box = slide.shapes.add_textbox(Inches(1), Inches(1), Inches(2), Inches(1))
+        box.text_frame.text = "text box"
+        group = slide.shapes.add_group_shape()
+        grouped = group.shapes.add_textbox(Inches(1), Inches(1), Inches(1), Inches(1))
+        grouped.text_frame.text = "grouped"
+        table = slide.shapes.add_table(2, 2, Inches(1), Inches(3), Inches(4), Inches(1))
+        table.table.cell(0, 0).text = "table cell"
+    buf = io.BytesIO()
+    presentation.save(buf)
+    return buf.getvalue()
+
+
+def _xlsx() -> bytes:
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    assert sheet is not None
+    sheet.append(["name", "count", "ratio", "ok", "when", None, "end"])
+    sheet.append(["a", 1, 2.5, True, datetime.datetime(2024, 3, 1, 12, 30), None, ""])
+    sheet.append([])
+    sheet.append([None, None, 1e20, False, datetime.date(2020, 1, 1)])
+    sheet["H2"] = "=B2*2"
+    second = workbook.create_sheet("Second")
+    second.append(["x", 3.0, datetime.time(13, 5), datetime.timedelta(hours=30)])
+    second["B5"] = 0.25
+    second["B5"].number_format = "0.00%"
+    buf = io.BytesIO()
+    workbook.save(buf)
+    return buf.getvalue()
+
+
+def _extract(data: bytes | str, filename: str, lean: bool, monkeypatch) -> str | None:
+    monkeypatch.setattr(settings, "OFFICE_XML_EXTRACTION", lean)
+    return extract_text(data, filename)
+
+
+@pytest.mark.parametrize(
+    "build, filename",
+    [(_docx, "report.docx"), (_pptx, "deck.pptx"), (_xlsx, "sheet.xlsx")],
+)
+def test_matches_library_extractors(build, filename, monkeypatch):
+    data = build()
+    library = _extract(data, filename, False, monkeypatch)
+    lean = _extract(data, filename, True, monkeypatch)
+    assert lean == library
+    assert lean
+
+
+def test_docx_skips_tables_and_blank_paragraphs(monkeypatch):
+    text = _extract(_docx(), "report.docx", True, monkeypatch)
+    assert text is not None
+    lines = text.split("\n")
+    assert lines[0] == "Quarterly report"
+    assert "Alpha\tbeta bold" in lines
+    assert "table text" not in text
+    assert "   " not in lines
+
+
+def test_xlsx_rows_are_tab_separated(monkeypatch):
+    text = _extract(_xlsx(), "sheet.xlsx", True, monkeypatch)
+    assert text is not None
+    # The formula has no cached value (never calculated), so it is skipped.
+    assert text.split("\n")[1] == "a\t1\t2.5\tTrue\t2024-03-01 12:30:00"
+
+
+def test_path_source_matches_bytes(monkeypatch, tmp_path):
+    data = _pptx()
+    path = tmp_path / "deck.pptx"
+    path.write_bytes(data)
+    assert _extract(str(path), "deck.pptx", True, monkeypatch) == _extract(
+        data, "deck.pptx", True, monkeypatch
+    )
+
+
+def test_zip_bomb_guard_applies(monkeypatch):
+    monkeypatch.setattr(parser_mod, "_ZIP_MAX_DECOMPRESSED_BYTES", 1024)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("payload.txt", b"x" * 2048)
+    with pytest.raises(HTTPException) as exc_info:
+        _extract(buf.getvalue(), "bomb.docx", True, monkeypatch)
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("filename", ["a.docx", "a.pptx", "a.xlsx"])
+def test_invalid_archives_raise_value_error(filename, monkeypatch):
+    with pytest.raises(ValueError):
+        _extract(b"not a zip", filename, True, monkeypatch)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("word/document.xml", b"<doc/>")
+    with pytest.raises(ValueError):
+        _extract(buf.getvalue(), filename, True, monkeypatch)
@@ -1,4 +1,4 @@
-"""Tests for the zip-bomb guard in pdf_parser.
+"""Tests for pdf_parser: the zip-bomb guard and whole-document chunking.
 
 Office formats (docx, pptx, xlsx) are zip archives.  A malicious small
 archive can declare a huge decompressed size and OOM the process.  The guard
@@ -11,6 +11,9 @@ archives that exceed three limits:
 
 The limits are patched to small values in these tests so we never need to
 build 200 MB files in memory.
+
+PDFParser.chunk_document packs runs of short pages into one chunk and splits
+long pages on their own, keeping page metadata on every chunk.
 """
 
 from __future__ import annotations
@@ -22,7 +25,7 @@ import pytest
 from fastapi import HTTPException
 
 import app.explore.services.pdf_parser as parser_mod
-from app.explore.services.pdf_parser import _check_zip_bomb, extract_text
+from app.explore.services.pdf_parser import PDFParser, _check_zip_bomb, extract_text
 
 
 # ---------------------------------------------------------------------------
@@ -147,3 +150,102 @@ class TestExtractTextZipBombRejection:
             pytest.fail("zip-bomb guard incorrectly rejected a sub-cap archive")
         except Exception:
             pass  # downstream Office parser error — acceptable
+
+
+class TestPathSources:
+    """Extractors read a spooled upload's file in place, given its path."""
+
+    def test_docx_from_path_matches_bytes(self, tmp_path):
+        from docx import Document
+
+        document = Document()
+        document.add_paragraph("First paragraph")
+        document.add_paragraph("Second paragraph")
+        buffer = io.BytesIO()
+        document.save(buffer)
+        path = tmp_path / "upload"
+        path.write_bytes(buffer.getvalue())
+
+        from_path = extract_text(str(path), "report.docx")
+        assert from_path == extract_text(buffer.getvalue(), "report.docx")
+        assert from_path == "First paragraph\nSecond paragraph"
+
+    def test_plaintext_from_path(self, tmp_path):
+        path = tmp_path / "upload"
+        path.write_bytes("caf\u00e9 notes".encode())
+        assert extract_text(str(path), "notes.md") == "caf\u00e9 notes"
+
+    def test_zip_bomb_guard_measures_the_file(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(parser_mod, "_ZIP_MAX_DECOMPRESSED_BYTES", 1024)
+        path = tmp_path / "upload"
+        path.write_bytes(_make_zip([("payload.txt", b"x" * 2048)]))
+        with pytest.raises(HTTPException) as exc_info:
+            extract_text(str(path), "deck.pptx")
+        assert exc_info.value.status_code == 400
+
+
+# ---------------------------------------------------------------------------
+# PDFParser.chunk_document
+# ---------------------------------------------------------------------------
+
+
+def _page(n: int, content: str) -> dict:
+    return {"content": content, "metadata": {"filename": "a.pdf", "page_number": n}}
+
+
+class TestChunkDocument:
+    def test_short_pages_are_packed_with_their_page_range(self):
+        parser = PDFParser(chunk_size=100, chunk_overlap=0)
+        pages = [_page(1, "a" * 40), _page(2, "b" * 40), _page(3, "c" * 40)]
+
+        chunks = parser.chunk_document(pages)
+
+        assert [c["content"] for c in chunks] == [
+            "a" * 40 + "\n\n" + "b" * 40,
+            "c" * 40,
+        ]
+        assert chunks[0]["metadata"]["page_number"] == 1
+        assert chunks[0]["metadata"]["page_end"] == 2
+        assert chunks[1]["metadata"] == {
+            "filename": "a.pdf",
+            "page_number": 3,
+            "chunk_index": 0,
+            "total_chunks": 1,
+        }
+
+    def test_long_pages_split_alone_and_keep_page_number(self):
+        parser = PDFParser(chunk_size=100, chunk_overlap=0)
+        long_text = " ".join(["word"] * 60)  # ~300 chars
+        pages = [_page(1, "intro"), _page(2, long_text), _page(3, "outro")]
+
+        chunks = parser.chunk_document(pages)
+
+        assert chunks[0]["content"] == "intro"
+        middle = chunks[1:-1]
+        assert middle == [
+            {
+                "content": chunk,
+                "metadata": {
+                    "filename": "a.pdf",
+                    "page_number": 2,
+                    "chunk_index": i,
+                    "total_chunks": len(middle),
+                },
+            }
+            for i, chunk in enumerate(parser.chunk_text(long_text))
+        ]
+        assert chunks[-1]["metadata"]["page_number"] == 3
+        assert "page_end" not in chunks[-1]["metadata"]
+
+    def test_blank_pages_are_skipped(self):
+        parser = PDFParser(chunk_size=100, chunk_overlap=0)
+        assert parser.chunk_document([_page(1, "  "), _page(2, "x")]) == [
+            {
+                "content": "x",
+                "metadata": {
+                    **_page(2, "")["metadata"],
+                    "chunk_index": 0,
+                    "total_chunks": 1,
+                },
+            }
+        ]
@@ -0,0 +1,156 @@
+"""Tests for app.explore.services.pipeline — streaming extract → chunk →
+embed → insert ingestion."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List, cast
+
+import pytest
+
+from app.explore.services import pipeline
+from app.explore.services.pdf_parser import PDFParser
+from app.explore.services.rag_service import RAGService
+
+
+def _page(n: int, content: str, total: int = 0) -> Dict[str, Any]:
+    return {
+        "content": content,
+        "metadata": {"filename": "a.pdf", "page_number": n, "total_pages": total},
+    }
+
+
+class _Rag:
+    """Records what the embed and insert stages receive."""
+
+    def __init__(self) -> None:
+        self.pdf_parser = PDFParser(chunk_size=100, chunk_overlap=10)
+        self.embedded: List[str] = []
+        self.inserted: List[Dict[str, Any]] = []
+
+    async def embed_chunks(self, chunks: List[str]) -> List[List[float]]:
+        self.embedded.extend(chunks)
+        return [[float(len(chunk))] for chunk in chunks]
+
+    async def insert_chunks(self, chunks, metadatas, embeddings, **kwargs):
+        start = len(self.inserted)
+        for chunk, metadata, embedding in zip(chunks, metadatas, embeddings):
+            assert embedding == [float(len(chunk))]
+            self.inserted.append({"content": chunk, "metadata": metadata, **kwargs})
+        return list(range(start, len(self.inserted)))
+
+
+@pytest.fixture(autouse=True)
+def _small_batches(monkeypatch):
+    monkeypatch.setattr(pipeline.settings, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(pipeline.settings, "EMBEDDING_CONCURRENCY", 1)
+    monkeypatch.setattr(pipeline.settings, "INGESTION_PIPELINE_DEPTH", 1)
+
+
+def _pages(count: int) -> List[Dict[str, Any]]:
+    # Alternate long pages (split) and short ones (packed together).
+    return [
+        _page(n, ("word " * 60) if n % 3 == 0 else f"short page {n}", count)
+        for n in range(1, count + 1)
+    ]
+
+
+async def test_stream_matches_chunk_document():
+    rag = _Rag()
+    pages = _pages(20)
+    reports: List[Dict[str, Any]] = []
+
+    async def _progress(fields: Dict[str, Any]) -> None:
+        reports.append(fields)
+
+    ids = await pipeline.store_stream(
+        cast(RAGService, rag),
+        pipeline.iter_pages(pages),
+        client_id="uid",
+        project_id=7,
+        metadata={"upload_date": "today"},
+        progress=_progress,
+    )
+
+    expected = rag.pdf_parser.chunk_document(pages)
+    assert ids == list(range(len(expected)))
+    assert [row["content"] for row in rag.inserted] == [c["content"] for c in expected]
+    assert [row["metadata"] for row in rag.inserted] == [
+        {**c["metadata"], "upload_date": "today"} for c in expected
+    ]
+    assert rag.inserted[0]["project_id"] == 7
+    assert reports[-1] == {
+        "stage": "streaming",
+        "pages_done": 20,
+        "pages_total": 20,
+        "chunks_embedded": len(expected),
+        "chunks_stored": len(expected),
+    }
+
+
+async def test_a_stalled_insert_stops_page_reading():
+    rag = _Rag()
+    release = asyncio.Event()
+    pulled = 0
+
+    async def _source():
+        nonlocal pulled
+        for page in _pages(1000):
+            pulled += 1
+            yield page
+
+    async def _blocked_insert(chunks, metadatas, embeddings, **kwargs):
+        await release.wait()
+        return [0] * len(chunks)
+
+    setattr(rag, "insert_chunks", _blocked_insert)
+    task = asyncio.create_task(
+        pipeline.store_stream(cast(RAGService, rag), _source(), client_id="uid")
+    )
+    await asyncio.sleep(0.05)
+    # One batch inserting, one per queue, one being built: a handful of pages.
+    assert pulled < 20
+    release.set()
+    await task
+    assert pulled == 1000
+
+
+async def test_a_failing_stage_fails_the_document():
+    rag = _Rag()
+
+    async def _failing_embed(chunks):
+        raise ValueError("Failed to generate embeddings: boom")
+
+    setattr(rag, "embed_chunks", _failing_embed)
+    with pytest.raises(ValueError, match="boom"):
+        await pipeline.store_stream(
+            cast(RAGService, rag),
+            pipeline.iter_pages(_pages(50)),
+            client_id="uid",
+        )
+    assert rag.inserted == []
+
+
+async def test_pdf_pages_walks_the_file_by_window(monkeypatch):
+    monkeypatch.setattr(pipeline.settings, "INGESTION_PAGE_WINDOW", 4)
+    windows = []
+
+    class _Parser:
+        def extract_page_window(self, file_bytes, filename, start, count):
+            windows.append((start, count))
+            stop = min(10, start + count)
+            return {
+                "pages": [_page(n + 1, "text") for n in range(start, stop) if n != 5],
+                "total_pages": 10,
+            }
+
+    pages = [
+        page
+        async for page in pipeline.pdf_pages(
+            cast(PDFParser, _Parser()),
+            b"%PDF",
+            "a.pdf",
+        )
+    ]
+    assert windows == [(0, 4), (4, 4), (8, 4)]
+    assert [p["metadata"]["page_number"] for p in pages] == [1, 2, 3, 4, 5, 7, 8, 9, 10]
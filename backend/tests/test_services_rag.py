@@ -8,16 +8,32 @@ Covers:
   - _scope_or_filter: builds correct filter with both project_ids and client_id
   - rerank: falls back to pre-rerank order when rerank_model is empty
   - rerank: returns at most top_n when there is only 1 document (skip rerank)
+  - rerank: repeat calls over the same candidate set hit the rerank cache
   - build_context_string: pure function with known input
+  - pack_context: token-budgeted packing by score, emitted in citation order
   - search_documents: empty project_ids AND no client_id returns [] without calling embedding
+  - search_documents: project-scoped queries served by the in-memory vector cache
+  - generate_embedding: repeat / whitespace-variant queries hit the embedding cache
+  - generate_embeddings: cache misses go out as one list-input request
+  - hybrid_search: fused single-RPC mode, and fallback to the two-RPC RRF path
+  - retrieve_relevant: result cache keyed on scope + corpus generation
+  - retrieve_relevant: MMR drops near-duplicate chunks and reports tokens saved
+  - retrieve_relevant_batch: one batched search RPC, results identical per query
+  - store_chunks: dual-writes embedding_next during an online re-embed
+  - search: EMBEDDING_READ_NEXT flips the query model and column together
+  - insert_chunks: binary COPY when configured, PostgREST when it fails
 """
 
 from __future__ import annotations
 
+from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import numpy as np
 import pytest
 
+from app.explore.core import metrics
+from app.explore.services import corpus, rag_service
 from app.explore.services.rag_service import RAGService, _UUID_RE
 
 
@@ -109,6 +125,12 @@ class TestRerank:
             svc = RAGService()
         return svc
 
+    @pytest.fixture(autouse=True)
+    def _clear_rerank_cache(self):
+        rag_service._rerank_cache.invalidate()
+        yield
+        rag_service._rerank_cache.invalidate()
+
     async def test_empty_rerank_model_returns_documents_truncated(self):
         svc = self._service()
         docs = [{"id": i, "content": f"doc {i}"} for i in range(5)]
@@ -136,19 +158,69 @@ class TestRerank:
         with patch("app.explore.services.rag_service.settings") as mock_settings:
             mock_settings.rerank_model = "cohere/rerank-4-pro"
             mock_settings.api_key = "test-key"
-            with patch("httpx.AsyncClient") as MockClient:
+            with patch(
+                "app.explore.services.rag_service.get_http_client"
+            ) as mock_get_client:
                 mock_resp = MagicMock()
                 mock_resp.raise_for_status.side_effect = httpx.HTTPStatusError(
                     "500", request=MagicMock(), response=MagicMock()
                 )
-                MockClient.return_value.__aenter__.return_value.post = AsyncMock(
-                    return_value=mock_resp
-                )
+                mock_get_client.return_value.post = AsyncMock(return_value=mock_resp)
                 result = await svc.rerank(query="q", documents=docs, top_n=3)
 
         # Falls back to pre-rerank order, truncated
         assert len(result) == 3
         assert result == docs[:3]
+        # ...and a failed call is not cached.
+        assert len(rag_service._rerank_cache) == 0
+
+    async def _rerank(
+        self, svc: RAGService, docs: list[dict], post: AsyncMock, query: str = "q"
+    ) -> list[dict]:
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch(
+                "app.explore.services.rag_service.get_http_client"
+            ) as mock_get_client,
+        ):
+            mock_settings.rerank_model = "cohere/rerank-4-pro"
+            mock_settings.api_key = "test-key"
+            mock_get_client.return_value.post = post
+            return await svc.rerank(query=query, documents=docs, top_n=2)
+
+    @staticmethod
+    def _post(results: list[dict]) -> AsyncMock:
+        resp = MagicMock()
+        resp.json.return_value = {"results": results}
+        return AsyncMock(return_value=resp)
+
+    async def test_repeat_rerank_is_served_from_cache(self):
+        svc = self._service()
+        docs = [{"id": i, "content": f"doc {i}"} for i in range(3)]
+        post = self._post(
+            [{"index": 2, "relevance_score": 0.9}, {"index": 0, "relevance_score": 0.4}]
+        )
+
+        first = await self._rerank(svc, docs, post)
+        # Same candidate set in a different first-stage order still hits.
+        second = await self._rerank(svc, list(reversed(docs)), post)
+
+        post.assert_awaited_once()
+        assert first == second
+        assert [(d["id"], d["rerank_score"]) for d in second] == [(2, 0.9), (0, 0.4)]
+        assert metrics.value("rerank.cache_hits") >= 1
+
+    async def test_changed_content_or_query_misses_cache(self):
+        svc = self._service()
+        docs = [{"id": i, "content": f"doc {i}"} for i in range(3)]
+        post = self._post([{"index": 0, "relevance_score": 0.5}])
+
+        await self._rerank(svc, docs, post)
+        edited = [dict(docs[0], content="doc 0 (edited)"), *docs[1:]]
+        await self._rerank(svc, edited, post)
+        await self._rerank(svc, docs, post, query="other query")
+
+        assert post.await_count == 3
 
 
 # ---------------------------------------------------------------------------
@@ -224,6 +296,641 @@ class TestSearchDocuments:
             assert "_match_count" in rpc_params
             assert "_filter_project_ids" in rpc_params
 
+    async def test_halfvec_mode_calls_halfvec_rpc(self):
+        svc = self._service()
+        svc.generate_embedding = AsyncMock(return_value=[0.1] * 8)
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.VECTOR_SEARCH_HALFVEC = True
+            mock_settings.VECTOR_RESCORE_FACTOR = 4
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=[])
+            await svc.search_documents("q", project_ids=[5], limit=3)
+
+        name, params = mock_supa.rpc.call_args[0]
+        assert name == "match_client_knowledge_halfvec"
+        assert params["_match_count"] == 3
+        assert params["_rescore_factor"] == 4
+
+    async def test_vector_cache_answers_project_scope_without_rpc(self):
+        svc = self._service()
+        svc.generate_embedding = AsyncMock(return_value=[0.1] * 8)
+        cache = MagicMock()
+        cache.serves.return_value = True
+        cache.search = AsyncMock(return_value=[(2, 0.9), (1, 0.8)])
+        rows = [
+            {"id": 1, "content": "one", "metadata": {"filename": "a.pdf"}},
+            {"id": 2, "content": "two", "metadata": {"filename": "b.pdf"}},
+        ]
+
+        with (
+            patch("app.explore.services.rag_service._vector_cache", cache),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            chain = mock_supa.table.return_value.select.return_value.in_.return_value
+            chain.execute.return_value = MagicMock(data=rows)
+            result = await svc.search_documents("q", project_ids=[5], limit=2)
+
+        mock_supa.rpc.assert_not_called()
+        mock_supa.table.return_value.select.return_value.in_.assert_called_once_with(
+            "id", [2, 1]
+        )
+        assert [(d["id"], d["similarity_score"]) for d in result] == [
+            (2, 0.9),
+            (1, 0.8),
+        ]
+
+    async def test_vector_cache_miss_falls_back_to_rpc(self):
+        svc = self._service()
+        svc.generate_embedding = AsyncMock(return_value=[0.1] * 8)
+        cache = MagicMock()
+        cache.serves.return_value = True
+        cache.search = AsyncMock(return_value=None)
+
+        with (
+            patch("app.explore.services.rag_service._vector_cache", cache),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=[])
+            await svc.search_documents("q", project_ids=[5])
+
+        assert mock_supa.rpc.call_args[0][0] == "match_client_knowledge"
+
+
+# ---------------------------------------------------------------------------
+# RAGService.generate_embedding — query-embedding cache
+# ---------------------------------------------------------------------------
+
+
+class TestQueryEmbeddingCache:
+    def _service(self) -> tuple[RAGService, AsyncMock]:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        emb = MagicMock()
+        emb.data = [MagicMock(embedding=[0.25, 0.5, 0.75])]
+        create = AsyncMock(return_value=emb)
+        svc.client = MagicMock()
+        svc.client.embeddings.create = create
+        return svc, create
+
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        rag_service._query_embedding_cache.invalidate()
+        yield
+        rag_service._query_embedding_cache.invalidate()
+
+    async def test_repeat_query_reuses_cached_embedding(self):
+        svc, create = self._service()
+        first = await svc.generate_embedding("roof insulation")
+        second = await svc.generate_embedding("roof insulation")
+        assert first == second == [0.25, 0.5, 0.75]
+        create.assert_awaited_once()
+
+    async def test_whitespace_variants_share_an_entry(self):
+        svc, create = self._service()
+        await svc.generate_embedding("roof   insulation ")
+        await svc.generate_embedding(" roof insulation")
+        create.assert_awaited_once()
+        assert create.call_args.kwargs["input"] == "roof insulation"
+
+    async def test_concurrent_identical_queries_share_one_request(self):
+        import asyncio
+
+        svc, create = self._service()
+        results = await asyncio.gather(
+            *(svc.generate_embedding("hvac schedule") for _ in range(4))
+        )
+        assert all(r == [0.25, 0.5, 0.75] for r in results)
+        create.assert_awaited_once()
+
+    async def test_model_change_misses_the_cache(self):
+        svc, create = self._service()
+        await svc.generate_embedding("roof insulation")
+        with patch(
+            "app.explore.services.rag_service.settings.EMBEDDING_MODEL", "other/model"
+        ):
+            await svc.generate_embedding("roof insulation")
+        assert create.await_count == 2
+
+    async def test_failures_are_not_cached(self):
+        svc, create = self._service()
+        create.side_effect = [
+            RuntimeError("boom"),
+            MagicMock(data=[MagicMock(embedding=[1.0])]),
+        ]
+        with pytest.raises(ValueError):
+            await svc.generate_embedding("roof insulation")
+        assert await svc.generate_embedding("roof insulation") == [1.0]
+
+    async def test_batch_embeds_misses_in_one_request(self):
+        svc, create = self._service()
+        await svc.generate_embedding("roof insulation")
+        create.reset_mock()
+        create.return_value = MagicMock(
+            data=[MagicMock(embedding=[1.0]), MagicMock(embedding=[2.0])]
+        )
+
+        vectors = await svc.generate_embeddings(
+            ["hvac", "roof  insulation", "duct", "hvac"]
+        )
+
+        create.assert_awaited_once()
+        assert create.call_args.kwargs["input"] == ["hvac", "duct"]
+        assert vectors == [[1.0], [0.25, 0.5, 0.75], [2.0], [1.0]]
+        assert await svc.generate_embedding("duct") == [2.0]
+        create.assert_awaited_once()
+
+    async def test_batch_rejects_short_response(self):
+        svc, create = self._service()
+        with pytest.raises(ValueError):
+            await svc.generate_embeddings(["a", "b"])
+
+
+# ---------------------------------------------------------------------------
+# RAGService.hybrid_search — fused RPC + Python RRF fallback
+# ---------------------------------------------------------------------------
+
+
+class TestHybridSearch:
+    def _service(self) -> RAGService:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        svc.generate_embedding = AsyncMock(return_value=[0.1] * 8)
+        return svc
+
+    def test_rrf_orders_by_weighted_reciprocal_rank(self):
+        vector = [{"id": 1, "content": "a"}, {"id": 2, "content": "b"}]
+        keyword = [{"id": 2, "content": "b"}, {"id": 3, "content": "c"}]
+        fused = RAGService._reciprocal_rank_fusion(vector, keyword, 3, 0.7)
+        assert [d["id"] for d in fused] == [2, 1, 3]
+        assert fused[0]["vector_rank"] == 2
+        assert fused[0]["keyword_rank"] == 1
+        assert fused[2]["vector_rank"] is None
+
+    async def test_fused_mode_makes_one_rpc(self):
+        svc = self._service()
+        rows = [
+            {
+                "id": 9,
+                "content": "roof R-30",
+                "metadata": {"filename": "spec.pdf"},
+                "similarity": 0.8,
+                "vector_rank": 1,
+                "keyword_rank": 2,
+                "combined_score": 0.0164,
+            }
+        ]
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.HYBRID_SEARCH_FUSED = True
+            mock_settings.VECTOR_SEARCH_HALFVEC = False
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=rows)
+            result = await svc.hybrid_search("roof", project_ids=[3], limit=4)
+
+        mock_supa.rpc.assert_called_once()
+        name, params = mock_supa.rpc.call_args[0]
+        assert name == "hybrid_search_client_knowledge"
+        assert params["_match_count"] == 4
+        assert params["_candidate_count"] == 8
+        assert params["_filter_project_ids"] == [3]
+        assert result == [
+            {
+                "id": 9,
+                "content": "roof R-30",
+                "metadata": {"filename": "spec.pdf"},
+                "similarity_score": 0.8,
+                "combined_score": 0.0164,
+                "vector_rank": 1,
+                "keyword_rank": 2,
+            }
+        ]
+
+    async def test_fused_rpc_failure_falls_back_to_two_rpcs(self):
+        svc = self._service()
+        calls: list[str] = []
+
+        def _rpc(name, params):
+            calls.append(name)
+            chain = MagicMock()
+            if name == "hybrid_search_client_knowledge":
+                chain.execute.side_effect = RuntimeError("PGRST202 not found")
+            elif name == "match_client_knowledge":
+                chain.execute.return_value = MagicMock(
+                    data=[{"id": 1, "content": "v", "metadata": {}, "similarity": 0.9}]
+                )
+            else:
+                chain.execute.return_value = MagicMock(
+                    data=[{"id": 2, "content": "k", "metadata": {}, "rank": 0.2}]
+                )
+            return chain
+
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.HYBRID_SEARCH_FUSED = True
+            mock_settings.VECTOR_SEARCH_HALFVEC = False
+            mock_supa.rpc.side_effect = _rpc
+            result = await svc.hybrid_search("roof", project_ids=[3], limit=4)
+
+        assert calls[0] == "hybrid_search_client_knowledge"
+        assert sorted(calls[1:]) == [
+            "keyword_search_client_knowledge",
+            "match_client_knowledge",
+        ]
+        assert [d["id"] for d in result] == [1, 2]
+
+    async def test_halfvec_mode_adds_rescoring_params(self):
+        svc = self._service()
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.HYBRID_SEARCH_FUSED = True
+            mock_settings.VECTOR_SEARCH_HALFVEC = True
+            mock_settings.VECTOR_RESCORE_FACTOR = 3
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=[])
+            await svc.hybrid_search("roof", project_ids=[3], limit=4)
+
+        name, params = mock_supa.rpc.call_args[0]
+        assert name == "hybrid_search_client_knowledge"
+        assert params["_halfvec"] is True
+        assert params["_rescore_factor"] == 3
+
+    async def test_fused_disabled_uses_two_rpcs(self):
+        svc = self._service()
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.HYBRID_SEARCH_FUSED = False
+            mock_settings.VECTOR_SEARCH_HALFVEC = False
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=[])
+            await svc.hybrid_search("roof", project_ids=[3], limit=4)
+
+        names = [c[0][0] for c in mock_supa.rpc.call_args_list]
+        assert "hybrid_search_client_knowledge" not in names
+
+    async def test_fused_embedding_failure_returns_keyword_leg(self):
+        svc = self._service()
+        embed = AsyncMock(side_effect=ValueError("no embedding"))
+        svc.generate_embedding = embed
+        with (
+            patch("app.explore.services.rag_service.settings") as mock_settings,
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_settings.HYBRID_SEARCH_FUSED = True
+            mock_settings.VECTOR_SEARCH_HALFVEC = False
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(
+                data=[{"id": 5, "content": "k", "metadata": {}, "rank": 0.4}]
+            )
+            result = await svc.hybrid_search("roof", project_ids=[3], limit=4)
+
+        embed.assert_awaited_once()
+        assert [c[0][0] for c in mock_supa.rpc.call_args_list] == [
+            "keyword_search_client_knowledge"
+        ]
+        assert [d["id"] for d in result] == [5]
+
+    async def test_empty_scope_returns_nothing(self):
+        svc = self._service()
+        embed = AsyncMock()
+        svc.generate_embedding = embed
+        assert await svc.hybrid_search("roof", project_ids=[], client_id=None) == []
+        embed.assert_not_awaited()
+
+
+# ---------------------------------------------------------------------------
+# RAGService.retrieve_relevant — retrieval result cache
+# ---------------------------------------------------------------------------
+
+
+class TestRetrievalCache:
+    DOCS = [
+        {"id": 1, "content": "a", "rerank_score": 0.9},
+        {"id": 2, "content": "b", "rerank_score": 0.5},
+    ]
+
+    def _service(self) -> tuple[RAGService, AsyncMock, AsyncMock]:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        hybrid = AsyncMock(return_value=[{"id": 1}, {"id": 2}])
+        rerank = AsyncMock(return_value=[dict(d) for d in self.DOCS])
+        svc.hybrid_search = hybrid
+        svc.rerank = rerank
+        return svc, hybrid, rerank
+
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        rag_service._retrieval_cache.invalidate()
+        yield
+        rag_service._retrieval_cache.invalidate()
+
+    async def test_repeat_query_skips_retrieval(self):
+        svc, hybrid, rerank = self._service()
+
+        first = await svc.retrieve_relevant("roof  spec", [7], strict=True)
+        second = await svc.retrieve_relevant("roof spec", [7], strict=True)
+
+        assert first == second == self.DOCS
+        hybrid.assert_awaited_once()
+        rerank.assert_awaited_once()
+
+    async def test_hits_are_copies(self):
+        svc, _, _ = self._service()
+        first = await svc.retrieve_relevant("roof", [7], strict=True)
+        first[0]["content"] = "mutated"
+
+        second = await svc.retrieve_relevant("roof", [7], strict=True)
+
+        assert second[0]["content"] == "a"
+
+    async def test_corpus_write_invalidates(self):
+        svc, hybrid, _ = self._service()
+        await svc.retrieve_relevant("roof", [7, 8], strict=True)
+
+        corpus.bump(8)
+        await svc.retrieve_relevant("roof", [7, 8], strict=True)
+
+        assert hybrid.await_count == 2
+
+    async def test_scope_is_part_of_the_key(self):
+        svc, hybrid, _ = self._service()
+        uid = "550e8400-e29b-41d4-a716-446655440000"
+
+        await svc.retrieve_relevant("roof", [7], client_id=uid, strict=True)
+        await svc.retrieve_relevant("roof", [7], client_id=uid, strict=False)
+        await svc.retrieve_relevant("roof", [7], client_id=uid, top_n=3)
+
+        assert hybrid.await_count == 3
+
+    async def test_legacy_rows_write_invalidates_unscoped_entries(self):
+        svc, hybrid, _ = self._service()
+        uid = "550e8400-e29b-41d4-a716-446655440000"
+        await svc.retrieve_relevant("roof", [7], client_id=uid)
+
+        corpus.bump(None)
+        await svc.retrieve_relevant("roof", [7], client_id=uid)
+
+        assert hybrid.await_count == 2
+
+    async def test_failed_rerank_is_not_cached(self):
+        svc, hybrid, rerank = self._service()
+        rerank.return_value = [{"id": 1, "content": "a"}, {"id": 2, "content": "b"}]
+
+        await svc.retrieve_relevant("roof", [7], strict=True)
+        await svc.retrieve_relevant("roof", [7], strict=True)
+
+        assert hybrid.await_count == 2
+
+
+# ---------------------------------------------------------------------------
+# RAGService.retrieve_relevant_batch — one search round-trip per tool iteration
+# ---------------------------------------------------------------------------
+
+
+class TestRetrieveRelevantBatch:
+    ROWS = {
+        "roof": [
+            {
+                "id": 1,
+                "content": "roof a",
+                "metadata": {},
+                "similarity": 0.9,
+                "vector_rank": 1,
+                "keyword_rank": 1,
+                "combined_score": 0.03,
+            },
+            {
+                "id": 2,
+                "content": "roof b",
+                "metadata": {},
+                "similarity": 0.7,
+                "vector_rank": 2,
+                "keyword_rank": None,
+                "combined_score": 0.01,
+            },
+        ],
+        "hvac": [
+            {
+                "id": 3,
+                "content": "hvac",
+                "metadata": {},
+                "similarity": 0.8,
+                "vector_rank": 1,
+                "keyword_rank": 1,
+                "combined_score": 0.03,
+            },
+        ],
+    }
+
+    def _service(self) -> RAGService:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        svc.generate_embedding = AsyncMock(return_value=[0.1, 0.2])
+        svc.generate_embeddings = AsyncMock(
+            side_effect=lambda texts: [[0.1, 0.2] for _ in texts]
+        )
+        svc.rerank = AsyncMock(
+            side_effect=lambda query, documents, top_n: [
+                {**doc, "rerank_score": 1.0 / (i + 1)}
+                for i, doc in enumerate(documents[:top_n])
+            ]
+        )
+        return svc
+
+    def _rpc(self, name: str, params: dict) -> MagicMock:
+        chain = MagicMock()
+        if name == "hybrid_search_client_knowledge":
+            rows = self.ROWS.get(params["_query"], [])
+        else:
+            rows = [
+                {**row, "query_index": i}
+                for i, query in enumerate(params["_queries"])
+                for row in self.ROWS.get(query, [])
+            ]
+        chain.execute.return_value = MagicMock(data=rows)
+        return chain
+
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        rag_service._retrieval_cache.invalidate()
+        yield
+        rag_service._retrieval_cache.invalidate()
+
+    async def test_matches_per_query_retrieval_with_one_rpc(self):
+        svc = self._service()
+        with (
+            patch.object(rag_service.settings, "HYBRID_SEARCH_FUSED", True),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_supa.rpc.side_effect = self._rpc
+            batched = await svc.retrieve_relevant_batch(
+                ["roof", "hvac", "nothing", "roof"], [3], strict=True
+            )
+            assert [c.args[0] for c in mock_supa.rpc.call_args_list] == [
+                "hybrid_search_client_knowledge_batch"
+            ]
+            params = mock_supa.rpc.call_args.args[1]
+            assert params["_queries"] == ["roof", "hvac", "nothing"]
+            assert params["_query_embeddings"] == ["[0.1,0.2]"] * 3
+
+            rag_service._retrieval_cache.invalidate()
+            single = [
+                await svc.retrieve_relevant(query, [3], strict=True)
+                for query in ["roof", "hvac", "nothing", "roof"]
+            ]
+
+        assert batched == single
+        assert [d["id"] for d in batched[0]] == [1, 2]
+        assert batched[2] == []
+        assert batched[0] is not batched[3]
+
+    async def test_cached_queries_skip_the_rpc(self):
+        svc = self._service()
+        with (
+            patch.object(rag_service.settings, "HYBRID_SEARCH_FUSED", True),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_supa.rpc.side_effect = self._rpc
+            await svc.retrieve_relevant("roof", [3], strict=True)
+            mock_supa.rpc.reset_mock()
+
+            await svc.retrieve_relevant_batch(["roof", "hvac"], [3], strict=True)
+
+        # Only "hvac" was left, and a single query uses the plain fused RPC.
+        assert [c.args[0] for c in mock_supa.rpc.call_args_list] == [
+            "hybrid_search_client_knowledge"
+        ]
+
+    async def test_batch_rpc_failure_falls_back_per_query(self):
+        svc = self._service()
+
+        def _rpc(name: str, params: dict) -> MagicMock:
+            if name == "hybrid_search_client_knowledge_batch":
+                chain = MagicMock()
+                chain.execute.side_effect = RuntimeError("PGRST202 not found")
+                return chain
+            return self._rpc(name, params)
+
+        with (
+            patch.object(rag_service.settings, "HYBRID_SEARCH_FUSED", True),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            mock_supa.rpc.side_effect = _rpc
+            batched = await svc.retrieve_relevant_batch(
+                ["roof", "hvac"], [3], strict=True
+            )
+
+        assert [[d["id"] for d in docs] for docs in batched] == [[1, 2], [3]]
+        assert mock_supa.rpc.call_count == 3
+
+    async def test_no_scope_returns_empty_lists(self):
+        svc = self._service()
+        assert await svc.retrieve_relevant_batch(["a", "b"], []) == [[], []]
+
+
+# ---------------------------------------------------------------------------
+# RAGService.retrieve_relevant — MMR diversification
+# ---------------------------------------------------------------------------
+
+
+class TestRetrieveRelevantMMR:
+    # Chunks 1 and 2 overlap (near-identical vectors); 3 and 4 are distinct.
+    CANDIDATES = [
+        {"id": 1, "content": "x" * 400, "rerank_score": 0.9},
+        {"id": 2, "content": "y" * 400, "rerank_score": 0.85},
+        {"id": 3, "content": "z" * 400, "rerank_score": 0.6},
+        {"id": 4, "content": "w" * 400, "rerank_score": 0.2},
+    ]
+    EMBEDDINGS = {
+        1: np.array([1.0, 0.0, 0.0], dtype=np.float32),
+        2: np.array([0.999, 0.045, 0.0], dtype=np.float32),
+        3: np.array([0.0, 1.0, 0.0], dtype=np.float32),
+        4: np.array([0.0, 0.0, 1.0], dtype=np.float32),
+    }
+
+    def _service(self, embeddings: dict) -> tuple[RAGService, AsyncMock]:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        rerank = AsyncMock(
+            side_effect=lambda query, documents, top_n: documents[:top_n]
+        )
+        svc.hybrid_search = AsyncMock(return_value=[dict(d) for d in self.CANDIDATES])
+        svc.rerank = rerank
+        svc._candidate_embeddings = AsyncMock(return_value=embeddings)
+        return svc, rerank
+
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        rag_service._retrieval_cache.invalidate()
+        yield
+        rag_service._retrieval_cache.invalidate()
+
+    async def test_near_duplicate_is_replaced(self):
+        svc, rerank = self._service(self.EMBEDDINGS)
+        saved_before = metrics.value("mmr.tokens_saved")
+
+        with patch.object(rag_service.settings, "MMR_LAMBDA", 0.5):
+            docs = await svc.retrieve_relevant("roof", [7], top_n=2, strict=True)
+
+        assert [d["id"] for d in docs] == [1, 3]
+        assert rerank.await_args is not None
+        assert rerank.await_args.kwargs["top_n"] == 4
+        assert metrics.value("mmr.tokens_saved") - saved_before == 100
+
+    async def test_lambda_one_keeps_rerank_order(self):
+        svc, rerank = self._service(self.EMBEDDINGS)
+
+        with patch.object(rag_service.settings, "MMR_LAMBDA", 1.0):
+            docs = await svc.retrieve_relevant("roof", [7], top_n=2, strict=True)
+
+        assert [d["id"] for d in docs] == [1, 2]
+        assert rerank.await_args is not None
+        assert rerank.await_args.kwargs["top_n"] == 2
+
+    async def test_missing_embeddings_fall_back_to_rerank_order(self):
+        svc, _ = self._service({1: self.EMBEDDINGS[1]})
+        fallbacks = metrics.value("mmr.fallbacks")
+
+        with patch.object(rag_service.settings, "MMR_LAMBDA", 0.5):
+            docs = await svc.retrieve_relevant("roof", [7], top_n=2, strict=True)
+
+        assert [d["id"] for d in docs] == [1, 2]
+        assert metrics.value("mmr.fallbacks") == fallbacks + 1
+
+    async def test_candidate_embeddings_fetched_by_id(self):
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        with patch("app.explore.services.rag_service.supabase") as mock_supa:
+            scoped = mock_supa.table.return_value.select.return_value.or_
+            scoped.return_value.in_.return_value.execute.return_value = MagicMock(
+                data=[{"id": 5, "embedding": "[3.0, 4.0]"}]
+            )
+            found = await svc._candidate_embeddings([7], [5, None])
+
+        scoped.assert_called_once_with("project_id.in.(7)")
+        scoped.return_value.in_.assert_called_once_with("id", [5])
+        np.testing.assert_allclose(found[5], [0.6, 0.8])
+
+    async def test_candidate_embeddings_include_the_callers_legacy_rows(self):
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        uid = "00000000-0000-0000-0000-000000000001"
+        with patch("app.explore.services.rag_service.supabase") as mock_supa:
+            scoped = mock_supa.table.return_value.select.return_value.or_
+            scoped.return_value.in_.return_value.execute.return_value = MagicMock(
+                data=[]
+            )
+            await svc._candidate_embeddings([7], [5], uid)
+
+        scoped.assert_called_once_with(
+            f"project_id.in.(7),and(uid.eq.{uid},project_id.is.null)"
+        )
+
 
 # ---------------------------------------------------------------------------
 # RAGService.build_context_string — pure function
@@ -265,6 +972,73 @@ class TestBuildContextString:
         assert len(result) <= 10_500  # some slack for surrounding text
 
 
+class TestPackContext:
+    @pytest.fixture(autouse=True)
+    def _estimator(self):
+        # Deterministic counts (4 chars per token), independent of the
+        # tiktoken encodings.
+        with patch.object(
+            rag_service.tokens,
+            "count_tokens",
+            lambda text, model="": rag_service.tokens.estimate_tokens(text),
+        ):
+            yield
+
+    @staticmethod
+    def _doc(name: str, chars: int, score: float) -> dict:
+        return {
+            "content": name[0] * chars,
+            "metadata": {"filename": f"{name}.pdf"},
+            "rerank_score": score,
+        }
+
+    def test_short_high_ranked_doc_survives_long_one(self):
+        docs = [
+            self._doc("long", 4000, 0.9),
+            self._doc("mid", 400, 0.8),
+            self._doc("short", 200, 0.7),
+        ]
+
+        text, kept, used = RAGService.pack_context(docs, "m", token_budget=300)
+
+        assert [d["metadata"]["filename"] for d in kept] == ["mid.pdf", "short.pdf"]
+        assert text.index("mid.pdf") < text.index("short.pdf")
+        assert "long.pdf" not in text
+        assert 0 < used <= 300
+
+    def test_packs_by_score_but_emits_in_citation_order(self):
+        docs = [
+            self._doc("first", 400, 0.2),
+            self._doc("second", 400, 0.9),
+            self._doc("third", 400, 0.8),
+        ]
+
+        _, kept, _ = RAGService.pack_context(docs, "m", token_budget=250)
+
+        assert [d["metadata"]["filename"] for d in kept] == [
+            "second.pdf",
+            "third.pdf",
+        ]
+
+    def test_attachments_are_charged_first(self):
+        attachments = [{"filename": "notes.txt", "content": "n" * 800}]
+        docs = [self._doc("doc", 400, 0.9)]
+
+        text, kept, _ = RAGService.pack_context(
+            docs, "m", token_budget=250, attachments=attachments
+        )
+
+        assert "notes.txt" in text
+        assert kept == []
+
+    def test_empty_input(self):
+        assert RAGService.pack_context([], "m", token_budget=100) == (
+            "No relevant documents found.",
+            [],
+            0,
+        )
+
+
 # ---------------------------------------------------------------------------
 # store_document — batched inserts (statement-timeout regression)
 # ---------------------------------------------------------------------------
@@ -287,10 +1061,11 @@ class TestStoreDocumentBatching:
         svc.pdf_parser = MagicMock()
         svc.pdf_parser.chunk_text.return_value = [f"chunk {i}" for i in range(n_chunks)]
 
-        emb = MagicMock()
-        emb.data = [MagicMock(embedding=[0.0] * 8) for _ in range(n_chunks)]
+        async def _create(input, **kwargs):
+            return MagicMock(data=[MagicMock(embedding=[0.0] * 8) for _ in input])
+
         svc.client = MagicMock()
-        svc.client.embeddings.create = AsyncMock(return_value=emb)
+        svc.client.embeddings.create = _create
 
         inserted_batches: list[int] = []
 
@@ -314,3 +1089,200 @@ class TestStoreDocumentBatching:
             50,
         ]
         assert len(ids) == n_chunks
+
+    async def test_pages_are_embedded_and_inserted_as_one_document(self):
+        from app.explore.services.pdf_parser import PDFParser
+
+        svc = self._service()
+        svc.pdf_parser = PDFParser(chunk_size=100, chunk_overlap=0)
+        requests: list[int] = []
+
+        async def _create(input, **kwargs):
+            requests.append(len(input))
+            return MagicMock(data=[MagicMock(embedding=[0.0] * 8) for _ in input])
+
+        svc.client = MagicMock()
+        svc.client.embeddings.create = _create
+        pages = [
+            {"content": f"page {n} " + "x" * 80, "metadata": {"page_number": n}}
+            for n in range(1, 31)
+        ]
+        inserted: list[dict] = []
+
+        def _insert(rows):
+            inserted.extend(rows)
+            chain = MagicMock()
+            chain.execute.return_value = MagicMock(
+                data=[{"id": len(inserted) - len(rows) + i} for i in range(len(rows))]
+            )
+            return chain
+
+        with patch("app.explore.services.rag_service.supabase") as mock_supa:
+            mock_supa.table.return_value.insert.side_effect = _insert
+            ids = await svc.store_pages(
+                pages, client_id="uid-1", project_id=1, metadata={"upload_date": "d"}
+            )
+
+        # One embeddings request for 30 pages, not 30.
+        assert requests == [30]
+        assert ids == list(range(30))
+        assert [row["metadata"]["page_number"] for row in inserted] == list(
+            range(1, 31)
+        )
+        assert all(row["metadata"]["upload_date"] == "d" for row in inserted)
+        assert inserted[0]["metadata"]["chunk_hash"] == rag_service.chunk_hash(
+            inserted[0]["content"]
+        )
+
+
+# ---------------------------------------------------------------------------
+# Online re-embedding: dual-write and the read flip
+# ---------------------------------------------------------------------------
+
+
+class TestShadowEmbedding:
+    @pytest.fixture(autouse=True)
+    def _migrating(self, monkeypatch):
+        monkeypatch.setattr(rag_service.settings, "EMBEDDING_NEXT_MODEL", "next/model")
+        monkeypatch.setattr(rag_service.settings, "EMBEDDING_NEXT_DIMENSIONS", 4)
+        monkeypatch.setattr(rag_service.settings, "EMBEDDING_STORE_CACHE", False)
+        rag_service._query_embedding_cache.invalidate()
+        yield
+        rag_service._query_embedding_cache.invalidate()
+
+    def _service(self, fail_next: bool = False) -> tuple[RAGService, list]:
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        models: list = []
+
+        async def _create(input, model, **kwargs):
+            models.append(model)
+            if fail_next and model == "next/model":
+                raise RuntimeError("rate limited")
+            width = kwargs.get("dimensions") or 8
+            items = input if isinstance(input, list) else [input]
+            return MagicMock(data=[MagicMock(embedding=[0.5] * width) for _ in items])
+
+        svc.client = MagicMock()
+        svc.client.embeddings.create = _create
+        return svc, models
+
+    async def _store(self, svc: RAGService) -> list:
+        inserted: list = []
+
+        def _insert(rows):
+            inserted.extend(rows)
+            chain = MagicMock()
+            chain.execute.return_value = MagicMock(data=[{"id": 1}, {"id": 2}])
+            return chain
+
+        with patch("app.explore.services.rag_service.supabase") as mock_supa:
+            mock_supa.table.return_value.insert.side_effect = _insert
+            await svc.store_chunks(["a", "b"], [{}, {}], client_id="uid-1")
+        return inserted
+
+    async def test_new_chunks_are_written_to_both_columns(self):
+        svc, models = self._service()
+        inserted = await self._store(svc)
+
+        assert sorted(models) == ["next/model", "qwen/qwen3-embedding-8b"]
+        assert [len(row["embedding"]) for row in inserted] == [1536, 1536]
+        assert [len(row["embedding_next"]) for row in inserted] == [4, 4]
+
+    async def test_dual_write_failure_leaves_the_row_for_the_tool(self):
+        svc, _ = self._service(fail_next=True)
+        failures = metrics.value("reembed.dual_write_failures")
+        inserted = await self._store(svc)
+
+        assert len(inserted) == 2
+        assert all("embedding_next" not in row for row in inserted)
+        assert metrics.value("reembed.dual_write_failures") == failures + 1
+
+    async def test_after_the_flip_dual_write_failure_fails_the_insert(
+        self, monkeypatch
+    ):
+        monkeypatch.setattr(rag_service.settings, "EMBEDDING_READ_NEXT", True)
+        svc, _ = self._service(fail_next=True)
+        with pytest.raises(ValueError):
+            await self._store(svc)
+
+    async def test_flipped_reads_embed_queries_and_search_the_next_column(
+        self, monkeypatch
+    ):
+        monkeypatch.setattr(rag_service.settings, "EMBEDDING_READ_NEXT", True)
+        monkeypatch.setattr(rag_service.settings, "VECTOR_SEARCH_HALFVEC", True)
+        monkeypatch.setattr(rag_service.settings, "HYBRID_SEARCH_FUSED", True)
+        svc, models = self._service()
+        with patch("app.explore.services.rag_service.supabase") as mock_supa:
+            mock_supa.rpc.return_value.execute.return_value = MagicMock(data=[])
+            await svc.search_documents("roof", project_ids=[5])
+            vector_call = mock_supa.rpc.call_args[0]
+            await svc.hybrid_search("roof", project_ids=[5])
+            hybrid_call = mock_supa.rpc.call_args[0]
+
+        # One query embedding, from the next model, shared by both searches.
+        assert models == ["next/model"]
+        assert vector_call[0] == "match_client_knowledge_next"
+        assert len(vector_call[1]["_query_embedding"]) == 4
+        assert hybrid_call[0] == "hybrid_search_client_knowledge"
+        assert hybrid_call[1]["_embedding_next"] is True
+        assert "_halfvec" not in hybrid_call[1]
+
+    def test_reads_can_only_flip_to_a_configured_model(self):
+        from app.explore.core.config import Settings
+
+        with pytest.raises(ValueError):
+            Settings(
+                SUPABASE_URL="http://localhost:54321",
+                SUPABASE_PUBLIC_KEY="x",
+                EMBEDDING_READ_NEXT=True,
+            )
+
+
+# ---------------------------------------------------------------------------
+# Bulk insert over a direct connection (db/direct.py)
+# ---------------------------------------------------------------------------
+
+
+class TestBulkCopyInsert:
+    @pytest.fixture(autouse=True)
+    def _copy(self, monkeypatch):
+        monkeypatch.setattr(rag_service.settings, "BULK_INSERT_COPY", True)
+        monkeypatch.setattr(rag_service.settings, "DATABASE_URL", "postgresql://x")
+
+    def _insert(self, svc: RAGService) -> Any:
+        return svc.insert_chunks(
+            ["a", "b"], [{}, {}], [[0.1], [0.2]], client_id="uid-1", project_id=3
+        )
+
+    async def test_whole_document_goes_through_one_copy(self):
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        copy = AsyncMock(return_value=[11, 12])
+        generation = corpus.generation(3)
+        with (
+            patch.object(rag_service.direct, "insert_rows", copy),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            assert await self._insert(svc) == [11, 12]
+
+        (rows,) = copy.call_args.args
+        assert [row["content"] for row in rows] == ["a", "b"]
+        assert rows[0]["metadata"]["chunk_hash"] == rag_service.chunk_hash("a")
+        mock_supa.table.assert_not_called()
+        assert corpus.generation(3) > generation
+
+    async def test_copy_failure_falls_back_to_postgrest(self):
+        with patch("app.explore.services.rag_service.AsyncOpenAI"):
+            svc = RAGService()
+        copy = AsyncMock(side_effect=OSError("connection refused"))
+        fallbacks = metrics.value("bulk_insert.fallbacks")
+        with (
+            patch.object(rag_service.direct, "insert_rows", copy),
+            patch("app.explore.services.rag_service.supabase") as mock_supa,
+        ):
+            chain = mock_supa.table.return_value.insert.return_value
+            chain.execute.return_value = MagicMock(data=[{"id": 1}, {"id": 2}])
+            assert await self._insert(svc) == [1, 2]
+
+        assert metrics.value("bulk_insert.fallbacks") == fallbacks + 1
@@ -0,0 +1,103 @@
+"""Tests for app.explore.services.tokens."""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import tiktoken
+
+from app.explore.services import tokens
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    tokens.count_tokens.cache_clear()
+    tokens._encoding.cache_clear()
+    yield
+    tokens.count_tokens.cache_clear()
+    tokens._encoding.cache_clear()
+
+
+def _encoding_or_skip(name: str) -> tiktoken.Encoding:
+    """The real encoding; skips where its BPE file can't be fetched (offline)."""
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        pytest.skip(f"tiktoken {name} unavailable: {e}")
+
+
+class TestCountTokens:
+    def test_openai_models_count_with_their_own_encoding(self):
+        cl100k = _encoding_or_skip("cl100k_base")
+        text = "你好，世界。今天天气很好。"
+
+        count = tokens.count_tokens(text, "openai/gpt-4")
+
+        assert count == len(cl100k.encode(text)) == 16
+        assert tokens.estimate_tokens(text) == 4
+
+    def test_tables_and_code_count_real_tokens(self):
+        _encoding_or_skip("cl100k_base")
+        count = tokens.token_counter("openai/gpt-4")
+
+        assert count("col_a\tcol_b\t12.5\t-3\n") == 12
+        assert count("def f(x):\n    return x**2\n") == 10
+        assert count("") == 0
+
+    def test_other_models_count_with_the_default_encoding(self):
+        o200k = _encoding_or_skip(tokens.DEFAULT_ENCODING)
+        text = "Roof membrane replaced on the north wing."
+
+        assert tokens.count_tokens(text, "qwen/qwen3-235b") == len(o200k.encode(text))
+
+    def test_falls_back_to_estimate_when_the_encoding_cannot_load(self):
+        fake = MagicMock()
+        fake.encoding_for_model.side_effect = KeyError("deepseek-v4")
+        fake.get_encoding.side_effect = ConnectionError("offline")
+        with patch.object(tokens, "tiktoken", fake):
+            assert tokens.count_tokens("abcde", "deepseek/deepseek-v4") == 2
+            assert tokens.count_tokens("", "deepseek/deepseek-v4") == 0
+
+    def test_token_counter_refuses_to_estimate(self):
+        fake = MagicMock()
+        fake.encoding_for_model.side_effect = ConnectionError("offline")
+        with patch.object(tokens, "tiktoken", fake):
+            with pytest.raises(ValueError):
+                tokens.token_counter("openai/gpt-4o")
+
+    def test_uses_model_encoding_without_provider_prefix(self):
+        fake = MagicMock()
+        fake.encoding_for_model.return_value.encode.return_value = [1, 2, 3]
+        with patch.object(tokens, "tiktoken", fake):
+            assert tokens.count_tokens("hello world", "openai/gpt-4o") == 3
+        fake.encoding_for_model.assert_called_once_with("gpt-4o")
+
+    def test_unknown_model_uses_default_encoding(self):
+        fake = MagicMock()
+        fake.encoding_for_model.side_effect = KeyError("qwen")
+        fake.get_encoding.return_value.encode.return_value = [1]
+        with patch.object(tokens, "tiktoken", fake):
+            assert tokens.count_tokens("hi", "qwen/qwen3-235b") == 1
+        fake.get_encoding.assert_called_once_with(tokens.DEFAULT_ENCODING)
+
+    def test_counts_are_cached(self):
+        fake = MagicMock()
+        fake.encoding_for_model.return_value.encode.return_value = [1, 2]
+        with patch.object(tokens, "tiktoken", fake):
+            tokens.count_tokens("same text", "gpt-4o")
+            tokens.count_tokens("same text", "gpt-4o")
+        assert fake.encoding_for_model.return_value.encode.call_count == 1
+
+
+class TestPack:
+    def test_skips_item_that_does_not_fit_and_keeps_going(self):
+        # The long doc ranks second; the short third doc still fits after it
+        # is skipped.
+        assert tokens.pack([50, 400, 60], [0.9, 0.8, 0.7], 200) == [0, 2]
+
+    def test_highest_scores_win_and_input_order_is_kept(self):
+        assert tokens.pack([100, 100, 100], [0.1, 0.9, 0.5], 200) == [1, 2]
+
+    def test_nothing_fits(self):
+        assert tokens.pack([10, 20], [1.0, 0.5], 5) == []
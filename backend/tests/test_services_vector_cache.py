@@ -0,0 +1,292 @@
+"""Tests for app.explore.services.vector_cache.ProjectVectorCache."""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.explore.services import corpus
+from app.explore.services.vector_cache import ProjectVectorCache
+
+DIMS = 4
+
+
+class _FakeQuery:
+    """Minimal stand-in for the PostgREST builder chains the cache issues."""
+
+    def __init__(self, table: "_FakeTable"):
+        self._table = table
+        self._columns = ""
+        self._count = False
+        self._filters: List[tuple[str, str, Any]] = []
+        self._desc = False
+        self._limit: int | None = None
+
+    def select(self, columns: str, count: Any = None) -> "_FakeQuery":
+        self._columns = columns
+        self._count = count is not None
+        return self
+
+    def eq(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(("eq", column, value))
+        return self
+
+    def gt(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(("gt", column, value))
+        return self
+
+    def lte(self, column: str, value: Any) -> "_FakeQuery":
+        self._filters.append(("lte", column, value))
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "_FakeQuery":
+        self._desc = desc
+        return self
+
+    def limit(self, n: int) -> "_FakeQuery":
+        self._limit = n
+        return self
+
+    def execute(self) -> MagicMock:
+        rows = list(self._table.rows)
+        for op, column, value in self._filters:
+            if op == "eq":
+                rows = [r for r in rows if r[column] == value]
+            elif op == "gt":
+                rows = [r for r in rows if r[column] > value]
+            else:
+                rows = [r for r in rows if r[column] <= value]
+        rows.sort(key=lambda r: r["id"], reverse=self._desc)
+        total = len(rows)
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        self._table.queries.append(self._columns)
+        data = [
+            {c.strip(): r[c.strip()] for c in self._columns.split(",")} for r in rows
+        ]
+        return MagicMock(data=data, count=total if self._count else None)
+
+
+class _FakeTable:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.queries: List[str] = []
+
+    def __call__(self, name: str) -> _FakeQuery:
+        assert name == "client_knowledge"
+        return _FakeQuery(self)
+
+    @property
+    def page_loads(self) -> int:
+        return self.queries.count("id, embedding")
+
+
+def _rows(project_id: int, vectors: List[List[float]], first_id: int = 1) -> list:
+    # PostgREST returns vector columns in their text form.
+    return [
+        {"id": first_id + i, "project_id": project_id, "embedding": json.dumps(v)}
+        for i, v in enumerate(vectors)
+    ]
+
+
+def _cache(**overrides: Any) -> ProjectVectorCache:
+    params: Dict[str, Any] = dict(
+        max_bytes=1_000_000, max_rows=1000, ttl=300.0, dimensions=DIMS
+    )
+    params.update(overrides)
+    return ProjectVectorCache(**params)
+
+
+@pytest.fixture
+def table():
+    fake = _FakeTable([])
+    with patch("app.explore.services.vector_cache.supabase") as mock_supa:
+        mock_supa.table.side_effect = fake
+        yield fake
+
+
+class TestSearch:
+    async def test_exact_top_k_matches_brute_force(self, table: _FakeTable):
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(50, DIMS)).tolist()
+        table.rows = _rows(1, vectors)
+        query = rng.normal(size=DIMS).tolist()
+
+        hits = await _cache().search([1], query, limit=5)
+
+        matrix = np.asarray(vectors)
+        sims = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)) @ (
+            np.asarray(query) / np.linalg.norm(query)
+        )
+        expected = (np.argsort(-sims)[:5] + 1).tolist()
+        assert hits is not None
+        assert [chunk_id for chunk_id, _ in hits] == expected
+        assert hits[0][1] == pytest.approx(sims.max(), abs=1e-5)
+
+    async def test_threshold_filters_low_similarity(self, table: _FakeTable):
+        table.rows = _rows(1, [[1, 0, 0, 0], [0, 1, 0, 0], [1, 1, 0, 0]])
+
+        hits = await _cache().search(
+            [1], [1, 0, 0, 0], limit=5, similarity_threshold=0.5
+        )
+
+        assert hits is not None
+        assert [chunk_id for chunk_id, _ in hits] == [1, 3]
+
+    async def test_searches_across_projects(self, table: _FakeTable):
+        table.rows = _rows(1, [[1, 0, 0, 0]]) + _rows(
+            2, [[0.9, 0.1, 0, 0]], first_id=10
+        )
+
+        hits = await _cache().search([1, 2], [1, 0, 0, 0], limit=2)
+
+        assert hits is not None
+        assert [chunk_id for chunk_id, _ in hits] == [1, 10]
+
+    async def test_disabled_cache_returns_none(self, table: _FakeTable):
+        cache = _cache(max_bytes=0)
+        assert not cache.serves([1], None)
+        assert await cache.search([1], [1, 0, 0, 0], limit=5) is None
+        assert table.queries == []
+
+
+class TestLoading:
+    async def test_loads_once_then_serves_from_memory(self, table: _FakeTable):
+        table.rows = _rows(1, [[1, 0, 0, 0], [0, 1, 0, 0]])
+        cache = _cache()
+
+        await cache.search([1], [1, 0, 0, 0], limit=1)
+        await cache.search([1], [0, 1, 0, 0], limit=1)
+
+        assert table.page_loads == 1
+        assert cache.stats()["hits"] == 1
+
+    async def test_paginates_by_keyset(self, table: _FakeTable):
+        table.rows = _rows(1, [[1, 0, 0, i] for i in range(5)])
+        with patch("app.explore.services.vector_cache.LOAD_PAGE_SIZE", 2):
+            hits = await _cache().search([1], [1, 0, 0, 0], limit=10)
+
+        assert hits is not None
+        assert sorted(chunk_id for chunk_id, _ in hits) == [1, 2, 3, 4, 5]
+        assert table.page_loads == 3
+
+    async def test_corpus_bump_forces_reload(self, table: _FakeTable):
+        table.rows = _rows(41, [[1, 0, 0, 0]])
+        cache = _cache()
+        await cache.search([41], [1, 0, 0, 0], limit=5)
+
+        table.rows += _rows(41, [[0.9, 0.1, 0, 0]], first_id=2)
+        corpus.bump(41)
+        hits = await cache.search([41], [1, 0, 0, 0], limit=5)
+
+        assert hits is not None
+        assert [chunk_id for chunk_id, _ in hits] == [1, 2]
+        assert table.page_loads == 2
+
+    async def test_oversize_project_falls_back_and_is_remembered(
+        self, table: _FakeTable
+    ):
+        table.rows = _rows(1, [[1, 0, 0, 0]] * 3)
+        cache = _cache(max_rows=2)
+
+        assert await cache.search([1], [1, 0, 0, 0], limit=5) is None
+        assert not cache.serves([1], None)
+        assert table.page_loads == 0
+
+    async def test_lru_eviction_bounds_total_bytes(self, table: _FakeTable):
+        table.rows = (
+            _rows(1, [[1, 0, 0, 0]] * 2)
+            + _rows(2, [[0, 1, 0, 0]] * 2, first_id=10)
+            + _rows(3, [[0, 0, 1, 0]] * 2, first_id=20)
+        )
+        per_project = 2 * (DIMS * 4 + 8)
+        cache = _cache(max_bytes=2 * per_project)
+
+        for pid in (1, 2, 3):
+            await cache.search([pid], [1, 0, 0, 0], limit=1)
+
+        assert cache.stats()["projects"] == 2
+        assert cache.nbytes <= cache.max_bytes
+        assert cache.evictions == 1
+
+    async def test_mmap_file_is_shared_between_caches(
+        self, table: _FakeTable, tmp_path
+    ):
+        table.rows = _rows(1, [[1, 0, 0, 0], [0, 1, 0, 0]])
+        first = _cache(mmap_dir=str(tmp_path))
+        await first.search([1], [1, 0, 0, 0], limit=1)
+        assert table.page_loads == 1
+        assert len(list(tmp_path.glob("project-1-*.npy"))) == 2
+
+        # A second worker with the same directory maps the file instead of
+        # paginating the embeddings again.
+        second = _cache(mmap_dir=str(tmp_path))
+        hits = await second.search([1], [0, 1, 0, 0], limit=1)
+
+        assert hits is not None
+        assert hits[0][0] == 2
+        assert table.page_loads == 1
+
+    async def test_shadow_column_is_loaded_and_mapped_separately(
+        self, table: _FakeTable, tmp_path
+    ):
+        table.rows = [
+            {**row, "embedding_next": json.dumps([0, 0, 0, 1])}
+            for row in _rows(1, [[1, 0, 0, 0]])
+        ]
+        await _cache(mmap_dir=str(tmp_path)).search([1], [1, 0, 0, 0], limit=1)
+        shadow = _cache(mmap_dir=str(tmp_path), column="embedding_next")
+        hits = await shadow.search([1], [0, 0, 0, 1], limit=1)
+
+        assert hits is not None
+        assert hits[0][1] == pytest.approx(1.0)
+        assert table.queries.count("id, embedding_next") == 1
+        assert len(list(tmp_path.glob("project-1-*-embedding_next.*.npy"))) == 2
+
+    async def test_model_change_forces_a_reload(self, table: _FakeTable, tmp_path):
+        table.rows = _rows(1, [[1, 0, 0, 0], [0, 1, 0, 0]])
+        await _cache(mmap_dir=str(tmp_path), model="old/model").search(
+            [1], [1, 0, 0, 0], limit=1
+        )
+        # Re-embedded in place: same rows and ids, new vectors.
+        table.rows = _rows(1, [[0, 0, 1, 0], [0, 0, 0, 1]])
+        hits = await _cache(mmap_dir=str(tmp_path), model="new/model").search(
+            [1], [0, 0, 0, 1], limit=1
+        )
+
+        assert table.page_loads == 2
+        assert hits is not None
+        assert hits[0] == (2, pytest.approx(1.0))
+        # The old model's files were replaced, not kept alongside.
+        assert len(list(tmp_path.glob("project-1-*.npy"))) == 2
+
+    async def test_load_failure_falls_back(self, table: _FakeTable):
+        table.rows = [{"id": 1, "project_id": 1, "embedding": "not json"}]
+        assert await _cache().search([1], [1, 0, 0, 0], limit=5) is None
+
+
+class TestVectors:
+    async def test_returns_resident_rows_without_loading(self, table: _FakeTable):
+        table.rows = _rows(52, [[2, 0, 0, 0], [0, 3, 0, 0]])
+        cache = _cache()
+        assert cache.vectors([52], [1, 2]) == {}
+
+        await cache.search([52], [1, 0, 0, 0], limit=1)
+        found = cache.vectors([52], [2, 99])
+
+        assert list(found) == [2]
+        np.testing.assert_allclose(found[2], [0, 1, 0, 0])
+        assert table.page_loads == 1
+
+    async def test_stale_entry_is_ignored(self, table: _FakeTable):
+        table.rows = _rows(53, [[1, 0, 0, 0]])
+        cache = _cache()
+        await cache.search([53], [1, 0, 0, 0], limit=1)
+
+        corpus.bump(53)
+
+        assert cache.vectors([53], [1]) == {}
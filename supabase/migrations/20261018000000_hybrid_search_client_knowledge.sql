@@ -0,0 +1,141 @@
+-- ===========================================================================
+-- RAG: single-round-trip fused hybrid search.
+--
+-- RAGService.hybrid_search used to make two RPCs per query
+-- (match_client_knowledge + keyword_search_client_knowledge), ship up to
+-- 2 x rerank_candidates full chunk bodies over HTTP, and then run Reciprocal
+-- Rank Fusion in Python. hybrid_search_client_knowledge does all three steps
+-- server-side in one statement:
+--
+--   1. vector leg  — HNSW-ordered cosine search, top _candidate_count rows
+--                    above _similarity_threshold;
+--   2. keyword leg — GIN-backed plainto_tsquery match, top _candidate_count
+--                    rows by ts_rank;
+--   3. weighted RRF — _vector_weight / (_rrf_k + vector_rank)
+--                    + (1 - _vector_weight) / (_rrf_k + keyword_rank),
+--
+-- and only the final _match_count rows are joined back to client_knowledge
+-- for their content/metadata. Per-leg ranks (1-based, NULL when the row was
+-- not found by that leg) are returned so the caller can still log or debug
+-- the fusion.
+--
+-- similarity mirrors what the Python path reported: the cosine similarity
+-- for rows found by the vector leg, otherwise the keyword ts_rank normalized
+-- so the leg's top row is 1.0.
+--
+-- Scoping mirrors match_client_knowledge / keyword_search_client_knowledge
+-- exactly (project rows in _filter_project_ids OR the caller's own legacy
+-- NULL-project rows). The Python two-RPC path remains as the fallback when
+-- this function errors or is not yet deployed.
+-- ===========================================================================
+
+CREATE OR REPLACE FUNCTION public.hybrid_search_client_knowledge(
+    _query_embedding      public.vector,
+    _query                text,
+    _match_count          integer          DEFAULT 5,
+    _candidate_count      integer          DEFAULT 10,
+    _filter_uid           uuid             DEFAULT NULL::uuid,
+    _filter_project_ids   bigint[]         DEFAULT NULL::bigint[],
+    _similarity_threshold double precision DEFAULT 0.25,
+    _vector_weight        double precision DEFAULT 0.7,
+    _rrf_k                integer          DEFAULT 60
+)
+RETURNS TABLE(
+    id             bigint,
+    content        text,
+    metadata       jsonb,
+    similarity     double precision,
+    vector_rank    integer,
+    keyword_rank   integer,
+    combined_score double precision
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _tsquery tsquery;
+BEGIN
+    IF _filter_project_ids IS NULL AND _filter_uid IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Same degenerate-query guards as keyword_search_client_knowledge: an
+    -- empty or all-stop-word tsquery disables the keyword leg instead of
+    -- matching every row.
+    IF _query IS NOT NULL AND trim(_query) <> '' THEN
+        _tsquery := plainto_tsquery('english', _query);
+        IF _tsquery::text = '' THEN
+            _tsquery := NULL;
+        END IF;
+    END IF;
+
+    RETURN QUERY
+    WITH vector_hits AS (
+        SELECT ck.id, 1 - (ck.embedding <=> _query_embedding) AS similarity
+        FROM client_knowledge ck
+        WHERE (
+            (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+            OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+          )
+          AND 1 - (ck.embedding <=> _query_embedding) > _similarity_threshold
+        ORDER BY ck.embedding <=> _query_embedding
+        LIMIT _candidate_count
+    ),
+    vector_leg AS (
+        SELECT vh.id, vh.similarity,
+               row_number() OVER (ORDER BY vh.similarity DESC)::integer AS rnk
+        FROM vector_hits vh
+    ),
+    keyword_hits AS (
+        SELECT ck.id,
+               ts_rank(to_tsvector('english', ck.content), _tsquery)::float AS score
+        FROM client_knowledge ck
+        WHERE _tsquery IS NOT NULL
+          AND to_tsvector('english', ck.content) @@ _tsquery
+          AND (
+            (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+            OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+          )
+        ORDER BY score DESC
+        LIMIT _candidate_count
+    ),
+    keyword_leg AS (
+        SELECT kh.id,
+               kh.score / nullif(max(kh.score) OVER (), 0) AS normalized,
+               row_number() OVER (ORDER BY kh.score DESC)::integer AS rnk
+        FROM keyword_hits kh
+    ),
+    fused AS (
+        SELECT coalesce(v.id, k.id) AS id,
+               coalesce(v.similarity, k.normalized, 0) AS similarity,
+               v.rnk AS vector_rank,
+               k.rnk AS keyword_rank,
+               coalesce(_vector_weight / (_rrf_k + v.rnk), 0)
+                 + coalesce((1 - _vector_weight) / (_rrf_k + k.rnk), 0)
+                 AS combined_score
+        FROM vector_leg v
+        FULL OUTER JOIN keyword_leg k ON k.id = v.id
+        ORDER BY combined_score DESC, v.rnk NULLS LAST, k.rnk NULLS LAST
+        LIMIT _match_count
+    )
+    SELECT ck.id, ck.content, ck.metadata,
+           f.similarity, f.vector_rank, f.keyword_rank, f.combined_score
+    FROM fused f
+    JOIN client_knowledge ck ON ck.id = f.id
+    ORDER BY f.combined_score DESC, f.vector_rank NULLS LAST, f.keyword_rank NULLS LAST;
+END;
+$$;
+
+-- Service-role only, same ACL rationale as match_client_knowledge: Supabase's
+-- default privileges auto-grant EXECUTE to anon + authenticated, and this
+-- SECURITY DEFINER function trusts the caller's _filter_project_ids.
+REVOKE ALL ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer
+) FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer
+) TO service_role;
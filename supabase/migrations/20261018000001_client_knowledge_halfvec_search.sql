@@ -0,0 +1,241 @@
+-- ===========================================================================
+-- RAG: half-precision (halfvec) ANN index with full-precision rescoring.
+--
+-- client_knowledge.embedding is vector(1536): 6 KB of float32 per chunk, and
+-- the HNSW index over it roughly doubles that. Keeping the index resident is
+-- becoming the memory limit as the corpus grows.
+--
+-- This adds a second HNSW index over embedding::halfvec(1536) — 2 bytes per
+-- dimension, so about half the index size. It is an EXPRESSION index rather
+-- than a stored halfvec column: a generated column would add another 3 KB
+-- per row to the heap, while the full-precision column is still needed to
+-- rescore. The planner uses the index for any
+-- `ORDER BY embedding::halfvec(1536) <=> <halfvec> LIMIT n`.
+--
+-- Search modes (the backend picks one with VECTOR_SEARCH_HALFVEC):
+--
+--   * match_client_knowledge_halfvec — same contract as
+--     match_client_knowledge. It shortlists _match_count * _rescore_factor
+--     rows from the halfvec index, then re-ranks the shortlist by exact
+--     float32 cosine similarity. With _rescore_factor < 1 the halfvec
+--     distances are returned as-is (no rescoring).
+--   * hybrid_search_client_knowledge gains _halfvec / _rescore_factor. With
+--     _halfvec the vector leg shortlists from the halfvec index and rescores
+--     the same way. The default (false) is byte-for-byte the previous vector
+--     leg, so existing callers are unaffected.
+--
+-- Both leave the original vector(1536) HNSW index in place. Drop it only once
+-- halfvec mode has been validated with backend/benchmarks/halfvec_recall.py.
+--
+-- Requires pgvector >= 0.7.0 (halfvec). CREATE INDEX (not CONCURRENTLY, since
+-- migrations run in a transaction) blocks writes to client_knowledge while
+-- the index builds.
+-- ===========================================================================
+
+-- 1. Half-precision ANN index (cosine, same opclass family as the vector one).
+CREATE INDEX IF NOT EXISTS idx_client_knowledge_embedding_halfvec_hnsw
+  ON public.client_knowledge
+  USING hnsw ((embedding::public.halfvec(1536)) public.halfvec_cosine_ops);
+
+-- 2. Vector-only search over the halfvec index.
+CREATE OR REPLACE FUNCTION public.match_client_knowledge_halfvec(
+  _query_embedding public.vector,
+  _match_count integer DEFAULT 5,
+  _filter_uid uuid DEFAULT NULL::uuid,
+  _similarity_threshold double precision DEFAULT 0.5,
+  _filter_project_ids bigint[] DEFAULT NULL::bigint[],
+  _rescore_factor integer DEFAULT 4
+)
+  RETURNS TABLE(id bigint, content text, metadata jsonb, similarity double precision)
+  LANGUAGE plpgsql
+  SECURITY DEFINER
+  SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+  _query_half halfvec(1536) := _query_embedding::halfvec(1536);
+BEGIN
+  IF _rescore_factor IS NULL OR _rescore_factor < 1 THEN
+    RETURN QUERY
+    SELECT ck.id, ck.content, ck.metadata,
+      1 - (ck.embedding::halfvec(1536) <=> _query_half) AS similarity
+    FROM client_knowledge ck
+    WHERE (
+        (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+        OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+      )
+      AND 1 - (ck.embedding::halfvec(1536) <=> _query_half) > _similarity_threshold
+    ORDER BY ck.embedding::halfvec(1536) <=> _query_half
+    LIMIT _match_count;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  WITH shortlist AS (
+    SELECT ck.id
+    FROM client_knowledge ck
+    WHERE (
+        (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+        OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+      )
+    ORDER BY ck.embedding::halfvec(1536) <=> _query_half
+    LIMIT _match_count * _rescore_factor
+  )
+  SELECT ck.id, ck.content, ck.metadata,
+    1 - (ck.embedding <=> _query_embedding) AS similarity
+  FROM shortlist s
+  JOIN client_knowledge ck ON ck.id = s.id
+  WHERE 1 - (ck.embedding <=> _query_embedding) > _similarity_threshold
+  ORDER BY ck.embedding <=> _query_embedding
+  LIMIT _match_count;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.match_client_knowledge_halfvec(
+  public.vector, integer, uuid, double precision, bigint[], integer
+) FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION public.match_client_knowledge_halfvec(
+  public.vector, integer, uuid, double precision, bigint[], integer
+) TO service_role;
+
+-- 3. Fused hybrid search with an optional halfvec vector leg. New parameters
+--    change the signature, so the 9-argument version is dropped first.
+DROP FUNCTION IF EXISTS public.hybrid_search_client_knowledge(
+  public.vector, text, integer, integer, uuid, bigint[],
+  double precision, double precision, integer
+);
+
+CREATE OR REPLACE FUNCTION public.hybrid_search_client_knowledge(
+    _query_embedding      public.vector,
+    _query                text,
+    _match_count          integer          DEFAULT 5,
+    _candidate_count      integer          DEFAULT 10,
+    _filter_uid           uuid             DEFAULT NULL::uuid,
+    _filter_project_ids   bigint[]         DEFAULT NULL::bigint[],
+    _similarity_threshold double precision DEFAULT 0.25,
+    _vector_weight        double precision DEFAULT 0.7,
+    _rrf_k                integer          DEFAULT 60,
+    _halfvec              boolean          DEFAULT false,
+    _rescore_factor       integer          DEFAULT 4
+)
+RETURNS TABLE(
+    id             bigint,
+    content        text,
+    metadata       jsonb,
+    similarity     double precision,
+    vector_rank    integer,
+    keyword_rank   integer,
+    combined_score double precision
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _tsquery tsquery;
+    _query_half halfvec(1536);
+BEGIN
+    IF _filter_project_ids IS NULL AND _filter_uid IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF _query IS NOT NULL AND trim(_query) <> '' THEN
+        _tsquery := plainto_tsquery('english', _query);
+        IF _tsquery::text = '' THEN
+            _tsquery := NULL;
+        END IF;
+    END IF;
+
+    IF _halfvec THEN
+        _query_half := _query_embedding::halfvec(1536);
+    END IF;
+
+    RETURN QUERY
+    -- Exactly one branch of vector_shortlist runs: the other's constant
+    -- `_halfvec` guard is a one-time filter, so each branch still gets its
+    -- own index scan.
+    WITH vector_shortlist AS (
+        (SELECT ck.id
+         FROM client_knowledge ck
+         WHERE NOT _halfvec
+           AND (
+             (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+             OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+           )
+         ORDER BY ck.embedding <=> _query_embedding
+         LIMIT _candidate_count)
+        UNION ALL
+        (SELECT ck.id
+         FROM client_knowledge ck
+         WHERE _halfvec
+           AND (
+             (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+             OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+           )
+         ORDER BY ck.embedding::halfvec(1536) <=> _query_half
+         LIMIT _candidate_count * greatest(coalesce(_rescore_factor, 1), 1))
+    ),
+    -- Exact float32 similarity for the shortlist (a no-op re-sort in vector
+    -- mode; the rescoring pass in halfvec mode).
+    vector_hits AS (
+        SELECT ck.id, 1 - (ck.embedding <=> _query_embedding) AS similarity
+        FROM vector_shortlist vs
+        JOIN client_knowledge ck ON ck.id = vs.id
+        WHERE 1 - (ck.embedding <=> _query_embedding) > _similarity_threshold
+        ORDER BY ck.embedding <=> _query_embedding
+        LIMIT _candidate_count
+    ),
+    vector_leg AS (
+        SELECT vh.id, vh.similarity,
+               row_number() OVER (ORDER BY vh.similarity DESC)::integer AS rnk
+        FROM vector_hits vh
+    ),
+    keyword_hits AS (
+        SELECT ck.id,
+               ts_rank(to_tsvector('english', ck.content), _tsquery)::float AS score
+        FROM client_knowledge ck
+        WHERE _tsquery IS NOT NULL
+          AND to_tsvector('english', ck.content) @@ _tsquery
+          AND (
+            (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+            OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+          )
+        ORDER BY score DESC
+        LIMIT _candidate_count
+    ),
+    keyword_leg AS (
+        SELECT kh.id,
+               kh.score / nullif(max(kh.score) OVER (), 0) AS normalized,
+               row_number() OVER (ORDER BY kh.score DESC)::integer AS rnk
+        FROM keyword_hits kh
+    ),
+    fused AS (
+        SELECT coalesce(v.id, k.id) AS id,
+               coalesce(v.similarity, k.normalized, 0) AS similarity,
+               v.rnk AS vector_rank,
+               k.rnk AS keyword_rank,
+               coalesce(_vector_weight / (_rrf_k + v.rnk), 0)
+                 + coalesce((1 - _vector_weight) / (_rrf_k + k.rnk), 0)
+                 AS combined_score
+        FROM vector_leg v
+        FULL OUTER JOIN keyword_leg k ON k.id = v.id
+        ORDER BY combined_score DESC, v.rnk NULLS LAST, k.rnk NULLS LAST
+        LIMIT _match_count
+    )
+    SELECT ck.id, ck.content, ck.metadata,
+           f.similarity, f.vector_rank, f.keyword_rank, f.combined_score
+    FROM fused f
+    JOIN client_knowledge ck ON ck.id = f.id
+    ORDER BY f.combined_score DESC, f.vector_rank NULLS LAST, f.keyword_rank NULLS LAST;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+) FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+) TO service_role;
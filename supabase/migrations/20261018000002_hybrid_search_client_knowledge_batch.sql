@@ -0,0 +1,68 @@
+-- ===========================================================================
+-- RAG: several hybrid searches in one round-trip.
+--
+-- A tool iteration in which the model asks for several search_documents calls
+-- used to pay one PostgREST round-trip per query. This wraps
+-- hybrid_search_client_knowledge so the backend can send every query of the
+-- iteration at once:
+--
+--   * _query_embeddings / _queries are parallel arrays, one entry per query.
+--     Embeddings are passed as pgvector text literals ('[0.1,0.2,...]') and
+--     cast per row; a vector[] parameter can't be filled reliably from a
+--     JSON array of arrays.
+--   * Every other parameter is shared and means exactly what it means for
+--     hybrid_search_client_knowledge, which runs once per query (LATERAL),
+--     so each query's rows are identical to a single call's.
+--   * query_index is the 0-based position of the query in the input arrays;
+--     rows come back ordered by query_index, then in the single call's order.
+-- ===========================================================================
+
+CREATE OR REPLACE FUNCTION public.hybrid_search_client_knowledge_batch(
+    _query_embeddings     text[],
+    _queries              text[],
+    _match_count          integer          DEFAULT 5,
+    _candidate_count      integer          DEFAULT 10,
+    _filter_uid           uuid             DEFAULT NULL::uuid,
+    _filter_project_ids   bigint[]         DEFAULT NULL::bigint[],
+    _similarity_threshold double precision DEFAULT 0.25,
+    _vector_weight        double precision DEFAULT 0.7,
+    _rrf_k                integer          DEFAULT 60,
+    _halfvec              boolean          DEFAULT false,
+    _rescore_factor       integer          DEFAULT 4
+)
+RETURNS TABLE(
+    query_index    integer,
+    id             bigint,
+    content        text,
+    metadata       jsonb,
+    similarity     double precision,
+    vector_rank    integer,
+    keyword_rank   integer,
+    combined_score double precision
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    SELECT (q.ord - 1)::integer,
+           h.id, h.content, h.metadata, h.similarity,
+           h.vector_rank, h.keyword_rank, h.combined_score
+    FROM unnest(_query_embeddings, _queries) WITH ORDINALITY AS q(embedding, query, ord)
+    CROSS JOIN LATERAL public.hybrid_search_client_knowledge(
+        q.embedding::public.vector, q.query, _match_count, _candidate_count,
+        _filter_uid, _filter_project_ids, _similarity_threshold,
+        _vector_weight, _rrf_k, _halfvec, _rescore_factor
+    ) WITH ORDINALITY AS h(id, content, metadata, similarity,
+                           vector_rank, keyword_rank, combined_score, rnk)
+    ORDER BY q.ord, h.rnk;
+$$;
+
+REVOKE ALL ON FUNCTION public.hybrid_search_client_knowledge_batch(
+    text[], text[], integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+) FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION public.hybrid_search_client_knowledge_batch(
+    text[], text[], integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+) TO service_role;
@@ -0,0 +1,172 @@
+-- ===========================================================================
+-- Background ingestion jobs.
+--
+-- /documents/upload and /documents/knowledge/index-file used to download,
+-- extract, chunk, embed and insert inline, holding the HTTP request (and the
+-- Next.js proxy in front of it) for tens of seconds on large files. With
+-- background=true they now enqueue a row here and return its id; backend
+-- workers (services/jobs.py) claim and run it, and the client polls
+-- GET /documents/knowledge/jobs/{id}.
+--
+--   * State lives in Postgres, so a worker restart loses nothing: a running
+--     job's lease (locked_at) is renewed while it runs, and a job whose lease
+--     expired is claimable again. attempts counts claims; a job that keeps
+--     losing its worker fails after max_attempts like any other error.
+--   * claim_ingestion_job takes the next runnable job with FOR UPDATE SKIP
+--     LOCKED, so concurrent workers never claim the same row. Projects with
+--     the fewest running jobs go first (per-project fairness), and a job is
+--     not started while another job for the same file (dedupe_key) runs.
+--   * enqueue_ingestion_job coalesces duplicates: a second index request for
+--     a file whose job is still queued returns the queued job.
+--
+-- Finished rows are kept for status polling; prune with
+-- DELETE ... WHERE finished_at < now() - interval '30 days' if volume grows.
+-- Service role only: the backend authorizes every read and write itself.
+-- ===========================================================================
+
+CREATE TABLE public.ingestion_jobs (
+  id           uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  kind         text NOT NULL CHECK (kind IN ('index_file', 'upload')),
+  project_id   bigint NOT NULL REFERENCES public.projects(id) ON DELETE CASCADE,
+  uid          uuid REFERENCES auth.users(id) ON DELETE SET NULL,
+  payload      jsonb NOT NULL DEFAULT '{}'::jsonb,
+  dedupe_key   text,
+  status       text NOT NULL DEFAULT 'queued'
+                 CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+  attempts     integer NOT NULL DEFAULT 0,
+  max_attempts integer NOT NULL DEFAULT 3 CHECK (max_attempts > 0),
+  run_after    timestamptz NOT NULL DEFAULT now(),
+  locked_by    text,
+  locked_at    timestamptz,
+  progress     jsonb NOT NULL DEFAULT '{}'::jsonb,
+  result       jsonb,
+  error        text,
+  created_at   timestamptz NOT NULL DEFAULT now(),
+  updated_at   timestamptz NOT NULL DEFAULT now(),
+  started_at   timestamptz,
+  finished_at  timestamptz
+);
+
+CREATE INDEX ingestion_jobs_runnable_idx
+  ON public.ingestion_jobs (run_after)
+  WHERE status IN ('queued', 'running');
+CREATE INDEX ingestion_jobs_project_status_idx
+  ON public.ingestion_jobs (project_id, status);
+CREATE UNIQUE INDEX ingestion_jobs_queued_dedupe_key
+  ON public.ingestion_jobs (project_id, dedupe_key)
+  WHERE status = 'queued';
+
+ALTER TABLE public.ingestion_jobs ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE public.ingestion_jobs FROM PUBLIC, anon, authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.ingestion_jobs TO service_role;
+
+
+CREATE OR REPLACE FUNCTION public.enqueue_ingestion_job(
+    _kind         text,
+    _project_id   bigint,
+    _uid          uuid,
+    _payload      jsonb,
+    _dedupe_key   text    DEFAULT NULL,
+    _max_attempts integer DEFAULT 3
+)
+RETURNS public.ingestion_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _job public.ingestion_jobs;
+BEGIN
+    INSERT INTO public.ingestion_jobs
+        (kind, project_id, uid, payload, dedupe_key, max_attempts)
+    VALUES (_kind, _project_id, _uid, _payload, _dedupe_key, _max_attempts)
+    ON CONFLICT (project_id, dedupe_key) WHERE status = 'queued' DO NOTHING
+    RETURNING * INTO _job;
+
+    IF NOT FOUND THEN
+        SELECT * INTO _job
+        FROM public.ingestion_jobs
+        WHERE project_id = _project_id
+          AND dedupe_key = _dedupe_key
+          AND status = 'queued';
+    END IF;
+    RETURN _job;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION public.claim_ingestion_job(
+    _worker         text,
+    _lease_seconds  integer  DEFAULT 300,
+    _skip_projects  bigint[] DEFAULT '{}'::bigint[]
+)
+RETURNS SETOF public.ingestion_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _stale timestamptz := now() - make_interval(secs => _lease_seconds);
+BEGIN
+    -- A job whose worker died on its last attempt is not retried again.
+    UPDATE public.ingestion_jobs
+    SET status = 'failed',
+        error = 'worker lost (lease expired) on the final attempt',
+        locked_by = NULL,
+        updated_at = now(),
+        finished_at = now()
+    WHERE status = 'running'
+      AND locked_at < _stale
+      AND attempts >= max_attempts;
+
+    RETURN QUERY
+    UPDATE public.ingestion_jobs j
+    SET status = 'running',
+        attempts = j.attempts + 1,
+        locked_by = _worker,
+        locked_at = now(),
+        started_at = coalesce(j.started_at, now()),
+        updated_at = now()
+    FROM (
+        SELECT c.id
+        FROM public.ingestion_jobs c
+        WHERE ((c.status = 'queued' AND c.run_after <= now())
+               OR (c.status = 'running' AND c.locked_at < _stale))
+          AND NOT (c.project_id = ANY (coalesce(_skip_projects, '{}'::bigint[])))
+          AND NOT EXISTS (
+              SELECT 1
+              FROM public.ingestion_jobs r
+              WHERE r.project_id = c.project_id
+                AND r.dedupe_key = c.dedupe_key
+                AND r.id <> c.id
+                AND r.status = 'running'
+                AND r.locked_at >= _stale
+          )
+        ORDER BY (
+            SELECT count(*)
+            FROM public.ingestion_jobs r
+            WHERE r.project_id = c.project_id
+              AND r.status = 'running'
+              AND r.locked_at >= _stale
+        ), c.run_after, c.created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ) picked
+    WHERE j.id = picked.id
+    RETURNING j.*;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.enqueue_ingestion_job(
+    text, bigint, uuid, jsonb, text, integer
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.enqueue_ingestion_job(
+    text, bigint, uuid, jsonb, text, integer
+) TO service_role;
+
+REVOKE ALL ON FUNCTION public.claim_ingestion_job(
+    text, integer, bigint[]
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_ingestion_job(
+    text, integer, bigint[]
+) TO service_role;
@@ -0,0 +1,48 @@
+-- ===========================================================================
+-- RAG: patch the metadata of many client_knowledge rows in one round-trip.
+--
+-- An incremental re-index of a Document Portal file (POST
+-- /documents/knowledge/index-file) keeps the rows whose chunk text is
+-- unchanged instead of deleting and re-embedding them, but their position
+-- (chunk_index / total_chunks) and the file's content_hash still change.
+-- PostgREST can only apply one patch per UPDATE, so this takes them all:
+--
+--   * _updates is a JSON array of {"id": <bigint>, "metadata": {...}}; each
+--     row's metadata is merged with its patch (jsonb ||, so keys not in the
+--     patch are kept).
+--   * Only rows of _project_id are touched, whatever ids are passed.
+--   * No index covers metadata, so these updates leave the embedding, FTS and
+--     HNSW indexes alone (HOT updates where the page has room) — unlike the
+--     delete + re-insert a full re-index does.
+--
+-- Returns the number of rows updated. Service role only.
+-- ===========================================================================
+
+CREATE OR REPLACE FUNCTION public.patch_client_knowledge_metadata(
+    _project_id bigint,
+    _updates    jsonb
+)
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    WITH patch AS (
+        SELECT (u ->> 'id')::bigint AS id, u -> 'metadata' AS metadata
+        FROM jsonb_array_elements(coalesce(_updates, '[]'::jsonb)) AS u
+    ), updated AS (
+        UPDATE public.client_knowledge ck
+        SET metadata = coalesce(ck.metadata, '{}'::jsonb) || patch.metadata
+        FROM patch
+        WHERE ck.id = patch.id
+          AND ck.project_id = _project_id
+          AND jsonb_typeof(patch.metadata) = 'object'
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM updated;
+$$;
+
+REVOKE ALL ON FUNCTION public.patch_client_knowledge_metadata(bigint, jsonb)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.patch_client_knowledge_metadata(bigint, jsonb)
+  TO service_role;
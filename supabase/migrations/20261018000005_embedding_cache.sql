@@ -0,0 +1,92 @@
+-- ===========================================================================
+-- RAG: content-addressed cache of document-chunk embeddings.
+--
+-- The same chunk text is embedded again whenever a file is re-indexed or
+-- re-uploaded, saved from chat (/documents/knowledge/index-text), or shared
+-- by several projects. The backend (services/embedding_cache.py) now looks
+-- chunks up here by (model, dimensions, sha256 of the chunk text) before
+-- calling the paid embeddings API, and writes new embeddings back.
+--
+--   * content_hash is the same hex SHA-256 that client_knowledge rows carry
+--     as metadata->>'chunk_hash', which is what garbage collection keys on.
+--   * embedding is an untyped vector: the cache holds whatever dimensions
+--     the model was asked for (the key includes them).
+--   * get_cached_embeddings takes the hashes in the request body (a GET with
+--     hundreds of 64-char hashes would overflow the URL).
+--   * gc_embedding_cache deletes entries older than _min_age_seconds that no
+--     client_knowledge row references any more. The age floor keeps entries
+--     written for an upload that hasn't inserted its rows yet. There is
+--     deliberately no index on metadata->>'chunk_hash' (it would turn the
+--     in-place metadata patches of an incremental re-index into non-HOT
+--     updates); GC is one hash anti-join over client_knowledge, run
+--     periodically.
+--
+-- Service role only.
+-- ===========================================================================
+
+CREATE TABLE public.embedding_cache (
+  model        text NOT NULL,
+  dimensions   integer NOT NULL,
+  content_hash text NOT NULL,
+  embedding    public.vector NOT NULL,
+  created_at   timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (model, dimensions, content_hash)
+);
+
+CREATE INDEX embedding_cache_created_at_idx
+  ON public.embedding_cache (created_at);
+
+ALTER TABLE public.embedding_cache ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE public.embedding_cache FROM PUBLIC, anon, authenticated;
+GRANT SELECT, INSERT, UPDATE, DELETE ON TABLE public.embedding_cache TO service_role;
+
+
+CREATE OR REPLACE FUNCTION public.get_cached_embeddings(
+    _model      text,
+    _dimensions integer,
+    _hashes     text[]
+)
+RETURNS TABLE(content_hash text, embedding public.vector)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    SELECT c.content_hash, c.embedding
+    FROM public.embedding_cache c
+    WHERE c.model = _model
+      AND c.dimensions = _dimensions
+      AND c.content_hash = ANY (_hashes);
+$$;
+
+
+CREATE OR REPLACE FUNCTION public.gc_embedding_cache(
+    _min_age_seconds integer DEFAULT 86400
+)
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    WITH deleted AS (
+        DELETE FROM public.embedding_cache c
+        WHERE c.created_at < now() - make_interval(secs => _min_age_seconds)
+          AND NOT EXISTS (
+              SELECT 1
+              FROM public.client_knowledge k
+              WHERE k.metadata ->> 'chunk_hash' = c.content_hash
+          )
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM deleted;
+$$;
+
+REVOKE ALL ON FUNCTION public.get_cached_embeddings(text, integer, text[])
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_cached_embeddings(text, integer, text[])
+  TO service_role;
+
+REVOKE ALL ON FUNCTION public.gc_embedding_cache(integer)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.gc_embedding_cache(integer)
+  TO service_role;
@@ -0,0 +1,364 @@
+-- ===========================================================================
+-- RAG: shadow embedding column for online re-embedding.
+--
+-- Changing the embedding model or its dimensions used to mean rewriting
+-- client_knowledge.embedding in one migration (20260702000001 got away with
+-- an in-place conversion only because MRL truncation needed no API calls).
+-- A real model change has to re-embed every chunk, and search must keep
+-- working while it does. The upgrade now runs online:
+--
+--   1. Set EMBEDDING_NEXT_MODEL / EMBEDDING_NEXT_DIMENSIONS. Every new chunk
+--      is embedded with both models and written to embedding and
+--      embedding_next (dual-write, RAGService.insert_chunks).
+--   2. Run `python -m app.explore.reembed` (backend/). It fills embedding_next
+--      for the remaining rows in throttled batches, and resumes where it
+--      left off after a crash (pending rows are the ones still NULL).
+--   3. Once no row is pending, set EMBEDDING_READ_NEXT=true. A worker then
+--      embeds queries with the next model AND searches embedding_next (the
+--      two always switch together), so reads never mix the two spaces.
+--   4. Finalize in a migration written for that upgrade: swap the columns,
+--      type and index the new one, and rebuild the halfvec index if the
+--      dimensions changed, e.g.
+--          ALTER TABLE client_knowledge RENAME embedding TO embedding_prev;
+--          ALTER TABLE client_knowledge RENAME embedding_next TO embedding;
+--          ALTER TABLE client_knowledge ALTER embedding TYPE vector(<dims>);
+--          CREATE INDEX ... USING hnsw (embedding vector_cosine_ops);
+--      then point EMBEDDING_MODEL / EMBEDDING_DIMENSIONS at the new model,
+--      unset the three settings above and drop embedding_prev.
+--   Steps 3 and 4 take effect as the workers restart with the new settings.
+--   Nothing in VECTOR_CACHE_DIR needs clearing: the vector cache stamps its
+--   mmap files with the read model (and column), so a restarted worker
+--   misses the old model's matrices and reloads the project's vectors.
+--
+-- embedding_next is an untyped vector: its dimensions are only known per
+-- upgrade. Without a type there is no HNSW index, so searches over it
+-- (match_client_knowledge_next, hybrid search with _embedding_next) are
+-- exact: the project filter (client_knowledge_project_id_idx) narrows the
+-- scan to the caller's projects and the rows are sorted by distance. That
+-- is the only window in which it is read.
+--
+-- Adding a nullable column without a default is a catalog change only; no
+-- row is rewritten. Service role only, like the other client_knowledge RPCs.
+-- ===========================================================================
+
+-- 1. The shadow column, and the rows the re-embed tool still has to fill.
+--    The partial index shrinks as the migration progresses, so counting and
+--    paging through the pending rows stays cheap until the end.
+ALTER TABLE public.client_knowledge
+  ADD COLUMN IF NOT EXISTS embedding_next public.vector;
+
+CREATE INDEX IF NOT EXISTS idx_client_knowledge_embedding_next_pending
+  ON public.client_knowledge (id)
+  WHERE embedding_next IS NULL;
+
+-- 2. Write many re-embedded rows in one round-trip. _updates is a JSON array
+--    of {"id": <bigint>, "embedding": [<float>, ...]}. Returns the number of
+--    rows updated (rows deleted since they were read are simply skipped).
+CREATE OR REPLACE FUNCTION public.set_client_knowledge_embedding_next(
+    _updates jsonb
+)
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    WITH patch AS (
+        SELECT (u ->> 'id')::bigint AS id,
+               (u ->> 'embedding')::public.vector AS embedding
+        FROM jsonb_array_elements(coalesce(_updates, '[]'::jsonb)) AS u
+    ), updated AS (
+        UPDATE public.client_knowledge ck
+        SET embedding_next = patch.embedding
+        FROM patch
+        WHERE ck.id = patch.id
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM updated;
+$$;
+
+-- 3. Clear up to _limit filled rows (an abandoned or retargeted migration).
+--    Returns how many were cleared; call until it returns 0.
+CREATE OR REPLACE FUNCTION public.reset_client_knowledge_embedding_next(
+    _limit integer DEFAULT 1000
+)
+RETURNS integer
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    WITH picked AS (
+        SELECT ck.id
+        FROM public.client_knowledge ck
+        WHERE ck.embedding_next IS NOT NULL
+        LIMIT _limit
+    ), updated AS (
+        UPDATE public.client_knowledge ck
+        SET embedding_next = NULL
+        FROM picked
+        WHERE ck.id = picked.id
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM updated;
+$$;
+
+-- 4. match_client_knowledge over embedding_next (same contract).
+CREATE OR REPLACE FUNCTION public.match_client_knowledge_next(
+  _query_embedding public.vector,
+  _match_count integer DEFAULT 5,
+  _filter_uid uuid DEFAULT NULL::uuid,
+  _similarity_threshold double precision DEFAULT 0.5,
+  _filter_project_ids bigint[] DEFAULT NULL::bigint[]
+)
+  RETURNS TABLE(id bigint, content text, metadata jsonb, similarity double precision)
+  LANGUAGE plpgsql
+  SECURITY DEFINER
+  SET search_path TO 'public', 'pg_temp'
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT ck.id, ck.content, ck.metadata,
+    1 - (ck.embedding_next <=> _query_embedding) AS similarity
+  FROM client_knowledge ck
+  WHERE (
+      (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+      OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+    )
+    AND ck.embedding_next IS NOT NULL
+    AND 1 - (ck.embedding_next <=> _query_embedding) > _similarity_threshold
+  ORDER BY ck.embedding_next <=> _query_embedding
+  LIMIT _match_count;
+END;
+$$;
+
+-- 5. Fused hybrid search with an optional embedding_next vector leg. With
+--    _embedding_next the vector leg ranks and scores by embedding_next and
+--    _halfvec is ignored; the default (false) is the previous function.
+DROP FUNCTION IF EXISTS public.hybrid_search_client_knowledge_batch(
+    text[], text[], integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+);
+DROP FUNCTION IF EXISTS public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer
+);
+
+CREATE OR REPLACE FUNCTION public.hybrid_search_client_knowledge(
+    _query_embedding      public.vector,
+    _query                text,
+    _match_count          integer          DEFAULT 5,
+    _candidate_count      integer          DEFAULT 10,
+    _filter_uid           uuid             DEFAULT NULL::uuid,
+    _filter_project_ids   bigint[]         DEFAULT NULL::bigint[],
+    _similarity_threshold double precision DEFAULT 0.25,
+    _vector_weight        double precision DEFAULT 0.7,
+    _rrf_k                integer          DEFAULT 60,
+    _halfvec              boolean          DEFAULT false,
+    _rescore_factor       integer          DEFAULT 4,
+    _embedding_next       boolean          DEFAULT false
+)
+RETURNS TABLE(
+    id             bigint,
+    content        text,
+    metadata       jsonb,
+    similarity     double precision,
+    vector_rank    integer,
+    keyword_rank   integer,
+    combined_score double precision
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _tsquery tsquery;
+    _query_half halfvec(1536);
+    _use_half boolean := _halfvec AND NOT _embedding_next;
+BEGIN
+    IF _filter_project_ids IS NULL AND _filter_uid IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF _query IS NOT NULL AND trim(_query) <> '' THEN
+        _tsquery := plainto_tsquery('english', _query);
+        IF _tsquery::text = '' THEN
+            _tsquery := NULL;
+        END IF;
+    END IF;
+
+    IF _use_half THEN
+        _query_half := _query_embedding::halfvec(1536);
+    END IF;
+
+    RETURN QUERY
+    -- Exactly one branch of vector_shortlist runs: the others' constant
+    -- guards are one-time filters, so each branch still gets its own scan.
+    WITH vector_shortlist AS (
+        (SELECT ck.id
+         FROM client_knowledge ck
+         WHERE NOT _use_half AND NOT _embedding_next
+           AND (
+             (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+             OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+           )
+         ORDER BY ck.embedding <=> _query_embedding
+         LIMIT _candidate_count)
+        UNION ALL
+        (SELECT ck.id
+         FROM client_knowledge ck
+         WHERE _use_half
+           AND (
+             (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+             OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+           )
+         ORDER BY ck.embedding::halfvec(1536) <=> _query_half
+         LIMIT _candidate_count * greatest(coalesce(_rescore_factor, 1), 1))
+        UNION ALL
+        (SELECT ck.id
+         FROM client_knowledge ck
+         WHERE _embedding_next
+           AND ck.embedding_next IS NOT NULL
+           AND (
+             (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+             OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+           )
+         ORDER BY ck.embedding_next <=> _query_embedding
+         LIMIT _candidate_count)
+    ),
+    -- Exact similarity for the shortlist, in the column searched (a no-op
+    -- re-sort in vector / embedding_next mode; rescoring in halfvec mode).
+    vector_scored AS (
+        SELECT ck.id,
+               1 - (CASE WHEN _embedding_next THEN ck.embedding_next
+                         ELSE ck.embedding::public.vector END
+                    <=> _query_embedding) AS similarity
+        FROM vector_shortlist vs
+        JOIN client_knowledge ck ON ck.id = vs.id
+    ),
+    vector_hits AS (
+        SELECT sc.id, sc.similarity
+        FROM vector_scored sc
+        WHERE sc.similarity > _similarity_threshold
+        ORDER BY sc.similarity DESC
+        LIMIT _candidate_count
+    ),
+    vector_leg AS (
+        SELECT vh.id, vh.similarity,
+               row_number() OVER (ORDER BY vh.similarity DESC)::integer AS rnk
+        FROM vector_hits vh
+    ),
+    keyword_hits AS (
+        SELECT ck.id,
+               ts_rank(to_tsvector('english', ck.content), _tsquery)::float AS score
+        FROM client_knowledge ck
+        WHERE _tsquery IS NOT NULL
+          AND to_tsvector('english', ck.content) @@ _tsquery
+          AND (
+            (_filter_project_ids IS NOT NULL AND ck.project_id = ANY(_filter_project_ids))
+            OR (_filter_uid IS NOT NULL AND ck.uid = _filter_uid AND ck.project_id IS NULL)
+          )
+        ORDER BY score DESC
+        LIMIT _candidate_count
+    ),
+    keyword_leg AS (
+        SELECT kh.id,
+               kh.score / nullif(max(kh.score) OVER (), 0) AS normalized,
+               row_number() OVER (ORDER BY kh.score DESC)::integer AS rnk
+        FROM keyword_hits kh
+    ),
+    fused AS (
+        SELECT coalesce(v.id, k.id) AS id,
+               coalesce(v.similarity, k.normalized, 0) AS similarity,
+               v.rnk AS vector_rank,
+               k.rnk AS keyword_rank,
+               coalesce(_vector_weight / (_rrf_k + v.rnk), 0)
+                 + coalesce((1 - _vector_weight) / (_rrf_k + k.rnk), 0)
+                 AS combined_score
+        FROM vector_leg v
+        FULL OUTER JOIN keyword_leg k ON k.id = v.id
+        ORDER BY combined_score DESC, v.rnk NULLS LAST, k.rnk NULLS LAST
+        LIMIT _match_count
+    )
+    SELECT ck.id, ck.content, ck.metadata,
+           f.similarity, f.vector_rank, f.keyword_rank, f.combined_score
+    FROM fused f
+    JOIN client_knowledge ck ON ck.id = f.id
+    ORDER BY f.combined_score DESC, f.vector_rank NULLS LAST, f.keyword_rank NULLS LAST;
+END;
+$$;
+
+-- 6. The batch wrapper, passing _embedding_next through.
+CREATE OR REPLACE FUNCTION public.hybrid_search_client_knowledge_batch(
+    _query_embeddings     text[],
+    _queries              text[],
+    _match_count          integer          DEFAULT 5,
+    _candidate_count      integer          DEFAULT 10,
+    _filter_uid           uuid             DEFAULT NULL::uuid,
+    _filter_project_ids   bigint[]         DEFAULT NULL::bigint[],
+    _similarity_threshold double precision DEFAULT 0.25,
+    _vector_weight        double precision DEFAULT 0.7,
+    _rrf_k                integer          DEFAULT 60,
+    _halfvec              boolean          DEFAULT false,
+    _rescore_factor       integer          DEFAULT 4,
+    _embedding_next       boolean          DEFAULT false
+)
+RETURNS TABLE(
+    query_index    integer,
+    id             bigint,
+    content        text,
+    metadata       jsonb,
+    similarity     double precision,
+    vector_rank    integer,
+    keyword_rank   integer,
+    combined_score double precision
+)
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+    SELECT (q.ord - 1)::integer,
+           h.id, h.content, h.metadata, h.similarity,
+           h.vector_rank, h.keyword_rank, h.combined_score
+    FROM unnest(_query_embeddings, _queries) WITH ORDINALITY AS q(embedding, query, ord)
+    CROSS JOIN LATERAL public.hybrid_search_client_knowledge(
+        q.embedding::public.vector, q.query, _match_count, _candidate_count,
+        _filter_uid, _filter_project_ids, _similarity_threshold,
+        _vector_weight, _rrf_k, _halfvec, _rescore_factor, _embedding_next
+    ) WITH ORDINALITY AS h(id, content, metadata, similarity,
+                           vector_rank, keyword_rank, combined_score, rnk)
+    ORDER BY q.ord, h.rnk;
+$$;
+
+REVOKE ALL ON FUNCTION public.set_client_knowledge_embedding_next(jsonb)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.set_client_knowledge_embedding_next(jsonb)
+  TO service_role;
+
+REVOKE ALL ON FUNCTION public.reset_client_knowledge_embedding_next(integer)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reset_client_knowledge_embedding_next(integer)
+  TO service_role;
+
+REVOKE ALL ON FUNCTION public.match_client_knowledge_next(
+  public.vector, integer, uuid, double precision, bigint[]
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.match_client_knowledge_next(
+  public.vector, integer, uuid, double precision, bigint[]
+) TO service_role;
+
+REVOKE ALL ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer, boolean
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.hybrid_search_client_knowledge(
+    public.vector, text, integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer, boolean
+) TO service_role;
+
+REVOKE ALL ON FUNCTION public.hybrid_search_client_knowledge_batch(
+    text[], text[], integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer, boolean
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.hybrid_search_client_knowledge_batch(
+    text[], text[], integer, integer, uuid, bigint[],
+    double precision, double precision, integer, boolean, integer, boolean
+) TO service_role;
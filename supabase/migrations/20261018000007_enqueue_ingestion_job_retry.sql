@@ -0,0 +1,60 @@
+-- ===========================================================================
+-- enqueue_ingestion_job: retry when the queued duplicate is claimed mid-call.
+--
+-- 20261018000003's enqueue_ingestion_job inserts with ON CONFLICT DO NOTHING
+-- and, on a conflict, selects the still-queued job with the same
+-- (project_id, dedupe_key). A worker can claim that job between the two
+-- statements (claim_ingestion_job moves it to 'running'), and then neither
+-- returns a row: the function returned a NULL composite, jobs.enqueue raised
+-- and the index request failed with a 500 although nothing was wrong.
+--
+-- Once the queued job has been claimed, the partial unique index no longer
+-- covers it and the INSERT succeeds, so the function now loops over the
+-- INSERT and SELECT until one of them returns a row (the usual upsert retry
+-- loop; each lost race means another transaction made progress). Same
+-- signature, so CREATE OR REPLACE keeps callers and grants; they are
+-- restated below like every other RPC.
+-- ===========================================================================
+
+CREATE OR REPLACE FUNCTION public.enqueue_ingestion_job(
+    _kind         text,
+    _project_id   bigint,
+    _uid          uuid,
+    _payload      jsonb,
+    _dedupe_key   text    DEFAULT NULL,
+    _max_attempts integer DEFAULT 3
+)
+RETURNS public.ingestion_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _job public.ingestion_jobs;
+BEGIN
+    LOOP
+        INSERT INTO public.ingestion_jobs
+            (kind, project_id, uid, payload, dedupe_key, max_attempts)
+        VALUES (_kind, _project_id, _uid, _payload, _dedupe_key, _max_attempts)
+        ON CONFLICT (project_id, dedupe_key) WHERE status = 'queued' DO NOTHING
+        RETURNING * INTO _job;
+        EXIT WHEN FOUND;
+
+        SELECT * INTO _job
+        FROM public.ingestion_jobs
+        WHERE project_id = _project_id
+          AND dedupe_key = _dedupe_key
+          AND status = 'queued';
+        EXIT WHEN FOUND;
+        -- Claimed between the two statements: insert again.
+    END LOOP;
+    RETURN _job;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.enqueue_ingestion_job(
+    text, bigint, uuid, jsonb, text, integer
+) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.enqueue_ingestion_job(
+    text, bigint, uuid, jsonb, text, integer
+) TO service_role;
@@ -0,0 +1,77 @@
+-- ===========================================================================
+-- gc_embedding_cache: one run per interval across all backend workers.
+--
+-- Every uvicorn worker starts its own GC task (services/embedding_cache.py),
+-- and each call of 20261018000005's gc_embedding_cache is a DELETE with an
+-- anti-join over all of client_knowledge on metadata->>'chunk_hash'. That
+-- expression is deliberately not indexed (an index would turn the in-place
+-- metadata patches of an incremental re-index into non-HOT updates), so
+-- every run is a full scan: N workers meant N scans an hour, racing to
+-- delete the same rows.
+--
+--   * pg_try_advisory_xact_lock: a call made while another run is in
+--     progress returns 0 at once instead of scanning alongside it.
+--   * embedding_cache_gc records when the last run started. A call within
+--     _min_interval_seconds of it returns 0, so however many workers call on
+--     their own timers, one scan runs per interval. The backend passes its
+--     EMBEDDING_CACHE_GC_INTERVAL_SECONDS (less a margin for timer jitter);
+--     the default of 0 keeps the old behaviour for manual calls.
+--
+-- The signature gains a parameter, so the old function is dropped first.
+-- Service role only.
+-- ===========================================================================
+
+CREATE TABLE public.embedding_cache_gc (
+  id          boolean PRIMARY KEY DEFAULT true CHECK (id),
+  last_run_at timestamptz
+);
+
+INSERT INTO public.embedding_cache_gc (id, last_run_at) VALUES (true, NULL);
+
+ALTER TABLE public.embedding_cache_gc ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON TABLE public.embedding_cache_gc FROM PUBLIC, anon, authenticated;
+GRANT SELECT, UPDATE ON TABLE public.embedding_cache_gc TO service_role;
+
+
+DROP FUNCTION IF EXISTS public.gc_embedding_cache(integer);
+
+CREATE OR REPLACE FUNCTION public.gc_embedding_cache(
+    _min_age_seconds      integer DEFAULT 86400,
+    _min_interval_seconds integer DEFAULT 0
+)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path TO 'public', 'pg_temp'
+AS $$
+DECLARE
+    _deleted integer;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('public.gc_embedding_cache')) THEN
+        RETURN 0;
+    END IF;
+
+    UPDATE public.embedding_cache_gc
+    SET last_run_at = now()
+    WHERE last_run_at IS NULL
+       OR last_run_at <= now() - make_interval(secs => _min_interval_seconds);
+    IF NOT FOUND THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM public.embedding_cache c
+    WHERE c.created_at < now() - make_interval(secs => _min_age_seconds)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM public.client_knowledge k
+          WHERE k.metadata ->> 'chunk_hash' = c.content_hash
+      );
+    GET DIAGNOSTICS _deleted = ROW_COUNT;
+    RETURN _deleted;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.gc_embedding_cache(integer, integer)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.gc_embedding_cache(integer, integer)
+  TO service_role;
@@ -0,0 +1,85 @@
+-- RAG search RPCs added for the retrieval hot path. Each is SECURITY DEFINER
+-- and trusts the caller-supplied scope, so each must be service_role-only, and
+-- each must honour the same project / legacy-NULL-project scoping as
+-- match_client_knowledge.
+BEGIN;
+SELECT plan(11);
+
+-- ---- hybrid_search_client_knowledge: ACL ----
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.hybrid_search_client_knowledge(public.vector,text,integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.hybrid_search_client_knowledge(public.vector,text,integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE'),
+  'hybrid_search_client_knowledge is NOT executable by anon/authenticated'
+);
+SELECT ok(
+  has_function_privilege('service_role', 'public.hybrid_search_client_knowledge(public.vector,text,integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE'),
+  'hybrid_search_client_knowledge IS executable by service_role'
+);
+
+-- ---- match_client_knowledge_halfvec: ACL + its expression index ----
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.match_client_knowledge_halfvec(public.vector,integer,uuid,double precision,bigint[],integer)', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.match_client_knowledge_halfvec(public.vector,integer,uuid,double precision,bigint[],integer)', 'EXECUTE'),
+  'match_client_knowledge_halfvec is NOT executable by anon/authenticated'
+);
+SELECT ok(
+  has_function_privilege('service_role', 'public.match_client_knowledge_halfvec(public.vector,integer,uuid,double precision,bigint[],integer)', 'EXECUTE'),
+  'match_client_knowledge_halfvec IS executable by service_role'
+);
+SELECT has_index(
+  'public', 'client_knowledge', 'idx_client_knowledge_embedding_halfvec_hnsw',
+  'client_knowledge has the halfvec HNSW expression index'
+);
+
+-- ---- hybrid_search_client_knowledge_batch: ACL ----
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.hybrid_search_client_knowledge_batch(text[],text[],integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.hybrid_search_client_knowledge_batch(text[],text[],integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE'),
+  'hybrid_search_client_knowledge_batch is NOT executable by anon/authenticated'
+);
+SELECT ok(
+  has_function_privilege('service_role', 'public.hybrid_search_client_knowledge_batch(text[],text[],integer,integer,uuid,bigint[],double precision,double precision,integer,boolean,integer)', 'EXECUTE'),
+  'hybrid_search_client_knowledge_batch IS executable by service_role'
+);
+
+-- ---- hybrid_search_client_knowledge: scoping (keyword leg; seed rows have
+--      no embeddings, so the vector leg is empty) ----
+SELECT t.as_service();
+SELECT is(
+  (SELECT array_agg(content ORDER BY content)
+     FROM public.hybrid_search_client_knowledge(
+       array_fill(0.1::real, ARRAY[1536])::public.vector, 'secret knowledge', 10, 20,
+       NULL, ARRAY[t.id('project_alpha')]::bigint[])),
+  ARRAY['Alpha tenant secret knowledge'],
+  'hybrid search scoped to Alpha returns only Alpha''s project row'
+);
+SELECT is(
+  (SELECT array_agg(content ORDER BY content)
+     FROM public.hybrid_search_client_knowledge(
+       array_fill(0.1::real, ARRAY[1536])::public.vector, 'unscoped knowledge', 10, 20,
+       'aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'::uuid, NULL)),
+  ARRAY['Alpha orphan unscoped knowledge'],
+  'hybrid search by uid returns only that uid''s NULL-project rows'
+);
+SELECT is(
+  (SELECT count(*)::int
+     FROM public.hybrid_search_client_knowledge(
+       array_fill(0.1::real, ARRAY[1536])::public.vector, 'knowledge', 10, 20,
+       NULL, NULL)),
+  0,
+  'hybrid search with no scope returns nothing'
+);
+SELECT is(
+  (SELECT array_agg(query_index::text || ':' || content ORDER BY query_index, content)
+     FROM public.hybrid_search_client_knowledge_batch(
+       ARRAY[array_fill(0.1::real, ARRAY[1536])::public.vector::text,
+             array_fill(0.1::real, ARRAY[1536])::public.vector::text],
+       ARRAY['secret knowledge', 'unscoped knowledge'], 10, 20,
+       NULL, ARRAY[t.id('project_alpha')]::bigint[])),
+  ARRAY['0:Alpha tenant secret knowledge'],
+  'batched hybrid search keeps each query''s scope and tags rows by query_index'
+);
+SELECT t.reset_auth();
+
+SELECT * FROM finish();
+ROLLBACK;
@@ -0,0 +1,65 @@
+-- Background ingestion job queue (migration 20261018000003). The table and
+-- both RPCs are service_role-only (the backend authorizes callers itself);
+-- claims must hand each job to exactly one worker and never start a second
+-- job for a file whose job is still running.
+BEGIN;
+SELECT plan(8);
+
+-- ---- ACL ----
+SELECT ok(
+  NOT has_table_privilege('anon', 'public.ingestion_jobs', 'SELECT')
+  AND NOT has_table_privilege('authenticated', 'public.ingestion_jobs', 'SELECT'),
+  'ingestion_jobs is NOT readable by anon/authenticated'
+);
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.enqueue_ingestion_job(text,bigint,uuid,jsonb,text,integer)', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.enqueue_ingestion_job(text,bigint,uuid,jsonb,text,integer)', 'EXECUTE'),
+  'enqueue_ingestion_job is NOT executable by anon/authenticated'
+);
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.claim_ingestion_job(text,integer,bigint[])', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.claim_ingestion_job(text,integer,bigint[])', 'EXECUTE'),
+  'claim_ingestion_job is NOT executable by anon/authenticated'
+);
+
+-- ---- Queue semantics ----
+SELECT t.as_service();
+SELECT is(
+  (public.enqueue_ingestion_job('index_file', t.id('project_alpha'), NULL,
+     '{"storage_path": "a.pdf"}', 'a.pdf')).id,
+  (public.enqueue_ingestion_job('index_file', t.id('project_alpha'), NULL,
+     '{"storage_path": "a.pdf"}', 'a.pdf')).id,
+  'a second request for a still-queued file returns the queued job'
+);
+SELECT is(
+  (SELECT attempts || ':' || locked_by
+     FROM public.claim_ingestion_job('w1', 300)),
+  '1:w1',
+  'claiming a job marks it running for that worker and counts the attempt'
+);
+SELECT is(
+  (SELECT count(*)::int FROM public.claim_ingestion_job('w2', 300)),
+  0,
+  'a running job is not handed to a second worker'
+);
+SELECT ok(
+  (public.enqueue_ingestion_job('index_file', t.id('project_alpha'), NULL,
+     '{"storage_path": "a.pdf"}', 'a.pdf')).status = 'queued'
+  AND (SELECT count(*) FROM public.claim_ingestion_job('w2', 300)) = 0,
+  'a re-index queued while the file''s job runs waits for it'
+);
+-- Expire w1's lease; hold the queued re-index back so only w1's job is due.
+UPDATE public.ingestion_jobs SET locked_at = now() - interval '1 hour'
+ WHERE locked_by = 'w1';
+UPDATE public.ingestion_jobs SET run_after = now() + interval '1 hour'
+ WHERE status = 'queued';
+SELECT is(
+  (SELECT attempts || ':' || locked_by
+     FROM public.claim_ingestion_job('w3', 300)),
+  '2:w3',
+  'a job whose lease expired is claimed again'
+);
+SELECT t.reset_auth();
+
+SELECT * FROM finish();
+ROLLBACK;
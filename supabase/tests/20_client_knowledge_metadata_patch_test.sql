@@ -0,0 +1,46 @@
+-- patch_client_knowledge_metadata (incremental re-index). SECURITY DEFINER
+-- and trusts the caller-supplied ids, so it must be service_role-only and
+-- must never touch rows outside _project_id.
+BEGIN;
+SELECT plan(5);
+
+SELECT ok(
+  NOT has_function_privilege('anon', 'public.patch_client_knowledge_metadata(bigint,jsonb)', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.patch_client_knowledge_metadata(bigint,jsonb)', 'EXECUTE'),
+  'patch_client_knowledge_metadata is NOT executable by anon/authenticated'
+);
+SELECT ok(
+  has_function_privilege('service_role', 'public.patch_client_knowledge_metadata(bigint,jsonb)', 'EXECUTE'),
+  'patch_client_knowledge_metadata IS executable by service_role'
+);
+
+SELECT t.as_service();
+SELECT is(
+  public.patch_client_knowledge_metadata(
+    t.id('project_alpha'),
+    jsonb_build_array(jsonb_build_object(
+      'id', (SELECT id FROM public.client_knowledge
+              WHERE content = 'Alpha tenant secret knowledge'),
+      'metadata', '{"chunk_index": 4, "total_chunks": 9}'::jsonb))),
+  1,
+  'a row of the project is patched'
+);
+SELECT is(
+  (SELECT metadata->>'chunk_index' FROM public.client_knowledge
+    WHERE content = 'Alpha tenant secret knowledge'),
+  '4',
+  'the patch is merged into the row''s metadata'
+);
+SELECT is(
+  public.patch_client_knowledge_metadata(
+    t.id('project_alpha'),
+    (SELECT jsonb_agg(jsonb_build_object('id', id, 'metadata', '{"x": 1}'::jsonb))
+       FROM public.client_knowledge
+      WHERE project_id IS DISTINCT FROM t.id('project_alpha'))),
+  0,
+  'rows outside _project_id are never touched'
+);
+SELECT t.reset_auth();
+
+SELECT * FROM finish();
+ROLLBACK;
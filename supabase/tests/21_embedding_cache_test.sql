@@ -0,0 +1,54 @@
+-- embedding_cache (document-chunk embedding cache). The table and both
+-- SECURITY DEFINER functions are service_role-only; GC must keep entries a
+-- client_knowledge row still references and entries younger than the floor,
+-- and run at most once per interval however many workers call it.
+BEGIN;
+SELECT plan(7);
+
+SELECT ok(
+  NOT has_table_privilege('anon', 'public.embedding_cache', 'SELECT')
+  AND NOT has_table_privilege('authenticated', 'public.embedding_cache', 'SELECT'),
+  'embedding_cache is NOT readable by anon/authenticated'
+);
+SELECT ok(
+  NOT has_function_privilege('authenticated', 'public.get_cached_embeddings(text,integer,text[])', 'EXECUTE')
+  AND NOT has_function_privilege('authenticated', 'public.gc_embedding_cache(integer,integer)', 'EXECUTE'),
+  'cache functions are NOT executable by authenticated'
+);
+SELECT ok(
+  has_function_privilege('service_role', 'public.get_cached_embeddings(text,integer,text[])', 'EXECUTE')
+  AND has_function_privilege('service_role', 'public.gc_embedding_cache(integer,integer)', 'EXECUTE'),
+  'cache functions ARE executable by service_role'
+);
+
+SELECT t.as_service();
+UPDATE public.client_knowledge
+   SET metadata = coalesce(metadata, '{}'::jsonb) || '{"chunk_hash": "kept"}'::jsonb
+ WHERE content = 'Alpha tenant secret knowledge';
+INSERT INTO public.embedding_cache (model, dimensions, content_hash, embedding, created_at)
+VALUES ('m', 3, 'kept',  '[1,2,3]', now() - interval '2 days'),
+       ('m', 3, 'stale', '[1,2,3]', now() - interval '2 days'),
+       ('m', 3, 'fresh', '[1,2,3]', now());
+
+SELECT is(
+  (SELECT count(*)::integer FROM public.get_cached_embeddings('m', 3, ARRAY['kept', 'stale', 'nope'])),
+  2,
+  'lookup returns only the cached hashes'
+);
+SELECT is(public.gc_embedding_cache(86400), 1, 'GC deletes only the stale, unreferenced entry');
+SELECT is(
+  (SELECT array_agg(content_hash ORDER BY content_hash) FROM public.embedding_cache WHERE model = 'm'),
+  ARRAY['fresh', 'kept'],
+  'referenced and young entries survive GC'
+);
+INSERT INTO public.embedding_cache (model, dimensions, content_hash, embedding, created_at)
+VALUES ('m', 3, 'stale2', '[1,2,3]', now() - interval '2 days');
+SELECT is(
+  public.gc_embedding_cache(86400, 3600),
+  0,
+  'another call within the interval skips the scan'
+);
+SELECT t.reset_auth();
+
+SELECT * FROM finish();
+ROLLBACK;